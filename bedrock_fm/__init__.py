@@ -1,44 +1,154 @@
 """Higher level SDK to interact with [Amazon Bedrock]().
 
-The `bedrock_fm` library exposes a separate class for each of the Bedrock models, with an simpler `generate()` API which is common across all models. The same method can be used to get a stream instead of a full completion by passing the `stream=True` as parameter. To obtain a detailed response including the original prompt, the body passed to the `invoke_*` method and timing information you can pass the parameter `details=True`. The API is fully typed, including the different return types based on the `stream` and `details` parameters values. 
+The `bedrock_fm` library exposes a separate class for each of the Bedrock models, with an simpler `generate()` API which is common across all models. The same method can be used to get a stream instead of a full completion by passing the `stream=True` as parameter. To obtain a detailed response including the original prompt, the body passed to the `invoke_*` method and timing information you can pass the parameter `details=True`. The API is fully typed, including the different return types based on the `stream` and `details` parameters values.
 
 The output generation can be tuned with the optional `temperature`, `top_p` and `stop_words` parameters which can be passed at the instance creation time (in the class constructor) and overridden at generation time in the `generate` method.
 """
 
-from .amazon import (
-    Titan,
-    TitanImageGeneration,
-    TitanImageVariation,
-    TitanImageInPainting,
-    TitanImageOutPainting,
-    TitanImageConditionedGeneration,
-    TitanImageColorGuidedContent,
-    TitanImageBackgroundRemoval,
-    ControlMode,
-    OutpaintingMode,
-)
-from .anthropic import Claude, Claude3
-from .ai21 import Jurassic, Jamba
-from .cohere import Command, CommandR
-from .meta import Llama2Chat, Llama3Instruct
-from .cohere_embeddings import Embed
-from .mistral import Mistral, Mixtral, MistralLarge
-from .titan_embeddings import TitanEmbeddings
-from .stability import SDXL, SDStylePresets
-from .bedrock import (
-    StreamDetails,
-    CompletionDetails,
-    BedrockFoundationModel,
-    BedrockEmbeddingsModel,
-    EmbeddingType,
-    InstanceProfile,
-)
-from .bedrock_image import BedrockImageModel
-from attrs import field
+from typing import TYPE_CHECKING
+import importlib
 from .exceptions import BedrockInvalidModelError
-from .bedrock import Human, Assistant, System
 from .model import Model
 
+_LAZY = {
+    "Titan": ".amazon",
+    "TitanImageGeneration": ".amazon",
+    "TitanImageVariation": ".amazon",
+    "TitanImageInPainting": ".amazon",
+    "TitanImageOutPainting": ".amazon",
+    "TitanImageConditionedGeneration": ".amazon",
+    "TitanImageColorGuidedContent": ".amazon",
+    "TitanImageBackgroundRemoval": ".amazon",
+    "ControlMode": ".amazon",
+    "OutpaintingMode": ".amazon",
+    "Claude": ".anthropic",
+    "Claude3": ".anthropic",
+    "Jurassic": ".ai21",
+    "Jamba": ".ai21",
+    "Command": ".cohere",
+    "CommandR": ".cohere",
+    "Llama2Chat": ".meta",
+    "Llama3Instruct": ".meta",
+    "Embed": ".cohere_embeddings",
+    "Rerank": ".cohere_embeddings",
+    "RerankResult": ".cohere_embeddings",
+    "Mistral": ".mistral",
+    "Mixtral": ".mistral",
+    "MistralLarge": ".mistral",
+    "TitanEmbeddings": ".titan_embeddings",
+    "TitanMultimodalEmbeddings": ".titan_embeddings",
+    "SDXL": ".stability",
+    "SDStylePresets": ".stability",
+    "StreamDetails": ".bedrock",
+    "CompletionDetails": ".bedrock",
+    "BedrockFoundationModel": ".bedrock",
+    "BedrockEmbeddingsModel": ".bedrock",
+    "EmbeddingType": ".bedrock",
+    "EmbeddingDataType": ".bedrock",
+    "InstanceProfile": ".bedrock",
+    "Human": ".bedrock",
+    "Assistant": ".bedrock",
+    "System": ".bedrock",
+    "BedrockImageModel": ".bedrock_image",
+    "EmbeddingPipeline": ".pipeline",
+    "Chunk": ".pipeline",
+    "iter_text_files": ".pipeline",
+    "split_text": ".pipeline",
+    "VectorStore": ".vector_store",
+    "InMemoryVectorStore": ".vector_store",
+    "CorpusSync": ".sync",
+    "SyncReport": ".sync",
+    "BatchRunner": ".batch",
+    "BatchReport": ".batch",
+    "PromptPacker": ".packing",
+    "PackReport": ".packing",
+    "ResultSink": ".sinks",
+    "JsonlSink": ".sinks",
+    "ParquetSink": ".sinks",
+    "ArrowSink": ".sinks",
+    "open_sink": ".sinks",
+    "RequestScheduler": ".scheduler",
+    "ScheduledClient": ".scheduler",
+    "scheduling": ".scheduler",
+    "BatchInference": ".batch_inference",
+    "BatchInferenceResult": ".batch_inference",
+    "S3Storage": ".batch_inference",
+    "LocalStorage": ".batch_inference",
+    "BedrockBatchJobs": ".batch_inference",
+    "LocalBatchJobs": ".batch_inference",
+    "Transport": ".transport",
+    "Boto3Transport": ".transport",
+    "HttpTransport": ".transport",
+    "CassetteClient": ".cassette",
+    "CassetteMode": ".cassette",
+    "Codec": ".codec",
+    "JsonCodec": ".codec",
+    "OrjsonCodec": ".codec",
+    "get_codec": ".codec",
+    "set_codec": ".codec",
+    "ModelCapabilities": ".catalog",
+    "get_capabilities": ".catalog",
+    "from_model_id": ".registry",
+    "get_model": ".registry",
+    "register_family": ".registry",
+}
+"""Module defining each public name. The modules, and `boto3` and `PIL` with them, are imported on first access"""
+
+if TYPE_CHECKING:
+    from .amazon import (
+        Titan,
+        TitanImageGeneration,
+        TitanImageVariation,
+        TitanImageInPainting,
+        TitanImageOutPainting,
+        TitanImageConditionedGeneration,
+        TitanImageColorGuidedContent,
+        TitanImageBackgroundRemoval,
+        ControlMode,
+        OutpaintingMode,
+    )
+    from .anthropic import Claude, Claude3
+    from .ai21 import Jurassic, Jamba
+    from .cohere import Command, CommandR
+    from .meta import Llama2Chat, Llama3Instruct
+    from .cohere_embeddings import Embed, Rerank, RerankResult
+    from .mistral import Mistral, Mixtral, MistralLarge
+    from .titan_embeddings import TitanEmbeddings, TitanMultimodalEmbeddings
+    from .stability import SDXL, SDStylePresets
+    from .bedrock import (
+        StreamDetails,
+        CompletionDetails,
+        BedrockFoundationModel,
+        BedrockEmbeddingsModel,
+        EmbeddingType,
+        EmbeddingDataType,
+        InstanceProfile,
+        Human,
+        Assistant,
+        System,
+    )
+    from .bedrock_image import BedrockImageModel
+    from .pipeline import EmbeddingPipeline, Chunk, iter_text_files, split_text
+    from .vector_store import VectorStore, InMemoryVectorStore
+    from .sync import CorpusSync, SyncReport
+    from .batch import BatchRunner, BatchReport
+    from .packing import PromptPacker, PackReport
+    from .sinks import ResultSink, JsonlSink, ParquetSink, ArrowSink, open_sink
+    from .scheduler import RequestScheduler, ScheduledClient, scheduling
+    from .batch_inference import (
+        BatchInference,
+        BatchInferenceResult,
+        S3Storage,
+        LocalStorage,
+        BedrockBatchJobs,
+        LocalBatchJobs,
+    )
+    from .transport import Transport, Boto3Transport, HttpTransport
+    from .cassette import CassetteClient, CassetteMode
+    from .codec import Codec, JsonCodec, OrjsonCodec, get_codec, set_codec
+    from .catalog import ModelCapabilities, get_capabilities
+    from .registry import from_model_id, get_model, register_family
+
 __all__ = [
     "Titan",
     "TitanImageGeneration",
@@ -62,6 +172,10 @@ __all__ = [
     "Command",
     "CommandR",
     "Embed",
+    "Rerank",
+    "RerankResult",
+    "TitanEmbeddings",
+    "TitanMultimodalEmbeddings",
     "Mistral",
     "Mixtral",
     "MistralLarge",
@@ -70,69 +184,65 @@ __all__ = [
     "SDXL",
     "SDStylePresets",
     "from_model_id",
+    "BedrockInvalidModelError",
+    "get_model",
+    "register_family",
     "Model",
     "Human",
     "Assistant",
     "System",
     "EmbeddingType",
+    "EmbeddingDataType",
     "InstanceProfile",
+    "EmbeddingPipeline",
+    "Chunk",
+    "iter_text_files",
+    "split_text",
+    "VectorStore",
+    "InMemoryVectorStore",
+    "CorpusSync",
+    "SyncReport",
+    "BatchRunner",
+    "BatchReport",
+    "PromptPacker",
+    "PackReport",
+    "ResultSink",
+    "JsonlSink",
+    "ParquetSink",
+    "ArrowSink",
+    "open_sink",
+    "RequestScheduler",
+    "ScheduledClient",
+    "scheduling",
+    "BatchInference",
+    "BatchInferenceResult",
+    "S3Storage",
+    "LocalStorage",
+    "BedrockBatchJobs",
+    "LocalBatchJobs",
+    "Transport",
+    "Boto3Transport",
+    "HttpTransport",
+    "CassetteClient",
+    "CassetteMode",
+    "Codec",
+    "JsonCodec",
+    "OrjsonCodec",
+    "get_codec",
+    "set_codec",
+    "ModelCapabilities",
+    "get_capabilities",
 ]
 
 
-__family_map = {
-    Titan.family(): Titan,
-    Command.family(): Command,
-    Jurassic.family(): Jurassic,
-    Claude.family(): Claude,
-    TitanEmbeddings.family(): TitanEmbeddings,
-    Embed.family(): Embed,
-    Llama2Chat.family(): Llama2Chat,
-    Embed.family(): Embed,
-    SDXL.family(): SDXL,
-    Claude3.family(): Claude3,
-    Jamba.family(): Jamba,
-}
-
-
-def from_model_id(
-    model_id: str | Model, **kwargs
-) -> BedrockFoundationModel | BedrockEmbeddingsModel | BedrockImageModel:
-    """Instantiates a Bedrock Foundation Model or Embedding Model based on the `model_id`.
-
-    Usage example:
-
-    ```py
-    from bedrock_fm import from_model_id
-
-    fm = from_model_id("amazon.titan-embed-g1-text-02")
-    # fm is of type `bedrock_fm.Titan`
-    ```
-
-    Args:
-        model_id (str): the Amazon Bedrock [modelId]()
-
-    Raises:
-        BedrockInvalidModelError:
-
-    Returns:
-        BedrockFoundationModel | BedrockEmbeddingsModel: A typed instance of the Foundation Model
-    """
-
-    if type(model_id) == Model:
-        model_id = model_id.value
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
 
-    if "-" not in model_id:
-        raise BedrockInvalidModelError(f"{model_id} is not a supported model")
-    family = model_id.split("-")[0]
-    if family == "amazon.titan" and "embed" in model_id:
-        family += "-embed"  # Amazon Titan model naming workaround
-    if family == "anthropic.claude" and "-3" in model_id:
-        family += "-3"
-    if family == "cohere.command" and "-r" in model_id:
-        family += "-r"
-    if family == "mistral.mistral" and "-large" in model_id:
-        family += "-large"
 
-    if family in __family_map:
-        return __family_map[family].from_id(model_id, **kwargs)
-    raise BedrockInvalidModelError(f"{model_id} is not a supported model")
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
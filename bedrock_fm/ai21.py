@@ -1,13 +1,54 @@
 from bedrock_fm.bedrock import Assistant, Human, System, MessageRole
 from .bedrock import BedrockFoundationModel, CompletionDetails, StreamDetails
 from .exceptions import BedrockExtraArgsError
-import json
-from typing import List, Any, Dict, Optional, overload, Literal
-from botocore.eventstream import EventStream
+from .codec import SLOT, body_template
+from typing import List, Any, Dict, Optional, Tuple, overload, Literal
 from attrs import define, field
 from typing import Iterable
 
 
+@body_template
+def _jurassic_body(
+    extra_args: Dict[str, Any],
+    max_token_count: int,
+    stop_sequences: Tuple[str],
+    temperature: float,
+    top_p: float,
+) -> Dict[str, Any]:
+    body = dict(extra_args)
+    body.update(
+        {
+            "prompt": SLOT,
+            "maxTokens": max_token_count,
+            "stopSequences": list(stop_sequences),
+            "temperature": temperature,
+            "topP": top_p,
+        }
+    )
+    return body
+
+
+@body_template
+def _jamba_body(
+    extra_args: Dict[str, Any],
+    max_token_count: int,
+    stop_sequences: Tuple[str],
+    temperature: float,
+    stream: bool,
+) -> Dict[str, Any]:
+    body = dict(extra_args)
+    body.update(
+        {
+            "messages": SLOT,
+            "max_tokens": max_token_count,
+            "stop": list(stop_sequences),
+            "temperature": temperature,
+            "stream": stream,
+        }
+    )
+    return body
+
+
 @define
 class Penalty:
     """Penalty object"""
@@ -212,17 +253,14 @@ class Jurassic(BedrockFoundationModel):
         extra_args: Dict[str, Any],
         stream: bool,
     ) -> str:
-        body = extra_args.copy()
-        body.update(
-            {
-                "prompt": prompt,
-                "maxTokens": max_token_count,
-                "stopSequences": stop_sequences,
-                "temperature": temperature,
-                "topP": top_p,
-            }
-        )
-        return json.dumps(body)
+        return _jurassic_body(
+            self.codec,
+            extra_args,
+            max_token_count,
+            tuple(stop_sequences),
+            temperature,
+            top_p,
+        ).render(prompt)
 
     def process_response_body(self, body: Dict[str, Any]) -> List[str]:
         return [self.get_text(r) for r in body["completions"]]
@@ -266,20 +304,17 @@ class Jamba(BedrockFoundationModel):
         extra_args: Dict[str, Any],
         stream: bool,
     ) -> str:
-        body = extra_args.copy()
         m = prompt
         if type(prompt) == str:
             m = [{"role": "user", "content": prompt}]
-        body.update(
-            {
-                "messages": m,
-                "max_tokens": max_token_count,
-                "stop": stop_sequences,
-                "temperature": temperature,
-                "stream": stream,
-            }
-        )
-        return json.dumps(body)
+        return _jamba_body(
+            self.codec,
+            extra_args,
+            max_token_count,
+            tuple(stop_sequences),
+            temperature,
+            stream,
+        ).render(m)
 
     def get_chat_prompt(
         self, conversation: List[Human | Assistant | System]
@@ -298,4 +333,7 @@ class Jamba(BedrockFoundationModel):
         return [self.get_text(r) for r in body["choices"]]
 
     def get_text(self, body: Dict[str, Any]) -> str:
+        if "choices" in body:
+            # stream events carry the generated text in the delta of the choices
+            return body["choices"][0]["delta"].get("content", "")
         return body["message"]["content"]
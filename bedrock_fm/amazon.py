@@ -1,14 +1,35 @@
-from typing import Any, Dict, List, Tuple, Optional
+from typing import Any, Dict, List, Tuple, Optional, TYPE_CHECKING
 from enum import Enum
 from .bedrock import BedrockFoundationModel, Model
 from .bedrock_image import BedrockImageModel
 from .exceptions import BedrockExtraArgsError, BedrockArgsError
-from PIL import Image
-import json
+from .codec import SLOT, body_template
 from attrs import define
 from io import BytesIO
 from base64 import b64decode, b64encode
 
+if TYPE_CHECKING:
+    from PIL import Image
+
+
+@body_template
+def _titan_body(
+    extra_args: Dict[str, Any],
+    max_token_count: int,
+    stop_sequences: Tuple[str],
+    temperature: float,
+    top_p: float,
+) -> Dict[str, Any]:
+    return {
+        "inputText": SLOT,
+        "textGenerationConfig": {
+            "maxTokenCount": max_token_count,
+            "stopSequences": list(stop_sequences),
+            "temperature": temperature,
+            "topP": top_p,
+        },
+    }
+
 
 @define
 class Titan(BedrockFoundationModel):
@@ -48,17 +69,14 @@ class Titan(BedrockFoundationModel):
         extra_args: Dict[str, Any],
         stream: bool,
     ) -> str:
-        return json.dumps(
-            {
-                "inputText": prompt,
-                "textGenerationConfig": {
-                    "maxTokenCount": max_token_count,
-                    "stopSequences": stop_sequences,
-                    "temperature": temperature,
-                    "topP": top_p,
-                },
-            }
-        )
+        return _titan_body(
+            self.codec,
+            extra_args,
+            max_token_count,
+            tuple(stop_sequences),
+            temperature,
+            top_p,
+        ).render(prompt)
 
     def process_response_body(self, out) -> List[str]:
         return [self.get_text(r) for r in out["results"]]
@@ -100,8 +118,10 @@ class TitanImageBase(BedrockImageModel):
             )
         return True
 
-    def get_images(self, resp: Dict[str, Any]) -> List[Image.Image]:
-        body_json = json.loads(resp["body"].read())
+    def get_images(self, resp: Dict[str, Any]) -> List["Image.Image"]:
+        from PIL import Image
+
+        body_json = self.codec.loads(resp["body"].read())
 
         imgs = [Image.open(BytesIO(b64decode(v))) for v in body_json["images"]]
 
@@ -110,9 +130,6 @@ class TitanImageBase(BedrockImageModel):
 
 @define
 class TitanImageGeneration(TitanImageBase):
-    def __init__(self):
-        super().__init__()
-
     def get_body(
         self,
         prompts: List[Tuple],
@@ -136,7 +153,7 @@ class TitanImageGeneration(TitanImageBase):
         body["imageGenerationConfig"]["numberOfImages"] = number_of_images
         body["imageGenerationConfig"]["height"] = height
         body["imageGenerationConfig"]["width"] = width
-        return json.dumps(body)
+        return self.codec.dumps(body)
 
     def generate(
         self,
@@ -148,7 +165,7 @@ class TitanImageGeneration(TitanImageBase):
         negative_prompt: Optional[str] = None,
         cfg_scale: int = 7.0,
         number_of_images: int = 1,
-    ) -> List[Image.Image]:
+    ) -> List["Image.Image"]:
         return super()._generate(
             prompts,
             height=height,
@@ -162,9 +179,6 @@ class TitanImageGeneration(TitanImageBase):
 
 @define
 class TitanImageVariation(TitanImageBase):
-    def __init__(self):
-        super().__init__()
-
     def get_body(
         self,
         prompts: List[Tuple],
@@ -172,7 +186,7 @@ class TitanImageVariation(TitanImageBase):
         width: int = 512,
         seed: int = 0,
         *,
-        images: List[Image.Image],
+        images: List["Image.Image"],
         negative_prompt: Optional[str] = None,
         cfg_scale: int = 7.0,
         number_of_images: int = 1,
@@ -204,7 +218,7 @@ class TitanImageVariation(TitanImageBase):
         body["imageGenerationConfig"]["height"] = height
         body["imageGenerationConfig"]["width"] = width
 
-        return json.dumps(body)
+        return self.codec.dumps(body)
 
     def generate(
         self,
@@ -213,11 +227,11 @@ class TitanImageVariation(TitanImageBase):
         width: int = 512,
         seed: int = 0,
         *,
-        images: List[Image.Image],
+        images: List["Image.Image"],
         negative_prompt: Optional[str] = None,
         cfg_scale: int = 7,
         number_of_images: int = 1,
-    ) -> List[Image.Image]:
+    ) -> List["Image.Image"]:
         return super()._generate(
             [(prompt,)],
             negative_prompt=negative_prompt,
@@ -232,19 +246,16 @@ class TitanImageVariation(TitanImageBase):
 
 @define
 class TitanImageInPainting(TitanImageBase):
-    def __init__(self):
-        super().__init__()
-
     def get_body(
         self,
         prompts: List[Tuple],
         height: int = 512,
         width: int = 512,
         seed: int = 0,
-        mask_image: Optional[Image.Image] = None,
+        mask_image: Optional["Image.Image"] = None,
         mask_prompt: Optional[str] = None,
         negative_prompt: Optional[str] = None,
-        image: Optional[Image.Image] = None,
+        image: Optional["Image.Image"] = None,
         cfg_scale: int = 7.0,
         number_of_images: int = 1,
     ) -> str:
@@ -282,7 +293,7 @@ class TitanImageInPainting(TitanImageBase):
             buf = buffer.getvalue()
             body["inPaintingParams"]["maskImage"] = str(b64encode(buf), "ascii")
 
-        return json.dumps(body)
+        return self.codec.dumps(body)
 
     def generate(
         self,
@@ -291,13 +302,13 @@ class TitanImageInPainting(TitanImageBase):
         width: int = 512,
         seed: int = 0,
         *,
-        image: Image.Image,
-        mask_image: Optional[Image.Image] = None,
+        image: "Image.Image",
+        mask_image: Optional["Image.Image"] = None,
         mask_prompt: Optional[str] = None,
         negative_prompt: Optional[str] = None,
         cfg_scale: int = 7,
         number_of_images: int = 1,
-    ) -> List[Image.Image]:
+    ) -> List["Image.Image"]:
         return super()._generate(
             [(prompt,)],
             mask_image=mask_image,
@@ -319,19 +330,16 @@ class OutpaintingMode(Enum):
 
 @define
 class TitanImageOutPainting(TitanImageBase):
-    def __init__(self):
-        super().__init__()
-
     def get_body(
         self,
         prompts: List[Tuple],
         height: int = 512,
         width: int = 512,
         seed: int = 0,
-        mask_image: Optional[Image.Image] = None,
+        mask_image: Optional["Image.Image"] = None,
         mask_prompt: Optional[str] = None,
         negative_prompt: Optional[str] = None,
-        image: Optional[Image.Image] = None,
+        image: Optional["Image.Image"] = None,
         outpainting_mode: Optional[OutpaintingMode] = OutpaintingMode.DEFAULT,
         cfg_scale: int = 7.0,
         number_of_images: int = 1,
@@ -371,7 +379,7 @@ class TitanImageOutPainting(TitanImageBase):
             buf = buffer.getvalue()
             body["outPaintingParams"]["maskImage"] = str(b64encode(buf), "ascii")
 
-        return json.dumps(body)
+        return self.codec.dumps(body)
 
     def generate(
         self,
@@ -380,13 +388,13 @@ class TitanImageOutPainting(TitanImageBase):
         width: int = 512,
         seed: int = 0,
         *,
-        image: Image.Image,
+        image: "Image.Image",
         cfg_scale: int = 7,
         number_of_images: int = 1,
-        mask_image: Optional[Image.Image] = None,
+        mask_image: Optional["Image.Image"] = None,
         mask_prompt: Optional[str] = None,
         negative_prompt: Optional[str] = None,
-    ) -> List[Image.Image]:
+    ) -> List["Image.Image"]:
         return super()._generate(
             [(prompt,)],
             mask_image=mask_image,
@@ -403,16 +411,13 @@ class TitanImageOutPainting(TitanImageBase):
 
 @define
 class TitanImageBackgroundRemoval(TitanImageBase):
-    def __init__(self):
-        super().__init__()
-
     def get_body(
         self,
         prompts: List[Tuple],
         height: int = 512,
         width: int = 512,
         seed: int = 0,
-        image: Image.Image = None,
+        image: "Image.Image" = None,
         cfg_scale: int = 7.0,
     ) -> str:
         buffer = BytesIO()
@@ -430,7 +435,7 @@ class TitanImageBackgroundRemoval(TitanImageBase):
         body["imageGenerationConfig"]["height"] = height
         body["imageGenerationConfig"]["width"] = width
 
-        return json.dumps(body)
+        return self.codec.dumps(body)
 
     def generate(
         self,
@@ -439,9 +444,9 @@ class TitanImageBackgroundRemoval(TitanImageBase):
         width: int = 512,
         seed: int = 0,
         *,
-        image: Image.Image,
+        image: "Image.Image",
         cfg_scale: int = 7,
-    ) -> List[Image.Image]:
+    ) -> List["Image.Image"]:
         return super()._generate(
             [(prompt,)],
             height=height,
@@ -459,9 +464,6 @@ class ControlMode(Enum):
 
 @define
 class TitanImageConditionedGeneration(TitanImageBase):
-    def __init__(self):
-        super().__init__()
-
     @classmethod
     def _validate_model_id(cls, model_id: str):
         return model_id == Model.AMAZON_TITAN_IMAGE_GENERATOR_V2_0.value
@@ -472,7 +474,7 @@ class TitanImageConditionedGeneration(TitanImageBase):
         height: int = 512,
         width: int = 512,
         seed: int = 0,
-        condition_image: Optional[Image.Image] = None,
+        condition_image: Optional["Image.Image"] = None,
         control_strength: Optional[float] = None,
         control_mode: Optional[ControlMode] = None,
         negative_prompt: Optional[str] = None,
@@ -504,7 +506,7 @@ class TitanImageConditionedGeneration(TitanImageBase):
         body["imageGenerationConfig"]["height"] = height
         body["imageGenerationConfig"]["width"] = width
 
-        return json.dumps(body)
+        return self.codec.dumps(body)
 
     def generate(
         self,
@@ -513,13 +515,13 @@ class TitanImageConditionedGeneration(TitanImageBase):
         width: int = 512,
         seed: int = 0,
         *,
-        condition_image: Optional[Image.Image] = None,
+        condition_image: Optional["Image.Image"] = None,
         control_strength: Optional[float] = None,
         control_mode: Optional[ControlMode] = None,
         negative_prompt: Optional[str] = None,
         cfg_scale: int = 7,
         number_of_images: int = 1,
-    ) -> List[Image.Image]:
+    ) -> List["Image.Image"]:
         return super()._generate(
             [(prompt,)],
             condition_image=condition_image,
@@ -536,9 +538,6 @@ class TitanImageConditionedGeneration(TitanImageBase):
 
 @define
 class TitanImageColorGuidedContent(TitanImageBase):
-    def __init__(self):
-        super().__init__()
-
     @classmethod
     def _validate_model_id(cls, model_id: str):
         return model_id == Model.AMAZON_TITAN_IMAGE_GENERATOR_V2_0.value
@@ -550,7 +549,7 @@ class TitanImageColorGuidedContent(TitanImageBase):
         width: int = 512,
         seed: int = 0,
         colors: list[str] = None,
-        reference_image: Optional[Image.Image] = None,
+        reference_image: Optional["Image.Image"] = None,
         negative_prompt: Optional[str] = None,
         cfg_scale: int = 7.0,
         number_of_images: int = 1,
@@ -579,7 +578,7 @@ class TitanImageColorGuidedContent(TitanImageBase):
         body["imageGenerationConfig"]["height"] = height
         body["imageGenerationConfig"]["width"] = width
 
-        return json.dumps(body)
+        return self.codec.dumps(body)
 
     def generate(
         self,
@@ -589,11 +588,11 @@ class TitanImageColorGuidedContent(TitanImageBase):
         seed: int = 0,
         *,
         colors: list[str] = None,
-        reference_image: Optional[Image.Image] = None,
+        reference_image: Optional["Image.Image"] = None,
         negative_prompt: Optional[str] = None,
         cfg_scale: int = 7,
         number_of_images: int = 1,
-    ) -> List[Image.Image]:
+    ) -> List["Image.Image"]:
         return super()._generate(
             [(prompt,)],
             colors=colors,
@@ -1,13 +1,61 @@
 from .bedrock import Assistant, BedrockFoundationModel, Human, System, MessageRole
 from .exceptions import BedrockExtraArgsError
-import json
+from .codec import SLOT, body_template
 from attrs import define
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Tuple
 import io
 from base64 import b64encode
 
 HUMAN_PROMPT = "\n\nHuman:"
 ASSISTANT_PROMPT = "\n\nAssistant:"
+ANTHROPIC_VERSION = "bedrock-2023-05-31"
+
+
+@body_template
+def _claude_body(
+    extra_args: Dict[str, Any],
+    max_token_count: int,
+    stop_sequences: Tuple[str],
+    temperature: float,
+    top_p: float,
+) -> Dict[str, Any]:
+    body = dict(extra_args)
+    body.update(
+        {
+            "prompt": SLOT,
+            "max_tokens_to_sample": max_token_count,
+            "stop_sequences": list(stop_sequences),
+            "temperature": temperature,
+            "top_p": top_p,
+            "anthropic_version": ANTHROPIC_VERSION,
+        }
+    )
+    return body
+
+
+@body_template
+def _claude3_body(
+    extra_args: Dict[str, Any],
+    system: bool,
+    max_token_count: int,
+    stop_sequences: Tuple[str],
+    temperature: float,
+    top_p: float,
+) -> Dict[str, Any]:
+    body = dict(extra_args)
+    if system:
+        body["system"] = SLOT
+    body.update(
+        {
+            "messages": SLOT,
+            "max_tokens": max_token_count,
+            "stop_sequences": list(stop_sequences),
+            "temperature": temperature,
+            "top_p": top_p,
+            "anthropic_version": ANTHROPIC_VERSION,
+        }
+    )
+    return body
 
 
 @define
@@ -50,7 +98,6 @@ class Claude(BedrockFoundationModel):
         extra_args: Dict[str, Any],
         stream: bool,
     ) -> str:
-        body = extra_args.copy()
         s = list(stop_sequences)
         if HUMAN_PROMPT not in s:
             s.append(HUMAN_PROMPT)
@@ -69,17 +116,9 @@ class Claude(BedrockFoundationModel):
         if a_i < 0 or (a_i > 0 and "Human:" in claude_prompt[a_i:]):
             claude_prompt = claude_prompt + ASSISTANT_PROMPT
 
-        body.update(
-            {
-                "prompt": claude_prompt,
-                "max_tokens_to_sample": max_token_count,
-                "stop_sequences": s,
-                "temperature": temperature,
-                "top_p": top_p,
-                "anthropic_version": "bedrock-2023-05-31",
-            }
-        )
-        return json.dumps(body)
+        return _claude_body(
+            self.codec, extra_args, max_token_count, tuple(s), temperature, top_p
+        ).render(claude_prompt)
 
     def get_chat_prompt(self, conversation: List[Human | Assistant | System]) -> str:
         prompts = []
@@ -144,26 +183,26 @@ class Claude3(BedrockFoundationModel):
         extra_args: Dict[str, Any],
         stream: bool,
     ) -> str:
-        body = extra_args.copy()
+        system = None
         if type(prompt) == str:
             prompt = [{"role": "user", "content": prompt}]
         else:
             if prompt[0].get("role") == "system":
-                body.update({"system": prompt[0].get("content", "")})
+                system = prompt[0].get("content", "")
                 prompt = prompt[1:]
 
-        s = list(stop_sequences)
-        body.update(
-            {
-                "messages": prompt,
-                "max_tokens": max_token_count,
-                "stop_sequences": s,
-                "temperature": temperature,
-                "top_p": top_p,
-                "anthropic_version": "bedrock-2023-05-31",
-            }
+        template = _claude3_body(
+            self.codec,
+            extra_args,
+            system is not None,
+            max_token_count,
+            tuple(stop_sequences),
+            temperature,
+            top_p,
         )
-        return json.dumps(body)
+        if system is not None:
+            return template.render(system, prompt)
+        return template.render(prompt)
 
     def get_chat_prompt(self, conversation: List[Human | Assistant | System]) -> list:
         prompts = []
@@ -0,0 +1,922 @@
+"""Resumable batch generation over JSON Lines files.
+
+`BatchRunner` streams records from a JSON Lines input and renders each of them through `generate` or `chat`. It
+runs up to `max_workers` invocations concurrently, optionally paced at `rate` requests per second, and appends the
+outputs with their token usage and latency to a JSON Lines output in batched writes. After each write the ids of
+the written records are appended to a checkpoint. A crashed or pre-empted job started again with the same
+arguments truncates the output to the last checkpoint and skips the completed records, so no record is sent
+twice and no output is duplicated. The input is read one line at a time and never loaded in memory.
+
+Input records are JSON objects with an `id` and either a `prompt`, a list of `messages` with `role` and `content`,
+or the fields referenced by a `template`. Records without an id are identified by their line number. The
+`top_p`, `temperature`, `max_token_count` and `stop_sequences` of a record override the runner ones.
+
+    python -m bedrock_fm.batch --model-id anthropic.claude-3-haiku-20240307-v1:0 \\
+        --input prompts.jsonl --output outputs.jsonl --max-workers 16 --rate 20
+
+```py
+from bedrock_fm import BatchRunner, Claude3, Model
+
+fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0)
+runner = BatchRunner(model=fm, output_path="outputs.jsonl", template="Classify the review: {text}")
+report = runner.run_file("reviews.jsonl")
+```
+
+Outputs are written in completion order, each with the id of its record. Embeddings models are supported too,
+with the `text` of the records embedded `batch_size` at a time.
+
+Large backfills scale out over independent workers sharing the input. Each worker runs with `--shard i/N`, claims
+the records whose id hashes to its shard and writes its own output and checkpoint, `--checkpoint` being derived
+for each shard like the output. `--merge N`, with the same `--checkpoint` if any, then assembles the shard
+outputs into one output in input order and lists the records missing from them:
+
+    python -m bedrock_fm.batch --model-id cohere.embed-english-v3 --input docs.jsonl --output vectors.jsonl --shard 3/8
+    python -m bedrock_fm.batch --input docs.jsonl --output vectors.jsonl --merge 8
+
+`--export` converts the output, once complete or merged, to Parquet or Arrow with `export_output`, with the
+vectors of embeddings models stored as `fixed_size_list<float32>` columns.
+"""
+
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from attrs import asdict, define, field
+from .bedrock import (
+    Assistant,
+    BedrockEmbeddingsModel,
+    BedrockFoundationModel,
+    EmbeddingType,
+    Human,
+    System,
+)
+from .exceptions import BedrockArgsError
+
+RETRYABLE_ERRORS = (
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+    "ModelTimeoutException",
+    "InternalServerException",
+)
+"""Error codes retried with exponential backoff"""
+
+GENERATE_ARGS = (
+    "top_p",
+    "temperature",
+    "max_token_count",
+    "stop_sequences",
+    "extra_args",
+)
+"""Record fields passed to `generate` and `chat`"""
+
+_ROLES = {"user": Human, "human": Human, "assistant": Assistant, "system": System}
+
+
+def iter_jsonl(path: str) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Lazily reads a JSON Lines file, compressed with gzip when the path ends with `.gz`.
+
+    Args:
+        path (str): the file
+
+    Yields:
+        Tuple[int, Dict[str, Any]]: the line number, starting from 1, and the record of each non empty line
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if line.strip():
+                yield n, json.loads(line)
+
+
+def iter_records(
+    path: str, id_field: str = "id"
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Lazily reads the records of a JSON Lines file with their id.
+
+    Args:
+        path (str): the file
+        id_field (str, optional): the field holding the record id. Defaults to "id".
+
+    Yields:
+        Tuple[str, Dict[str, Any]]: the id, or the line number when the record has none, and the record
+    """
+    for n, record in iter_jsonl(path):
+        value = record.get(id_field)
+        yield str(n) if value is None else str(value), record
+
+
+def shard_of(record_id: str, shards: int) -> int:
+    """The shard claiming a record, from a hash of its id that is stable across processes and machines.
+
+    Args:
+        record_id (str): the record id
+        shards (int): the number of shards
+
+    Returns:
+        int: the shard, between 0 and `shards - 1`
+    """
+    digest = hashlib.blake2b(record_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def parse_shard(value: str) -> Tuple[int, int]:
+    """Parses a shard given as `i/N`.
+
+    Args:
+        value (str): the shard, for example `0/8`
+
+    Raises:
+        BedrockArgsError: if the value is not a valid shard
+
+    Returns:
+        Tuple[int, int]: the shard index and the number of shards
+    """
+    index, _, count = value.partition("/")
+    try:
+        shard = int(index), int(count)
+    except ValueError:
+        raise BedrockArgsError(f"invalid shard {value!r}, expected i/N") from None
+    if not 0 <= shard[0] < shard[1]:
+        raise BedrockArgsError(
+            f"invalid shard {value!r}, i must be between 0 and N - 1"
+        )
+    return shard
+
+
+def shard_path(path: str, index: int, shards: int) -> str:
+    """The path of the output of a shard, `outputs-00002-of-00008.jsonl` for `outputs.jsonl`.
+
+    Args:
+        path (str): the path of the merged output
+        index (int): the shard index
+        shards (int): the number of shards
+
+    Returns:
+        str: the shard output path
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}-{index:05d}-of-{shards:05d}{ext}"
+
+
+def usage(response: Dict[str, Any]) -> Dict[str, Optional[int]]:
+    """The token usage reported in a response body, for the families that report it.
+
+    Args:
+        response (Dict[str, Any]): the decoded response body
+
+    Returns:
+        Dict[str, Optional[int]]: `input_tokens` and `output_tokens`, None when not reported
+    """
+    u = response.get("usage") or (response.get("meta") or {}).get("billed_units") or {}
+    input_tokens = u.get("input_tokens", u.get("prompt_tokens"))
+    output_tokens = u.get("output_tokens", u.get("completion_tokens"))
+    if input_tokens is None:
+        input_tokens = response.get(
+            "inputTextTokenCount", response.get("prompt_token_count")
+        )
+    if output_tokens is None:
+        output_tokens = response.get("generation_token_count")
+    if output_tokens is None and isinstance(response.get("results"), list):
+        output_tokens = sum(r.get("tokenCount", 0) for r in response["results"])
+    return {"input_tokens": input_tokens, "output_tokens": output_tokens}
+
+
+def _error_code(e: Exception) -> str:
+    response = getattr(e, "response", None)
+    if isinstance(response, dict) and "Error" in response:
+        return response["Error"].get("Code") or type(e).__name__
+    return type(e).__name__
+
+
+@define
+class _Pacer:
+    """Spaces the calls to `wait` by `1 / rate` seconds, across threads"""
+
+    rate: float
+    sleep: Callable[[float], None] = field(default=time.sleep)
+    _next: float = field(factory=time.monotonic, init=False)
+    _lock: threading.Lock = field(factory=threading.Lock, init=False)
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            at = max(self._next, now)
+            self._next = at + 1.0 / self.rate
+        if at > now:
+            self.sleep(at - now)
+
+
+@define
+class Checkpoint:
+    """Append-only log of the records durably written to an output file.
+
+    Each line holds the ids written by a flush, the ids among them that failed, and the size of the output after
+    the flush. A torn last line, left by a crash during a write, is discarded when loading.
+    """
+
+    path: str
+    """The checkpoint file"""
+    done: Set[str] = field(factory=set, init=False)
+    """The ids of the completed records"""
+    failed: Set[str] = field(factory=set, init=False)
+    """The ids of the records whose latest output is an error"""
+    offset: int = field(default=0, init=False)
+    """The size of the output at the last checkpoint"""
+
+    def load(self):
+        """Reads the checkpoint and truncates a torn last line."""
+        if not os.path.exists(self.path):
+            return
+        end = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                if not line.endswith(b"\n"):
+                    break
+                self.done.update(entry["ids"])
+                self.failed.difference_update(entry["ids"])
+                self.failed.update(entry.get("errors", ()))
+                self.offset = entry["offset"]
+                end += len(line)
+        if end < os.path.getsize(self.path):
+            os.truncate(self.path, end)
+
+    def commit(self, ids: List[str], offset: int, errors: Sequence[str] = ()):
+        """Durably appends the ids written to the output, and the output size.
+
+        Args:
+            ids (List[str]): the ids of the records written
+            offset (int): the size of the output after the write
+            errors (Sequence[str], optional): the ids, among `ids`, written with an error. Defaults to ().
+        """
+        entry: Dict[str, Any] = {"offset": offset, "ids": ids}
+        if len(errors) > 0:
+            entry["errors"] = list(errors)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with open(self.path, "ab") as f:
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(ids)
+        self.failed.difference_update(ids)
+        self.failed.update(errors)
+        self.offset = offset
+
+
+@define(kw_only=True)
+class BatchReport:
+    """Statistics of a `BatchRunner` run"""
+
+    records: int = field(default=0)
+    """Number of records read"""
+    skipped: int = field(default=0)
+    """Number of records completed by a previous run"""
+    completed: int = field(default=0)
+    """Number of records written"""
+    errors: int = field(default=0)
+    """Number of records written with an error"""
+    retries: int = field(default=0)
+    """Number of invocations retried"""
+    input_tokens: int = field(default=0)
+    """Input tokens reported by the model"""
+    output_tokens: int = field(default=0)
+    """Output tokens reported by the model"""
+    elapsed: float = field(default=0.0)
+    """Wall clock seconds"""
+
+
+@define(kw_only=True)
+class MergeReport:
+    """Statistics of a `merge_shards` run"""
+
+    records: int = field(default=0)
+    """Number of input records"""
+    written: int = field(default=0)
+    """Number of outputs written to the merged output"""
+    errors: int = field(default=0)
+    """Number of outputs with an error"""
+    missing: List[str] = field(factory=list)
+    """Ids of the records without an output"""
+    missing_by_shard: Dict[int, int] = field(factory=dict)
+    """Number of records without an output in each shard"""
+
+
+@define(kw_only=True)
+class BatchRunner:
+    """Runs the records of a JSON Lines file through a model, with checkpointing.
+
+    With a text model, each output line holds the record `id`, the `output` text, the token `usage`, the `latency`
+    and the number of `attempts`. With an embeddings model, the records are embedded `batch_size` at a time and
+    each output line holds the `id`, the `embedding`, the `latency` and the `attempts`. Records that failed after
+    the retries have an `error` with `code` and `message`. They are checkpointed too, and sent again by a run with
+    `retry_errors`, which appends their new output: the latest line of an id supersedes the previous ones.
+
+    The output must only be written by the runner. A run refuses to start when the output is shorter than the
+    checkpoint, or exists without a checkpoint, instead of overwriting it.
+
+    With `shard`, the runner only claims the records whose id hashes to its shard, see `shard_of`, so that
+    independent workers can share an input without coordination. Give each worker its own output, for example
+    with `shard_path`, and assemble the outputs with `merge_shards`.
+    """
+
+    model: BedrockFoundationModel | BedrockEmbeddingsModel
+    """The text or embeddings model"""
+    output_path: str
+    """The JSON Lines output, appended to"""
+    checkpoint_path: Optional[str] = field(default=None)
+    """The checkpoint file. Defaults to `<output_path>.checkpoint`"""
+    template: Optional[str] = field(default=None)
+    """A `str.format` template rendered with the record fields into the prompt, or the text to embed"""
+    mode: str = field(default="auto")
+    """How prompts are sent: `generate`, `chat` as a single `Human` message, or `auto` to use `chat` for the
+    models supporting it. Records with `messages` always use `chat`"""
+    generate_args: Dict[str, Any] = field(factory=dict)
+    """Arguments passed to `generate` and `chat`, such as `max_token_count`"""
+    shard: Optional[Tuple[int, int]] = field(default=None)
+    """Only run the records of shard `i` of `N`, given as `(i, N)`"""
+    batch_size: Optional[int] = field(default=None)
+    """Records embedded per invocation. Defaults to the model batch size"""
+    max_workers: int = field(default=8)
+    """Number of concurrent invocations"""
+    max_in_flight: Optional[int] = field(default=None)
+    """Maximum number of invocations submitted and not yet written. Defaults to twice `max_workers`"""
+    rate: Optional[float] = field(default=None)
+    """Maximum invocations per second, retries included"""
+    max_retries: int = field(default=5)
+    """Retries of throttled and transient errors, see `RETRYABLE_ERRORS`"""
+    backoff: float = field(default=1.0)
+    """Seconds before the first retry, doubled at each retry with jitter, up to one minute"""
+    flush_every: int = field(default=100)
+    """Number of outputs buffered before a write"""
+    flush_interval: float = field(default=5.0)
+    """Maximum seconds between writes"""
+    retry_errors: bool = field(default=False)
+    """Send again the records whose latest output is an error"""
+    sleep: Callable[[float], None] = field(default=time.sleep)
+    """Function used to wait between retries and to pace the invocations"""
+
+    def render(self, record: Dict[str, Any]) -> Tuple[str, Any]:
+        """Renders a record into a prompt for `generate`, or a conversation for `chat`.
+
+        Args:
+            record (Dict[str, Any]): the input record
+
+        Raises:
+            BedrockArgsError: if the record has no prompt and no template is set
+
+        Returns:
+            Tuple[str, Any]: `("generate", prompt)` or `("chat", conversation)`
+        """
+        if self.template is not None:
+            prompt = self.template.format(**record)
+        elif "messages" in record:
+            return "chat", [
+                _ROLES[m["role"].lower()](content=m["content"])
+                for m in record["messages"]
+            ]
+        elif "prompt" in record:
+            prompt = record["prompt"]
+        else:
+            raise BedrockArgsError("records need a prompt, messages or a template")
+        if self.mode == "chat" or (self.mode == "auto" and self.model.supports_chat()):
+            return "chat", [Human(prompt)]
+        return "generate", prompt
+
+    def _invoke(self, record: Dict[str, Any]):
+        kind, value = self.render(record)
+        kwargs = dict(self.generate_args)
+        kwargs.update((k, record[k]) for k in GENERATE_ARGS if k in record)
+        fn = self.model.chat if kind == "chat" else self.model.generate
+        return fn(value, details=True, **kwargs)
+
+    def render_text(self, record: Dict[str, Any]) -> str:
+        """Renders a record into the text to embed.
+
+        Args:
+            record (Dict[str, Any]): the input record
+
+        Raises:
+            BedrockArgsError: if the record has no text and no template is set
+
+        Returns:
+            str: the text
+        """
+        if self.template is not None:
+            return self.template.format(**record)
+        if "text" in record:
+            return record["text"]
+        raise BedrockArgsError("records need a text or a template")
+
+    def _retry(
+        self, fn: Callable[[], Any], pacer: Optional[_Pacer]
+    ) -> Tuple[Any, Optional[Dict[str, str]], int]:
+        attempt = 0
+        while True:
+            attempt += 1
+            if pacer is not None:
+                pacer.wait()
+            try:
+                return fn(), None, attempt
+            except Exception as e:
+                code = _error_code(e)
+                if code in RETRYABLE_ERRORS and attempt <= self.max_retries:
+                    delay = min(self.backoff * 2 ** (attempt - 1), 60.0)
+                    self.sleep(delay * random.uniform(0.5, 1.0))
+                    continue
+                return None, {"code": code, "message": str(e)}, attempt
+
+    def process(
+        self, record_id: str, record: Dict[str, Any], pacer: Optional[_Pacer] = None
+    ) -> Dict[str, Any]:
+        """Invokes the model for a record, retrying throttled and transient errors.
+
+        Args:
+            record_id (str): the record id
+            record (Dict[str, Any]): the record
+            pacer (Optional[_Pacer], optional): paces the invocations. Defaults to None.
+
+        Returns:
+            Dict[str, Any]: the output line
+        """
+        details, error, attempts = self._retry(lambda: self._invoke(record), pacer)
+        if error is not None:
+            return {"id": record_id, "error": error, "attempts": attempts}
+        return {
+            "id": record_id,
+            "output": details.output,
+            "usage": usage(details.response),
+            "latency": round(details.latency, 4),
+            "attempts": attempts,
+        }
+
+    def process_batch(
+        self, batch: List[Tuple[str, Dict[str, Any]]], pacer: Optional[_Pacer] = None
+    ) -> List[Dict[str, Any]]:
+        """Embeds a batch of records in one invocation, retrying throttled and transient errors.
+
+        Args:
+            batch (List[Tuple[str, Dict[str, Any]]]): the `(id, record)` pairs
+            pacer (Optional[_Pacer], optional): paces the invocations. Defaults to None.
+
+        Returns:
+            List[Dict[str, Any]]: the output lines
+        """
+        if not isinstance(self.model, BedrockEmbeddingsModel):
+            return [
+                self.process(record_id, record, pacer) for record_id, record in batch
+            ]
+        rows: List[Dict[str, Any]] = []
+        texts: List[Tuple[str, str]] = []
+        for record_id, record in batch:
+            try:
+                texts.append((record_id, self.render_text(record)))
+            except Exception as e:
+                rows.append(
+                    {
+                        "id": record_id,
+                        "error": {"code": _error_code(e), "message": str(e)},
+                        "attempts": 0,
+                    }
+                )
+        if len(texts) == 0:
+            return rows
+
+        def embed() -> Tuple[Any, float]:
+            t = time.perf_counter()
+            vectors = self.model.generate(
+                [text for _, text in texts], type=EmbeddingType.DOCUMENT
+            )
+            return vectors, time.perf_counter() - t
+
+        result, error, attempts = self._retry(embed, pacer)
+        if error is not None:
+            return rows + [
+                {"id": record_id, "error": error, "attempts": attempts}
+                for record_id, _ in texts
+            ]
+        vectors, latency = result
+        for (record_id, _), vector in zip(texts, vectors):
+            vector = vector.tolist() if hasattr(vector, "tolist") else vector
+            rows.append(
+                {
+                    "id": record_id,
+                    "embedding": vector,
+                    "latency": round(latency, 4),
+                    "attempts": attempts,
+                }
+            )
+        return rows
+
+    def run(self, records: Iterable[Tuple[str, Dict[str, Any]]]) -> BatchReport:
+        """Runs the records not completed by a previous run and appends the outputs.
+
+        Args:
+            records (Iterable[Tuple[str, Dict[str, Any]]]): the `(id, record)` pairs, as returned by `iter_records`
+
+        Returns:
+            BatchReport: the statistics of the run. Records of other shards are not counted
+
+        Raises:
+            BedrockArgsError: when the output does not match the checkpoint
+        """
+        checkpoint_path = self.checkpoint_path or f"{self.output_path}.checkpoint"
+        checkpoint = Checkpoint(checkpoint_path)
+        checkpoint.load()
+        size = (
+            os.path.getsize(self.output_path) if os.path.exists(self.output_path) else 0
+        )
+        if size > 0 and not os.path.exists(checkpoint_path):
+            raise BedrockArgsError(
+                f"{self.output_path} exists without the checkpoint {checkpoint_path}, "
+                "pass its checkpoint or write to a new output"
+            )
+        if size < checkpoint.offset:
+            raise BedrockArgsError(
+                f"{self.output_path} is shorter than its checkpoint {checkpoint_path} and was modified, "
+                "restore it or write to a new output"
+            )
+        report = BatchReport()
+        pacer = _Pacer(self.rate, self.sleep) if self.rate else None
+        max_in_flight = self.max_in_flight or 2 * self.max_workers
+        batch_size = 1
+        if isinstance(self.model, BedrockEmbeddingsModel):
+            batch_size = self.batch_size or self.model.max_batch_size()
+        lines: List[bytes] = []
+        ids: List[str] = []
+        errors: List[str] = []
+        t = time.perf_counter()
+        last_flush = time.monotonic()
+
+        with open(self.output_path, "a+b") as out:
+            # drop the outputs written after the last checkpoint by an interrupted run
+            out.truncate(checkpoint.offset)
+
+            def flush():
+                nonlocal last_flush
+                last_flush = time.monotonic()
+                if len(ids) == 0:
+                    return
+                out.write(b"".join(lines))
+                out.flush()
+                os.fsync(out.fileno())
+                checkpoint.commit(list(ids), out.tell(), list(errors))
+                lines.clear()
+                ids.clear()
+                errors.clear()
+
+            def collect(done: Iterable[Future]):
+                for future in done:
+                    rows = future.result()
+                    report.retries += max(rows[-1]["attempts"] - 1, 0)
+                    for row in rows:
+                        lines.append(
+                            (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+                        )
+                        ids.append(row["id"])
+                        report.completed += 1
+                        if "error" in row:
+                            report.errors += 1
+                            errors.append(row["id"])
+                        elif "usage" in row:
+                            report.input_tokens += row["usage"]["input_tokens"] or 0
+                            report.output_tokens += row["usage"]["output_tokens"] or 0
+                if (
+                    len(ids) >= self.flush_every
+                    or time.monotonic() - last_flush >= self.flush_interval
+                ):
+                    flush()
+
+            pool = ThreadPoolExecutor(max_workers=self.max_workers)
+            in_flight: Set[Future] = set()
+            batch: List[Tuple[str, Dict[str, Any]]] = []
+            try:
+                for record_id, record in records:
+                    if (
+                        self.shard is not None
+                        and shard_of(record_id, self.shard[1]) != self.shard[0]
+                    ):
+                        continue
+                    report.records += 1
+                    if record_id in checkpoint.done and not (
+                        self.retry_errors and record_id in checkpoint.failed
+                    ):
+                        report.skipped += 1
+                        continue
+                    batch.append((record_id, record))
+                    if len(batch) < batch_size:
+                        continue
+                    in_flight.add(pool.submit(self.process_batch, batch, pacer))
+                    batch = []
+                    if len(in_flight) >= max_in_flight:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        collect(done)
+                if len(batch) > 0:
+                    in_flight.add(pool.submit(self.process_batch, batch, pacer))
+                while len(in_flight) > 0:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    collect(done)
+            finally:
+                pool.shutdown(wait=True, cancel_futures=True)
+                flush()
+        report.elapsed = time.perf_counter() - t
+        return report
+
+    def run_file(self, input_path: str, id_field: str = "id") -> BatchReport:
+        """Runs the records of a JSON Lines file, see `run`.
+
+        Args:
+            input_path (str): the input file, compressed with gzip when the path ends with `.gz`
+            id_field (str, optional): the field holding the record id. Defaults to "id".
+
+        Returns:
+            BatchReport: the statistics of the run
+        """
+        return self.run(iter_records(input_path, id_field))
+
+
+def _committed_rows(
+    path: str, checkpoint_path: Optional[str] = None
+) -> Iterator[Tuple[int, str]]:
+    """The offsets and ids of the rows of an output covered by its checkpoint"""
+    checkpoint = Checkpoint(checkpoint_path or f"{path}.checkpoint")
+    checkpoint.load()
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        offset = 0
+        for line in f:
+            if offset + len(line) > checkpoint.offset:
+                return
+            yield offset, json.loads(line)["id"]
+            offset += len(line)
+
+
+def merge_shards(
+    input_path: str,
+    shard_paths: Sequence[str],
+    output_path: str,
+    id_field: str = "id",
+    checkpoint_paths: Optional[Sequence[str]] = None,
+) -> MergeReport:
+    """Assembles the outputs of the shards into one output in input order, and reports the missing records.
+
+    Only the outputs covered by the checkpoint of each shard are merged, with the latest line of each id. The
+    shard outputs are indexed by id and
+    read back in the order of the input, so memory grows with the number of records but not with their size.
+
+    Args:
+        input_path (str): the input of the shards
+        shard_paths (Sequence[str]): the outputs of the shards, in shard order
+        output_path (str): the merged output, overwritten
+        id_field (str, optional): the field holding the record id. Defaults to "id".
+        checkpoint_paths (Optional[Sequence[str]], optional): the checkpoints of the shards, in shard order.
+            Defaults to `<shard output>.checkpoint`.
+
+    Returns:
+        MergeReport: the statistics of the merge, with the ids of the missing records
+    """
+    index: Dict[str, Tuple[int, int]] = {}
+    for n, path in enumerate(shard_paths):
+        checkpoint_path = checkpoint_paths[n] if checkpoint_paths is not None else None
+        for offset, record_id in _committed_rows(path, checkpoint_path):
+            index[record_id] = (n, offset)
+    report = MergeReport()
+    files = [open(path, "rb") if os.path.exists(path) else None for path in shard_paths]
+    try:
+        with open(output_path, "wb") as out:
+            for record_id, _ in iter_records(input_path, id_field):
+                report.records += 1
+                location = index.get(record_id)
+                if location is None:
+                    report.missing.append(record_id)
+                    shard = shard_of(record_id, len(shard_paths))
+                    report.missing_by_shard[shard] = (
+                        report.missing_by_shard.get(shard, 0) + 1
+                    )
+                    continue
+                f = files[location[0]]
+                f.seek(location[1])
+                line = f.readline()
+                if b'"error":' in line and "error" in json.loads(line):
+                    report.errors += 1
+                out.write(line)
+                report.written += 1
+    finally:
+        for f in files:
+            if f is not None:
+                f.close()
+    return report
+
+
+def export_output(
+    output_path: str,
+    export_path: str,
+    format: Optional[str] = None,
+    checkpoint_path: Optional[str] = None,
+    **kwargs,
+) -> int:
+    """Streams an output, covered by its checkpoint when there is one, into a sink, see `open_sink`.
+
+    Only the latest line of each id is exported, so records sent again with `retry_errors` appear once. Outputs
+    of `generate` are joined into one string. The columns are the fields of the first row without
+    error, with the `error` and `attempts` fields, whose types are declared as they are often null in the
+    first rows.
+
+    Args:
+        output_path (str): the output of a `BatchRunner` or of `merge_shards`
+        export_path (str): the destination, with the format of its extension
+        format (Optional[str], optional): "jsonl", "parquet" or "arrow". Defaults to the format of the extension.
+        checkpoint_path (Optional[str], optional): the checkpoint of the output. Defaults to
+            `<output_path>.checkpoint`.
+        **kwargs: the arguments of the sink
+
+    Returns:
+        int: the number of rows written
+    """
+    from .sinks import SINK_FORMATS, open_sink
+
+    limit = None
+    checkpoint_path = checkpoint_path or f"{output_path}.checkpoint"
+    if os.path.exists(checkpoint_path):
+        checkpoint = Checkpoint(checkpoint_path)
+        checkpoint.load()
+        limit = checkpoint.offset
+
+    def lines() -> Iterator[Tuple[int, bytes]]:
+        with open(output_path, "rb") as f:
+            offset = 0
+            for line in f:
+                if limit is not None and offset + len(line) > limit:
+                    return
+                yield offset, line
+                offset += len(line)
+
+    latest: Dict[str, int] = {}
+    for offset, line in lines():
+        latest[json.loads(line)["id"]] = offset
+
+    def rows() -> Iterator[Dict[str, Any]]:
+        for offset, line in lines():
+            row = json.loads(line)
+            if latest[row["id"]] != offset:
+                continue
+            if isinstance(row.get("output"), list):
+                row["output"] = "".join(row["output"])
+            yield row
+
+    format = format or SINK_FORMATS.get(os.path.splitext(export_path)[1].lower())
+    if format != "jsonl" and "columns" not in kwargs and "schema" not in kwargs:
+        first = next((row for row in rows() if "error" not in row), {})
+        kwargs["columns"] = list(dict.fromkeys(["id", *first, "error", "attempts"]))
+        kwargs["types"] = {
+            "error": "string",
+            "attempts": "int64",
+            **kwargs.get("types", {}),
+        }
+    with open_sink(export_path, format, **kwargs) as sink:
+        return sink.write_rows(rows())
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    from .registry import from_model_id
+
+    parser = argparse.ArgumentParser(
+        prog="python -m bedrock_fm.batch", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--model-id")
+    parser.add_argument("--input", required=True, help="JSON Lines records")
+    parser.add_argument(
+        "--output", required=True, help="JSON Lines outputs, appended to"
+    )
+    parser.add_argument(
+        "--checkpoint",
+        help="defaults to <output>.checkpoint, with --shard or --merge the checkpoint of each shard "
+        "is derived like the outputs, <checkpoint>-i-of-N",
+    )
+    parser.add_argument(
+        "--shard", type=parse_shard, help="run shard i of N, written to <output>-i-of-N"
+    )
+    parser.add_argument(
+        "--merge",
+        type=int,
+        metavar="N",
+        help="merge the outputs of N shards into --output",
+    )
+    parser.add_argument(
+        "--export",
+        metavar="PATH",
+        help="convert the output to .parquet, .arrow or .jsonl.gz",
+    )
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument(
+        "--template", help="str.format template rendered with the record fields"
+    )
+    parser.add_argument("--mode", choices=["auto", "generate", "chat"], default="auto")
+    parser.add_argument(
+        "--batch-size", type=int, help="records per invocation of embeddings models"
+    )
+    parser.add_argument("--max-tokens", type=int)
+    parser.add_argument("--temperature", type=float)
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, help="maximum requests per second")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument(
+        "--retry-errors", action="store_true", help="send again the records that failed"
+    )
+    parser.add_argument("--flush-every", type=int, default=100)
+    parser.add_argument("--region")
+    parser.add_argument("--endpoint-url", help="for example the URL of a StubServer")
+    parser.add_argument(
+        "--stub", action="store_true", help="use an in-process StubBedrockClient"
+    )
+    args = parser.parse_args(argv)
+
+    if args.merge is not None:
+        paths = [shard_path(args.output, i, args.merge) for i in range(args.merge)]
+        checkpoints = None
+        if args.checkpoint is not None:
+            checkpoints = [
+                shard_path(args.checkpoint, i, args.merge) for i in range(args.merge)
+            ]
+        merged = merge_shards(
+            args.input, paths, args.output, args.id_field, checkpoints
+        )
+        if len(merged.missing) > 0:
+            with open(f"{args.output}.missing", "w", encoding="utf-8") as f:
+                f.writelines(f"{record_id}\n" for record_id in merged.missing)
+        out = asdict(merged)
+        out["missing"] = len(merged.missing)
+        if args.export is not None:
+            out["exported"] = export_output(args.output, args.export)
+        print(json.dumps(out))
+        return
+    if args.model_id is None:
+        parser.error("--model-id is required")
+    output, checkpoint = args.output, args.checkpoint
+    if args.shard is not None:
+        # each shard has its own output and checkpoint
+        output = shard_path(output, *args.shard)
+        if checkpoint is not None:
+            checkpoint = shard_path(checkpoint, *args.shard)
+
+    if args.stub:
+        from .stub import StubBedrockClient
+
+        client = StubBedrockClient()
+    else:
+        import boto3
+
+        session = boto3.Session(region_name=args.region)
+        client = session.client("bedrock-runtime", endpoint_url=args.endpoint_url)
+    generate_args: Dict[str, Any] = {}
+    if args.max_tokens is not None:
+        generate_args["max_token_count"] = args.max_tokens
+    if args.temperature is not None:
+        generate_args["temperature"] = args.temperature
+    runner = BatchRunner(
+        model=from_model_id(args.model_id, client=client),
+        output_path=output,
+        checkpoint_path=checkpoint,
+        template=args.template,
+        mode=args.mode,
+        generate_args=generate_args,
+        shard=args.shard,
+        batch_size=args.batch_size,
+        max_workers=args.max_workers,
+        rate=args.rate,
+        max_retries=args.max_retries,
+        flush_every=args.flush_every,
+        retry_errors=args.retry_errors,
+    )
+    report = runner.run_file(args.input, args.id_field)
+    out = asdict(report)
+    out["elapsed"] = round(out["elapsed"], 3)
+    if args.export is not None:
+        out["exported"] = export_output(output, args.export, checkpoint_path=checkpoint)
+    print(json.dumps(out))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,646 @@
+"""Asynchronous Bedrock batch inference (`CreateModelInvocationJob`) for large offline workloads.
+
+`BatchInference` serializes prompts and conversations with the `get_body` of the model family into the
+`recordId`/`modelInput` JSON Lines format of batch inference. The records are sharded into job input files within
+the job size limits. The jobs are submitted, at most `max_concurrent_jobs` at a time, and polled. The output files
+are then streamed back through `process_response_body`, and the results are yielded in input order. Batch
+inference is billed at a lower price than on-demand invocations and does not consume the on-demand quota.
+
+The files and the job calls sit behind the `BatchStorage` and `BatchJobs` interfaces. `S3Storage` and
+`BedrockBatchJobs` run real jobs. `LocalStorage` and `LocalBatchJobs` run them in process against any
+`bedrock-runtime` client, such as the `StubBedrockClient`, for tests and dry runs.
+
+```py
+from bedrock_fm import BatchInference, BedrockBatchJobs, Claude3, Model, S3Storage
+
+fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0)
+batch = BatchInference(
+    model=fm,
+    storage=S3Storage("my-bucket", "batch/"),
+    jobs=BedrockBatchJobs("arn:aws:iam::123456789012:role/BedrockBatch"),
+)
+for result in batch.run(f"Summarize: {doc}" for doc in documents):
+    print(result.index, result.output, result.error)
+```
+
+Bedrock also requires a minimum number of records per job, 100 at the time of writing: the last two jobs are
+rebalanced so that the last one is not smaller.
+"""
+
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from abc import ABC, abstractmethod
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import uuid
+from attrs import define, field
+from .bedrock import Assistant, BedrockFoundationModel, Human, System
+from .exceptions import BedrockArgsError, BedrockBatchJobError
+
+logger = logging.getLogger(__name__)
+
+MAX_RECORDS_PER_JOB = 50_000
+"""Default maximum number of records of a job"""
+
+MAX_BYTES_PER_JOB = 1 << 30
+"""Default maximum size of the input file of a job"""
+
+MIN_RECORDS_PER_JOB = 100
+"""Minimum number of records of a Bedrock batch inference job"""
+
+TERMINAL_STATUSES = ("Completed", "PartiallyCompleted", "Failed", "Stopped", "Expired")
+"""Statuses of the jobs that are done"""
+
+FAILED_STATUSES = ("Failed", "Stopped", "Expired")
+"""Statuses of the jobs whose outputs are not available"""
+
+
+class BatchStorage(ABC):
+    """Interface of the storage holding the input and output files of the jobs, addressed by URI"""
+
+    @abstractmethod
+    def uri(self, key: str) -> str:
+        """The URI of a key."""
+        ...
+
+    @abstractmethod
+    def put(self, uri: str, data: BinaryIO):
+        """Writes a file.
+
+        Args:
+            uri (str): the destination
+            data (BinaryIO): the content, read to the end
+        """
+        ...
+
+    @abstractmethod
+    def list(self, prefix: str) -> List[str]:
+        """Lists the URIs of the files under a prefix, recursively."""
+        ...
+
+    @abstractmethod
+    def read_lines(self, uri: str) -> Iterator[bytes]:
+        """Streams the lines of a file."""
+        ...
+
+
+@define
+class S3Storage(BatchStorage):
+    """Amazon S3 storage"""
+
+    bucket: str
+    """The bucket"""
+    prefix: str = field(default="")
+    """Prefix of the keys"""
+    client: Any = field(default=None)
+    """The `s3` client. Defaults to a client of the default session"""
+
+    def __attrs_post_init__(self):
+        if self.client is None:
+            from .transport import default_session
+
+            self.client = default_session().client("s3")
+
+    def uri(self, key: str) -> str:
+        return f"s3://{self.bucket}/{self.prefix}{key}"
+
+    def _split(self, uri: str) -> Tuple[str, str]:
+        bucket, _, key = uri[len("s3://") :].partition("/")
+        return bucket, key
+
+    def put(self, uri: str, data: BinaryIO):
+        bucket, key = self._split(uri)
+        self.client.upload_fileobj(data, bucket, key)
+
+    def list(self, prefix: str) -> List[str]:
+        bucket, key = self._split(prefix)
+        paginator = self.client.get_paginator("list_objects_v2")
+        return [
+            f"s3://{bucket}/{o['Key']}"
+            for page in paginator.paginate(Bucket=bucket, Prefix=key)
+            for o in page.get("Contents", [])
+        ]
+
+    def read_lines(self, uri: str) -> Iterator[bytes]:
+        bucket, key = self._split(uri)
+        body = self.client.get_object(Bucket=bucket, Key=key)["Body"]
+        for line in body.iter_lines():
+            if line.strip():
+                yield line
+
+
+@define
+class LocalStorage(BatchStorage):
+    """Storage in a local directory, the URIs are file paths"""
+
+    root: str
+    """The directory"""
+
+    def uri(self, key: str) -> str:
+        return os.path.join(self.root, key)
+
+    def put(self, uri: str, data: BinaryIO):
+        os.makedirs(os.path.dirname(uri), exist_ok=True)
+        with open(uri, "wb") as f:
+            shutil.copyfileobj(data, f)
+
+    def list(self, prefix: str) -> List[str]:
+        if not os.path.isdir(prefix):
+            return []
+        return sorted(
+            os.path.join(d, name) for d, _, names in os.walk(prefix) for name in names
+        )
+
+    def read_lines(self, uri: str) -> Iterator[bytes]:
+        with open(uri, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield line
+
+
+class BatchJobs(ABC):
+    """Interface of the batch inference job calls"""
+
+    min_records: int = 0
+    """Minimum number of records of a job"""
+
+    @abstractmethod
+    def submit(self, name: str, model_id: str, input_uri: str, output_uri: str) -> str:
+        """Creates a job.
+
+        Args:
+            name (str): the job name
+            model_id (str): the modelId or inference profile
+            input_uri (str): the input file
+            output_uri (str): the prefix of the output files
+
+        Returns:
+            str: the job id
+        """
+        ...
+
+    @abstractmethod
+    def status(self, job_id: str) -> Tuple[str, Optional[str]]:
+        """The status of a job, and its message"""
+        ...
+
+    @abstractmethod
+    def stop(self, job_id: str):
+        """Stops a job that is not done.
+
+        Args:
+            job_id (str): the job id
+        """
+        ...
+
+
+@define
+class BedrockBatchJobs(BatchJobs):
+    """Jobs run by Bedrock with `CreateModelInvocationJob`"""
+
+    role_arn: str
+    """The service role Bedrock assumes to read the inputs and write the outputs"""
+    client: Any = field(default=None)
+    """The `bedrock` control plane client. Defaults to a client of the default session"""
+    timeout_hours: Optional[int] = field(default=None)
+    """Hours after which Bedrock stops a job"""
+    tags: Dict[str, str] = field(factory=dict)
+    """Tags of the jobs"""
+
+    min_records = MIN_RECORDS_PER_JOB
+
+    def __attrs_post_init__(self):
+        if self.client is None:
+            from .transport import default_session
+
+            self.client = default_session().client("bedrock")
+
+    def submit(self, name: str, model_id: str, input_uri: str, output_uri: str) -> str:
+        kwargs: Dict[str, Any] = {}
+        if self.timeout_hours is not None:
+            kwargs["timeoutDurationInHours"] = self.timeout_hours
+        if len(self.tags) > 0:
+            kwargs["tags"] = [{"key": k, "value": v} for k, v in self.tags.items()]
+        resp = self.client.create_model_invocation_job(
+            jobName=name,
+            roleArn=self.role_arn,
+            modelId=model_id,
+            inputDataConfig={
+                "s3InputDataConfig": {"s3Uri": input_uri, "s3InputFormat": "JSONL"}
+            },
+            outputDataConfig={"s3OutputDataConfig": {"s3Uri": output_uri}},
+            **kwargs,
+        )
+        return resp["jobArn"]
+
+    def status(self, job_id: str) -> Tuple[str, Optional[str]]:
+        resp = self.client.get_model_invocation_job(jobIdentifier=job_id)
+        return resp["status"], resp.get("message")
+
+    def stop(self, job_id: str):
+        self.client.stop_model_invocation_job(jobIdentifier=job_id)
+
+
+@define
+class LocalBatchJobs(BatchJobs):
+    """Jobs run in process when submitted, invoking a `bedrock-runtime` client for each record.
+
+    The outputs are written like Bedrock does, to `<output_uri><job_id>/<input file name>.out`.
+    """
+
+    storage: BatchStorage
+    """The storage of the input and output files"""
+    client: Any
+    """The `bedrock-runtime` client, for example a `StubBedrockClient`"""
+    jobs: Dict[str, Tuple[str, Optional[str]]] = field(factory=dict, init=False)
+    """The status of the submitted jobs"""
+
+    def submit(self, name: str, model_id: str, input_uri: str, output_uri: str) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        errors = 0
+        with tempfile.TemporaryFile() as out:
+            for line in self.storage.read_lines(input_uri):
+                record = json.loads(line)
+                entry = {
+                    "recordId": record["recordId"],
+                    "modelInput": record["modelInput"],
+                }
+                try:
+                    resp = self.client.invoke_model(
+                        modelId=model_id, body=json.dumps(record["modelInput"])
+                    )
+                    entry["modelOutput"] = json.loads(resp["body"].read())
+                except Exception as e:
+                    errors += 1
+                    status = (
+                        getattr(e, "response", {})
+                        .get("ResponseMetadata", {})
+                        .get("HTTPStatusCode", 500)
+                    )
+                    entry["error"] = {"errorCode": status, "errorMessage": str(e)}
+                out.write((json.dumps(entry) + "\n").encode("utf-8"))
+            out.seek(0)
+            name = os.path.basename(input_uri)
+            self.storage.put(f"{output_uri}{job_id}/{name}.out", out)
+        self.jobs[job_id] = ("PartiallyCompleted" if errors > 0 else "Completed", None)
+        return job_id
+
+    def status(self, job_id: str) -> Tuple[str, Optional[str]]:
+        return self.jobs[job_id]
+
+    def stop(self, job_id: str):
+        # jobs are done when submitted
+        pass
+
+
+@define
+class BatchInferenceJob:
+    """A job of a `BatchInference` run and the range of records it holds"""
+
+    name: str
+    """The job name"""
+    first: int
+    """Index of the first record"""
+    count: int
+    """Number of records"""
+    input_uri: str
+    """The input file"""
+    output_uri: str
+    """The prefix of the output files"""
+    job_id: Optional[str] = None
+    """The job id, once submitted"""
+    status: Optional[str] = None
+    """The last known status"""
+    message: Optional[str] = None
+    """The last known status message"""
+
+
+@define
+class BatchInferenceResult:
+    """The result of a record"""
+
+    index: int
+    """Position of the record in the input"""
+    output: Any = None
+    """The output of `process_response_body`"""
+    response: Optional[Dict[str, Any]] = None
+    """The model output"""
+    error: Optional[Dict[str, Any]] = None
+    """The `errorCode` and `errorMessage` of records that failed"""
+
+
+@define(kw_only=True)
+class BatchInference:
+    """Runs prompts and conversations through Bedrock batch inference jobs."""
+
+    model: BedrockFoundationModel
+    """The text model"""
+    storage: BatchStorage
+    """The storage of the input and output files"""
+    jobs: BatchJobs
+    """The job calls"""
+    generate_args: Dict[str, Any] = field(factory=dict)
+    """Arguments passed to `prepare_body`, such as `max_token_count`"""
+    job_name: str = field(default="bedrock-fm")
+    """Prefix of the job names"""
+    max_records_per_job: int = field(default=MAX_RECORDS_PER_JOB)
+    """Maximum number of records of a job"""
+    max_bytes_per_job: int = field(default=MAX_BYTES_PER_JOB)
+    """Maximum size of the input file of a job"""
+    min_records_per_job: Optional[int] = field(default=None)
+    """Minimum number of records of a job. Defaults to the `min_records` of `jobs`"""
+    max_concurrent_jobs: int = field(default=10)
+    """Maximum number of jobs submitted and not done"""
+    poll_interval: float = field(default=60.0)
+    """Seconds between status checks"""
+    timeout: Optional[float] = field(default=None)
+    """Seconds after which `run` stops waiting for the jobs"""
+    sleep: Callable[[float], None] = field(default=time.sleep)
+    """Function used to wait between status checks"""
+
+    def model_input(
+        self, item: str | List[Human | Assistant | System]
+    ) -> Dict[str, Any]:
+        """The `modelInput` of a prompt or conversation, the body `generate` or `chat` would send.
+
+        Args:
+            item (str | List[Human | Assistant | System]): a prompt or a conversation
+
+        Returns:
+            Dict[str, Any]: the request body
+        """
+        if not isinstance(item, str):
+            if len(item) == 0:
+                raise BedrockArgsError("conversations cannot be empty")
+            self.model._validate_conversation(item)
+            item = self.model.get_chat_prompt(item)
+        return json.loads(self.model.prepare_body(item, **self.generate_args))
+
+    def prepare(
+        self,
+        items: Iterable[str | List[Human | Assistant | System]],
+        run_id: Optional[str] = None,
+    ) -> List[BatchInferenceJob]:
+        """Serializes the items into job input files, within the job size limits.
+
+        The items are read once, one job at a time: a job file is spooled to disk above 64 MiB. The last two files
+        are uploaded at the end, after moving records from the first to the second when the second holds less
+        than `min_records_per_job` records.
+
+        Args:
+            items (Iterable[str | List[Human | Assistant | System]]): the prompts and conversations
+            run_id (Optional[str], optional): names the files and jobs. Defaults to a unique id.
+
+        Raises:
+            BedrockArgsError: if a record is larger than `max_bytes_per_job`, or if the records do not fill jobs of
+                `min_records_per_job` records within the limits
+
+        Returns:
+            List[BatchInferenceJob]: the jobs, not yet submitted
+        """
+        run_id = run_id or time.strftime("%Y%m%d%H%M%S") + "-" + uuid.uuid4().hex[:6]
+        minimum = (
+            self.min_records_per_job
+            if self.min_records_per_job is not None
+            else self.jobs.min_records
+        )
+        jobs: List[BatchInferenceJob] = []
+        # files not uploaded yet, with their number of records and size: at most the last two
+        shards: List[Tuple[int, int, Any]] = []
+        buffer = tempfile.SpooledTemporaryFile(max_size=64 << 20)
+        count = size = 0
+
+        def upload():
+            count, _, data = shards.pop(0)
+            n = len(jobs)
+            job = BatchInferenceJob(
+                name=f"{self.job_name}-{run_id}-{n}",
+                first=jobs[-1].first + jobs[-1].count if n > 0 else 0,
+                count=count,
+                input_uri=self.storage.uri(f"{run_id}/input/{n:05d}.jsonl"),
+                output_uri=self.storage.uri(f"{run_id}/output/{n:05d}/"),
+            )
+            data.seek(0)
+            self.storage.put(job.input_uri, data)
+            data.close()
+            jobs.append(job)
+
+        try:
+            for i, item in enumerate(items):
+                record = {"recordId": f"{i:011d}", "modelInput": self.model_input(item)}
+                line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+                if len(line) > self.max_bytes_per_job:
+                    raise BedrockArgsError(
+                        f"record {i} is larger than max_bytes_per_job"
+                    )
+                if (
+                    count == self.max_records_per_job
+                    or size + len(line) > self.max_bytes_per_job
+                ):
+                    shards.append((count, size, buffer))
+                    buffer = tempfile.SpooledTemporaryFile(max_size=64 << 20)
+                    count = size = 0
+                    if len(shards) > 2:
+                        upload()
+                buffer.write(line)
+                count += 1
+                size += len(line)
+            if count > 0:
+                shards.append((count, size, buffer))
+                buffer = tempfile.SpooledTemporaryFile(max_size=64 << 20)
+                if len(shards) > 2:
+                    upload()
+            if len(shards) == 2 and shards[1][0] < minimum:
+                shards[:] = self._rebalance(shards[0], shards[1], minimum)
+            if len(shards) > 0 and shards[-1][0] < minimum:
+                raise BedrockArgsError(
+                    f"Batch inference jobs need at least {minimum} records, the last job would have {shards[-1][0]}"
+                )
+            while len(shards) > 0:
+                upload()
+        finally:
+            buffer.close()
+            for _, _, data in shards:
+                data.close()
+        return jobs
+
+    def _rebalance(
+        self, previous: Tuple[int, int, Any], last: Tuple[int, int, Any], minimum: int
+    ) -> List[Tuple[int, int, Any]]:
+        """Moves the last records of `previous` to `last` so that it holds `minimum` records, or merges the two
+        files when they hold less than two jobs. Returns the files unchanged when the result exceeds the limits.
+        """
+        total = previous[0] + last[0]
+        keep = total - minimum if total >= 2 * minimum else 0
+        if keep == 0 and total > self.max_records_per_job:
+            return [previous, last]
+        head = tempfile.SpooledTemporaryFile(max_size=64 << 20)
+        tail = tempfile.SpooledTemporaryFile(max_size=64 << 20)
+        head_size = 0
+        previous[2].seek(0)
+        for i, line in enumerate(previous[2]):
+            if i < keep:
+                head.write(line)
+                head_size += len(line)
+            else:
+                tail.write(line)
+        last[2].seek(0)
+        shutil.copyfileobj(last[2], tail)
+        tail_size = previous[1] - head_size + last[1]
+        if tail_size > self.max_bytes_per_job:
+            head.close()
+            tail.close()
+            return [previous, last]
+        previous[2].close()
+        last[2].close()
+        if keep == 0:
+            head.close()
+            return [(total, tail_size, tail)]
+        return [(keep, head_size, head), (total - keep, tail_size, tail)]
+
+    def submit(self, job: BatchInferenceJob):
+        """Submits a job.
+
+        Args:
+            job (BatchInferenceJob): the job
+        """
+        job.job_id = self.jobs.submit(
+            job.name, self.model.invocation_model_id(), job.input_uri, job.output_uri
+        )
+        job.status = "Submitted"
+
+    def refresh(self, job: BatchInferenceJob):
+        """Updates the status of a job.
+
+        Args:
+            job (BatchInferenceJob): the job
+
+        Raises:
+            BedrockBatchJobError: if the job failed, was stopped or expired
+        """
+        job.status, job.message = self.jobs.status(job.job_id)
+        if job.status in FAILED_STATUSES:
+            raise BedrockBatchJobError(
+                f"Batch inference job {job.name} {job.status.lower()}: {job.message}"
+            )
+
+    def _stop_others(
+        self, failed: Optional[BatchInferenceJob], jobs: List[BatchInferenceJob]
+    ) -> List[str]:
+        """Stops the submitted jobs that are not done, except `failed`, returning their ids"""
+        stopped = []
+        for job in jobs:
+            if job is failed or job.job_id is None or job.status in TERMINAL_STATUSES:
+                continue
+            try:
+                self.jobs.stop(job.job_id)
+                job.status = "Stopping"
+            except Exception:
+                logger.warning(
+                    "Cannot stop batch inference job %s", job.job_id, exc_info=True
+                )
+            stopped.append(job.job_id)
+        return stopped
+
+    def results(self, job: BatchInferenceJob) -> Iterator[BatchInferenceResult]:
+        """Streams the outputs of a done job through `process_response_body`.
+
+        Args:
+            job (BatchInferenceJob): the job
+
+        Yields:
+            BatchInferenceResult: the results of the records of the job, in input order. Records missing from the
+                outputs have a `MissingRecord` error
+        """
+        results: Dict[int, BatchInferenceResult] = {}
+        for uri in self.storage.list(job.output_uri):
+            if not uri.endswith(".jsonl.out"):
+                continue
+            for line in self.storage.read_lines(uri):
+                entry = json.loads(line)
+                index = int(entry["recordId"])
+                if "modelOutput" in entry and not entry.get("error"):
+                    output = self.model.process_response_body(entry["modelOutput"])
+                    results[index] = BatchInferenceResult(
+                        index, output, entry["modelOutput"]
+                    )
+                else:
+                    results[index] = BatchInferenceResult(
+                        index, error=entry.get("error")
+                    )
+        for index in range(job.first, job.first + job.count):
+            result = results.pop(index, None)
+            if result is None:
+                message = f"record missing from the outputs of {job.name}"
+                result = BatchInferenceResult(
+                    index, error={"errorCode": "MissingRecord", "errorMessage": message}
+                )
+            yield result
+
+    def run(
+        self, items: Iterable[str | List[Human | Assistant | System]]
+    ) -> Iterator[BatchInferenceResult]:
+        """Prepares, submits and polls the jobs, and streams the results.
+
+        Args:
+            items (Iterable[str | List[Human | Assistant | System]]): the prompts and conversations
+
+        Raises:
+            BedrockBatchJobError: if a job failed or on timeout, after stopping the other submitted jobs
+
+        Yields:
+            BatchInferenceResult: the results, in input order. The submitted jobs are stopped when the iteration
+                is abandoned before its end
+        """
+        jobs = self.prepare(items)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        pending = list(jobs)
+        active: List[BatchInferenceJob] = []
+        done = 0
+        stopping = True
+        try:
+            while done < len(jobs):
+                while len(pending) > 0 and len(active) < self.max_concurrent_jobs:
+                    job = pending.pop(0)
+                    self.submit(job)
+                    active.append(job)
+                for job in active:
+                    try:
+                        self.refresh(job)
+                    except BedrockBatchJobError as e:
+                        stopping = False
+                        stopped = ", ".join(self._stop_others(job, active)) or "none"
+                        raise BedrockBatchJobError(
+                            f"{e}, stopped the other jobs: {stopped}"
+                        ) from e
+                active = [job for job in active if job.status not in TERMINAL_STATUSES]
+                progress = False
+                while done < len(jobs) and jobs[done].status in TERMINAL_STATUSES:
+                    yield from self.results(jobs[done])
+                    done += 1
+                    progress = True
+                if done < len(jobs) and not progress:
+                    if deadline is not None and time.monotonic() > deadline:
+                        stopping = False
+                        stopped = ", ".join(self._stop_others(None, active)) or "none"
+                        raise BedrockBatchJobError(
+                            f"Timeout waiting for {len(active)} batch inference jobs, stopped the jobs: {stopped}"
+                        )
+                    self.sleep(self.poll_interval)
+        finally:
+            # the jobs keep running, and billing, when the caller gives up on the results
+            if stopping and done < len(jobs):
+                self._stop_others(None, active)
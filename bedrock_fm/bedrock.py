@@ -1,17 +1,35 @@
-import boto3
-import json
 import time
-from PIL.Image import Image
 
-from attrs import define, field, Factory
-from botocore.eventstream import EventStream
+from attrs import define, field
 from .exceptions import BedrockArgsError
-from typing import Any, List, Dict, Iterable, Iterator, Literal, overload, Optional
+from .eventstream import iter_chunk_bytes, register_decoder
+from .codec import Codec, get_codec
+from .logs import payload_logger
+from .warmup import Warmable
+from .transport import default_session
+from .catalog import get_capabilities, list_foundation_models
+from .clients import LazyClient, reduce_model, track
+from typing import (
+    Any,
+    List,
+    Dict,
+    Iterable,
+    Iterator,
+    Literal,
+    overload,
+    Optional,
+    TYPE_CHECKING,
+)
 import logging
 from enum import Enum
 from .model import Model
 from abc import abstractmethod
 
+if TYPE_CHECKING:
+    import boto3
+    from botocore.eventstream import EventStream
+    from PIL.Image import Image
+
 logger = logging.getLogger(__name__)
 
 CONTENT_TYPE_APPLICATION_JSON = "application/json"
@@ -22,6 +40,20 @@ class EmbeddingType(Enum):
     QUERY = 1
 
 
+class EmbeddingDataType(Enum):
+    """Numeric format of the returned embedding vectors.
+
+    `FLOAT` vectors are returned as `List[List[float]]`. The compact formats are returned as 2D NumPy arrays,
+    one row per input: `INT8`/`UINT8` hold one byte per dimension, `BINARY`/`UBINARY` pack 8 dimensions per byte.
+    """
+
+    FLOAT = "float"
+    INT8 = "int8"
+    UINT8 = "uint8"
+    BINARY = "binary"
+    UBINARY = "ubinary"
+
+
 @define(kw_only=True)
 class StreamDetails:
     """Details for the stream responses"""
@@ -30,8 +62,8 @@ class StreamDetails:
     """An iterable providing the tokens as they get generated"""
     prompt: str = field(default="")
     """The prompt that is being sent to the model"""
-    body: str = field(default="")
-    """The prompt that is being sent to the model"""
+    body: str | bytes = field(default="")
+    """The body sent to the model, `bytes` when encoded by `OrjsonCodec`"""
     latency: float = field(default=0.0)
     """The latency for the invocation"""
 
@@ -44,8 +76,8 @@ class CompletionDetails:
     """The response as a dictionary"""
     prompt: str = field(default="")
     """The prompt that is being sent to the model"""
-    body: str = field(default="")
-    """The prompt that is being sent to the model"""
+    body: str | bytes = field(default="")
+    """The body sent to the model, `bytes` when encoded by `OrjsonCodec`"""
     latency: float = field(default=0.0)
     """The latency for the invocation"""
 
@@ -66,7 +98,7 @@ class Message:
 @define()
 class Human(Message):
     role: MessageRole = field(default=MessageRole.HUMAN)
-    images: list[Image] = field(default=[])
+    images: list["Image"] = field(factory=list)
 
 
 @define()
@@ -82,15 +114,28 @@ class System(Message):
 class InstanceProfile(Enum):
     US = "us."
     EU = "eu."
+    APAC = "apac."
+
+
+_REGION_PROFILES = {
+    "us": InstanceProfile.US,
+    "eu": InstanceProfile.EU,
+    "ap": InstanceProfile.APAC,
+}
 
 
 @define(kw_only=True)
-class BedrockFoundationModel:
+class BedrockFoundationModel(Warmable):
     """Abstract class for all foundation models exposed via Bedrock.
 
     To add a new FM, inherit from this class and implement the abstract methods:
 
     `get_body`, `get_text`, `process_response`, `validate_extra_args`, `model_id`
+
+    Instances are thread safe: `generate` and `chat` keep the per-call state in local variables and only read
+    the fields, so one instance, and its clients, can serve concurrent requests without locks. Do not assign
+    the fields while requests are in flight, derive a new model with `attrs.evolve(fm, temperature=0.2)`
+    instead, which shares the clients.
     """
 
     top_p: float = field(default=1)
@@ -129,34 +174,44 @@ class BedrockFoundationModel:
     """A dictionary containing the extra arguments to pass to the model that are not supported via the common
     paramters."""
 
-    session: boto3.Session = field(
-        default=Factory(lambda: boto3.Session()), kw_only=True
-    )
+    session: "boto3.Session" = field(factory=default_session, kw_only=True)
     """A `boto3.Session` object to use to create an instance of the Bedrock client"""
 
-    _client: Any = field(
-        default=Factory(
-            lambda self: self.session.client("bedrock-runtime"),
-            takes_self=True,
-        ),
-        kw_only=True,
-    )
-    """Instance of the Bedrock data plane client to use. By default it creates one using the session"""
-
-    _client_ops: Any = field(
-        default=Factory(
-            lambda self: self.session.client("bedrock"),
-            takes_self=True,
-        ),
-        kw_only=True,
-    )
-    """Instance of the Bedrock control plane client to use. By default it creates one using the session"""
+    _client: Any = field(default=None, kw_only=True)
+    """Instance of the Bedrock data plane client to use. By default one is created from the session on first use"""
+
+    _client_ops: Any = field(default=None, kw_only=True)
+    """Instance of the Bedrock control plane client to use. By default one is created from the session on first
+    use"""
 
     _model_id: str = field(default=None)
     """The modelId"""
 
     instance_profile: Optional[InstanceProfile] = field(default=None)
 
+    auto_profile: bool = field(default=False)
+    """Invoke the models that the catalog lists as available only through inference profiles through the profile
+    of the client region, when `instance_profile` is not set"""
+
+    codec: Codec = field(factory=get_codec)
+    """Encodes the request bodies and decodes the responses. Defaults to `get_codec()`"""
+
+    prewarm: bool = field(default=False)
+    """Call `warmup()` when the model is created"""
+
+    client = LazyClient("_client", "bedrock-runtime")
+    """The Bedrock data plane client"""
+
+    client_ops = LazyClient("_client_ops", "bedrock")
+    """The Bedrock control plane client"""
+
+    def __attrs_post_init__(self):
+        track(self)
+        self._prewarm()
+
+    def __reduce__(self):
+        return reduce_model(self)
+
     @classmethod
     def _validate_model_id(cls, model_id: str) -> bool:
         return model_id.startswith(cls.family())
@@ -185,8 +240,29 @@ class BedrockFoundationModel:
         model._model_id = model_id
         return model
 
+    def invocation_model_id(self) -> str:
+        """The modelId passed to the runtime API. With `auto_profile`, models available only through cross-region
+        inference profiles, according to the catalog, are invoked through the profile of the client region when
+        `instance_profile` is not set.
+
+        Returns:
+            str: the modelId or inference profile id
+        """
+        if self.instance_profile is not None:
+            return self.instance_profile.value + self._model_id
+        if not self.auto_profile:
+            return self._model_id
+        caps = get_capabilities(self._model_id)
+        if caps is not None and not caps.on_demand and caps.inference_profile:
+            meta = getattr(self.client, "meta", None)
+            region = getattr(meta, "region_name", None) or self.session.region_name
+            profile = _REGION_PROFILES.get((region or "").split("-")[0])
+            if profile is not None:
+                return profile.value + self._model_id
+        return self._model_id
+
     def list_model_ids(self) -> List[str]:
-        models = self._client_ops.list_foundation_models()["modelSummaries"]
+        models = list_foundation_models(self.client_ops)
         return [m["modelId"] for m in models if m["modelId"].startswith(self.family())]
 
     @abstractmethod
@@ -289,38 +365,29 @@ class BedrockFoundationModel:
         Returns:
             Dict[str, Any]: A dictionary containing the output from the model as Dictionary, the prompt, the body passed to the model an the inference time.
         """
-        if extra_args is None:
-            extra_args = dict(self.extra_args)
-        self.validate_extra_args(extra_args)
-        logger.debug(f"extra_args = {extra_args}")
-        if stop_sequences is None:
-            stop_sequences = list(self.stop_sequences)
-
-        logger.debug(f"stop_word = {stop_sequences}")
-        body = self.get_body(
+        body = self.prepare_body(
             prompt,
-            top_p or self.top_p,
-            temperature or self.temperature,
-            max_token_count or self.max_token_count,
-            stop_sequences,
-            extra_args,
-            stream,
+            top_p=top_p,
+            temperature=temperature,
+            max_token_count=max_token_count,
+            stop_sequences=stop_sequences,
+            extra_args=extra_args,
+            stream=stream,
         )
-        logger.debug(f"Body= {body}")
         t = time.time()
-        mid = self._model_id
-        if self.instance_profile is not None:
-            mid = self.instance_profile.value + mid
+        mid = self.invocation_model_id()
+        payload_logger.log("request", mid, body)
         try:
             if stream:
-                resp = self._client.invoke_model_with_response_stream(
+                register_decoder(self.client)
+                resp = self.client.invoke_model_with_response_stream(
                     modelId=mid,
                     body=body,
                     contentType=CONTENT_TYPE_APPLICATION_JSON,
                     accept="*/*",
                 )
             else:
-                resp = self._client.invoke_model(
+                resp = self.client.invoke_model(
                     modelId=mid,
                     body=body,
                     contentType=CONTENT_TYPE_APPLICATION_JSON,
@@ -339,7 +406,9 @@ class BedrockFoundationModel:
                 )
 
             else:
-                out_body = json.loads(resp["body"].read())
+                raw = resp["body"].read()
+                payload_logger.log("response", mid, raw)
+                out_body = self.codec.loads(raw)
                 return CompletionDetails(
                     output=self.process_response_body(out_body),
                     response=out_body,
@@ -351,9 +420,70 @@ class BedrockFoundationModel:
             if stream:
                 return self._get_text_stream(resp["body"])
             else:
-                out_body = json.loads(resp["body"].read())
+                raw = resp["body"].read()
+                payload_logger.log("response", mid, raw)
+                out_body = self.codec.loads(raw)
                 return self.process_response_body(out_body)
 
+    def prepare_body(
+        self,
+        prompt: str | list,
+        *,
+        top_p: float = None,
+        temperature: float = None,
+        max_token_count: int = None,
+        stop_sequences: List[str] = [],
+        extra_args: Dict[str, Any] = None,
+        stream: bool = False,
+    ) -> str | bytes:
+        """Builds the request body `generate` sends to the model, applying the defaults set on the model instance.
+
+        Args:
+            prompt (str | list): the user prompt, or a chat prompt returned by `get_chat_prompt`
+            top_p (float, optional): The Top P value. Defaults to the value set on the model instance.
+            temperature (float, optional): The temperature for the generation. Defaults to the value set on the model instance.
+            max_token_count (int, optional): Max number of tokens to return. Defaults to the value set on the model instance.
+            stop_sequences (List[str], optional): The list of stop words. Defaults to the value set on the model instance.
+            extra_args (Dict[str, Any], optional): Model specific extra arguments. Defaults to the value set on the model instance.
+            stream (bool, optional): build the body of a streaming invocation. Defaults to False.
+
+        Returns:
+            str | bytes: the encoded body
+        """
+        if extra_args is None:
+            extra_args = dict(self.extra_args)
+        self.validate_extra_args(extra_args)
+        logger.debug("extra_args = %s", extra_args)
+        if stop_sequences is None:
+            stop_sequences = list(self.stop_sequences)
+
+        logger.debug("stop_word = %s", stop_sequences)
+        max_token_count = max_token_count or self.max_token_count
+        caps = get_capabilities(self._model_id)
+        if caps is not None:
+            # the catalog is advisory, Bedrock validates the request
+            if stream and not caps.streaming:
+                logger.warning(
+                    "%s may not support streaming according to the catalog",
+                    self._model_id,
+                )
+            if caps.max_output_tokens and max_token_count > caps.max_output_tokens:
+                logger.warning(
+                    "max_token_count %s exceeds the %s tokens listed in the catalog for %s",
+                    max_token_count,
+                    caps.max_output_tokens,
+                    self._model_id,
+                )
+        return self.get_body(
+            prompt,
+            top_p or self.top_p,
+            temperature or self.temperature,
+            max_token_count,
+            stop_sequences,
+            extra_args,
+            stream,
+        )
+
     def chat(
         self,
         conversation: List[Human | Assistant | System],
@@ -368,19 +498,7 @@ class BedrockFoundationModel:
     ) -> StreamDetails | CompletionDetails | List[str] | Iterable:
         if len(conversation) == 0:
             return [""]
-        s = 0
-        if conversation[0].role == MessageRole.SYSTEM:
-            s = 1
-        if not all([m.role == MessageRole.HUMAN for m in conversation[s + 0 :: 2]]):
-            raise ValueError(
-                "Human messages are not alternating correctly in the conversation"
-            )
-        if not all([m.role == MessageRole.ASSISTANT for m in conversation[s + 1 :: 2]]):
-            raise ValueError(
-                "Assistant messages are not alternating correctly in the conversation"
-            )
-        if conversation[-1].role != MessageRole.HUMAN:
-            raise ValueError("Last messages in the conversation should be Human")
+        self._validate_conversation(conversation)
 
         prompt = self.get_chat_prompt(conversation=conversation)
 
@@ -395,6 +513,30 @@ class BedrockFoundationModel:
             stream=stream,
         )
 
+    @classmethod
+    def supports_chat(cls) -> bool:
+        """Whether the model family implements `chat`.
+
+        Returns:
+            bool: True when `get_chat_prompt` is implemented
+        """
+        return cls.get_chat_prompt is not BedrockFoundationModel.get_chat_prompt
+
+    def _validate_conversation(self, conversation: List[Human | Assistant | System]):
+        s = 0
+        if conversation[0].role == MessageRole.SYSTEM:
+            s = 1
+        if not all([m.role == MessageRole.HUMAN for m in conversation[s + 0 :: 2]]):
+            raise ValueError(
+                "Human messages are not alternating correctly in the conversation"
+            )
+        if not all([m.role == MessageRole.ASSISTANT for m in conversation[s + 1 :: 2]]):
+            raise ValueError(
+                "Assistant messages are not alternating correctly in the conversation"
+            )
+        if conversation[-1].role != MessageRole.HUMAN:
+            raise ValueError("Last messages in the conversation should be Human")
+
     def get_chat_prompt(
         self, conversation: List[Human | Assistant | System]
     ) -> str | list:
@@ -440,7 +582,7 @@ class BedrockFoundationModel:
         """
         ...
 
-    def _get_text_stream(self, stream: EventStream) -> Iterator[str]:
+    def _get_text_stream(self, stream: "EventStream") -> Iterator[str]:
         """Internal method to return the stream of tokens
 
         Args:
@@ -453,8 +595,8 @@ class BedrockFoundationModel:
             Iterator[Iterable[str]]: _description_
         """
 
-        for e in stream:
-            yield self.get_text(json.loads(e["chunk"]["bytes"]))
+        for data in iter_chunk_bytes(stream):
+            yield self.get_text(self.codec.loads(data))
 
     @abstractmethod
     def get_text(self, body: Dict[str, Any]) -> str:
@@ -470,23 +612,31 @@ class BedrockFoundationModel:
 
 
 @define(kw_only=True)
-class BedrockEmbeddingsModel:
+class BedrockEmbeddingsModel(Warmable):
     verbose: bool = field(default=False)
-    session: boto3.Session = field(
-        default=Factory(lambda: boto3.Session()),
-    )
-    _client: Any = field(
-        default=Factory(
-            lambda self: self.session.client("bedrock-runtime"),
-            takes_self=True,
-        ),
-    )
-    _client_ops: Any = field(
-        default=Factory(
-            lambda self: self.session.client("bedrock"),
-            takes_self=True,
-        ),
-    )
+    session: "boto3.Session" = field(factory=default_session)
+    _client: Any = field(default=None)
+    _client_ops: Any = field(default=None)
+    _model_id: str = field(default=None)
+    """The modelId"""
+    codec: Codec = field(factory=get_codec)
+    """Encodes the request bodies and decodes the responses. Defaults to `get_codec()`"""
+
+    prewarm: bool = field(default=False)
+    """Call `warmup()` when the model is created"""
+
+    client = LazyClient("_client", "bedrock-runtime")
+    """The Bedrock data plane client"""
+
+    client_ops = LazyClient("_client_ops", "bedrock")
+    """The Bedrock control plane client"""
+
+    def __attrs_post_init__(self):
+        track(self)
+        self._prewarm()
+
+    def __reduce__(self):
+        return reduce_model(self)
 
     @classmethod
     def _validate_model_id(cls, model_id: str) -> bool:
@@ -506,7 +656,7 @@ class BedrockEmbeddingsModel:
         return model
 
     def list_model_ids(self) -> List[str]:
-        models = self._client_ops.list_foundation_models()["modelSummaries"]
+        models = list_foundation_models(self.client_ops)
         return [m["modelId"] for m in models if m["modelId"].startswith(self.family())]
 
     @abstractmethod
@@ -518,6 +668,38 @@ class BedrockEmbeddingsModel:
         """
         ...
 
+    def max_batch_size(self) -> int:
+        """The maximum number of passages the model accepts in a single invocation, from the catalog.
+
+        Returns:
+            int: the batch size
+        """
+        return self._catalog_limit("max_batch_size", 1)
+
+    def max_input_tokens(self) -> int:
+        """The maximum number of tokens the model accepts for each passage, from the catalog.
+
+        Returns:
+            int: the token limit
+        """
+        return self._catalog_limit("context_window", 512)
+
+    def _catalog_limit(self, name: str, default: int) -> int:
+        caps = get_capabilities(self._model_id)
+        return getattr(caps, name, None) or default
+
+    def prepare(self, item: Any) -> Any:
+        """Override this method to convert an input into the form consumed by `get_body`, for example to resize
+        and encode images. `EmbeddingPipeline` runs it in a worker pool ahead of the invocations.
+
+        Args:
+            item (Any): the input
+
+        Returns:
+            Any: the prepared input
+        """
+        return item
+
     def generate_for_documents(self, data: List[str]) -> List[List[float]]:
         """Generate embedding for 1 or multiple documents.
         Providing multiple documents in a single call must be supported by the model used
@@ -526,7 +708,8 @@ class BedrockEmbeddingsModel:
             data (List[str]): The document passages to get the embedding for
 
         Returns:
-            List[List[float]]: A list of embeddings vectors, one for each passage
+            List[List[float]]: A list of embeddings vectors, one for each passage. Models configured with a compact
+            `EmbeddingDataType` return a 2D NumPy array instead.
         """
         return self.generate(data, type=EmbeddingType.DOCUMENT)
 
@@ -537,7 +720,7 @@ class BedrockEmbeddingsModel:
             data (str): The query for which one wants the embedding
 
         Returns:
-            List[float]: The embedding vector
+            List[float]: The embedding vector, or a 1D NumPy array for compact `EmbeddingDataType`
         """
         return self.generate([data], type=EmbeddingType.QUERY)[0]
 
@@ -556,9 +739,8 @@ class BedrockEmbeddingsModel:
 
         body = self.get_body(data, type)
 
-        logger.debug("Body:")
-        logger.debug(body)
-        response = self._client.invoke_model(
+        payload_logger.log("request", self._model_id, body)
+        response = self.client.invoke_model(
             modelId=self._model_id,
             body=body,
             accept="*/*",
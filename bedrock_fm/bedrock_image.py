@@ -1,33 +1,46 @@
-import boto3
-import json
 import time
 
-from attrs import define, field, Factory
+from attrs import define, field
+from .codec import Codec, get_codec
+from .logs import payload_logger
 from .exceptions import BedrockArgsError
-from typing import Any, List, Dict, Tuple
+from .clients import LazyClient, reduce_model, track
+from .transport import default_session
+from .warmup import Warmable
+from typing import Any, List, Dict, Tuple, TYPE_CHECKING
 import logging
-from PIL import Image
 from .bedrock import Model
 from abc import abstractmethod
 
+if TYPE_CHECKING:
+    import boto3
+    from PIL import Image
+
 
 @define
-class BedrockImageModel:
+class BedrockImageModel(Warmable):
     scale: float = field(default=0)
     steps: int = field(default=0)
-    session: boto3.Session = field(
-        default=Factory(lambda: boto3.Session()), kw_only=True
-    )
+    session: "boto3.Session" = field(factory=default_session, kw_only=True)
     """A `boto3.Session` object to use to create an instance of the Bedrock client"""
 
-    _client: Any = field(
-        default=Factory(
-            lambda self: self.session.client("bedrock-runtime"),
-            takes_self=True,
-        ),
-        kw_only=True,
-    )
+    _client: Any = field(default=None, kw_only=True)
+    """Instance of the Bedrock data plane client to use. By default one is created from the session on first use"""
     _model_id: str = field(default=None)
+    codec: Codec = field(factory=get_codec, kw_only=True)
+    """Encodes the request bodies and decodes the responses. Defaults to `get_codec()`"""
+    prewarm: bool = field(default=False, kw_only=True)
+    """Call `warmup()` when the model is created"""
+
+    client = LazyClient("_client", "bedrock-runtime")
+    """The Bedrock data plane client"""
+
+    def __attrs_post_init__(self):
+        track(self)
+        self._prewarm()
+
+    def __reduce__(self):
+        return reduce_model(self)
 
     @classmethod
     def from_id(cls, model_id: str | Model, **kwargs):
@@ -48,13 +61,14 @@ class BedrockImageModel:
         width: int = 512,
         seed: int = 0,
         **kwargs,
-    ) -> List[Image.Image]:
+    ) -> List["Image.Image"]:
         body = self.get_body(prompts, height, width, seed, **kwargs)
-        resp = self._client.invoke_model(modelId=self._model_id, body=body)
+        payload_logger.log("request", self._model_id, body)
+        resp = self.client.invoke_model(modelId=self._model_id, body=body)
         return self.get_images(resp)
 
     @abstractmethod
     def get_body(self, prompt: str, seed: int, extra_args: Dict[str, Any]) -> str: ...
 
     @abstractmethod
-    def get_images(self, response: Dict[str, Any]) -> List[Image.Image]: ...
+    def get_images(self, response: Dict[str, Any]) -> List["Image.Image"]: ...
@@ -0,0 +1,546 @@
+"""Load generation against Bedrock models, with a latency report and a concurrency sweep.
+
+Drives `generate`, `chat`, embeddings or image generation for any modelId, at a fixed concurrency or at a fixed
+request rate, and reports the p50/p90/p99 latency, the time to first token of streams, the output tokens per
+second, the throttle rate and the client CPU time per request.
+
+    python -m bedrock_fm.bench --model-id anthropic.claude-3-haiku-20240307-v1:0 --concurrency 8 --requests 200
+    python -m bedrock_fm.bench --model-id anthropic.claude-3-haiku-20240307-v1:0 --rate 5 --duration 60 --stream
+    python -m bedrock_fm.bench --model-id meta.llama3-8b-instruct-v1:0 --instance-profile us eu --sweep 1 2 4 8 16 32
+
+The sweep runs each modelId and `InstanceProfile` at increasing concurrency and reports the saturation knee: the
+lowest concurrency reaching `KNEE_THROUGHPUT` of the best throughput, beyond which more concurrency mostly adds
+latency and throttling. Use `--stub` to run against the in-process `StubBedrockClient`, or `--endpoint-url` to
+run against a `StubServer`, without Bedrock quota.
+
+Output tokens are counted as the text chunks of streams, and estimated from the text length otherwise.
+"""
+
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import threading
+import time
+from attrs import define, field
+from .bedrock import (
+    BedrockEmbeddingsModel,
+    BedrockFoundationModel,
+    Human,
+    InstanceProfile,
+)
+from .bedrock_image import BedrockImageModel
+
+CHARS_PER_TOKEN = 4.0
+"""Characters per token used to estimate the output tokens of responses that are not streamed"""
+
+KNEE_THROUGHPUT = 0.9
+"""Fraction of the best throughput of a sweep defining the saturation knee"""
+
+
+def _percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def _is_throttling(e: Exception) -> bool:
+    error = getattr(e, "response", {}).get("Error", {})
+    return error.get("Code", "").lower() in (
+        "throttlingexception",
+        "toomanyrequestsexception",
+    )
+
+
+@define
+class Sample:
+    """The measures of one request"""
+
+    latency: float
+    """Seconds from the scheduled start of the request to the end of the response"""
+    ttft: Optional[float] = None
+    """Seconds to the first text chunk of a stream"""
+    output_tokens: int = 0
+    """Output tokens, counted or estimated"""
+    error: Optional[str] = None
+    """`throttled`, or the type of the error"""
+
+
+@define
+class LoadResult:
+    """The report of a load run"""
+
+    model_id: str
+    """The modelId"""
+    concurrency: Optional[int] = None
+    """The number of concurrent requests, for fixed concurrency runs"""
+    rate: Optional[float] = None
+    """The requests per second, for fixed rate runs"""
+    instance_profile: Optional[str] = None
+    """The inference profile"""
+    samples: List[Sample] = field(factory=list)
+    """The measures of each request"""
+    elapsed: float = 0.0
+    """Wall clock seconds"""
+    cpu: float = 0.0
+    """Process CPU seconds"""
+
+    @property
+    def requests(self) -> int:
+        return len(self.samples)
+
+    @property
+    def ok(self) -> List[Sample]:
+        return [s for s in self.samples if s.error is None]
+
+    @property
+    def throughput(self) -> float:
+        """Successful requests per second"""
+        return len(self.ok) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Output tokens per second, over all the concurrent requests"""
+        return (
+            sum(s.output_tokens for s in self.ok) / self.elapsed
+            if self.elapsed
+            else 0.0
+        )
+
+    @property
+    def throttle_rate(self) -> float:
+        return (
+            sum(s.error == "throttled" for s in self.samples) / self.requests
+            if self.requests
+            else 0.0
+        )
+
+    @property
+    def error_rate(self) -> float:
+        """Fraction of the requests failing with errors other than throttling"""
+        failed = sum(s.error not in (None, "throttled") for s in self.samples)
+        return failed / self.requests if self.requests else 0.0
+
+    @property
+    def cpu_per_request(self) -> float:
+        return self.cpu / self.requests if self.requests else 0.0
+
+    def latency(self, p: float) -> Optional[float]:
+        """Percentile of the latency of the successful requests.
+
+        Args:
+            p (float): the percentile, between 0 and 100
+
+        Returns:
+            Optional[float]: seconds, None without successful requests
+        """
+        return _percentile([s.latency for s in self.ok], p)
+
+    def ttft(self, p: float) -> Optional[float]:
+        """Percentile of the time to first token of the successful streams.
+
+        Args:
+            p (float): the percentile, between 0 and 100
+
+        Returns:
+            Optional[float]: seconds, None without streams
+        """
+        return _percentile([s.ttft for s in self.ok if s.ttft is not None], p)
+
+    def report(self) -> Dict[str, Any]:
+        """The summary of the run.
+
+        Returns:
+            Dict[str, Any]: the report, with latencies in milliseconds
+        """
+
+        def ms(v: Optional[float]) -> Optional[float]:
+            return None if v is None else round(v * 1000, 1)
+
+        return {
+            "model_id": self.model_id,
+            "instance_profile": self.instance_profile,
+            "concurrency": self.concurrency,
+            "rate": self.rate,
+            "requests": self.requests,
+            "throughput_rps": round(self.throughput, 2),
+            "p50_ms": ms(self.latency(50)),
+            "p90_ms": ms(self.latency(90)),
+            "p99_ms": ms(self.latency(99)),
+            "ttft_p50_ms": ms(self.ttft(50)),
+            "ttft_p99_ms": ms(self.ttft(99)),
+            "output_tokens_per_s": round(self.tokens_per_second, 1),
+            "throttle_rate": round(self.throttle_rate, 4),
+            "error_rate": round(self.error_rate, 4),
+            "cpu_ms_per_request": ms(self.cpu_per_request),
+        }
+
+
+def make_call(
+    fm: Any,
+    mode: str = "auto",
+    prompt: str = "Write a short story about a fox.",
+    max_tokens: int = 256,
+    stream: bool = False,
+    batch: int = 1,
+) -> Callable[[], Sample]:
+    """Builds the function invoking the model once and measuring it.
+
+    Args:
+        fm (Any): the model
+        mode (str, optional): `generate`, `chat`, `embed`, `image`, or `auto` to pick from the model type.
+            Defaults to "auto".
+        prompt (str, optional): the prompt, or the text to embed. Defaults to "Write a short story about a fox.".
+        max_tokens (int, optional): the maximum output tokens of text models. Defaults to 256.
+        stream (bool, optional): stream the responses of text models, measuring the time to first token.
+            Defaults to False.
+        batch (int, optional): the number of texts of each embeddings request. Defaults to 1.
+
+    Returns:
+        Callable[[], Sample]: the function, raising the errors of the model
+    """
+    if mode == "auto":
+        if isinstance(fm, BedrockEmbeddingsModel):
+            mode = "embed"
+        elif isinstance(fm, BedrockImageModel):
+            mode = "image"
+        else:
+            mode = "chat" if fm.supports_chat() else "generate"
+
+    if mode == "embed":
+
+        def call() -> Sample:
+            t = time.perf_counter()
+            fm.generate_for_documents([prompt] * batch)
+            return Sample(latency=time.perf_counter() - t)
+
+    elif mode == "image":
+
+        def call() -> Sample:
+            t = time.perf_counter()
+            fm.generate([(prompt, 1.0)])
+            return Sample(latency=time.perf_counter() - t)
+
+    elif mode in ("chat", "generate"):
+        if mode == "chat":
+            conversation = [Human(prompt)]
+
+            def invoke(stream: bool):
+                return fm.chat(conversation, max_token_count=max_tokens, stream=stream)
+
+        else:
+
+            def invoke(stream: bool):
+                return fm.generate(prompt, max_token_count=max_tokens, stream=stream)
+
+        def call() -> Sample:
+            t = time.perf_counter()
+            if not stream:
+                text = "".join(invoke(False))
+                return Sample(
+                    latency=time.perf_counter() - t,
+                    output_tokens=round(len(text) / CHARS_PER_TOKEN),
+                )
+            ttft = None
+            tokens = 0
+            for chunk in invoke(True):
+                if chunk:
+                    if ttft is None:
+                        ttft = time.perf_counter() - t
+                    tokens += 1
+            return Sample(
+                latency=time.perf_counter() - t, ttft=ttft, output_tokens=tokens
+            )
+
+    else:
+        raise ValueError(f"Unknown mode {mode}")
+    return call
+
+
+def _measure(call: Callable[[], Sample], scheduled: float) -> Sample:
+    # include the time spent waiting for a worker, so that a saturated client is not hidden
+    queued = time.perf_counter() - scheduled
+    try:
+        sample = call()
+        sample.latency += queued
+        if sample.ttft is not None:
+            sample.ttft += queued
+        return sample
+    except Exception as e:
+        error = "throttled" if _is_throttling(e) else type(e).__name__
+        return Sample(latency=time.perf_counter() - scheduled, error=error)
+
+
+def run_load(
+    call: Callable[[], Sample],
+    *,
+    model_id: str = "",
+    concurrency: Optional[int] = None,
+    rate: Optional[float] = None,
+    requests: Optional[int] = None,
+    duration: Optional[float] = None,
+    max_workers: int = 256,
+) -> LoadResult:
+    """Runs `call` at a fixed concurrency, or at a fixed rate of requests per second.
+
+    At a fixed rate the requests are started on schedule whether or not the previous ones completed, and the
+    latency is measured from the scheduled start, so that the queueing of an overloaded client is reported.
+
+    Args:
+        call (Callable[[], Sample]): the function invoking the model, see `make_call`
+        model_id (str, optional): the modelId, for the report. Defaults to "".
+        concurrency (Optional[int], optional): the number of concurrent requests. Defaults to None.
+        rate (Optional[float], optional): the requests per second. Defaults to None.
+        requests (Optional[int], optional): the number of requests. Defaults to None.
+        duration (Optional[float], optional): the seconds to run. Defaults to None.
+        max_workers (int, optional): the maximum concurrent requests at a fixed rate. Defaults to 256.
+
+    Returns:
+        LoadResult: the report
+    """
+    if (concurrency is None) == (rate is None):
+        raise ValueError("Set either concurrency or rate")
+    if requests is None and duration is None:
+        raise ValueError("Set requests or duration")
+    result = LoadResult(model_id=model_id, concurrency=concurrency, rate=rate)
+    lock = threading.Lock()
+    issued = 0
+    start = time.perf_counter()
+    deadline = None if duration is None else start + duration
+    cpu = time.process_time()
+
+    def next_request() -> bool:
+        nonlocal issued
+        with lock:
+            if requests is not None and issued >= requests:
+                return False
+            if deadline is not None and time.perf_counter() >= deadline:
+                return False
+            issued += 1
+            return True
+
+    if concurrency is not None:
+
+        def worker():
+            samples = []
+            while next_request():
+                samples.append(_measure(call, time.perf_counter()))
+            return samples
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            for samples in list(pool.map(lambda _: worker(), range(concurrency))):
+                result.samples.extend(samples)
+    else:
+        futures = []
+        with ThreadPoolExecutor(max_workers) as pool:
+            i = 0
+            while next_request():
+                scheduled = start + i / rate
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(pool.submit(_measure, call, scheduled))
+                i += 1
+        result.samples.extend(f.result() for f in futures)
+    result.elapsed = time.perf_counter() - start
+    result.cpu = time.process_time() - cpu
+    return result
+
+
+def find_knee(results: Sequence[LoadResult]) -> Optional[LoadResult]:
+    """The saturation knee of a concurrency sweep: the run with the lowest concurrency reaching
+    `KNEE_THROUGHPUT` of the best throughput.
+
+    Args:
+        results (Sequence[LoadResult]): the runs of the sweep
+
+    Returns:
+        Optional[LoadResult]: the knee, None if no request succeeded
+    """
+    best = max((r.throughput for r in results), default=0.0)
+    if best == 0:
+        return None
+    return min(
+        (r for r in results if r.throughput >= KNEE_THROUGHPUT * best),
+        key=lambda r: r.concurrency or 0,
+    )
+
+
+def sweep(
+    call: Callable[[], Sample],
+    levels: Sequence[int],
+    *,
+    model_id: str = "",
+    requests_per_level: Optional[int] = None,
+    duration: Optional[float] = None,
+    on_result: Optional[Callable[[LoadResult], None]] = None,
+) -> List[LoadResult]:
+    """Runs `call` at each concurrency level.
+
+    Args:
+        call (Callable[[], Sample]): the function invoking the model, see `make_call`
+        levels (Sequence[int]): the concurrency levels, in increasing order
+        model_id (str, optional): the modelId, for the report. Defaults to "".
+        requests_per_level (Optional[int], optional): requests for each level. Defaults to None.
+        duration (Optional[float], optional): seconds for each level. Defaults to None.
+        on_result (Optional[Callable[[LoadResult], None]], optional): called after each level. Defaults to None.
+
+    Returns:
+        List[LoadResult]: the runs
+    """
+    results = []
+    for level in levels:
+        result = run_load(
+            call,
+            model_id=model_id,
+            concurrency=level,
+            requests=requests_per_level,
+            duration=duration,
+        )
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+    return results
+
+
+def _print(result: LoadResult, as_json: bool):
+    r = result.report()
+    if as_json:
+        print(json.dumps(r))
+        return
+
+    def f(v):
+        return "-" if v is None else v
+
+    load = (
+        f"c={r['concurrency']}"
+        if r["concurrency"] is not None
+        else f"rate={r['rate']}/s"
+    )
+    print(
+        f"{r['model_id']} {r['instance_profile'] or ''} {load} n={r['requests']} "
+        f"{r['throughput_rps']} req/s p50={f(r['p50_ms'])} p90={f(r['p90_ms'])} p99={f(r['p99_ms'])} ms "
+        f"ttft p50={f(r['ttft_p50_ms'])} p99={f(r['ttft_p99_ms'])} ms {r['output_tokens_per_s']} tok/s "
+        f"throttled={r['throttle_rate']:.1%} errors={r['error_rate']:.1%} cpu={f(r['cpu_ms_per_request'])} ms/req"
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None):
+    from .registry import family_class, from_model_id
+
+    parser = argparse.ArgumentParser(
+        prog="python -m bedrock_fm.bench", description=__doc__.splitlines()[0]
+    )
+    parser.add_argument("--model-id", nargs="+", required=True)
+    parser.add_argument(
+        "--mode", choices=["auto", "generate", "chat", "embed", "image"], default="auto"
+    )
+    parser.add_argument("--prompt", default="Write a short story about a fox.")
+    parser.add_argument("--max-tokens", type=int, default=256)
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="stream the responses and measure the TTFT",
+    )
+    parser.add_argument(
+        "--batch", type=int, default=1, help="texts per embeddings request"
+    )
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--concurrency", type=int)
+    load.add_argument("--rate", type=float, help="requests per second")
+    load.add_argument("--sweep", type=int, nargs="+", help="concurrency levels")
+    parser.add_argument("--requests", type=int, help="requests for each run")
+    parser.add_argument("--duration", type=float, help="seconds for each run")
+    parser.add_argument(
+        "--instance-profile",
+        nargs="+",
+        choices=[p.name.lower() for p in InstanceProfile],
+        default=[],
+        help="also run through these inference profiles",
+    )
+    parser.add_argument("--region")
+    parser.add_argument("--endpoint-url", help="for example the URL of a StubServer")
+    parser.add_argument(
+        "--stub", action="store_true", help="use an in-process StubBedrockClient"
+    )
+    parser.add_argument("--stub-latency", type=float, default=0.2)
+    parser.add_argument("--stub-tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--stub-throttle-rate", type=float, default=0.0)
+    parser.add_argument(
+        "--json", action="store_true", help="print a JSON report for each run"
+    )
+    args = parser.parse_args(argv)
+    if args.concurrency is None and args.rate is None and args.sweep is None:
+        args.concurrency = 1
+    if args.requests is None and args.duration is None:
+        args.requests = 100
+
+    if args.stub:
+        from .stub import StubBedrockClient
+
+        client = StubBedrockClient(
+            latency=args.stub_latency,
+            tokens_per_second=args.stub_tokens_per_second,
+            throttle_rate=args.stub_throttle_rate,
+            output_tokens=args.max_tokens,
+        )
+    else:
+        import boto3
+
+        session = boto3.Session(region_name=args.region)
+        client = session.client("bedrock-runtime", endpoint_url=args.endpoint_url)
+
+    for model_id in args.model_id:
+        profiles: List[Optional[InstanceProfile]] = [None]
+        if issubclass(family_class(model_id), BedrockFoundationModel):
+            # only the text models are available through inference profiles
+            profiles += [InstanceProfile[p.upper()] for p in args.instance_profile]
+        for profile in profiles:
+            kwargs: Dict[str, Any] = {"client": client}
+            if profile is not None:
+                kwargs["instance_profile"] = profile
+            fm = from_model_id(model_id, **kwargs)
+            call = make_call(
+                fm, args.mode, args.prompt, args.max_tokens, args.stream, args.batch
+            )
+            profile_name = None if profile is None else profile.name.lower()
+
+            def show(result: LoadResult):
+                result.instance_profile = profile_name
+                _print(result, args.json)
+
+            if args.sweep:
+                results = sweep(
+                    call,
+                    args.sweep,
+                    model_id=model_id,
+                    requests_per_level=args.requests,
+                    duration=args.duration,
+                    on_result=show,
+                )
+                knee = find_knee(results)
+                if knee is not None:
+                    message = {
+                        "model_id": model_id,
+                        "instance_profile": profile_name,
+                        "knee_concurrency": knee.concurrency,
+                        "knee_throughput_rps": round(knee.throughput, 2),
+                    }
+                    text = " ".join(f"{k}={v}" for k, v in message.items())
+                    print(json.dumps(message) if args.json else f"knee {text}")
+            else:
+                show(
+                    run_load(
+                        call,
+                        model_id=model_id,
+                        concurrency=args.concurrency,
+                        rate=args.rate,
+                        requests=args.requests,
+                        duration=args.duration,
+                    )
+                )
+
+
+if __name__ == "__main__":
+    main()
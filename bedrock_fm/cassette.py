@@ -0,0 +1,328 @@
+"""Record and replay of the Bedrock invocations, for deterministic offline runs.
+
+`CassetteClient` wraps a `bedrock-runtime` client. In `RECORD` mode it forwards the invocations and appends each
+request and response to the cassette: the request body, the response body and headers, the event stream chunks
+with the time elapsed before each of them, and the errors. A stream closed before its end is recorded with the
+chunks that were read and marked `truncated`. In `REPLAY` mode it answers from the cassette without
+network calls, either as fast as possible or, with `realtime`, with the recorded latencies.
+
+Invocations are matched on the modelId and a hash of the request body, with the JSON keys sorted, so that
+text, embedding and image models are all covered. Identical requests recorded more than once are replayed in
+the recorded order.
+
+A cassette is a JSON Lines file with one invocation per line, compressed with gzip when the path ends with `.gz`.
+
+```py
+from bedrock_fm import CassetteClient, CassetteMode, Claude3, Model
+
+client = CassetteClient("claude.jsonl.gz", mode=CassetteMode.RECORD)
+fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client)
+fm.generate("Hello")
+
+client = CassetteClient("claude.jsonl.gz")
+fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client)
+fm.generate("Hello")  # replayed
+```
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from base64 import b64decode, b64encode
+from enum import Enum
+from io import BytesIO
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from attrs import define, field
+from .eventstream import _raise_exception, register_decoder
+from .exceptions import BedrockCassetteMissError
+from .transport import CONTENT_TYPE_APPLICATION_JSON, Transport, _raise_for_status
+
+CASSETTE_VERSION = 1
+"""Version of the cassette format"""
+
+
+class CassetteMode(Enum):
+    RECORD = "record"
+    """Forward the invocations to the client and record them"""
+    REPLAY = "replay"
+    """Answer from the cassette"""
+
+
+def body_hash(body: str | bytes) -> str:
+    """Hash of a request body. JSON bodies are normalized by sorting the keys, so that the hash does not depend on
+    how the body was serialized.
+
+    Args:
+        body (str | bytes): the request body
+
+    Returns:
+        str: the hex digest
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    try:
+        normalized = json.dumps(
+            json.loads(body), sort_keys=True, separators=(",", ":"), ensure_ascii=False
+        )
+        body = normalized.encode("utf-8")
+    except ValueError:
+        pass
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def _encode(data: str | bytes) -> Any:
+    if isinstance(data, str):
+        return data
+    try:
+        return data.decode("utf-8")
+    except UnicodeDecodeError:
+        return {"b64": b64encode(data).decode("ascii")}
+
+
+def _decode(value: Any) -> bytes:
+    if isinstance(value, dict):
+        return b64decode(value["b64"])
+    return value.encode("utf-8")
+
+
+def _error(e: Exception) -> Optional[Dict[str, Any]]:
+    response = getattr(e, "response", None)
+    if not isinstance(response, dict) or "Error" not in response:
+        return None
+    return {
+        "code": response["Error"].get("Code"),
+        "message": response["Error"].get("Message", ""),
+        "status": response.get("ResponseMetadata", {}).get("HTTPStatusCode"),
+    }
+
+
+def _headers(resp: Dict[str, Any]) -> Dict[str, str]:
+    headers = dict(resp.get("ResponseMetadata", {}).get("HTTPHeaders", {}))
+    if resp.get("contentType"):
+        headers.setdefault("content-type", resp["contentType"])
+    return headers
+
+
+@define
+class CassetteClient(Transport):
+    """`Transport` recording the invocations of a client to a cassette, or replaying them."""
+
+    path: str
+    """The cassette file. Recorded invocations are appended to it"""
+    mode: CassetteMode = field(default=CassetteMode.REPLAY)
+    """Record or replay"""
+    client: Any = field(default=None)
+    """The client to record. Defaults to a boto3 `bedrock-runtime` client from the default session"""
+    realtime: bool = field(default=False)
+    """When replaying, wait the recorded latencies and the recorded time between the stream chunks"""
+    sleep: Callable[[float], None] = field(default=time.sleep)
+    """Function used to wait when replaying in real time"""
+    _entries: Dict[Tuple[str, str], List[Dict[str, Any]]] = field(
+        factory=dict, init=False
+    )
+    _next: Dict[Tuple[str, str], int] = field(factory=dict, init=False)
+    _lock: threading.Lock = field(factory=threading.Lock, init=False)
+
+    def __attrs_post_init__(self):
+        if self.mode == CassetteMode.REPLAY:
+            for entry in self.load(self.path):
+                self._entries.setdefault((entry["model"], entry["key"]), []).append(
+                    entry
+                )
+        elif self.client is None:
+            from .transport import default_session
+
+            self.client = default_session().client("bedrock-runtime")
+
+    @staticmethod
+    def load(path: str) -> List[Dict[str, Any]]:
+        """Reads the invocations recorded in a cassette.
+
+        Args:
+            path (str): the cassette file
+
+        Returns:
+            List[Dict[str, Any]]: the recorded invocations, in order
+        """
+        if not os.path.exists(path):
+            return []
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def _write(self, entry: Dict[str, Any]):
+        line = json.dumps(entry, separators=(",", ":"), ensure_ascii=False) + "\n"
+        opener = gzip.open if self.path.endswith(".gz") else open
+        with self._lock:
+            with opener(self.path, "at", encoding="utf-8") as f:
+                f.write(line)
+
+    def _entry(self, op: str, modelId: str, body: str | bytes) -> Dict[str, Any]:
+        return {
+            "v": CASSETTE_VERSION,
+            "op": op,
+            "model": modelId,
+            "key": body_hash(body),
+            "request": _encode(body),
+        }
+
+    def _find(self, op: str, modelId: str, body: str | bytes) -> Dict[str, Any]:
+        key = (modelId, body_hash(body))
+        with self._lock:
+            entries = [e for e in self._entries.get(key, []) if e["op"] == op]
+            if not entries:
+                raise BedrockCassetteMissError(
+                    f"No recorded {op} for {modelId} with body hash {key[1]} in {self.path}"
+                )
+            i = self._next.get((op,) + key, 0)
+            self._next[(op,) + key] = i + 1
+        return entries[i % len(entries)]
+
+    def _raise(self, error: Dict[str, Any], operation: str):
+        _raise_for_status(
+            error.get("status") or 500,
+            {"x-amzn-ErrorType": error["code"]},
+            json.dumps({"message": error["message"]}).encode("utf-8"),
+            operation,
+        )
+
+    def invoke_model(
+        self,
+        *,
+        modelId: str,
+        body: str | bytes,
+        contentType: str = CONTENT_TYPE_APPLICATION_JSON,
+        accept: str = "*/*",
+        **kwargs,
+    ) -> Dict[str, Any]:
+        if self.mode == CassetteMode.REPLAY:
+            entry = self._find("invoke", modelId, body)
+            if self.realtime:
+                self.sleep(entry["latency"])
+            if "error" in entry:
+                self._raise(entry["error"], "InvokeModel")
+            return {
+                "body": BytesIO(_decode(entry["body"])),
+                "contentType": entry["headers"].get("content-type"),
+                "ResponseMetadata": {
+                    "HTTPStatusCode": 200,
+                    "HTTPHeaders": entry["headers"],
+                },
+            }
+
+        entry = self._entry("invoke", modelId, body)
+        t = time.perf_counter()
+        try:
+            resp = self.client.invoke_model(
+                modelId=modelId,
+                body=body,
+                contentType=contentType,
+                accept=accept,
+                **kwargs,
+            )
+            data = resp["body"].read()
+        except Exception as e:
+            error = _error(e)
+            if error is not None:
+                entry["latency"] = round(time.perf_counter() - t, 4)
+                entry["error"] = error
+                self._write(entry)
+            raise
+        entry["latency"] = round(time.perf_counter() - t, 4)
+        entry["headers"] = _headers(resp)
+        entry["body"] = _encode(data)
+        self._write(entry)
+        resp = dict(resp)
+        resp["body"] = BytesIO(data)
+        return resp
+
+    def invoke_model_with_response_stream(
+        self,
+        *,
+        modelId: str,
+        body: str | bytes,
+        contentType: str = CONTENT_TYPE_APPLICATION_JSON,
+        accept: str = "*/*",
+        **kwargs,
+    ) -> Dict[str, Any]:
+        if self.mode == CassetteMode.REPLAY:
+            entry = self._find("stream", modelId, body)
+            if self.realtime:
+                self.sleep(entry["latency"])
+            if "error" in entry and "chunks" not in entry:
+                self._raise(entry["error"], "InvokeModelWithResponseStream")
+            return {
+                "body": self._replay_chunks(entry),
+                "contentType": entry["headers"].get("content-type"),
+                "ResponseMetadata": {
+                    "HTTPStatusCode": 200,
+                    "HTTPHeaders": entry["headers"],
+                },
+            }
+
+        entry = self._entry("stream", modelId, body)
+        t = time.perf_counter()
+        try:
+            register_decoder(self.client)
+            resp = self.client.invoke_model_with_response_stream(
+                modelId=modelId,
+                body=body,
+                contentType=contentType,
+                accept=accept,
+                **kwargs,
+            )
+        except Exception as e:
+            error = _error(e)
+            if error is not None:
+                entry["latency"] = round(time.perf_counter() - t, 4)
+                entry["error"] = error
+                self._write(entry)
+            raise
+        entry["latency"] = round(time.perf_counter() - t, 4)
+        entry["headers"] = _headers(resp)
+        resp = dict(resp)
+        resp["body"] = self._record_chunks(entry, resp["body"])
+        return resp
+
+    def _record_chunks(
+        self, entry: Dict[str, Any], stream: Any
+    ) -> Iterator[Dict[str, Any]]:
+        from .eventstream import iter_chunk_bytes
+
+        chunks: List[Tuple[float, Any]] = []
+        entry["chunks"] = chunks
+        t = time.perf_counter()
+        record = True
+        try:
+            for data in iter_chunk_bytes(stream):
+                now = time.perf_counter()
+                chunks.append((round(now - t, 4), _encode(data)))
+                t = now
+                yield {"chunk": {"bytes": data}}
+        except GeneratorExit:
+            # the stream was closed before its end, the entry replays the chunks that were read
+            entry["truncated"] = True
+            raise
+        except Exception as e:
+            error = _error(e)
+            if error is None:
+                record = False
+            else:
+                entry["error"] = error
+            raise
+        finally:
+            if record:
+                self._write(entry)
+
+    def _replay_chunks(self, entry: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        for delay, data in entry.get("chunks", []):
+            if self.realtime:
+                self.sleep(delay)
+            yield {"chunk": {"bytes": _decode(data)}}
+        if "error" in entry:
+            error = entry["error"]
+            payload = json.dumps({"message": error["message"]}).encode("utf-8")
+            _raise_exception({":exception-type": error["code"]}, memoryview(payload))
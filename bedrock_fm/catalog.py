@@ -0,0 +1,152 @@
+"""Model capabilities, from an offline catalog.
+
+`bedrock_fm/model_catalog.py` is generated with the `Model` enum by `tools/gen_model_enum.py` and records, for
+each model, the streaming support, the on-demand and inference profile availability, the context window, the
+output token limit, the embedding batch size, the image size limits and the supported extra args. The data is
+advisory: models log a warning for requests exceeding it, leaving the validation to Bedrock, and only pick the
+inference profile from it when created with `auto_profile=True`. Regenerate it from `ListFoundationModels` with
+`python tools/gen_model_enum.py` rather than editing the API-derived fields by hand.
+
+Live lookups of `list_foundation_models` go through `list_foundation_models`, whose results are cached for
+`LIST_MODELS_TTL` seconds and shared by all the models using a client of the same region.
+
+```py
+from bedrock_fm import Model
+from bedrock_fm.catalog import get_capabilities
+
+caps = get_capabilities(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0)
+caps.max_output_tokens  # 4096
+```
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import threading
+import time
+from attrs import define, field
+from .model import Model
+
+LIST_MODELS_TTL = 3600.0
+"""Seconds the results of `list_foundation_models` are cached"""
+
+_PROFILE_PREFIXES = ("us.", "eu.", "apac.")
+
+
+@define(frozen=True)
+class ModelCapabilities:
+    """Capabilities of a Bedrock model"""
+
+    model_id: str
+    """The modelId"""
+    provider: str = field(default="")
+    """The model provider"""
+    input_modalities: Tuple[str, ...] = field(default=())
+    """The input modalities, such as `TEXT` and `IMAGE`"""
+    output_modalities: Tuple[str, ...] = field(default=())
+    """The output modalities, such as `TEXT`, `EMBEDDING` and `IMAGE`"""
+    streaming: bool = field(default=False)
+    """Whether `invoke_model_with_response_stream` is supported"""
+    on_demand: bool = field(default=True)
+    """Whether the model can be invoked on demand with its modelId"""
+    inference_profile: bool = field(default=False)
+    """Whether the model can be invoked through a cross-region inference profile"""
+    context_window: Optional[int] = field(default=None)
+    """Maximum number of input tokens, for each passage for embedding models"""
+    max_output_tokens: Optional[int] = field(default=None)
+    """Maximum number of generated tokens"""
+    max_batch_size: Optional[int] = field(default=None)
+    """Maximum number of passages, or documents for rerank models, in an invocation"""
+    max_image_side: Optional[int] = field(default=None)
+    """Maximum width and height of the images in pixels"""
+    max_image_pixels: Optional[int] = field(default=None)
+    """Maximum number of pixels of the images"""
+    extra_args: Tuple[str, ...] = field(default=())
+    """The model specific arguments supported in `extra_args`"""
+
+
+_capabilities: Dict[str, Optional[ModelCapabilities]] = {}
+
+
+def get_capabilities(model_id: str | Model) -> Optional[ModelCapabilities]:
+    """Returns the capabilities of a model from the catalog. Inference profile ids, such as
+    `us.anthropic.claude-3-haiku-20240307-v1:0`, return the capabilities of the model.
+
+    Args:
+        model_id (str | Model): the modelId
+
+    Returns:
+        Optional[ModelCapabilities]: the capabilities, None if the model is not in the catalog
+    """
+    if type(model_id) is Model:
+        model_id = model_id.value
+    try:
+        return _capabilities[model_id]
+    except KeyError:
+        pass
+    from .model_catalog import CATALOG
+
+    key = model_id
+    if key not in CATALOG and key.startswith(_PROFILE_PREFIXES):
+        key = key.split(".", 1)[1]
+    entry = CATALOG.get(key)
+    caps = None if entry is None else ModelCapabilities(model_id=key, **entry)
+    _capabilities[model_id] = caps
+    return caps
+
+
+def catalog_version() -> str:
+    """The date the catalog was generated.
+
+    Returns:
+        str: the ISO date
+    """
+    from .model_catalog import CATALOG_VERSION
+
+    return CATALOG_VERSION
+
+
+_models_cache: Dict[Any, Tuple[float, List[Dict[str, Any]]]] = {}
+_models_lock = threading.Lock()
+
+
+def _after_fork():
+    global _models_lock
+    _models_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def list_foundation_models(
+    client_ops: Any, ttl: float = LIST_MODELS_TTL
+) -> List[Dict[str, Any]]:
+    """Returns the `modelSummaries` of `list_foundation_models`, cached for `ttl` seconds. The cache is shared
+    by all the clients of the same region.
+
+    Args:
+        client_ops (Any): a boto3 `bedrock` client
+        ttl (float, optional): seconds the result is cached. Defaults to `LIST_MODELS_TTL`.
+
+    Returns:
+        List[Dict[str, Any]]: the model summaries
+    """
+    meta = getattr(client_ops, "meta", None)
+    key = getattr(meta, "region_name", None) or id(client_ops)
+    now = time.monotonic()
+    cached = _models_cache.get(key)
+    if cached is not None and now - cached[0] < ttl:
+        return cached[1]
+    with _models_lock:
+        cached = _models_cache.get(key)
+        if cached is not None and now - cached[0] < ttl:
+            return cached[1]
+        models = client_ops.list_foundation_models()["modelSummaries"]
+        _models_cache[key] = (time.monotonic(), models)
+        return models
+
+
+def clear_cache():
+    """Drops the cached `list_foundation_models` results."""
+    with _models_lock:
+        _models_cache.clear()
@@ -0,0 +1,226 @@
+"""Bedrock clients that are created lazily, and that survive pickling and `fork`.
+
+Models create their boto3 clients from their `session` on first use. When a model is pickled, for example to
+be sent to a `ProcessPoolExecutor` worker, the session is reduced to its settings (region and profile) and the
+boto3 clients to their region and endpoint, and the receiving process creates new ones. Credentials passed
+explicitly to the session are not pickled: the child process resolves them again with the default chain.
+
+In a child process created with `fork`, the boto3 clients of the existing models, whose connection pools are
+shared with the parent, are dropped and created again on first use from the same session, so explicit
+credentials are kept.
+
+```py
+from concurrent.futures import ProcessPoolExecutor
+from bedrock_fm import Claude3, Model
+
+fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0)
+with ProcessPoolExecutor() as pool:
+    results = list(pool.map(fm.generate, prompts))
+```
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple, TYPE_CHECKING
+import os
+import threading
+import weakref
+from attrs import define, fields
+from .transport import default_session
+
+if TYPE_CHECKING:
+    import boto3
+
+_lock = threading.Lock()
+_tracked: "weakref.WeakValueDictionary[int, Any]" = weakref.WeakValueDictionary()
+
+
+@define(frozen=True)
+class SessionSettings:
+    """The picklable settings of a `boto3.Session`"""
+
+    region_name: Optional[str] = None
+    """The region"""
+    profile_name: Optional[str] = None
+    """The profile, if set explicitly"""
+
+    @classmethod
+    def of(cls, session: Any) -> "SessionSettings":
+        profile = session.profile_name
+        return cls(
+            region_name=session.region_name,
+            profile_name=None if profile == "default" else profile,
+        )
+
+    def session(self) -> "boto3.Session":
+        """Creates a session with these settings.
+
+        Returns:
+            boto3.Session: a new session
+        """
+        if self.region_name is None and self.profile_name is None:
+            return default_session()
+        import boto3
+
+        return boto3.Session(
+            region_name=self.region_name, profile_name=self.profile_name
+        )
+
+
+@define(frozen=True)
+class ClientSettings:
+    """The picklable settings of a boto3 client, replacing it until a new client is created"""
+
+    region_name: Optional[str] = None
+    """The region"""
+    endpoint_url: Optional[str] = None
+    """The endpoint"""
+
+    @classmethod
+    def of(cls, client: Any) -> "ClientSettings":
+        return cls(
+            region_name=client.meta.region_name, endpoint_url=client.meta.endpoint_url
+        )
+
+
+def is_boto3_client(client: Any) -> bool:
+    """Whether `client` is a boto3 client, as opposed to a `Transport` or another drop-in client."""
+    return hasattr(getattr(client, "meta", None), "service_model")
+
+
+class LazyClient:
+    """Descriptor returning the client stored in the `field` attribute of a model, creating it from the model
+    `session` when the attribute is None or holds `ClientSettings`."""
+
+    def __init__(self, field: str, service: str):
+        self.field = field
+        self.service = service
+
+    def __get__(self, obj: Any, owner: Any = None) -> Any:
+        if obj is None:
+            return self
+        client = getattr(obj, self.field)
+        if client is None or type(client) is ClientSettings:
+            with _lock:
+                client = getattr(obj, self.field)
+                if client is None:
+                    client = obj.session.client(self.service)
+                elif type(client) is ClientSettings:
+                    client = obj.session.client(
+                        self.service,
+                        region_name=client.region_name,
+                        endpoint_url=client.endpoint_url,
+                    )
+                else:
+                    return client
+                object.__setattr__(obj, self.field, client)
+        return client
+
+
+def track(obj: Any):
+    """Registers a model so that its session and clients are dropped in the child after a `fork`."""
+    # by id, the models compare by value and are not hashable
+    _tracked[id(obj)] = obj
+
+
+def _portable(value: Any) -> Any:
+    if is_boto3_client(value):
+        return ClientSettings.of(value)
+    if hasattr(value, "_session") and hasattr(value, "get_credentials"):
+        return SessionSettings.of(value)
+    return value
+
+
+def reduce_model(obj: Any, drop: Tuple[str, ...] = ()) -> tuple:
+    """Implements `__reduce__` for the models: the state is pickled with the session replaced by its settings
+    and the boto3 clients by their region and endpoint.
+
+    Args:
+        obj (Any): the model
+        drop (Tuple[str, ...], optional): attributes pickled as None, such as connection pools created on
+            first use. Defaults to ().
+
+    Returns:
+        tuple: the reduce value
+    """
+    state = {
+        a.name: None if a.name in drop else _portable(getattr(obj, a.name))
+        for a in fields(type(obj))
+    }
+    return (_restore_model, (type(obj), state))
+
+
+def _restore_model(cls: type, state: Dict[str, Any]) -> Any:
+    obj = cls.__new__(cls)
+    for name, value in state.items():
+        if type(value) is SessionSettings:
+            value = value.session()
+        object.__setattr__(obj, name, value)
+    track(obj)
+    return obj
+
+
+def reduce_init(obj: Any) -> tuple:
+    """Implements `__reduce__` for the transports holding locks and queues: the object is created again from its
+    init arguments, with the boto3 clients replaced by their region and endpoint.
+
+    Args:
+        obj (Any): the transport
+
+    Returns:
+        tuple: the reduce value
+    """
+    kwargs = {
+        a.alias: _portable(getattr(obj, a.name)) for a in fields(type(obj)) if a.init
+    }
+    return (_construct, (type(obj), kwargs))
+
+
+def _construct(cls: type, kwargs: Dict[str, Any]) -> Any:
+    return cls(**kwargs)
+
+
+def lazy_client(settings: Any, service: str) -> Any:
+    """The boto3 client for `ClientSettings`, any other client unchanged.
+
+    Args:
+        settings (Any): the client or its settings
+        service (str): the service of the client
+
+    Returns:
+        Any: the client
+    """
+    if type(settings) is not ClientSettings:
+        return settings
+    return default_session().client(
+        service, region_name=settings.region_name, endpoint_url=settings.endpoint_url
+    )
+
+
+def reset_model(obj: Any, drop: Tuple[str, ...] = ()):
+    """Drops the boto3 clients of a model, in the child after a `fork`. The clients are created again on first use
+    from the session of the model, which is kept with its credentials.
+
+    Args:
+        obj (Any): the model
+        drop (Tuple[str, ...], optional): attributes set to None. Defaults to ().
+    """
+    for name in drop:
+        object.__setattr__(obj, name, None)
+    for a in fields(type(obj)):
+        value = getattr(obj, a.name)
+        if is_boto3_client(value):
+            object.__setattr__(obj, a.name, ClientSettings.of(value))
+
+
+def _after_fork():
+    global _lock
+    _lock = threading.Lock()
+    for obj in list(_tracked.values()):
+        reset: Optional[Callable[[], None]] = getattr(obj, "_after_fork", None)
+        if reset is not None:
+            reset()
+        else:
+            reset_model(obj)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -0,0 +1,177 @@
+"""JSON encoding of request bodies and decoding of responses.
+
+Models encode bodies and decode responses through a `Codec`. The default `JsonCodec` encodes with the standard
+library, so bodies are identical to `json.dumps`, and decodes with `orjson` when it is installed. `OrjsonCodec`
+also encodes with `orjson`, producing compact `bytes` that are passed to the client without further encoding.
+
+```py
+from bedrock_fm import Claude3, Model, OrjsonCodec, set_codec
+
+set_codec(OrjsonCodec())  # default for the models created afterwards
+fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, codec=OrjsonCodec())
+```
+
+The constant part of a body, such as the sampling parameters, only changes when the parameters change.
+Families build a `BodyTemplate` once for each combination of parameters with `body_template`, and only
+encode the prompt at each call.
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+from abc import abstractmethod
+from functools import lru_cache, wraps
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+TEMPLATE_CACHE_SIZE = 256
+"""Number of body templates kept for each family"""
+
+SLOT = "\x00bedrock_fm.slot\x00"
+"""Placeholder for the values encoded at each call in a `BodyTemplate`"""
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+class Codec:
+    """Encodes request bodies and decodes response bodies"""
+
+    @abstractmethod
+    def dumps(self, obj: Any) -> str | bytes:
+        """Encodes an object as JSON.
+
+        Args:
+            obj (Any): the object to encode
+
+        Returns:
+            str | bytes: the JSON document
+        """
+        ...
+
+    @abstractmethod
+    def loads(self, data: str | bytes) -> Any:
+        """Decodes a JSON document.
+
+        Args:
+            data (str | bytes): the JSON document
+
+        Returns:
+            Any: the decoded object
+        """
+        ...
+
+
+class JsonCodec(Codec):
+    """Encodes with the standard library `json`, decodes with `orjson` when installed"""
+
+    def dumps(self, obj: Any) -> str:
+        return json.dumps(obj)
+
+    def loads(self, data: str | bytes) -> Any:
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """Encodes and decodes with `orjson`. Bodies are compact `bytes`"""
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError(
+                "OrjsonCodec requires orjson. Install it with `pip install bedrock_fm[orjson]`"
+            )
+
+    def dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj)
+
+    def loads(self, data: str | bytes) -> Any:
+        return orjson.loads(data)
+
+
+_codec: Codec = JsonCodec()
+
+
+def get_codec() -> Codec:
+    """The codec used by the models that are not given one.
+
+    Returns:
+        Codec: the default codec
+    """
+    return _codec
+
+
+def set_codec(codec: Codec):
+    """Sets the codec used by the models created afterwards that are not given one.
+
+    Args:
+        codec (Codec): the new default codec
+    """
+    global _codec
+    _codec = codec
+
+
+class BodyTemplate:
+    """A request body whose constant fields are encoded once.
+
+    The fields set to `SLOT` are encoded at each `render`, in the order they appear in the body.
+    """
+
+    def __init__(self, codec: Codec, body: Dict[str, Any]):
+        self._dumps = codec.dumps
+        self.parts = tuple(codec.dumps(body).split(codec.dumps(SLOT)))
+
+    def render(self, *values: Any) -> str | bytes:
+        """Encodes the body with the given slot values.
+
+        Returns:
+            str | bytes: the encoded body
+        """
+        parts = self.parts
+        if len(values) == 1:
+            return parts[0] + self._dumps(values[0]) + parts[1]
+        out = [parts[0]]
+        for value, part in zip(values, parts[1:]):
+            out.append(self._dumps(value))
+            out.append(part)
+        return parts[0][:0].join(out)
+
+
+def _freeze(extra_args: Dict[str, Any]) -> Optional[Tuple]:
+    key = []
+    for k, v in extra_args.items():
+        if v.__class__ not in _SCALARS:
+            return None
+        key.append((k, v.__class__, v))
+    return tuple(key)
+
+
+def body_template(fn: Callable[..., Dict[str, Any]]) -> Callable[..., BodyTemplate]:
+    """Turns a function building a body with `SLOT` placeholders into a cached `BodyTemplate` factory.
+
+    `fn` takes the extra arguments followed by the other constant parameters of the body, which must be
+    hashable. The returned function takes the codec followed by the arguments of `fn`. Templates are cached
+    when all the extra arguments are scalars. Arguments of different types are cached separately, so that `1`
+    and `1.0` give different templates.
+
+    Args:
+        fn (Callable[..., Dict[str, Any]]): the body builder
+
+    Returns:
+        Callable[..., BodyTemplate]: the template factory
+    """
+
+    @lru_cache(maxsize=TEMPLATE_CACHE_SIZE, typed=True)
+    def cached(codec: Codec, extra: Tuple, *args) -> BodyTemplate:
+        return BodyTemplate(codec, fn({k: v for k, _, v in extra}, *args))
+
+    @wraps(fn)
+    def build(codec: Codec, extra_args: Dict[str, Any], *args) -> BodyTemplate:
+        extra = _freeze(extra_args)
+        if extra is None:
+            return BodyTemplate(codec, fn(extra_args, *args))
+        return cached(codec, extra, *args)
+
+    return build
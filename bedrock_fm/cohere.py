@@ -9,11 +9,34 @@ from .bedrock import (
     MessageRole,
 )
 from .exceptions import BedrockExtraArgsError, BedrockInvocationError
-import json
-from typing import List, Any, Dict, Iterable, Optional, overload, Literal
+from .codec import SLOT, body_template
+from typing import List, Any, Dict, Iterable, Optional, Tuple, overload, Literal
 from attrs import define
 
 
+@body_template
+def _command_body(
+    extra_args: Dict[str, Any],
+    max_token_count: int,
+    temperature: float,
+    top_p: float,
+    stop_sequences: Tuple[str],
+    stream: bool,
+) -> Dict[str, Any]:
+    body = dict(extra_args)
+    body.update(
+        {
+            "prompt": SLOT,
+            "max_tokens": max_token_count,
+            "temperature": temperature,
+            "p": top_p,
+            "stop_sequences": list(stop_sequences),
+            "stream": stream,
+        }
+    )
+    return body
+
+
 @define
 class Command(BedrockFoundationModel):
     """Command is a text generation model for business use cases. Command is trained on data that supports reliable business applications,
@@ -55,18 +78,15 @@ class Command(BedrockFoundationModel):
         extra_args: Dict[str, Any],
         stream: bool,
     ) -> str:
-        body = extra_args.copy()
-        body.update(
-            {
-                "prompt": prompt,
-                "max_tokens": max_token_count,
-                "temperature": temperature,
-                "p": top_p,
-                "stop_sequences": stop_sequences,
-                "stream": stream,
-            }
-        )
-        return json.dumps(body)
+        return _command_body(
+            self.codec,
+            extra_args,
+            max_token_count,
+            temperature,
+            top_p,
+            tuple(stop_sequences),
+            stream,
+        ).render(prompt)
 
     @overload
     def generate(
@@ -245,14 +265,15 @@ class CommandR(BedrockFoundationModel):
                     "temperature": temperature,
                 }
             )
-            return json.dumps(body)
+            return self.codec.dumps(body)
         else:
             raise BedrockInvocationError(
                 "Command-R models do not support generate api."
             )
 
     def get_text(self, body: Dict[str, Any]) -> str:
-        return body["text"]
+        # the stream-start and stream-end events have no text
+        return body.get("text", "")
 
     def process_response_body(self, body: Dict[str, Any]) -> List[str]:
         return [body["text"]]
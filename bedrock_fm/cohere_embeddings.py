@@ -1,26 +1,214 @@
-from typing import List
-import json
-from .bedrock import BedrockEmbeddingsModel, EmbeddingType
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from attrs import define, field
+from .bedrock import BedrockEmbeddingsModel, EmbeddingType, EmbeddingDataType, Model
+from .codec import Codec, get_codec
+from .exceptions import BedrockArgsError
+from .clients import LazyClient, reduce_model, track
+from .transport import default_session
 
+if TYPE_CHECKING:
+    import boto3
 
+_COMPACT_DTYPES = {
+    EmbeddingDataType.INT8: "int8",
+    EmbeddingDataType.UINT8: "uint8",
+    EmbeddingDataType.BINARY: "int8",
+    EmbeddingDataType.UBINARY: "uint8",
+}
+
+
+@define(kw_only=True)
 class Embed(BedrockEmbeddingsModel):
-    """Amazon Titan Embedding base class."""
+    """Cohere Embed base class.
+
+    Set `embedding_type` to request compact vectors from the model. `INT8` and `UINT8` return one byte per
+    dimension, `BINARY` and `UBINARY` pack 8 dimensions per byte. Compact vectors are returned as 2D NumPy arrays.
+    """
+
+    embedding_type: EmbeddingDataType = field(default=EmbeddingDataType.FLOAT)
+    """The output format of the embeddings"""
 
     @classmethod
     def family(cls) -> str:
         return "cohere.embed"
 
+    def max_batch_size(self) -> int:
+        return self._catalog_limit("max_batch_size", 96)
+
+    def max_input_tokens(self) -> int:
+        return self._catalog_limit("context_window", 512)
+
     def get_body(self, data: List[str], type: EmbeddingType) -> str:
-        return json.dumps(
+        body = {
+            "texts": data,
+            "input_type": (
+                "search_document" if type == EmbeddingType.DOCUMENT else "search_query"
+            ),
+        }
+        if self.embedding_type != EmbeddingDataType.FLOAT:
+            body["embedding_types"] = [self.embedding_type.value]
+        return self.codec.dumps(body)
+
+    def parse_response(self, response: bytes) -> List[List[float]]:
+        response_body = self.codec.loads(response.get("body").read())
+        embeddings = response_body.get("embeddings")
+        if self.embedding_type == EmbeddingDataType.FLOAT:
+            return embeddings
+        import numpy as np
+
+        return np.asarray(
+            embeddings[self.embedding_type.value],
+            dtype=_COMPACT_DTYPES[self.embedding_type],
+        )
+
+
+@define(kw_only=True)
+class RerankResult:
+    """A document scored by a rerank model"""
+
+    index: int
+    """Position of the document in the candidate list"""
+    relevance_score: float
+    """Relevance of the document to the query, higher is more relevant"""
+    document: Any = field(default=None)
+    """The document"""
+
+
+@define(kw_only=True)
+class Rerank:
+    """Cohere Rerank scores candidate documents against a query.
+
+    Large candidate sets are split in batches of `batch_size` documents which are scored concurrently and merged,
+    so that only the best passages need to be passed to the generation model:
+
+        rr = Rerank.from_id(Model.COHERE_RERANK_V3_5_0)
+        best = rr.rerank("Where is Paris?", passages, top_n=5)
+        fm.chat([Human("Where is Paris?")], extra_args={"documents": [{"snippet": r.document} for r in best]})
+    """
+
+    batch_size: int = field(default=100)
+    """Number of documents per invocation. Bedrock accepts up to 1000"""
+
+    max_workers: int = field(default=4)
+    """Number of concurrent invocations"""
+
+    session: "boto3.Session" = field(factory=default_session)
+    """A `boto3.Session` object to use to create an instance of the Bedrock client"""
+
+    _client: Any = field(default=None)
+    """Instance of the Bedrock data plane client to use. By default one is created from the session on first use"""
+    _model_id: str = field(default=None)
+    """The modelId"""
+    codec: Codec = field(factory=get_codec)
+    """Encodes the request bodies and decodes the responses. Defaults to `get_codec()`"""
+
+    client = LazyClient("_client", "bedrock-runtime")
+    """The Bedrock data plane client"""
+
+    def __attrs_post_init__(self):
+        track(self)
+
+    def __reduce__(self):
+        return reduce_model(self)
+
+    @classmethod
+    def family(cls) -> str:
+        return "cohere.rerank"
+
+    @classmethod
+    def _validate_model_id(cls, model_id: str) -> bool:
+        return model_id.startswith(cls.family())
+
+    @classmethod
+    def from_id(cls, model_id: str | Model, **kw):
+        """Instantiates a new rerank model
+
+        Args:
+            model_id (str | Model): The modelId as a string or as a Model enum value
+
+        Raises:
+            BedrockArgsError: Raises an exception if the model is not a rerank model
+
+        Returns:
+            Rerank: the model
+        """
+        if type(model_id) is Model:
+            model_id = model_id.value
+
+        if not cls._validate_model_id(model_id):
+            raise BedrockArgsError(
+                f"model_id {model_id} not compatible with {cls.family()}"
+            )
+        model = cls(**kw)
+        model._model_id = model_id
+        return model
+
+    def get_body(self, query: str, documents: List[Any], top_n: int) -> str:
+        return self.codec.dumps(
             {
-                "texts": data,
-                "input_type": "search_document"
-                if type == EmbeddingType.DOCUMENT
-                else "search_query",
+                "query": query,
+                "documents": documents,
+                "top_n": top_n,
+                "api_version": 2,
             }
         )
 
-    def parse_response(self, response: bytes) -> List[List[float]]:
-        response_body = json.loads(response.get("body").read())
-        embeddings = response_body.get("embeddings")
-        return embeddings
+    def parse_response(self, response: Dict[str, Any]) -> List[Tuple[int, float]]:
+        response_body = self.codec.loads(response.get("body").read())
+        return [(r["index"], r["relevance_score"]) for r in response_body["results"]]
+
+    def _score(
+        self, query: str, documents: List[Any], top_n: int
+    ) -> List[Tuple[int, float]]:
+        body = self.get_body(query, documents, min(top_n, len(documents)))
+        response = self.client.invoke_model(
+            modelId=self._model_id,
+            body=body,
+            accept="*/*",
+            contentType="application/json",
+        )
+        return self.parse_response(response)
+
+    def rerank(
+        self, query: str, documents: List[Any], *, top_n: Optional[int] = None
+    ) -> List[RerankResult]:
+        """Scores the documents against the query and returns the most relevant ones.
+
+        Args:
+            query (str): the query
+            documents (List[Any]): the candidate documents, as strings or dictionaries
+            top_n (int, optional): the number of documents to return, at least 1. Defaults to all the documents.
+
+        Raises:
+            BedrockArgsError: if `top_n` is less than 1
+
+        Returns:
+            List[RerankResult]: the `top_n` documents, most relevant first
+        """
+        if top_n is not None and top_n < 1:
+            raise BedrockArgsError(f"top_n must be at least 1, got {top_n}")
+        if len(documents) == 0:
+            return []
+        top_n = len(documents) if top_n is None else min(top_n, len(documents))
+        offsets = range(0, len(documents), self.batch_size)
+        if len(offsets) == 1:
+            scored = self._score(query, documents, top_n)
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                batches = pool.map(
+                    lambda o: [
+                        (o + i, s)
+                        for i, s in self._score(
+                            query, documents[o : o + self.batch_size], top_n
+                        )
+                    ],
+                    offsets,
+                )
+                scored = [s for batch in batches for s in batch]
+        best = heapq.nlargest(top_n, scored, key=lambda s: s[1])
+        return [
+            RerankResult(index=i, relevance_score=s, document=documents[i])
+            for i, s in best
+        ]
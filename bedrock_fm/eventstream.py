@@ -0,0 +1,415 @@
+"""Decoder for the `application/vnd.amazon.eventstream` format used by `InvokeModelWithResponseStream`.
+
+Messages are parsed in place in the received blocks, CRCs are checked with `zlib.crc32` and the base64 chunk
+bytes are decoded straight from the message payload, skipping the generic botocore event parsing. A message split
+across two blocks is copied into a buffer, which is completed with the bytes it is missing from the next block.
+`iter_chunk_bytes` picks the fastest path available for the stream returned by the client.
+
+boto3 clients return a botocore `EventStream`. `register_decoder` adds a `before-parse` handler to a client so that
+its streamed bodies are a `RawEventStream` instead, decoded here from the raw HTTP response. The models register it
+on the boto3 clients they stream with.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, Tuple, Type
+from base64 import b64decode, b64encode
+from functools import lru_cache
+import json
+import struct
+import uuid
+import weakref
+import zlib
+
+_PRELUDE = struct.Struct(">II")
+_UINT32 = struct.Struct(">I")
+_PRELUDE_LENGTH = 12
+_MIN_LENGTH = _PRELUDE_LENGTH + 4
+_CHUNK_BYTES = b'"bytes":"'
+
+
+class EventStreamDecodeError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+def _parse_headers(buf: memoryview, pos: int, end: int) -> Dict[str, Any]:
+    headers = {}
+    while pos < end:
+        name_len = buf[pos]
+        name = bytes(buf[pos + 1 : pos + 1 + name_len]).decode("utf-8")
+        pos += 1 + name_len
+        t = buf[pos]
+        pos += 1
+        if t == 7 or t == 6:
+            (length,) = struct.unpack_from(">H", buf, pos)
+            value = bytes(buf[pos + 2 : pos + 2 + length])
+            headers[name] = value.decode("utf-8") if t == 7 else value
+            pos += 2 + length
+        elif t == 0 or t == 1:
+            headers[name] = t == 0
+        elif t == 2:
+            headers[name] = struct.unpack_from(">b", buf, pos)[0]
+            pos += 1
+        elif t == 3:
+            headers[name] = struct.unpack_from(">h", buf, pos)[0]
+            pos += 2
+        elif t == 4:
+            headers[name] = struct.unpack_from(">i", buf, pos)[0]
+            pos += 4
+        elif t == 5 or t == 8:
+            headers[name] = struct.unpack_from(">q", buf, pos)[0]
+            pos += 8
+        elif t == 9:
+            headers[name] = uuid.UUID(bytes=bytes(buf[pos : pos + 16]))
+            pos += 16
+        else:
+            raise EventStreamDecodeError(f"Unknown header type {t}")
+    return headers
+
+
+@lru_cache(maxsize=None)
+def _exception_class(code: str, exceptions: Any = None) -> Type[Exception]:
+    """The `EventStreamError` subclass raised for the stream exception `code`. When `code` is modeled by the
+    `bedrock-runtime` service, such as `throttlingException`, the class also derives from the modeled exception
+    of `exceptions`, the `client.exceptions` of a boto3 client, so that `client.exceptions.ThrottlingException`
+    catches it as with the other operations. Without `exceptions`, the classes of a module level factory are
+    used."""
+    from botocore.exceptions import ClientError, EventStreamError
+    from botocore.errorfactory import ClientExceptionsFactory
+    import botocore.session
+
+    try:
+        service = botocore.session.get_session().get_service_model("bedrock-runtime")
+        body = service.operation_model(
+            "InvokeModelWithResponseStream"
+        ).output_shape.members["body"]
+        shape = body.members[code]
+        if exceptions is None:
+            exceptions = ClientExceptionsFactory().create_client_exceptions(service)
+        modeled = exceptions.from_code(shape.name)
+    except Exception:
+        return EventStreamError
+    if modeled is ClientError:
+        return EventStreamError
+    return type(modeled.__name__, (EventStreamError, modeled), {})
+
+
+def _raise_exception(
+    headers: Dict[str, Any], payload: memoryview, exceptions: Any = None
+):
+    code = headers.get(":exception-type") or headers.get(":error-code")
+    try:
+        body = json.loads(bytes(payload))
+        message = body.get("message", body.get("Message", ""))
+    except ValueError:
+        body = {}
+        message = headers.get(":error-message", "")
+    response = {k: v for k, v in body.items() if k not in ("message", "Message")}
+    response["Error"] = {"Code": code, "Message": message}
+    raise _exception_class(code or "", exceptions)(
+        response, "InvokeModelWithResponseStream"
+    )
+
+
+class EventStreamDecoder:
+    """Incremental decoder. Feed it the received blocks and iterate over the complete messages.
+
+    Only the incomplete message at the end of a block is copied and kept for the next block.
+    """
+
+    def __init__(self, verify_crc: bool = True, exceptions: Any = None):
+        self.verify_crc = verify_crc
+        self.exceptions = exceptions
+        self._pending = bytearray()
+
+    def _prelude(self, src: Any, pos: int) -> Tuple[int, int]:
+        total, headers_len = _PRELUDE.unpack_from(src, pos)
+        if (
+            self.verify_crc
+            and zlib.crc32(memoryview(src)[pos : pos + 8])
+            != _UINT32.unpack_from(src, pos + 8)[0]
+        ):
+            raise EventStreamDecodeError("Prelude CRC mismatch")
+        if total < _MIN_LENGTH or headers_len > total - _MIN_LENGTH:
+            raise EventStreamDecodeError(
+                f"Invalid message length {total} with {headers_len} bytes of headers"
+            )
+        return total, headers_len
+
+    def _message(
+        self, src: Any, pos: int, total: int, headers_len: int
+    ) -> Tuple[Dict[str, Any], Any, int, int]:
+        buf = memoryview(src)
+        end = pos + total - 4
+        if (
+            self.verify_crc
+            and zlib.crc32(buf[pos:end]) != _UINT32.unpack_from(src, end)[0]
+        ):
+            raise EventStreamDecodeError("Message CRC mismatch")
+        h = pos + _PRELUDE_LENGTH
+        return _parse_headers(buf, h, h + headers_len), src, h + headers_len, end
+
+    def messages(self, data: bytes) -> Iterator[Tuple[Dict[str, Any], bytes, int, int]]:
+        """Decodes the complete messages available after adding `data`, without copying the payloads of the
+        messages contained in `data`.
+
+        Args:
+            data (bytes): the next block of the stream
+
+        Raises:
+            EventStreamDecodeError: if a message is malformed or fails the CRC checks
+
+        Yields:
+            Tuple[Dict[str, Any], bytes, int, int]: the headers of each message, the buffer holding it and the
+            start and end offsets of the payload in the buffer
+        """
+        src = data if isinstance(data, (bytes, bytearray)) else bytes(data)
+        view = memoryview(src)
+        size = len(src)
+        pos = 0
+        if len(self._pending) > 0:
+            # complete the message started in the previous block with the bytes it misses
+            pending = self._pending
+            if len(pending) < _PRELUDE_LENGTH:
+                pos = min(_PRELUDE_LENGTH - len(pending), size)
+                pending += view[:pos]
+                if len(pending) < _PRELUDE_LENGTH:
+                    return
+            total, headers_len = self._prelude(pending, 0)
+            take = min(total - len(pending), size - pos)
+            pending += view[pos : pos + take]
+            pos += take
+            if len(pending) < total:
+                return
+            self._pending = bytearray()
+            yield self._message(pending, 0, total, headers_len)
+        while size - pos >= _PRELUDE_LENGTH:
+            total, headers_len = self._prelude(src, pos)
+            if size - pos < total:
+                break
+            yield self._message(src, pos, total, headers_len)
+            pos += total
+        if pos < size:
+            self._pending = bytearray(view[pos:])
+
+    def feed(self, data: bytes) -> Iterator[Tuple[Dict[str, Any], memoryview]]:
+        """Decodes the complete messages available after adding `data`.
+
+        Args:
+            data (bytes): the next block of the stream
+
+        Yields:
+            Tuple[Dict[str, Any], memoryview]: the headers and the payload of each message
+        """
+        for headers, src, start, end in self.messages(data):
+            yield headers, memoryview(src)[start:end]
+
+    def chunks(self, data: bytes) -> Iterator[bytes]:
+        """Decodes the bytes of the `chunk` events completed by `data`.
+
+        The base64 chunk bytes are decoded straight from the message payload, without parsing it as JSON.
+
+        Args:
+            data (bytes): the next block of the stream
+
+        Raises:
+            EventStreamError: when the stream contains an exception message
+
+        Yields:
+            bytes: the bytes of each chunk, usually a JSON document
+        """
+        for headers, src, start, end in self.messages(data):
+            if headers.get(":message-type") != "event":
+                _raise_exception(headers, memoryview(src)[start:end], self.exceptions)
+            if headers.get(":event-type") != "chunk":
+                continue
+            # the payload is {"bytes":"<base64>"} possibly followed by other fields: base64 has no quotes
+            if src.startswith(_CHUNK_BYTES, start + 1):
+                start += 1 + len(_CHUNK_BYTES)
+                yield b64decode(memoryview(src)[start : src.index(b'"', start, end)])
+            else:
+                yield b64decode(json.loads(src[start:end])["bytes"])
+
+
+def decode_chunks(
+    raw: Iterable[bytes], verify_crc: bool = True, exceptions: Any = None
+) -> Iterator[bytes]:
+    """Decodes the chunk bytes from the raw event stream body.
+
+    Args:
+        raw (Iterable[bytes]): the response body as an iterable of byte blocks
+        verify_crc (bool, optional): check the messages CRCs. Defaults to True.
+        exceptions (Any, optional): the `client.exceptions` of the boto3 client whose modeled exceptions are
+            raised. Defaults to None.
+
+    Raises:
+        EventStreamError: when the stream contains an exception message
+
+    Yields:
+        bytes: the bytes of each chunk, usually a JSON document
+    """
+    decoder = EventStreamDecoder(verify_crc, exceptions)
+    for data in raw:
+        yield from decoder.chunks(data)
+
+
+def iter_events(
+    raw: Iterable[bytes], verify_crc: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """Decodes the raw event stream body into events shaped like the boto3 `EventStream` ones,
+    `{"chunk": {"bytes": ...}}`.
+
+    Args:
+        raw (Iterable[bytes]): the response body as an iterable of byte blocks
+        verify_crc (bool, optional): check the messages CRCs. Defaults to True.
+
+    Yields:
+        Dict[str, Any]: the events
+    """
+    for data in decode_chunks(raw, verify_crc):
+        yield {"chunk": {"bytes": data}}
+
+
+def iter_chunk_bytes(stream: Any) -> Iterator[bytes]:
+    """Iterates over the chunk bytes of a streamed response body using the fastest available path.
+
+    Bodies exposing `iter_chunk_bytes`, as returned by `HttpTransport` or by the boto3 clients passed to
+    `register_decoder`, are decoded from the raw bytes with `decode_chunks`. Any other iterable of
+    `{"chunk": {"bytes": ...}}` events, such as a botocore `EventStream`, is iterated.
+
+    Args:
+        stream (Any): the `body` returned by `invoke_model_with_response_stream`
+
+    Yields:
+        bytes: the bytes of each chunk
+    """
+    if hasattr(stream, "iter_chunk_bytes"):
+        yield from stream.iter_chunk_bytes()
+        return
+    for e in stream:
+        if "chunk" in e:
+            yield e["chunk"]["bytes"]
+
+
+class RawEventStream:
+    """Body of a boto3 `InvokeModelWithResponseStream` response decoded from the raw HTTP response, iterable as the
+    botocore `EventStream`. `iter_chunk_bytes` lets the models skip building the intermediate events.
+    """
+
+    def __init__(self, raw: Any, exceptions: Any = None, verify_crc: bool = True):
+        self._raw = raw
+        self.exceptions = exceptions
+        self.verify_crc = verify_crc
+
+    def iter_chunk_bytes(self) -> Iterator[bytes]:
+        try:
+            yield from decode_chunks(
+                self._raw.stream(), self.verify_crc, self.exceptions
+            )
+        finally:
+            self._raw.close()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for data in self.iter_chunk_bytes():
+            yield {"chunk": {"bytes": data}}
+
+    def close(self):
+        """Closes the underlying HTTP response."""
+        self._raw.close()
+
+
+_BEFORE_PARSE = "before-parse.bedrock-runtime.InvokeModelWithResponseStream"
+_registered: "weakref.WeakSet[Any]" = weakref.WeakSet()
+
+
+class _RawStreamHandler:
+    """`before-parse` handler replacing the botocore `EventStream` of a client by a `RawEventStream`"""
+
+    def __init__(self, exceptions: Any):
+        self.exceptions = exceptions
+
+    def __call__(
+        self,
+        response_dict: Dict[str, Any],
+        customized_response_dict: Dict[str, Any],
+        **kwargs,
+    ):
+        # the error responses are parsed by botocore, their body is already read
+        if response_dict["status_code"] < 300:
+            customized_response_dict["body"] = RawEventStream(
+                response_dict["body"], self.exceptions
+            )
+
+
+def register_decoder(client: Any):
+    """Makes a boto3 `bedrock-runtime` client return its streamed bodies as a `RawEventStream`, decoded by this
+    module instead of the botocore event parsing. Other clients are left unchanged.
+
+    Args:
+        client (Any): the client
+    """
+    meta = getattr(client, "meta", None)
+    if getattr(meta, "service_model", None) is None or client in _registered:
+        return
+    handler = _RawStreamHandler(client.exceptions)
+    meta.events.register(_BEFORE_PARSE, handler, unique_id="bedrock_fm-eventstream")
+    _registered.add(client)
+
+
+def encode_message(headers: Dict[str, str], payload: bytes) -> bytes:
+    """Encodes a message with string headers.
+
+    Args:
+        headers (Dict[str, str]): the message headers
+        payload (bytes): the message payload
+
+    Returns:
+        bytes: the encoded message
+    """
+    h = bytearray()
+    for name, value in headers.items():
+        name = name.encode("utf-8")
+        value = value.encode("utf-8")
+        h += bytes([len(name)]) + name + b"\x07" + struct.pack(">H", len(value)) + value
+    prelude = _PRELUDE.pack(_PRELUDE_LENGTH + len(h) + len(payload) + 4, len(h))
+    message = prelude + _UINT32.pack(zlib.crc32(prelude)) + bytes(h) + payload
+    return message + _UINT32.pack(zlib.crc32(message))
+
+
+def encode_chunk(data: bytes) -> bytes:
+    """Encodes a `chunk` event as sent by `InvokeModelWithResponseStream`.
+
+    Args:
+        data (bytes): the chunk bytes, usually a JSON document
+
+    Returns:
+        bytes: the encoded message
+    """
+    payload = b'{"bytes":"' + b64encode(data) + b'"}'
+    return encode_message(
+        {
+            ":event-type": "chunk",
+            ":content-type": "application/json",
+            ":message-type": "event",
+        },
+        payload,
+    )
+
+
+def encode_exception(code: str, message: str) -> bytes:
+    """Encodes an exception message, such as `throttlingException`.
+
+    Args:
+        code (str): the exception type
+        message (str): the error message
+
+    Returns:
+        bytes: the encoded message
+    """
+    return encode_message(
+        {
+            ":exception-type": code,
+            ":content-type": "application/json",
+            ":message-type": "exception",
+        },
+        json.dumps({"message": message}).encode("utf-8"),
+    )
@@ -1,4 +1,11 @@
-__all__ = ["BedrockExtraArgsError", "BedrockInvalidModelError", "BedrockArgsError"]
+__all__ = [
+    "BedrockExtraArgsError",
+    "BedrockInvalidModelError",
+    "BedrockArgsError",
+    "BedrockCassetteMissError",
+    "BedrockBatchJobError",
+    "BedrockQueueTimeoutError",
+]
 
 
 class BedrockExtraArgsError(Exception):
@@ -19,3 +26,18 @@ class BedrockArgsError(Exception):
 class BedrockInvocationError(Exception):
     def __init__(self, message):
         super().__init__(message)
+
+
+class BedrockCassetteMissError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class BedrockBatchJobError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
+
+
+class BedrockQueueTimeoutError(Exception):
+    def __init__(self, message):
+        super().__init__(message)
@@ -0,0 +1,171 @@
+"""Payload logging that stays off the request path.
+
+Models log the bodies they send and receive through `payload_logger`, on the `bedrock_fm.payload` logger at
+DEBUG level. Nothing is computed unless the level is enabled and the call is sampled, and payloads are only
+summarized, with their size, hash, number of images and first `max_chars` characters, when the record is
+formatted.
+
+`start_payload_writer` moves the formatting and the writing of the records to a background thread, so that
+logging large payloads never blocks the thread sending the request.
+
+```py
+import logging
+from bedrock_fm.logs import payload_logger, start_payload_writer
+
+logging.getLogger("bedrock_fm.payload").setLevel(logging.DEBUG)
+payload_logger.sample_rate = 0.01
+listener = start_payload_writer(logging.FileHandler("payloads.log"))
+...
+listener.stop()
+```
+"""
+
+from typing import Optional
+from logging.handlers import QueueHandler, QueueListener
+import hashlib
+import logging
+import queue
+import random
+from attrs import define, field
+
+PAYLOAD_LOGGER_NAME = "bedrock_fm.payload"
+
+_IMAGE_MARKERS = (b'"iVBORw0KGgo', b'"/9j/', b'"R0lGOD', b'"UklGR')
+"""Start of base64 encoded PNG, JPEG, GIF and WEBP images in a JSON string"""
+
+
+class PayloadSummary:
+    """Lazily formatted summary of a payload: size, hash, number of base64 images and the first characters"""
+
+    __slots__ = ("payload", "max_chars")
+
+    def __init__(self, payload: str | bytes, max_chars: int):
+        self.payload = payload
+        self.max_chars = max_chars
+
+    def __str__(self) -> str:
+        data = self.payload
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        images = sum(data.count(m) for m in _IMAGE_MARKERS)
+        head = data[: self.max_chars].decode("utf-8", errors="replace")
+        if len(data) > self.max_chars:
+            head += "..."
+        return f"size={len(data)} sha256={hashlib.sha256(data).hexdigest()[:16]} images={images} payload={head}"
+
+
+@define(kw_only=True)
+class PayloadLogger:
+    """Logs request and response payloads, sampled and summarized"""
+
+    logger: logging.Logger = field(
+        factory=lambda: logging.getLogger(PAYLOAD_LOGGER_NAME)
+    )
+    """The destination logger"""
+    level: int = field(default=logging.DEBUG)
+    """The level of the records"""
+    max_chars: int = field(default=1024)
+    """Number of payload characters included in the record"""
+    sample_rate: float = field(default=1.0)
+    """Fraction of the payloads logged"""
+
+    def log(self, kind: str, model_id: str, payload: str | bytes):
+        """Logs a payload if the level is enabled and the call is sampled.
+
+        Args:
+            kind (str): what the payload is, such as `request` or `response`
+            model_id (str): the model invoked
+            payload (str | bytes): the payload
+        """
+        if not self.logger.isEnabledFor(self.level):
+            return
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        self.logger.log(
+            self.level,
+            "%s %s %s",
+            kind,
+            model_id,
+            PayloadSummary(payload, self.max_chars),
+        )
+
+
+payload_logger = PayloadLogger()
+"""The `PayloadLogger` used by the models"""
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Queues the records without formatting them and drops them when the queue is full"""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class PayloadWriter(QueueListener):
+    """The listener returned by `start_payload_writer`. `stop()` also detaches the queue from the logger, so that
+    records are no longer queued once nothing serves the queue."""
+
+    def __init__(
+        self, logger: logging.Logger, q: queue.Queue, *handlers: logging.Handler
+    ):
+        super().__init__(q, *handlers, respect_handler_level=True)
+        self.logger = logger
+        self.handler = _DeferredQueueHandler(q)
+        self._propagate = logger.propagate
+
+    @property
+    def dropped(self) -> int:
+        """Number of records dropped because the queue was full"""
+        return self.handler.dropped
+
+    def start(self):
+        """Attaches the queue to the logger, stopping the propagation to the parent loggers, and starts the
+        background thread."""
+        super().start()
+        self._propagate = self.logger.propagate
+        self.logger.addHandler(self.handler)
+        self.logger.propagate = False
+
+    def stop(self):
+        """Detaches the queue from the logger, restoring its propagation, then writes the queued records and
+        stops the background thread. Stopping twice has no effect."""
+        if self._thread is None:
+            return
+        self.logger.removeHandler(self.handler)
+        self.logger.propagate = self._propagate
+        super().stop()
+
+
+def start_payload_writer(
+    *handlers: logging.Handler,
+    logger: Optional[logging.Logger] = None,
+    max_queue: int = 10000,
+) -> PayloadWriter:
+    """Routes the records of the payload logger to `handlers` through a queue served by a background thread.
+
+    The records are formatted in the background thread. When more than `max_queue` records are waiting new
+    records are dropped instead of blocking the caller.
+
+    Args:
+        handlers (logging.Handler): the handlers writing the records
+        logger (logging.Logger, optional): the logger to route. Defaults to `payload_logger.logger`.
+        max_queue (int, optional): maximum number of queued records. Defaults to 10000.
+
+    Returns:
+        PayloadWriter: the started listener, call `stop()` to flush it and restore the logger
+    """
+    writer = PayloadWriter(
+        logger or payload_logger.logger, queue.Queue(maxsize=max_queue), *handlers
+    )
+    writer.start()
+    return writer
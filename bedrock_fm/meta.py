@@ -1,12 +1,27 @@
 from .bedrock import Assistant, BedrockFoundationModel, Human, System
 from .exceptions import BedrockExtraArgsError, BedrockInvocationError
-import json
+from .codec import SLOT, body_template
 from typing import List, Any, Dict
-from botocore.eventstream import EventStream
 from attrs import define
 from .bedrock import MessageRole
 
 
+@body_template
+def _llama_body(
+    extra_args: Dict[str, Any], max_token_count: int, temperature: float, top_p: float
+) -> Dict[str, Any]:
+    body = dict(extra_args)
+    body.update(
+        {
+            "prompt": SLOT,
+            "max_gen_len": max_token_count,
+            "temperature": temperature,
+            "top_p": top_p,
+        }
+    )
+    return body
+
+
 def get_llama2_prompt(conversation: List[Human | Assistant | System]) -> str:
     prompts = []
     if conversation[0].role == MessageRole.SYSTEM:
@@ -94,7 +109,7 @@ class Llama2Chat(BedrockFoundationModel):
                 "top_p": top_p,
             }
         )
-        return json.dumps(body)
+        return self.codec.dumps(body)
 
     def process_response_body(self, body: Dict[str, Any]) -> List[str]:
         return [body["generation"][2:]]
@@ -136,16 +151,9 @@ class Llama3Instruct(BedrockFoundationModel):
             raise BedrockInvocationError(
                 "Llama3Instruct model does not support generate api"
             )
-        body = extra_args.copy()
-        body.update(
-            {
-                "prompt": get_llama3_prompt(prompt),
-                "max_gen_len": max_token_count,
-                "temperature": temperature,
-                "top_p": top_p,
-            }
-        )
-        return json.dumps(body)
+        return _llama_body(
+            self.codec, extra_args, max_token_count, temperature, top_p
+        ).render(get_llama3_prompt(prompt))
 
     def get_text(self, body):
         return body["generation"]
@@ -1,12 +1,69 @@
 from .bedrock import Assistant, BedrockFoundationModel, Human, System, MessageRole
 from .exceptions import BedrockExtraArgsError, BedrockInvocationError
-import json
-from typing import List, Any, Dict
-from botocore.eventstream import EventStream
+from .codec import SLOT, body_template
+from typing import List, Any, Dict, Tuple
 from attrs import define
 from .meta import get_llama2_prompt
 
 
+@body_template
+def _mistral_prompt_body(
+    extra_args: Dict[str, Any],
+    max_token_count: int,
+    temperature: float,
+    top_p: float,
+    stop_sequences: Tuple[str],
+) -> Dict[str, Any]:
+    body = dict(extra_args)
+    body.update(
+        {
+            "prompt": SLOT,
+            "max_tokens": max_token_count,
+            "temperature": temperature,
+            "top_p": top_p,
+            "stop": list(stop_sequences),
+        }
+    )
+    return body
+
+
+@body_template
+def _mistral_messages_body(
+    extra_args: Dict[str, Any], max_token_count: int, top_p: float, temperature: float
+) -> Dict[str, Any]:
+    body = dict(extra_args)
+    body.update(
+        {
+            "messages": SLOT,
+            "max_tokens": max_token_count,
+            "top_p": top_p,
+            "temperature": temperature,
+        }
+    )
+    return body
+
+
+@body_template
+def _mistral_large_body(
+    extra_args: Dict[str, Any],
+    max_token_count: int,
+    temperature: float,
+    top_p: float,
+    stop_sequences: Tuple[str],
+) -> Dict[str, Any]:
+    body = dict(extra_args)
+    body.update(
+        {
+            "messages": SLOT,
+            "max_tokens": max_token_count,
+            "temperature": temperature,
+            "top_p": top_p,
+            "stop": list(stop_sequences),
+        }
+    )
+    return body
+
+
 @define
 class Mistral(BedrockFoundationModel):
     """Mistral and Mixtral models base class."""
@@ -38,30 +95,18 @@ class Mistral(BedrockFoundationModel):
         extra_args: Dict[str, Any],
         stream: bool,
     ) -> str:
-        body = extra_args.copy()
         if isinstance(prompt, str):
-            if "top_k" in extra_args:
-                body["top_k"] = extra_args["top_k"]
-
-            body.update(
-                {
-                    "prompt": f"[INST] {prompt} [/INST] ",
-                    "max_tokens": max_token_count,
-                    "temperature": temperature,
-                    "top_p": top_p,
-                    "stop": stop_sequences,
-                }
-            )
-        else:
-            body.update(
-                {
-                    "messages": prompt,
-                    "max_tokens": max_token_count,
-                    "top_p": top_p,
-                    "temperature": temperature,
-                }
-            )
-        return json.dumps(body)
+            return _mistral_prompt_body(
+                self.codec,
+                extra_args,
+                max_token_count,
+                temperature,
+                top_p,
+                tuple(stop_sequences),
+            ).render(f"[INST] {prompt} [/INST] ")
+        return _mistral_messages_body(
+            self.codec, extra_args, max_token_count, top_p, temperature
+        ).render(prompt)
 
     def get_text(self, body: Dict[str, Any]) -> str:
         return body["outputs"][0]["text"]
@@ -93,22 +138,19 @@ class MistralLarge(Mistral):
         extra_args: Dict[str, Any],
         stream: bool,
     ) -> str:
-        body = extra_args.copy()
         if isinstance(prompt, str):
             raise BedrockInvocationError(
                 "MistralLarge does not support the generate API"
             )
 
-        body.update(
-            {
-                "messages": prompt,
-                "max_tokens": max_token_count,
-                "temperature": temperature,
-                "top_p": top_p,
-                "stop": stop_sequences,
-            }
-        )
-        return json.dumps(body)
+        return _mistral_large_body(
+            self.codec,
+            extra_args,
+            max_token_count,
+            temperature,
+            top_p,
+            tuple(stop_sequences),
+        ).render(prompt)
 
     def get_chat_prompt(
         self, conversation: List[Human | Assistant | System]
@@ -1,57 +1,63 @@
 # This file is autogenerated
 from enum import Enum
 
+
 class Model(Enum):
-    AI21_J2_GRANDE_INSTRUCT="ai21.j2-grande-instruct"
-    AI21_J2_JUMBO_INSTRUCT="ai21.j2-jumbo-instruct"
-    AI21_J2_MID="ai21.j2-mid"
-    AI21_J2_MID_V1="ai21.j2-mid-v1"
-    AI21_J2_ULTRA="ai21.j2-ultra"
-    AI21_J2_ULTRA_V1="ai21.j2-ultra-v1"
-    AI21_JAMBA_1_5_LARGE_V1_0="ai21.jamba-1-5-large-v1:0"
-    AI21_JAMBA_1_5_MINI_V1_0="ai21.jamba-1-5-mini-v1:0"
-    AI21_JAMBA_INSTRUCT_V1_0="ai21.jamba-instruct-v1:0"
-    AMAZON_TITAN_EMBED_G1_TEXT_02="amazon.titan-embed-g1-text-02"
-    AMAZON_TITAN_EMBED_IMAGE_V1="amazon.titan-embed-image-v1"
-    AMAZON_TITAN_EMBED_TEXT_V1="amazon.titan-embed-text-v1"
-    AMAZON_TITAN_EMBED_TEXT_V2_0="amazon.titan-embed-text-v2:0"
-    AMAZON_TITAN_IMAGE_GENERATOR_V1="amazon.titan-image-generator-v1"
-    AMAZON_TITAN_IMAGE_GENERATOR_V2_0="amazon.titan-image-generator-v2:0"
-    AMAZON_TITAN_TEXT_EXPRESS_V1="amazon.titan-text-express-v1"
-    AMAZON_TITAN_TEXT_LITE_V1="amazon.titan-text-lite-v1"
-    AMAZON_TITAN_TEXT_PREMIER_V1_0="amazon.titan-text-premier-v1:0"
-    AMAZON_TITAN_TG1_LARGE="amazon.titan-tg1-large"
-    ANTHROPIC_CLAUDE_3_5_SONNET_20240620_V1_0="anthropic.claude-3-5-sonnet-20240620-v1:0"
-    ANTHROPIC_CLAUDE_3_5_SONNET_20241022_V2_0="anthropic.claude-3-5-sonnet-20241022-v2:0"
-    ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0="anthropic.claude-3-haiku-20240307-v1:0"
-    ANTHROPIC_CLAUDE_3_OPUS_20240229_V1_0="anthropic.claude-3-opus-20240229-v1:0"
-    ANTHROPIC_CLAUDE_3_SONNET_20240229_V1_0="anthropic.claude-3-sonnet-20240229-v1:0"
-    ANTHROPIC_CLAUDE_INSTANT_V1="anthropic.claude-instant-v1"
-    ANTHROPIC_CLAUDE_V2="anthropic.claude-v2"
-    ANTHROPIC_CLAUDE_V2_1="anthropic.claude-v2:1"
-    COHERE_COMMAND_LIGHT_TEXT_V14="cohere.command-light-text-v14"
-    COHERE_COMMAND_R_PLUS_V1_0="cohere.command-r-plus-v1:0"
-    COHERE_COMMAND_R_V1_0="cohere.command-r-v1:0"
-    COHERE_COMMAND_TEXT_V14="cohere.command-text-v14"
-    COHERE_EMBED_ENGLISH_V3="cohere.embed-english-v3"
-    COHERE_EMBED_MULTILINGUAL_V3="cohere.embed-multilingual-v3"
-    META_LLAMA2_13B_CHAT_V1="meta.llama2-13b-chat-v1"
-    META_LLAMA2_70B_CHAT_V1="meta.llama2-70b-chat-v1"
-    META_LLAMA3_1_405B_INSTRUCT_V1_0="meta.llama3-1-405b-instruct-v1:0"
-    META_LLAMA3_1_70B_INSTRUCT_V1_0="meta.llama3-1-70b-instruct-v1:0"
-    META_LLAMA3_1_8B_INSTRUCT_V1_0="meta.llama3-1-8b-instruct-v1:0"
-    META_LLAMA3_2_11B_INSTRUCT_V1_0="meta.llama3-2-11b-instruct-v1:0"
-    META_LLAMA3_2_1B_INSTRUCT_V1_0="meta.llama3-2-1b-instruct-v1:0"
-    META_LLAMA3_2_3B_INSTRUCT_V1_0="meta.llama3-2-3b-instruct-v1:0"
-    META_LLAMA3_2_90B_INSTRUCT_V1_0="meta.llama3-2-90b-instruct-v1:0"
-    META_LLAMA3_70B_INSTRUCT_V1_0="meta.llama3-70b-instruct-v1:0"
-    META_LLAMA3_8B_INSTRUCT_V1_0="meta.llama3-8b-instruct-v1:0"
-    MISTRAL_MISTRAL_7B_INSTRUCT_V0_2="mistral.mistral-7b-instruct-v0:2"
-    MISTRAL_MISTRAL_LARGE_2402_V1_0="mistral.mistral-large-2402-v1:0"
-    MISTRAL_MISTRAL_LARGE_2407_V1_0="mistral.mistral-large-2407-v1:0"
-    MISTRAL_MISTRAL_SMALL_2402_V1_0="mistral.mistral-small-2402-v1:0"
-    MISTRAL_MIXTRAL_8X7B_INSTRUCT_V0_1="mistral.mixtral-8x7b-instruct-v0:1"
-    STABILITY_SD3_LARGE_V1_0="stability.sd3-large-v1:0"
-    STABILITY_STABLE_DIFFUSION_XL_V1="stability.stable-diffusion-xl-v1"
-    STABILITY_STABLE_IMAGE_CORE_V1_0="stability.stable-image-core-v1:0"
-    STABILITY_STABLE_IMAGE_ULTRA_V1_0="stability.stable-image-ultra-v1:0"
+    AI21_J2_GRANDE_INSTRUCT = "ai21.j2-grande-instruct"
+    AI21_J2_JUMBO_INSTRUCT = "ai21.j2-jumbo-instruct"
+    AI21_J2_MID = "ai21.j2-mid"
+    AI21_J2_MID_V1 = "ai21.j2-mid-v1"
+    AI21_J2_ULTRA = "ai21.j2-ultra"
+    AI21_J2_ULTRA_V1 = "ai21.j2-ultra-v1"
+    AI21_JAMBA_1_5_LARGE_V1_0 = "ai21.jamba-1-5-large-v1:0"
+    AI21_JAMBA_1_5_MINI_V1_0 = "ai21.jamba-1-5-mini-v1:0"
+    AI21_JAMBA_INSTRUCT_V1_0 = "ai21.jamba-instruct-v1:0"
+    AMAZON_TITAN_EMBED_G1_TEXT_02 = "amazon.titan-embed-g1-text-02"
+    AMAZON_TITAN_EMBED_IMAGE_V1 = "amazon.titan-embed-image-v1"
+    AMAZON_TITAN_EMBED_TEXT_V1 = "amazon.titan-embed-text-v1"
+    AMAZON_TITAN_EMBED_TEXT_V2_0 = "amazon.titan-embed-text-v2:0"
+    AMAZON_TITAN_IMAGE_GENERATOR_V1 = "amazon.titan-image-generator-v1"
+    AMAZON_TITAN_IMAGE_GENERATOR_V2_0 = "amazon.titan-image-generator-v2:0"
+    AMAZON_TITAN_TEXT_EXPRESS_V1 = "amazon.titan-text-express-v1"
+    AMAZON_TITAN_TEXT_LITE_V1 = "amazon.titan-text-lite-v1"
+    AMAZON_TITAN_TEXT_PREMIER_V1_0 = "amazon.titan-text-premier-v1:0"
+    AMAZON_TITAN_TG1_LARGE = "amazon.titan-tg1-large"
+    ANTHROPIC_CLAUDE_3_5_SONNET_20240620_V1_0 = (
+        "anthropic.claude-3-5-sonnet-20240620-v1:0"
+    )
+    ANTHROPIC_CLAUDE_3_5_SONNET_20241022_V2_0 = (
+        "anthropic.claude-3-5-sonnet-20241022-v2:0"
+    )
+    ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0 = "anthropic.claude-3-haiku-20240307-v1:0"
+    ANTHROPIC_CLAUDE_3_OPUS_20240229_V1_0 = "anthropic.claude-3-opus-20240229-v1:0"
+    ANTHROPIC_CLAUDE_3_SONNET_20240229_V1_0 = "anthropic.claude-3-sonnet-20240229-v1:0"
+    ANTHROPIC_CLAUDE_INSTANT_V1 = "anthropic.claude-instant-v1"
+    ANTHROPIC_CLAUDE_V2 = "anthropic.claude-v2"
+    ANTHROPIC_CLAUDE_V2_1 = "anthropic.claude-v2:1"
+    COHERE_COMMAND_LIGHT_TEXT_V14 = "cohere.command-light-text-v14"
+    COHERE_COMMAND_R_PLUS_V1_0 = "cohere.command-r-plus-v1:0"
+    COHERE_COMMAND_R_V1_0 = "cohere.command-r-v1:0"
+    COHERE_COMMAND_TEXT_V14 = "cohere.command-text-v14"
+    COHERE_EMBED_ENGLISH_V3 = "cohere.embed-english-v3"
+    COHERE_EMBED_MULTILINGUAL_V3 = "cohere.embed-multilingual-v3"
+    COHERE_RERANK_V3_5_0 = "cohere.rerank-v3-5:0"
+    META_LLAMA2_13B_CHAT_V1 = "meta.llama2-13b-chat-v1"
+    META_LLAMA2_70B_CHAT_V1 = "meta.llama2-70b-chat-v1"
+    META_LLAMA3_1_405B_INSTRUCT_V1_0 = "meta.llama3-1-405b-instruct-v1:0"
+    META_LLAMA3_1_70B_INSTRUCT_V1_0 = "meta.llama3-1-70b-instruct-v1:0"
+    META_LLAMA3_1_8B_INSTRUCT_V1_0 = "meta.llama3-1-8b-instruct-v1:0"
+    META_LLAMA3_2_11B_INSTRUCT_V1_0 = "meta.llama3-2-11b-instruct-v1:0"
+    META_LLAMA3_2_1B_INSTRUCT_V1_0 = "meta.llama3-2-1b-instruct-v1:0"
+    META_LLAMA3_2_3B_INSTRUCT_V1_0 = "meta.llama3-2-3b-instruct-v1:0"
+    META_LLAMA3_2_90B_INSTRUCT_V1_0 = "meta.llama3-2-90b-instruct-v1:0"
+    META_LLAMA3_70B_INSTRUCT_V1_0 = "meta.llama3-70b-instruct-v1:0"
+    META_LLAMA3_8B_INSTRUCT_V1_0 = "meta.llama3-8b-instruct-v1:0"
+    MISTRAL_MISTRAL_7B_INSTRUCT_V0_2 = "mistral.mistral-7b-instruct-v0:2"
+    MISTRAL_MISTRAL_LARGE_2402_V1_0 = "mistral.mistral-large-2402-v1:0"
+    MISTRAL_MISTRAL_LARGE_2407_V1_0 = "mistral.mistral-large-2407-v1:0"
+    MISTRAL_MISTRAL_SMALL_2402_V1_0 = "mistral.mistral-small-2402-v1:0"
+    MISTRAL_MIXTRAL_8X7B_INSTRUCT_V0_1 = "mistral.mixtral-8x7b-instruct-v0:1"
+    STABILITY_SD3_LARGE_V1_0 = "stability.sd3-large-v1:0"
+    STABILITY_STABLE_DIFFUSION_XL_V1 = "stability.stable-diffusion-xl-v1"
+    STABILITY_STABLE_IMAGE_CORE_V1_0 = "stability.stable-image-core-v1:0"
+    STABILITY_STABLE_IMAGE_ULTRA_V1_0 = "stability.stable-image-ultra-v1:0"
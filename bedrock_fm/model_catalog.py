@@ -0,0 +1,602 @@
+# This file is autogenerated by tools/gen_model_enum.py
+CATALOG_VERSION = "2026-10-19"
+
+CATALOG = {
+    "ai21.j2-grande-instruct": {
+        "provider": "AI21 Labs",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8191,
+        "max_output_tokens": 8191,
+        "extra_args": ("countPenalty", "presencePenalty", "frequencyPenalty"),
+    },
+    "ai21.j2-jumbo-instruct": {
+        "provider": "AI21 Labs",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8191,
+        "max_output_tokens": 8191,
+        "extra_args": ("countPenalty", "presencePenalty", "frequencyPenalty"),
+    },
+    "ai21.j2-mid": {
+        "provider": "AI21 Labs",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8191,
+        "max_output_tokens": 8191,
+        "extra_args": ("countPenalty", "presencePenalty", "frequencyPenalty"),
+    },
+    "ai21.j2-mid-v1": {
+        "provider": "AI21 Labs",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8191,
+        "max_output_tokens": 8191,
+        "extra_args": ("countPenalty", "presencePenalty", "frequencyPenalty"),
+    },
+    "ai21.j2-ultra": {
+        "provider": "AI21 Labs",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8191,
+        "max_output_tokens": 8191,
+        "extra_args": ("countPenalty", "presencePenalty", "frequencyPenalty"),
+    },
+    "ai21.j2-ultra-v1": {
+        "provider": "AI21 Labs",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8191,
+        "max_output_tokens": 8191,
+        "extra_args": ("countPenalty", "presencePenalty", "frequencyPenalty"),
+    },
+    "ai21.jamba-1-5-large-v1:0": {
+        "provider": "AI21 Labs",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 256000,
+        "max_output_tokens": 4096,
+        "extra_args": ("response_format", "n", "documents"),
+    },
+    "ai21.jamba-1-5-mini-v1:0": {
+        "provider": "AI21 Labs",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 256000,
+        "max_output_tokens": 4096,
+        "extra_args": ("response_format", "n", "documents"),
+    },
+    "ai21.jamba-instruct-v1:0": {
+        "provider": "AI21 Labs",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 256000,
+        "max_output_tokens": 4096,
+        "extra_args": ("response_format", "n", "documents"),
+    },
+    "amazon.titan-embed-g1-text-02": {
+        "provider": "Amazon",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("EMBEDDING",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8192,
+        "max_batch_size": 1,
+    },
+    "amazon.titan-embed-image-v1": {
+        "provider": "Amazon",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("EMBEDDING",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 128,
+        "max_batch_size": 1,
+        "max_image_side": 2048,
+    },
+    "amazon.titan-embed-text-v1": {
+        "provider": "Amazon",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("EMBEDDING",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8192,
+        "max_batch_size": 1,
+    },
+    "amazon.titan-embed-text-v2:0": {
+        "provider": "Amazon",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("EMBEDDING",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8192,
+        "max_batch_size": 1,
+    },
+    "amazon.titan-image-generator-v1": {
+        "provider": "Amazon",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("IMAGE",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "max_image_side": 1408,
+        "max_image_pixels": 4194304,
+        "extra_args": ("numberOfImages", "height", "width", "cfgScale", "steps"),
+    },
+    "amazon.titan-image-generator-v2:0": {
+        "provider": "Amazon",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("IMAGE",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "max_image_side": 1408,
+        "max_image_pixels": 4194304,
+        "extra_args": ("numberOfImages", "height", "width", "cfgScale", "steps"),
+    },
+    "amazon.titan-text-express-v1": {
+        "provider": "Amazon",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8192,
+        "max_output_tokens": 8192,
+    },
+    "amazon.titan-text-lite-v1": {
+        "provider": "Amazon",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 4096,
+        "max_output_tokens": 4096,
+    },
+    "amazon.titan-text-premier-v1:0": {
+        "provider": "Amazon",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 32000,
+        "max_output_tokens": 3072,
+    },
+    "amazon.titan-tg1-large": {
+        "provider": "Amazon",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8192,
+        "max_output_tokens": 8192,
+    },
+    "anthropic.claude-3-5-sonnet-20240620-v1:0": {
+        "provider": "Anthropic",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": True,
+        "context_window": 200000,
+        "max_output_tokens": 4096,
+        "extra_args": ("top_k",),
+    },
+    "anthropic.claude-3-5-sonnet-20241022-v2:0": {
+        "provider": "Anthropic",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": True,
+        "context_window": 200000,
+        "max_output_tokens": 8192,
+        "extra_args": ("top_k",),
+    },
+    "anthropic.claude-3-haiku-20240307-v1:0": {
+        "provider": "Anthropic",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": True,
+        "context_window": 200000,
+        "max_output_tokens": 4096,
+        "extra_args": ("top_k",),
+    },
+    "anthropic.claude-3-opus-20240229-v1:0": {
+        "provider": "Anthropic",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": True,
+        "context_window": 200000,
+        "max_output_tokens": 4096,
+        "extra_args": ("top_k",),
+    },
+    "anthropic.claude-3-sonnet-20240229-v1:0": {
+        "provider": "Anthropic",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": True,
+        "context_window": 200000,
+        "max_output_tokens": 4096,
+        "extra_args": ("top_k",),
+    },
+    "anthropic.claude-instant-v1": {
+        "provider": "Anthropic",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 100000,
+        "max_output_tokens": 4096,
+        "extra_args": ("top_k",),
+    },
+    "anthropic.claude-v2": {
+        "provider": "Anthropic",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 100000,
+        "max_output_tokens": 4096,
+        "extra_args": ("top_k",),
+    },
+    "anthropic.claude-v2:1": {
+        "provider": "Anthropic",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 200000,
+        "max_output_tokens": 4096,
+        "extra_args": ("top_k",),
+    },
+    "cohere.command-light-text-v14": {
+        "provider": "Cohere",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 4096,
+        "max_output_tokens": 4096,
+        "extra_args": ("return_likelihoods", "num_generations", "k"),
+    },
+    "cohere.command-r-plus-v1:0": {
+        "provider": "Cohere",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 128000,
+        "max_output_tokens": 4096,
+        "extra_args": (
+            "k",
+            "documents",
+            "search_queries_only",
+            "preamble",
+            "prompt_truncation",
+            "frequency_penalty",
+            "presence_penalty",
+            "seed",
+            "return_prompt",
+            "tools",
+            "tool_results",
+            "stop_sequences",
+            "raw_prompting",
+        ),
+    },
+    "cohere.command-r-v1:0": {
+        "provider": "Cohere",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 128000,
+        "max_output_tokens": 4096,
+        "extra_args": (
+            "k",
+            "documents",
+            "search_queries_only",
+            "preamble",
+            "prompt_truncation",
+            "frequency_penalty",
+            "presence_penalty",
+            "seed",
+            "return_prompt",
+            "tools",
+            "tool_results",
+            "stop_sequences",
+            "raw_prompting",
+        ),
+    },
+    "cohere.command-text-v14": {
+        "provider": "Cohere",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 4096,
+        "max_output_tokens": 4096,
+        "extra_args": ("return_likelihoods", "num_generations", "k"),
+    },
+    "cohere.embed-english-v3": {
+        "provider": "Cohere",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("EMBEDDING",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 512,
+        "max_batch_size": 96,
+    },
+    "cohere.embed-multilingual-v3": {
+        "provider": "Cohere",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("EMBEDDING",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 512,
+        "max_batch_size": 96,
+    },
+    "cohere.rerank-v3-5:0": {
+        "provider": "Cohere",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 4096,
+        "max_batch_size": 1000,
+    },
+    "meta.llama2-13b-chat-v1": {
+        "provider": "Meta",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 4096,
+        "max_output_tokens": 2048,
+    },
+    "meta.llama2-70b-chat-v1": {
+        "provider": "Meta",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 4096,
+        "max_output_tokens": 2048,
+    },
+    "meta.llama3-1-405b-instruct-v1:0": {
+        "provider": "Meta",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": True,
+        "context_window": 128000,
+        "max_output_tokens": 2048,
+    },
+    "meta.llama3-1-70b-instruct-v1:0": {
+        "provider": "Meta",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": True,
+        "context_window": 128000,
+        "max_output_tokens": 2048,
+    },
+    "meta.llama3-1-8b-instruct-v1:0": {
+        "provider": "Meta",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": True,
+        "context_window": 128000,
+        "max_output_tokens": 2048,
+    },
+    "meta.llama3-2-11b-instruct-v1:0": {
+        "provider": "Meta",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": False,
+        "inference_profile": True,
+        "context_window": 128000,
+        "max_output_tokens": 2048,
+    },
+    "meta.llama3-2-1b-instruct-v1:0": {
+        "provider": "Meta",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": False,
+        "inference_profile": True,
+        "context_window": 128000,
+        "max_output_tokens": 2048,
+    },
+    "meta.llama3-2-3b-instruct-v1:0": {
+        "provider": "Meta",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": False,
+        "inference_profile": True,
+        "context_window": 128000,
+        "max_output_tokens": 2048,
+    },
+    "meta.llama3-2-90b-instruct-v1:0": {
+        "provider": "Meta",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": False,
+        "inference_profile": True,
+        "context_window": 128000,
+        "max_output_tokens": 2048,
+    },
+    "meta.llama3-70b-instruct-v1:0": {
+        "provider": "Meta",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8192,
+        "max_output_tokens": 2048,
+    },
+    "meta.llama3-8b-instruct-v1:0": {
+        "provider": "Meta",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 8192,
+        "max_output_tokens": 2048,
+    },
+    "mistral.mistral-7b-instruct-v0:2": {
+        "provider": "Mistral AI",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 32000,
+        "max_output_tokens": 8192,
+        "extra_args": ("top_k",),
+    },
+    "mistral.mistral-large-2402-v1:0": {
+        "provider": "Mistral AI",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 32000,
+        "max_output_tokens": 8192,
+        "extra_args": ("top_k",),
+    },
+    "mistral.mistral-large-2407-v1:0": {
+        "provider": "Mistral AI",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 128000,
+        "max_output_tokens": 8192,
+        "extra_args": ("top_k",),
+    },
+    "mistral.mistral-small-2402-v1:0": {
+        "provider": "Mistral AI",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 32000,
+        "max_output_tokens": 8192,
+        "extra_args": ("top_k",),
+    },
+    "mistral.mixtral-8x7b-instruct-v0:1": {
+        "provider": "Mistral AI",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("TEXT",),
+        "streaming": True,
+        "on_demand": True,
+        "inference_profile": False,
+        "context_window": 32000,
+        "max_output_tokens": 4096,
+        "extra_args": ("top_k",),
+    },
+    "stability.sd3-large-v1:0": {
+        "provider": "Stability AI",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("IMAGE",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "max_image_side": 1536,
+        "max_image_pixels": 1048576,
+    },
+    "stability.stable-diffusion-xl-v1": {
+        "provider": "Stability AI",
+        "input_modalities": ("TEXT", "IMAGE"),
+        "output_modalities": ("IMAGE",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "max_image_side": 1536,
+        "max_image_pixels": 1048576,
+    },
+    "stability.stable-image-core-v1:0": {
+        "provider": "Stability AI",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("IMAGE",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "max_image_side": 1536,
+        "max_image_pixels": 1048576,
+    },
+    "stability.stable-image-ultra-v1:0": {
+        "provider": "Stability AI",
+        "input_modalities": ("TEXT",),
+        "output_modalities": ("IMAGE",),
+        "streaming": False,
+        "on_demand": True,
+        "inference_profile": False,
+        "max_image_side": 1536,
+        "max_image_pixels": 1048576,
+    },
+}
@@ -0,0 +1,287 @@
+"""Request packing: many small prompts folded into one invocation.
+
+For classification and extraction over many short items, the per-request overhead and the requests per minute
+quota cost more than the tokens. `PromptPacker` groups the items into packs, renders each pack as one prompt with
+the shared instruction and the numbered items, and parses the JSON array, or the numbered lines, of the answer
+back into one result per item. When an answer cannot be parsed, for example because the model skipped an item,
+the items of the pack are sent again one by one.
+
+The number of items of a pack adapts to their length: items are added while the estimated prompt and answer fit
+the context window and the output token limit of the model, up to `max_items`.
+
+```py
+from bedrock_fm import Claude3, Model, PromptPacker
+
+fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0)
+packer = PromptPacker(model=fm, instruction="Classify the sentiment of the review as positive or negative.")
+labels = packer.generate(reviews)
+```
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import json
+import math
+import re
+from attrs import define, field
+from .bedrock import BedrockFoundationModel, Human
+from .catalog import get_capabilities
+from .exceptions import BedrockArgsError
+from .pipeline import _bounded_map
+
+PACK_FORMATS = ("json", "numbered")
+"""The answer formats: a JSON array, or one numbered line per item"""
+
+ITEM_OVERHEAD_TOKENS = 8
+"""Estimated tokens added to each item by the numbering, in the prompt and in the answer"""
+
+_NUMBERED = re.compile(r"^\s*(?:\[(\d+)\]|(\d+)[.):])\s?(.*)$")
+
+
+@define(kw_only=True)
+class PackReport:
+    """Statistics of a `PromptPacker`"""
+
+    items: int = field(default=0)
+    """Number of items answered"""
+    invocations: int = field(default=0)
+    """Number of model invocations"""
+    packs: int = field(default=0)
+    """Number of packs of more than one item"""
+    fallbacks: int = field(default=0)
+    """Number of packs whose answer could not be parsed, sent again one item at a time"""
+
+    @property
+    def items_per_invocation(self) -> float:
+        return self.items / self.invocations if self.invocations else 0.0
+
+
+@define(kw_only=True)
+class PromptPacker:
+    """Answers many small prompts with fewer invocations by packing them.
+
+    Results are the strings of the numbered format, or the elements of the JSON array, which can be objects for
+    extraction tasks. Items sent alone, because they do not fit a pack with others or after a fallback, are
+    answered with the raw text of the model in the numbered format, and with the element of a one-element array
+    in the JSON format, or the raw text when the answer is not such an array.
+    """
+
+    model: BedrockFoundationModel
+    """The text model"""
+    instruction: str
+    """The instruction applied to each item"""
+    format: str = field(default="json")
+    """The answer format, see `PACK_FORMATS`"""
+    max_items: int = field(default=32)
+    """Maximum number of items of a pack"""
+    output_tokens_per_item: int = field(default=64)
+    """Estimated maximum tokens of the answer of an item"""
+    chars_per_token: float = field(default=3.0)
+    """Conservative characters per token ratio used to estimate the size of the items"""
+    context_window: Optional[int] = field(default=None)
+    """Maximum input and output tokens of an invocation. Defaults to the model context window in the catalog"""
+    max_output_tokens: Optional[int] = field(default=None)
+    """Maximum output tokens of an invocation. Defaults to the model limit in the catalog"""
+    max_workers: int = field(default=4)
+    """Number of concurrent invocations"""
+    generate_args: Dict[str, Any] = field(factory=dict)
+    """Arguments passed to `generate` or `chat`, such as `temperature`"""
+    report: PackReport = field(factory=PackReport, init=False)
+    """Statistics of the items answered so far"""
+
+    def __attrs_post_init__(self):
+        if self.format not in PACK_FORMATS:
+            raise BedrockArgsError(f"format must be one of {', '.join(PACK_FORMATS)}")
+
+    def _limits(self) -> Tuple[int, int]:
+        caps = get_capabilities(self.model._model_id)
+        context = self.context_window or (caps and caps.context_window) or 4096
+        output = (
+            self.max_output_tokens
+            or (caps and caps.max_output_tokens)
+            or self.model.max_token_count
+        )
+        return context, output
+
+    def _tokens(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token) + ITEM_OVERHEAD_TOKENS
+
+    def header(self, count: int) -> str:
+        """The instructions of a pack of `count` items.
+
+        Args:
+            count (int): the number of items
+
+        Returns:
+            str: the header of the prompt
+        """
+        if self.format == "json":
+            answer = (
+                f"Answer with a JSON array of exactly {count} elements, where element i is the answer for item i, "
+                "and nothing else."
+            )
+        else:
+            answer = (
+                f"Answer with exactly {count} lines, one for each item, each starting with the item number and a "
+                "period, like `1. answer`, and nothing else."
+            )
+        return (
+            f"{self.instruction}\n\n"
+            f"The input contains {count} items, numbered from 1 to {count}. "
+            f"Apply the instruction to each item independently. {answer}"
+        )
+
+    def pack_prompt(self, items: List[str]) -> str:
+        """Renders a pack into one prompt.
+
+        Args:
+            items (List[str]): the items
+
+        Returns:
+            str: the prompt
+        """
+        body = "\n".join(
+            f'<item id="{i}">\n{item}\n</item>' for i, item in enumerate(items, 1)
+        )
+        return f"{self.header(len(items))}\n\n{body}"
+
+    def parse(self, text: str, count: int) -> Optional[List[Any]]:
+        """Parses the answer of a pack.
+
+        Args:
+            text (str): the answer
+            count (int): the number of items of the pack
+
+        Returns:
+            Optional[List[Any]]: one result for each item, None if the answer is not valid
+        """
+        if self.format == "json":
+            start, end = text.find("["), text.rfind("]")
+            if start < 0 or end < start:
+                return None
+            try:
+                results = json.loads(text[start : end + 1])
+            except ValueError:
+                return None
+            return (
+                results if isinstance(results, list) and len(results) == count else None
+            )
+
+        answers: Dict[int, List[str]] = {}
+        current = None
+        for line in text.strip().splitlines():
+            m = _NUMBERED.match(line)
+            if m is not None:
+                current = int(m.group(1) or m.group(2))
+                if current in answers:
+                    return None
+                answers[current] = [m.group(3).strip()]
+            elif current is not None:
+                answers[current].append(line.strip())
+            elif line.strip():
+                return None
+        if sorted(answers) != list(range(1, count + 1)):
+            return None
+        return ["\n".join(answers[i]).strip() for i in range(1, count + 1)]
+
+    def packs(self, items: Iterable[str]) -> Iterator[List[str]]:
+        """Groups the items into packs fitting the context window and the output limit of the model.
+
+        Args:
+            items (Iterable[str]): the items
+
+        Yields:
+            List[str]: the packs, in order
+        """
+        context, output = self._limits()
+        per_item = self.output_tokens_per_item + ITEM_OVERHEAD_TOKENS
+        max_items = max(1, min(self.max_items, output // per_item))
+        header = self._tokens(self.header(max_items))
+        pack: List[str] = []
+        size = header
+        for item in items:
+            tokens = self._tokens(item)
+            if len(pack) > 0 and (
+                len(pack) == max_items
+                or size + tokens + (len(pack) + 1) * per_item > context
+            ):
+                yield pack
+                pack, size = [], header
+            pack.append(item)
+            size += tokens
+        if len(pack) > 0:
+            yield pack
+
+    def _ask(self, prompt: str, max_token_count: int) -> str:
+        kwargs = dict(self.generate_args)
+        kwargs.setdefault("max_token_count", max_token_count)
+        if self.model.supports_chat():
+            out = self.model.chat([Human(prompt)], **kwargs)
+        else:
+            out = self.model.generate(prompt, **kwargs)
+        return "".join(out) if isinstance(out, list) else out
+
+    def _ask_one(self, item: str) -> Any:
+        if self.format == "json":
+            text = self._ask(
+                self.pack_prompt([item]),
+                self.output_tokens_per_item + ITEM_OVERHEAD_TOKENS,
+            )
+            results = self.parse(text, 1)
+            return results[0] if results is not None else text.strip()
+        return self._ask(
+            f"{self.instruction}\n\n{item}", self.output_tokens_per_item
+        ).strip()
+
+    def run_pack(self, items: List[str]) -> Tuple[List[Any], int, bool]:
+        """Answers a pack with one invocation, or one invocation per item when the answer cannot be parsed.
+
+        Args:
+            items (List[str]): the items
+
+        Returns:
+            Tuple[List[Any], int, bool]: the results, the number of invocations and whether the pack fell back
+        """
+        if len(items) > 1:
+            _, output = self._limits()
+            max_tokens = min(
+                output,
+                len(items) * (self.output_tokens_per_item + ITEM_OVERHEAD_TOKENS),
+            )
+            results = self.parse(
+                self._ask(self.pack_prompt(items), max_tokens), len(items)
+            )
+            if results is not None:
+                return results, 1, False
+        single = [self._ask_one(item) for item in items]
+        return single, len(items) + (len(items) > 1), len(items) > 1
+
+    def run(self, items: Iterable[str]) -> Iterator[Any]:
+        """Answers the items, running up to `max_workers` packs concurrently.
+
+        Args:
+            items (Iterable[str]): the items
+
+        Yields:
+            Any: one result for each item, in order
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for results, invocations, fallback in _bounded_map(
+                pool, self.run_pack, self.packs(items), 2 * self.max_workers
+            ):
+                self.report.items += len(results)
+                self.report.invocations += invocations
+                self.report.packs += len(results) > 1
+                self.report.fallbacks += fallback
+                yield from results
+
+    def generate(self, items: List[str]) -> List[Any]:
+        """Answers a list of items, see `run`.
+
+        Args:
+            items (List[str]): the items
+
+        Returns:
+            List[Any]: one result for each item
+        """
+        return list(self.run(items))
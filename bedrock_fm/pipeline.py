@@ -0,0 +1,387 @@
+"""Streaming embedding ingestion with bounded memory.
+
+`EmbeddingPipeline` reads documents lazily, splits them into chunks that fit the model input limit, groups the
+chunks in batches of the model batch size and embeds a bounded number of batches concurrently. Memory usage only
+depends on the chunk size, the batch size and the number of in-flight batches, not on the size of the corpus.
+
+```py
+from bedrock_fm import EmbeddingPipeline, Embed, Model, iter_text_files
+
+pipeline = EmbeddingPipeline(model=Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3), max_workers=8)
+for chunk_id, vector in pipeline.run(iter_text_files("./corpus", "*.md")):
+    ...
+```
+"""
+
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+import os
+from attrs import define, field
+from .bedrock import BedrockEmbeddingsModel, EmbeddingType
+from .exceptions import BedrockArgsError
+from .vector_store import VectorStore
+
+if TYPE_CHECKING:
+    from .sinks import ResultSink
+
+DEFAULT_BLOCK_SIZE = 1 << 20
+"""Number of characters read from a file at a time"""
+
+_SEPARATORS = ("\n\n", "\n", ". ", " ")
+
+
+@define(frozen=True)
+class Chunk:
+    """A piece of a document small enough to be embedded in one invocation"""
+
+    id: str
+    """Unique id of the chunk, `<document_id>#<index>`"""
+    document_id: str
+    """Id of the document the chunk belongs to"""
+    index: int
+    """Position of the chunk in the document"""
+    text: str
+    """The chunk text"""
+
+
+def _read_blocks(path: str, encoding: str, block_size: int) -> Iterator[str]:
+    with open(path, encoding=encoding, errors="replace") as f:
+        while True:
+            block = f.read(block_size)
+            if not block:
+                return
+            yield block
+
+
+def iter_text_files(
+    root: str,
+    pattern: str = "*",
+    *,
+    encoding: str = "utf-8",
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> Iterator[Tuple[str, Iterator[str]]]:
+    """Lazily walks a directory tree in a deterministic order and yields the files matching `pattern`.
+
+    Files are not read until their content iterator is consumed, and then only `block_size` characters at a time.
+
+    Args:
+        root (str): a directory or a single file
+        pattern (str, optional): a glob pattern matched against the file name. Defaults to "*".
+        encoding (str, optional): the files encoding. Defaults to "utf-8".
+        block_size (int, optional): number of characters read at a time. Defaults to 1M.
+
+    Yields:
+        Tuple[str, Iterator[str]]: the path relative to `root`, used as document id, and the content blocks
+    """
+    if os.path.isfile(root):
+        yield os.path.basename(root), _read_blocks(root, encoding, block_size)
+        return
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if fnmatch(name, pattern):
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, root), _read_blocks(
+                    path, encoding, block_size
+                )
+
+
+def _find_cut(text: str, start: int, max_chars: int) -> int:
+    end = start + max_chars
+    for sep in _SEPARATORS:
+        i = text.rfind(sep, start + max_chars // 2, end)
+        if i >= 0:
+            return i + len(sep)
+    return end
+
+
+def split_text(
+    content: str | Iterable[str], max_chars: int, overlap: int = 0
+) -> Iterator[str]:
+    """Splits a text, or a stream of text blocks, into chunks of at most `max_chars` characters.
+
+    Chunks are cut on paragraph, line, sentence or word boundaries when possible.
+
+    Args:
+        content (str | Iterable[str]): the text or an iterable of text blocks
+        max_chars (int): the maximum chunk size in characters
+        overlap (int, optional): number of characters repeated at the start of the next chunk. Defaults to 0.
+
+    Yields:
+        str: the chunks
+    """
+    if max_chars < 1:
+        raise BedrockArgsError("max_chars must be at least 1")
+    if overlap < 0 or (overlap > 0 and overlap >= max_chars // 2):
+        raise BedrockArgsError("overlap must be between 0 and half of the chunk size")
+    if isinstance(content, str):
+        content = [content]
+    buffer = ""
+    for block in content:
+        buffer += block
+        pos = 0
+        while len(buffer) - pos > max_chars:
+            cut = _find_cut(buffer, pos, max_chars)
+            chunk = buffer[pos:cut].strip()
+            if chunk:
+                yield chunk
+            pos = cut - overlap
+        buffer = buffer[pos:]
+    chunk = buffer.strip()
+    if chunk:
+        yield chunk
+
+
+def _batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+def _bounded_map(
+    pool: ThreadPoolExecutor,
+    fn: Callable[[Any], Any],
+    items: Iterable[Any],
+    window: int,
+) -> Iterator[Any]:
+    """Applies `fn` to the items in the pool, with at most `window` pending results, yielding in input order."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while len(pending) > 0:
+        yield pending.popleft().result()
+
+
+@define(kw_only=True)
+class EmbeddingPipeline:
+    """Embeds a stream of documents with bounded memory.
+
+    Documents are `(document_id, content)` pairs where content is a string or an iterable of text blocks,
+    as returned by `iter_text_files`.
+    """
+
+    model: BedrockEmbeddingsModel
+    """The embeddings model"""
+    chunk_tokens: Optional[int] = field(default=None)
+    """Chunk size in tokens. Defaults to the model input limit"""
+    chunk_overlap: int = field(default=0)
+    """Number of tokens repeated between consecutive chunks"""
+    chars_per_token: float = field(default=3.0)
+    """Conservative characters per token ratio used to convert token limits into chunk sizes"""
+    batch_size: Optional[int] = field(default=None)
+    """Number of chunks per invocation. Defaults to the model batch size"""
+    max_workers: int = field(default=4)
+    """Number of concurrent invocations"""
+    preprocess_workers: int = field(default=2)
+    """Number of threads preparing inputs, for models that override `prepare`"""
+    max_in_flight: Optional[int] = field(default=None)
+    """Maximum number of batches submitted and not yet consumed. Defaults to twice `max_workers`"""
+    type: EmbeddingType = field(default=EmbeddingType.DOCUMENT)
+    """The type of embedding to generate"""
+
+    def _max_chars(self) -> int:
+        tokens = self.model.max_input_tokens()
+        if self.chunk_tokens is not None:
+            tokens = min(tokens, self.chunk_tokens)
+        return int(tokens * self.chars_per_token)
+
+    def chunks(
+        self, documents: Iterable[Tuple[str, str | Iterable[str]]]
+    ) -> Iterator[Chunk]:
+        """Splits the documents into chunks fitting the model input limit.
+
+        Args:
+            documents (Iterable[Tuple[str, str | Iterable[str]]]): the `(document_id, content)` pairs
+
+        Yields:
+            Chunk: the chunks
+        """
+        max_chars = self._max_chars()
+        overlap = int(self.chunk_overlap * self.chars_per_token)
+        for document_id, content in documents:
+            for i, text in enumerate(split_text(content, max_chars, overlap)):
+                yield Chunk(f"{document_id}#{i}", document_id, i, text)
+
+    def embed_items(
+        self, items: Iterable[Tuple[Any, Any]]
+    ) -> Iterator[Tuple[List[Any], Any]]:
+        """Embeds `(key, input)` pairs in batches, running up to `max_workers` invocations concurrently.
+
+        Inputs are whatever the model `generate` accepts, text for text models. When the model overrides
+        `prepare`, the inputs are prepared in a separate pool of `preprocess_workers` ahead of the invocations.
+
+        Batches are yielded in input order. The input is only consumed when there is room for a new batch,
+        so a slow consumer slows down the reading of the input.
+
+        Args:
+            items (Iterable[Tuple[Any, Any]]): the `(key, input)` pairs to embed
+
+        Yields:
+            Tuple[List[Any], Any]: the keys of each batch with the corresponding vectors
+        """
+        batch_size = self.batch_size or self.model.max_batch_size()
+        max_in_flight = self.max_in_flight or 2 * self.max_workers
+
+        def invoke(batch: List[Tuple[Any, Any]]) -> Tuple[List[Any], Any]:
+            keys = [k for k, _ in batch]
+            return keys, self.model.generate([v for _, v in batch], type=self.type)
+
+        with ThreadPoolExecutor(max_workers=self.preprocess_workers) as prep:
+            if type(self.model).prepare is not BedrockEmbeddingsModel.prepare:
+                items = _bounded_map(
+                    prep,
+                    lambda kv: (kv[0], self.model.prepare(kv[1])),
+                    items,
+                    max_in_flight * batch_size,
+                )
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                yield from _bounded_map(
+                    pool, invoke, _batched(items, batch_size), max_in_flight
+                )
+
+    def embed_chunks(
+        self, chunks: Iterable[Chunk]
+    ) -> Iterator[Tuple[List[Chunk], Any]]:
+        """Embeds the chunks in batches, see `embed_items`.
+
+        Args:
+            chunks (Iterable[Chunk]): the chunks to embed
+
+        Yields:
+            Tuple[List[Chunk], Any]: each batch of chunks with the corresponding vectors
+        """
+        return self.embed_items((c, c.text) for c in chunks)
+
+    def run_items(self, items: Iterable[Tuple[str, Any]]) -> Iterator[Tuple[str, Any]]:
+        """Embeds inputs that do not need chunking, such as images for multimodal models.
+
+        Args:
+            items (Iterable[Tuple[str, Any]]): the `(id, input)` pairs
+
+        Yields:
+            Tuple[str, Any]: `(id, vector)` pairs
+        """
+        for ids, vectors in self.embed_items(items):
+            yield from zip(ids, vectors)
+
+    def run_items_to_store(
+        self, items: Iterable[Tuple[str, Any]], store: VectorStore
+    ) -> int:
+        """Embeds inputs that do not need chunking and writes the vectors to a `VectorStore`, one batch at a time.
+
+        Args:
+            items (Iterable[Tuple[str, Any]]): the `(id, input)` pairs
+            store (VectorStore): the destination store
+
+        Returns:
+            int: the number of vectors written
+        """
+        count = 0
+        for ids, vectors in self.embed_items(items):
+            store.upsert(ids, vectors)
+            count += len(ids)
+        return count
+
+    def run_items_to_sink(
+        self, items: Iterable[Tuple[str, Any]], sink: "ResultSink"
+    ) -> int:
+        """Embeds inputs that do not need chunking and writes `id` and `embedding` rows to a `ResultSink`.
+
+        Args:
+            items (Iterable[Tuple[str, Any]]): the `(id, input)` pairs
+            sink (ResultSink): the destination sink, left open
+
+        Returns:
+            int: the number of vectors written
+        """
+        count = 0
+        for ids, vectors in self.embed_items(items):
+            count += sink.write_embeddings(ids, vectors)
+        return count
+
+    def run(
+        self, documents: Iterable[Tuple[str, str | Iterable[str]]]
+    ) -> Iterator[Tuple[str, Any]]:
+        """Embeds the documents.
+
+        Args:
+            documents (Iterable[Tuple[str, str | Iterable[str]]]): the `(document_id, content)` pairs
+
+        Yields:
+            Tuple[str, Any]: `(chunk_id, vector)` pairs
+        """
+        for batch, vectors in self.embed_chunks(self.chunks(documents)):
+            for chunk, vector in zip(batch, vectors):
+                yield chunk.id, vector
+
+    def run_to_store(
+        self,
+        documents: Iterable[Tuple[str, str | Iterable[str]]],
+        store: VectorStore,
+    ) -> int:
+        """Embeds the documents and writes the vectors to a `VectorStore`, one batch at a time.
+
+        The chunk text and document id are stored as metadata.
+
+        Args:
+            documents (Iterable[Tuple[str, str | Iterable[str]]]): the `(document_id, content)` pairs
+            store (VectorStore): the destination store
+
+        Returns:
+            int: the number of chunks written
+        """
+        count = 0
+        for batch, vectors in self.embed_chunks(self.chunks(documents)):
+            store.upsert(
+                [c.id for c in batch],
+                vectors,
+                [{"document_id": c.document_id, "text": c.text} for c in batch],
+            )
+            count += len(batch)
+        return count
+
+    def run_to_sink(
+        self,
+        documents: Iterable[Tuple[str, str | Iterable[str]]],
+        sink: "ResultSink",
+    ) -> int:
+        """Embeds the documents and writes the vectors to a `ResultSink`, one batch at a time.
+
+        Rows hold the chunk `id`, the `embedding`, the `document_id`, the chunk `index` and the `text`.
+
+        Args:
+            documents (Iterable[Tuple[str, str | Iterable[str]]]): the `(document_id, content)` pairs
+            sink (ResultSink): the destination sink, left open
+
+        Returns:
+            int: the number of chunks written
+        """
+        count = 0
+        for batch, vectors in self.embed_chunks(self.chunks(documents)):
+            count += sink.write_embeddings(
+                [c.id for c in batch],
+                vectors,
+                [
+                    {"document_id": c.document_id, "index": c.index, "text": c.text}
+                    for c in batch
+                ],
+            )
+        return count
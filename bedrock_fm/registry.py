@@ -0,0 +1,248 @@
+"""Registry of the model families, mapping model ids to the classes implementing them.
+
+Each family is identified by a model id prefix, such as `anthropic.claude-3`, and a model id belongs to the
+family with the longest matching prefix. The classes of all the `Model` enum values are computed once, on first
+use, so that looking up a known model id is a dictionary access.
+
+Packages can add new families, or replace the built-in ones, by declaring an entry point in the
+`bedrock_fm.families` group, whose name is the model id prefix and whose value is the class:
+
+```toml
+[tool.poetry.plugins."bedrock_fm.families"]
+"acme.llm" = "acme_bedrock.models:AcmeLLM"
+```
+
+or at runtime with `register_family("acme.llm", AcmeLLM)`.
+
+`get_model` returns a model instance shared by all the callers asking for the same model id and arguments,
+so that the boto3 clients are created once per process instead of at each request.
+
+```py
+from bedrock_fm import get_model, Model
+
+fm = get_model(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, max_token_count=1000)
+assert fm is get_model(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, max_token_count=1000)
+```
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+import importlib
+import os
+import threading
+from .exceptions import BedrockInvalidModelError
+from .model import Model
+
+ENTRY_POINT_GROUP = "bedrock_fm.families"
+
+FAMILIES = {
+    "ai21.j2": "Jurassic",
+    "ai21.jamba": "Jamba",
+    "amazon.titan": "Titan",
+    "amazon.titan-embed": "TitanEmbeddings",
+    "amazon.titan-embed-image": "TitanMultimodalEmbeddings",
+    "amazon.titan-image": "TitanImageGeneration",
+    "anthropic.claude": "Claude",
+    "anthropic.claude-3": "Claude3",
+    "cohere.command": "Command",
+    "cohere.command-r": "CommandR",
+    "cohere.embed": "Embed",
+    "cohere.rerank": "Rerank",
+    "meta.llama2": "Llama2Chat",
+    "meta.llama3": "Llama3Instruct",
+    "mistral.mistral": "Mistral",
+    "mistral.mistral-large": "MistralLarge",
+    "mistral.mixtral": "Mixtral",
+    "stability.stable": "SDXL",
+}
+"""The built-in families, from model id prefix to the name of the class exported by `bedrock_fm`"""
+
+_registered: Dict[str, Any] = {}
+_prefixes: Optional[List[Tuple[str, Any]]] = None
+_classes: Dict[str, type] = {}
+_lock = threading.Lock()
+
+_models: Dict[Any, Any] = {}
+_models_lock = threading.Lock()
+
+
+def _after_fork():
+    # a lock held by another thread of the parent would never be released in the child
+    global _lock, _models_lock
+    _lock = threading.Lock()
+    _models_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def register_family(prefix: str, cls: type):
+    """Registers the class implementing the models whose id starts with `prefix`. Registered families take
+    precedence over the built-in and the entry point ones.
+
+    Args:
+        prefix (str): the model id prefix
+        cls (type): the model class, with a `from_id` class method
+    """
+    global _prefixes
+    with _lock:
+        _registered[prefix] = cls
+        _prefixes = None
+        _classes.clear()
+
+
+def _load_prefixes() -> List[Tuple[str, Any]]:
+    from importlib.metadata import entry_points
+
+    families: Dict[str, Any] = dict(FAMILIES)
+    for ep in entry_points(group=ENTRY_POINT_GROUP):
+        families[ep.name] = ep
+    families.update(_registered)
+    return sorted(families.items(), key=lambda f: len(f[0]), reverse=True)
+
+
+def _load_class(target: Any) -> type:
+    if isinstance(target, str):
+        return getattr(importlib.import_module("bedrock_fm"), target)
+    if isinstance(target, type):
+        return target
+    return target.load()
+
+
+def _match(prefixes: List[Tuple[str, Any]], model_id: str) -> Any:
+    for prefix, target in prefixes:
+        if model_id.startswith(prefix):
+            return target
+    return None
+
+
+def _resolve(model_id: str) -> type:
+    global _prefixes
+    with _lock:
+        cls = _classes.get(model_id)
+        if cls is not None:
+            return cls
+        if _prefixes is None:
+            _prefixes = _load_prefixes()
+            for m in Model:
+                target = _match(_prefixes, m.value)
+                if target is not None:
+                    _classes[m.value] = _load_class(target)
+            cls = _classes.get(model_id)
+            if cls is not None:
+                return cls
+        target = _match(_prefixes, model_id)
+        if target is None:
+            raise BedrockInvalidModelError(f"{model_id} is not a supported model")
+        cls = _load_class(target)
+        _classes[model_id] = cls
+        return cls
+
+
+def family_class(model_id: str | Model) -> type:
+    """Returns the class implementing a model.
+
+    Args:
+        model_id (str | Model): the model id
+
+    Raises:
+        BedrockInvalidModelError: if no family matches the model id
+
+    Returns:
+        type: the model class
+    """
+    if type(model_id) is Model:
+        model_id = model_id.value
+    cls = _classes.get(model_id)
+    if cls is None:
+        cls = _resolve(model_id)
+    return cls
+
+
+def from_model_id(model_id: str | Model, **kwargs) -> Any:
+    """Instantiates a Bedrock Foundation Model or Embedding Model based on the `model_id`.
+
+    Usage example:
+
+    ```py
+    from bedrock_fm import from_model_id
+
+    fm = from_model_id("amazon.titan-embed-g1-text-02")
+    # fm is of type `bedrock_fm.TitanEmbeddings`
+    ```
+
+    Args:
+        model_id (str): the Amazon Bedrock [modelId]()
+
+    Raises:
+        BedrockInvalidModelError:
+
+    Returns:
+        BedrockFoundationModel | BedrockEmbeddingsModel | BedrockImageModel | Rerank: A typed instance of the
+            Foundation Model
+    """
+    if type(model_id) is Model:
+        model_id = model_id.value
+    return family_class(model_id).from_id(model_id, **kwargs)
+
+
+class _Identity:
+    """Key of an unhashable argument, compared by identity. The key holds the argument, so that its id cannot
+    be reused by another object while the key is cached"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __hash__(self) -> int:
+        return id(self.value)
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, _Identity) and other.value is self.value
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return (dict, tuple(sorted((k, _freeze(v)) for k, v in value.items())))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_freeze(v) for v in value))
+    try:
+        hash(value)
+    except TypeError:
+        return (id, _Identity(value))
+    return (type(value), value)
+
+
+def get_model(model_id: str | Model, **kwargs) -> Any:
+    """Returns a model instance shared by all the callers with the same model id and arguments, creating it
+    with `from_model_id` on the first call. Models are thread safe, so the instance can be used concurrently.
+
+    Arguments such as `session` or `client` are compared by identity, the other ones by value.
+
+    Args:
+        model_id (str | Model): the Amazon Bedrock modelId
+
+    Raises:
+        BedrockInvalidModelError:
+
+    Returns:
+        BedrockFoundationModel | BedrockEmbeddingsModel | BedrockImageModel | Rerank: the shared instance
+    """
+    if type(model_id) is Model:
+        model_id = model_id.value
+    key = (model_id, _freeze(kwargs)) if kwargs else model_id
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            model = _models.get(key)
+            if model is None:
+                model = from_model_id(model_id, **kwargs)
+                _models[key] = model
+    return model
+
+
+def clear_models():
+    """Drops the instances cached by `get_model`."""
+    with _models_lock:
+        _models.clear()
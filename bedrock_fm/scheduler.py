@@ -0,0 +1,478 @@
+"""Priority and tenant aware scheduling of the invocations sharing a quota.
+
+`RequestScheduler` wraps a `bedrock-runtime` client and is passed as the `client` of the models, so every
+`generate`, `chat`, embedding and image invocation goes through it. Each modelId gets a budget of concurrent
+slots. Invocations beyond the budget wait in a queue and are dispatched as slots free up:
+
+- by priority class: a queued `interactive` invocation is always dispatched before queued `standard` and `bulk`
+  ones, so a batch job only uses the slots that interactive traffic leaves free. With `promote_after`, an
+  invocation queued for longer is dispatched first whatever its class, so bulk work is never starved;
+- within a class, by weighted fair queuing between tenants: each tenant gets a share of the dispatches
+  proportional to its weight, whatever the number of invocations it queues.
+
+The priority class and the tenant are set for a model with `bind`, or for a block of code with `scheduling`.
+Queue wait times are tracked per class, see `report`.
+
+```py
+from bedrock_fm import Claude3, Model, RequestScheduler
+
+scheduler = RequestScheduler(slots={Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0.value: 16})
+chat = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=scheduler.bind("interactive"))
+bulk = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=scheduler.bind("bulk", tenant="etl"))
+```
+"""
+
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import heapq
+import itertools
+import threading
+import time
+import weakref
+from attrs import define, field
+from .eventstream import iter_chunk_bytes, register_decoder
+from .exceptions import BedrockArgsError, BedrockQueueTimeoutError
+from .transport import Transport
+
+PRIORITY_CLASSES = {"interactive": 0, "standard": 1, "bulk": 2}
+"""Default priority classes and their rank, lower ranks are dispatched first"""
+
+DEFAULT_TENANT = "default"
+
+_context: ContextVar[Tuple[Optional[str], Optional[str]]] = ContextVar(
+    "bedrock_fm_scheduling", default=(None, None)
+)
+
+
+@contextmanager
+def scheduling(priority: Optional[str] = None, tenant: Optional[str] = None):
+    """Sets the priority class and the tenant of the invocations made in the block by the current thread or task.
+
+    Args:
+        priority (Optional[str], optional): the priority class. Defaults to the scheduler default.
+        tenant (Optional[str], optional): the tenant. Defaults to `DEFAULT_TENANT`.
+    """
+    token = _context.set((priority, tenant))
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+@define(kw_only=True)
+class ClassStats:
+    """Queue statistics of a priority class"""
+
+    requests: int = field(default=0)
+    """Number of invocations dispatched"""
+    queued: int = field(default=0)
+    """Number of invocations currently waiting for a slot"""
+    timeouts: int = field(default=0)
+    """Number of invocations that waited longer than `max_queue_wait`"""
+    promoted: int = field(default=0)
+    """Number of invocations dispatched ahead of their class after waiting `promote_after`"""
+    total_wait: float = field(default=0.0)
+    """Sum of the queue wait times, in seconds"""
+    max_wait: float = field(default=0.0)
+    """Longest queue wait time, in seconds"""
+    recent: Deque[float] = field(factory=lambda: deque(maxlen=1024))
+    """Wait times of the last dispatched invocations, used for the percentiles"""
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.requests if self.requests else 0.0
+
+    def wait(self, p: float) -> Optional[float]:
+        """Percentile of the recent queue wait times.
+
+        Args:
+            p (float): the percentile, between 0 and 100
+
+        Returns:
+            Optional[float]: seconds, None before the first dispatch
+        """
+        if len(self.recent) == 0:
+            return None
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+@define(eq=False)
+class _Request:
+    priority: str
+    tenant: str
+    enqueued: float
+    start: float = 0.0
+    event: threading.Event = field(factory=threading.Event)
+    done: bool = False
+    promoted: bool = False
+
+
+@define
+class _ClassQueue:
+    heap: List[Tuple[float, int, _Request]] = field(factory=list)
+    vtime: float = 0.0
+    finish: Dict[str, float] = field(factory=dict)
+
+
+@define
+class _ModelQueue:
+    slots: int
+    in_use: int = 0
+    classes: Dict[str, _ClassQueue] = field(factory=dict)
+    arrivals: Deque[_Request] = field(factory=deque)
+
+
+class _ScheduledStream:
+    """Stream body releasing its slot when it is consumed, closed or garbage collected"""
+
+    def __init__(self, body: Any, release: Callable[[], None]):
+        self._body = body
+        self._release = release
+
+    def iter_chunk_bytes(self) -> Iterator[bytes]:
+        try:
+            yield from iter_chunk_bytes(self._body)
+        finally:
+            self.close()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        try:
+            yield from self._body
+        finally:
+            self.close()
+
+    def close(self):
+        self._release()
+        if hasattr(self._body, "close"):
+            self._body.close()
+
+
+@define(kw_only=True)
+class RequestScheduler(Transport):
+    """`Transport` limiting the concurrent invocations of each modelId and dispatching the queued ones by priority
+    class and tenant.
+
+    Invocations block the calling thread while queued. Streams hold their slot until they are consumed, closed or
+    garbage collected. Schedulers can be pickled, the copy starts with empty queues and statistics, and in a child
+    process created with `fork` the queues of the parent are dropped.
+    """
+
+    client: Any = field(default=None)
+    """The client invoking Bedrock. Defaults to a boto3 `bedrock-runtime` client from the default session"""
+    slots: Dict[str, int] = field(factory=dict)
+    """Number of concurrent invocations of each modelId"""
+    default_slots: int = field(default=8)
+    """Number of concurrent invocations of the modelIds not in `slots`"""
+    classes: Dict[str, int] = field(factory=lambda: dict(PRIORITY_CLASSES))
+    """The priority classes and their rank, lower ranks are dispatched first"""
+    default_priority: str = field(default="standard")
+    """The priority class of the invocations without one"""
+    tenant_weights: Dict[str, float] = field(factory=dict)
+    """Share of the dispatches of each tenant within a class, tenants not listed have weight 1"""
+    promote_after: Optional[float] = field(default=None)
+    """Seconds after which a queued invocation is dispatched before the other classes"""
+    max_queue_wait: Optional[float] = field(default=None)
+    """Seconds after which a queued invocation fails with `BedrockQueueTimeoutError`"""
+    clock: Callable[[], float] = field(default=time.monotonic)
+    """Clock used to measure the wait times"""
+    stats: Dict[str, ClassStats] = field(init=False)
+    """Queue statistics of each priority class"""
+    _queues: Dict[str, _ModelQueue] = field(factory=dict, init=False)
+    _lock: threading.Lock = field(factory=threading.Lock, init=False)
+    _seq: Iterator[int] = field(factory=itertools.count, init=False)
+
+    def __attrs_post_init__(self):
+        if self.default_priority not in self.classes:
+            raise BedrockArgsError(
+                f"default_priority must be one of {', '.join(self.classes)}"
+            )
+        self.stats = {name: ClassStats() for name in self.classes}
+        if self.client is None:
+            from .transport import default_session
+
+            self.client = default_session().client("bedrock-runtime")
+        from .clients import track
+
+        track(self)
+
+    def __reduce__(self):
+        from .clients import reduce_init
+
+        return reduce_init(self)
+
+    def _after_fork(self):
+        # the queued invocations and the lock belong to the threads of the parent
+        from .clients import ClientSettings, is_boto3_client
+
+        self._lock = threading.Lock()
+        self._queues = {}
+        self.stats = {name: ClassStats() for name in self.classes}
+        if is_boto3_client(self.client):
+            self.client = ClientSettings.of(self.client)
+
+    def _client(self) -> Any:
+        client = self.client
+        if not hasattr(client, "invoke_model"):
+            from .clients import lazy_client
+
+            with self._lock:
+                self.client = client = lazy_client(self.client, "bedrock-runtime")
+        return client
+
+    def bind(
+        self, priority: Optional[str] = None, tenant: Optional[str] = None
+    ) -> "ScheduledClient":
+        """A client whose invocations have the given priority class and tenant, to pass to a model.
+
+        Args:
+            priority (Optional[str], optional): the priority class. Defaults to `default_priority`.
+            tenant (Optional[str], optional): the tenant. Defaults to `DEFAULT_TENANT`.
+
+        Returns:
+            ScheduledClient: the client
+        """
+        self._priority(priority)
+        return ScheduledClient(scheduler=self, priority=priority, tenant=tenant)
+
+    def _priority(self, priority: Optional[str]) -> str:
+        priority = priority or self.default_priority
+        if priority not in self.classes:
+            raise BedrockArgsError(
+                f"Unknown priority class {priority}, use one of {', '.join(self.classes)}"
+            )
+        return priority
+
+    def _queue(self, model_id: str) -> _ModelQueue:
+        queue = self._queues.get(model_id)
+        if queue is None:
+            queue = self._queues[model_id] = _ModelQueue(
+                slots=self.slots.get(model_id, self.default_slots)
+            )
+        return queue
+
+    def _next(self, queue: _ModelQueue, now: float) -> Optional[_Request]:
+        while len(queue.arrivals) > 0 and queue.arrivals[0].done:
+            queue.arrivals.popleft()
+        if (
+            self.promote_after is not None
+            and len(queue.arrivals) > 0
+            and now - queue.arrivals[0].enqueued >= self.promote_after
+        ):
+            request = queue.arrivals.popleft()
+            request.promoted = True
+            return request
+        for name in sorted(queue.classes, key=self.classes.__getitem__):
+            cq = queue.classes[name]
+            while len(cq.heap) > 0:
+                _, _, request = heapq.heappop(cq.heap)
+                if not request.done:
+                    cq.vtime = request.start
+                    return request
+        return None
+
+    def _dispatch(self, queue: _ModelQueue):
+        now = self.clock()
+        while queue.in_use < queue.slots:
+            request = self._next(queue, now)
+            if request is None:
+                return
+            request.done = True
+            queue.in_use += 1
+            wait = now - request.enqueued
+            stats = self.stats[request.priority]
+            stats.queued -= 1
+            stats.requests += 1
+            stats.promoted += request.promoted
+            stats.total_wait += wait
+            stats.max_wait = max(stats.max_wait, wait)
+            stats.recent.append(wait)
+            request.event.set()
+
+    def acquire(
+        self,
+        model_id: str,
+        priority: Optional[str] = None,
+        tenant: Optional[str] = None,
+    ):
+        """Waits for a slot of a modelId. Prefer the client methods, which release the slot.
+
+        Args:
+            model_id (str): the modelId
+            priority (Optional[str], optional): the priority class. Defaults to `default_priority`.
+            tenant (Optional[str], optional): the tenant. Defaults to `DEFAULT_TENANT`.
+
+        Raises:
+            BedrockQueueTimeoutError: when the invocation waits longer than `max_queue_wait`
+        """
+        priority = self._priority(priority)
+        tenant = tenant or DEFAULT_TENANT
+        with self._lock:
+            queue = self._queue(model_id)
+            cq = queue.classes.get(priority)
+            if cq is None:
+                cq = queue.classes[priority] = _ClassQueue()
+            request = _Request(priority, tenant, self.clock())
+            request.start = max(cq.vtime, cq.finish.get(tenant, 0.0))
+            finish = cq.finish[tenant] = request.start + 1.0 / self.tenant_weights.get(
+                tenant, 1.0
+            )
+            heapq.heappush(cq.heap, (finish, next(self._seq), request))
+            queue.arrivals.append(request)
+            self.stats[priority].queued += 1
+            self._dispatch(queue)
+        if request.event.wait(self.max_queue_wait):
+            return
+        with self._lock:
+            if request.event.is_set():
+                return
+            request.done = True
+            self.stats[priority].queued -= 1
+            self.stats[priority].timeouts += 1
+        raise BedrockQueueTimeoutError(
+            f"Invocation of {model_id} queued for more than {self.max_queue_wait}s in class {priority}"
+        )
+
+    def release(self, model_id: str):
+        """Frees a slot of a modelId and dispatches the next queued invocation.
+
+        Args:
+            model_id (str): the modelId
+        """
+        with self._lock:
+            queue = self._queue(model_id)
+            queue.in_use -= 1
+            self._dispatch(queue)
+
+    def _tags(
+        self, priority: Optional[str], tenant: Optional[str]
+    ) -> Tuple[Optional[str], Optional[str]]:
+        context_priority, context_tenant = _context.get()
+        return priority or context_priority, tenant or context_tenant
+
+    def invoke(
+        self, priority: Optional[str], tenant: Optional[str], **kwargs
+    ) -> Dict[str, Any]:
+        """`invoke_model` with the given priority class and tenant, or the ones of the current `scheduling` block.
+
+        Returns:
+            Dict[str, Any]: the response
+        """
+        model_id = kwargs["modelId"]
+        self.acquire(model_id, *self._tags(priority, tenant))
+        try:
+            return self._client().invoke_model(**kwargs)
+        finally:
+            self.release(model_id)
+
+    def invoke_stream(
+        self, priority: Optional[str], tenant: Optional[str], **kwargs
+    ) -> Dict[str, Any]:
+        """`invoke_model_with_response_stream` with the given priority class and tenant, or the ones of the current
+        `scheduling` block. The slot is released when the stream is consumed, closed or garbage collected.
+
+        Returns:
+            Dict[str, Any]: the response
+        """
+        model_id = kwargs["modelId"]
+        self.acquire(model_id, *self._tags(priority, tenant))
+        try:
+            client = self._client()
+            register_decoder(client)
+            resp = client.invoke_model_with_response_stream(**kwargs)
+        except BaseException:
+            self.release(model_id)
+            raise
+        once = threading.Lock()
+
+        def release():
+            if once.acquire(blocking=False):
+                self.release(model_id)
+
+        resp["body"] = _ScheduledStream(resp["body"], release)
+        # a stream that is never read is released when it is garbage collected
+        weakref.finalize(resp["body"], release)
+        return resp
+
+    def invoke_model(self, **kwargs) -> Dict[str, Any]:
+        return self.invoke(None, None, **kwargs)
+
+    def invoke_model_with_response_stream(self, **kwargs) -> Dict[str, Any]:
+        return self.invoke_stream(None, None, **kwargs)
+
+    def credentials(self) -> Any:
+        from .transport import client_credentials
+
+        return client_credentials(self._client())
+
+    def open_connections(self, count: int):
+        from .transport import open_connections
+
+        open_connections(self._client(), count)
+
+    def queued(self, model_id: Optional[str] = None) -> int:
+        """Number of invocations waiting for a slot.
+
+        Args:
+            model_id (Optional[str], optional): count only the invocations of a modelId. Defaults to None.
+
+        Returns:
+            int: the number of queued invocations
+        """
+        with self._lock:
+            queues = [
+                q for m, q in self._queues.items() if model_id is None or m == model_id
+            ]
+            return sum(1 for q in queues for r in q.arrivals if not r.done)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Queue statistics of each priority class, with the wait times in milliseconds.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: the statistics, by class
+        """
+
+        def ms(v: Optional[float]) -> Optional[float]:
+            return None if v is None else round(v * 1000, 3)
+
+        with self._lock:
+            return {
+                name: {
+                    "requests": s.requests,
+                    "queued": s.queued,
+                    "timeouts": s.timeouts,
+                    "promoted": s.promoted,
+                    "wait_mean_ms": ms(s.mean_wait),
+                    "wait_p50_ms": ms(s.wait(50)),
+                    "wait_p95_ms": ms(s.wait(95)),
+                    "wait_p99_ms": ms(s.wait(99)),
+                    "wait_max_ms": ms(s.max_wait),
+                }
+                for name, s in self.stats.items()
+            }
+
+
+@define(kw_only=True)
+class ScheduledClient(Transport):
+    """Client of a `RequestScheduler` with a fixed priority class and tenant, see `RequestScheduler.bind`."""
+
+    scheduler: RequestScheduler
+    """The scheduler"""
+    priority: Optional[str] = field(default=None)
+    """The priority class of the invocations"""
+    tenant: Optional[str] = field(default=None)
+    """The tenant of the invocations"""
+
+    def invoke_model(self, **kwargs) -> Dict[str, Any]:
+        return self.scheduler.invoke(self.priority, self.tenant, **kwargs)
+
+    def invoke_model_with_response_stream(self, **kwargs) -> Dict[str, Any]:
+        return self.scheduler.invoke_stream(self.priority, self.tenant, **kwargs)
+
+    def credentials(self) -> Any:
+        return self.scheduler.credentials()
+
+    def open_connections(self, count: int):
+        self.scheduler.open_connections(count)
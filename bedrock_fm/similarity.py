@@ -0,0 +1,59 @@
+"""Similarity kernels for the compact embedding formats returned by `TitanEmbeddings` and `Embed`.
+
+All functions take a single query vector and a 2D array of vectors (one per row) and return one score per row.
+This module requires `numpy` (`pip install bedrock_fm[numpy]`).
+"""
+
+import numpy as np
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _as_bytes(v: np.ndarray) -> np.ndarray:
+    return np.ascontiguousarray(v).view(np.uint8)
+
+
+def hamming_distance(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Number of differing bits between a packed binary query and each packed binary vector.
+
+    Works for both `BINARY` (int8) and `UBINARY` (uint8) packed vectors.
+
+    Args:
+        query (np.ndarray): the packed query vector
+        vectors (np.ndarray): the packed vectors, one per row
+
+    Returns:
+        np.ndarray: the distances, one per row
+    """
+    q = _as_bytes(query)
+    v = _as_bytes(np.atleast_2d(vectors))
+    return _POPCOUNT[np.bitwise_xor(v, q)].sum(axis=-1, dtype=np.int64)
+
+
+def hamming_similarity(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Fraction of matching bits, in `[0, 1]`, between a packed binary query and each packed binary vector.
+
+    Args:
+        query (np.ndarray): the packed query vector
+        vectors (np.ndarray): the packed vectors, one per row
+
+    Returns:
+        np.ndarray: the similarities, one per row
+    """
+    bits = _as_bytes(query).shape[-1] * 8
+    return 1.0 - hamming_distance(query, vectors) / bits
+
+
+def int8_dot(query: np.ndarray, vectors: np.ndarray) -> np.ndarray:
+    """Dot product between an `INT8`/`UINT8` query and each `INT8`/`UINT8` vector, accumulated in int32.
+
+    Args:
+        query (np.ndarray): the query vector
+        vectors (np.ndarray): the vectors, one per row
+
+    Returns:
+        np.ndarray: the dot products, one per row
+    """
+    q = np.asarray(query, dtype=np.int32)
+    v = np.atleast_2d(vectors).astype(np.int32)
+    return v @ q
@@ -0,0 +1,570 @@
+"""Incremental writers for embedding and generation outputs.
+
+Backfills produce more vectors and completions than fit in memory. A `ResultSink` receives the results as they
+are produced and writes them in batches, so memory is bounded by the size of a write and not by the size of the
+job.
+
+- `JsonlSink` buffers encoded lines and writes them `batch_rows` at a time, gzip compressed when the path ends
+  with `.gz`.
+- `ParquetSink` and `ArrowSink` write Parquet and Arrow IPC files with `pyarrow`, installed with
+  `pip install bedrock_fm[arrow]`. Vectors are stored as a `fixed_size_list<float32>` column, which readers
+  load without conversion into a 2D array. Rows are converted to Arrow every `batch_rows` rows and written as a
+  row group, or record batch, of about `row_group_bytes`, large enough for efficient scans and column pruning.
+
+Strings, numbers and booleans are stored natively, other values, such as the usage or the error of a result, as
+JSON strings. The columns and their types are inferred from the rows of the first row group, unless `schema` is
+passed: columns mixing integers and floats are stored as floats and columns mixing other types raise
+`BedrockArgsError`. A column that is null in the whole first row group has the Arrow null type, and later values
+raise `BedrockArgsError`: declare the type of such columns with `types`, for example `{"error": "string"}`.
+
+```py
+from bedrock_fm import EmbeddingPipeline, Model, ParquetSink, TitanEmbeddings, iter_text_files
+
+fm = TitanEmbeddings.from_id(Model.AMAZON_TITAN_EMBED_TEXT_V2_0)
+pipeline = EmbeddingPipeline(model=fm)
+with ParquetSink("vectors.parquet") as sink:
+    pipeline.run_to_sink(iter_text_files("docs/"), sink)
+```
+"""
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+from abc import ABC, abstractmethod
+import gzip
+import json
+import os
+from .bedrock import CompletionDetails
+from .exceptions import BedrockArgsError
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+SINK_FORMATS = {
+    ".jsonl": "jsonl",
+    ".json": "jsonl",
+    ".gz": "jsonl",
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+}
+"""The format of a sink for each file extension, see `open_sink`"""
+
+ROW_GROUP_BYTES = 64 << 20
+"""Default uncompressed size of a Parquet row group or Arrow record batch"""
+
+_SCALARS = (str, int, float, bool, type(None))
+
+
+def _default(obj: Any) -> Any:
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(
+            obj,
+            default=_default,
+            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_APPEND_NEWLINE,
+        )
+    return (json.dumps(obj, ensure_ascii=False, default=_default) + "\n").encode(
+        "utf-8"
+    )
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError(
+            "Parquet and Arrow sinks require pyarrow. Install it with `pip install bedrock_fm[arrow]`"
+        ) from e
+    return pyarrow
+
+
+def completion_row(
+    id: str, details: CompletionDetails, **fields: Any
+) -> Dict[str, Any]:
+    """The row of a `CompletionDetails`, with the output, the token usage and the latency.
+
+    Args:
+        id (str): the id of the row
+        details (CompletionDetails): the details returned by `generate(..., details=True)`
+        **fields: additional fields of the row
+
+    Returns:
+        Dict[str, Any]: the row
+    """
+    from .batch import usage
+
+    output = details.output
+    return {
+        "id": id,
+        "output": "".join(output) if isinstance(output, list) else output,
+        **usage(details.response or {}),
+        "latency": round(details.latency, 4),
+        **fields,
+    }
+
+
+class ResultSink(ABC):
+    """Abstract destination for results, written in batches.
+
+    To add a format, inherit from this class and implement `_write` and `_close`. Sinks are context managers and
+    flush and close their file on exit.
+    """
+
+    def __init__(self, batch_rows: int):
+        self.batch_rows = batch_rows
+        self.rows = 0
+        self._buffer: List[Dict[str, Any]] = []
+        self._closed = False
+
+    @abstractmethod
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        """Writes a batch of rows"""
+        ...
+
+    @abstractmethod
+    def _close(self) -> None:
+        """Writes the pending data and closes the file"""
+        ...
+
+    def write(self, row: Dict[str, Any]) -> None:
+        """Buffers a row, writing the buffer when it holds `batch_rows` rows.
+
+        Args:
+            row (Dict[str, Any]): the row
+        """
+        if self._closed:
+            raise BedrockArgsError("The sink is closed")
+        self._buffer.append(row)
+        self.rows += 1
+        if len(self._buffer) >= self.batch_rows:
+            self.flush()
+
+    def write_rows(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Writes the rows.
+
+        Args:
+            rows (Iterable[Dict[str, Any]]): the rows
+
+        Returns:
+            int: the number of rows written
+        """
+        count = 0
+        for row in rows:
+            self.write(row)
+            count += 1
+        return count
+
+    def write_embeddings(
+        self,
+        ids: Sequence[str],
+        vectors: Sequence[Any],
+        metadata: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> int:
+        """Writes a batch of vectors as rows with an `id`, an `embedding` and the metadata fields.
+
+        Args:
+            ids (Sequence[str]): the ids
+            vectors (Sequence[Any]): the vectors, one for each id
+            metadata (Sequence[Dict[str, Any]], optional): additional fields, one for each id
+
+        Returns:
+            int: the number of rows written
+        """
+        for i, (id, vector) in enumerate(zip(ids, vectors)):
+            self.write(
+                {
+                    "id": id,
+                    "embedding": vector,
+                    **(metadata[i] if metadata is not None else {}),
+                }
+            )
+        return len(ids)
+
+    def write_completion(
+        self, id: str, details: CompletionDetails, **fields: Any
+    ) -> None:
+        """Writes a completion, see `completion_row`.
+
+        Args:
+            id (str): the id of the row
+            details (CompletionDetails): the details returned by `generate(..., details=True)`
+            **fields: additional fields of the row
+        """
+        self.write(completion_row(id, details, **fields))
+
+    def flush(self) -> None:
+        """Writes the buffered rows."""
+        if len(self._buffer) > 0:
+            rows, self._buffer = self._buffer, []
+            self._write(rows)
+
+    def close(self) -> None:
+        """Writes the buffered rows and closes the file. Closing twice has no effect."""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class JsonlSink(ResultSink):
+    """Writes JSON Lines, `batch_rows` lines at a time with one unbuffered write.
+
+    Vectors returned as numpy arrays are written as lists. Lines are encoded with `orjson` when it is installed.
+    """
+
+    def __init__(self, path: str, batch_rows: int = 1000, append: bool = False):
+        """Creates the sink.
+
+        Args:
+            path (str): the output, gzip compressed when it ends with `.gz`
+            batch_rows (int, optional): number of lines of each write. Defaults to 1000.
+            append (bool, optional): append to an existing output instead of overwriting it. Defaults to False.
+        """
+        super().__init__(batch_rows)
+        self.path = path
+        mode = "ab" if append else "wb"
+        self._file = (
+            gzip.open(path, mode)
+            if path.endswith(".gz")
+            else open(path, mode, buffering=0)
+        )
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        self._file.write(b"".join(_dumps(row) for row in rows))
+
+    def _close(self) -> None:
+        self._file.close()
+
+
+class _ArrowSink(ResultSink):
+    """Converts rows to Arrow record batches and writes them in groups of about `row_group_bytes`"""
+
+    def __init__(
+        self,
+        path: str,
+        vector_field: str = "embedding",
+        dimensions: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+        schema: Any = None,
+        batch_rows: int = 1024,
+        row_group_bytes: int = ROW_GROUP_BYTES,
+        types: Optional[Mapping[str, Any]] = None,
+    ):
+        super().__init__(batch_rows)
+        pa = self.pa = _require_pyarrow()
+        self.path = path
+        self.vector_field = vector_field
+        self.dimensions = dimensions
+        self.columns = list(columns) if columns is not None else None
+        self.schema = schema
+        self.types = {
+            name: pa.type_for_alias(t) if isinstance(t, str) else t
+            for name, t in (types or {}).items()
+        }
+        self.row_group_bytes = row_group_bytes
+        self.row_groups = 0
+        self._infer = schema is None
+        self._inferred: Dict[str, Any] = {name: None for name in self.columns or []}
+        self._batches: List[Any] = []
+        self._bytes = 0
+
+    def _type(self, name: str, values: List[Any]):
+        """The type of the values of a column in a batch"""
+        pa = self.pa
+        if name in self.types:
+            return self.types[name]
+        if name == self.vector_field:
+            if self.dimensions is None:
+                vector = next((v for v in values if v is not None), None)
+                if vector is None:
+                    return pa.null()
+                self.dimensions = len(vector)
+            return pa.list_(pa.float32(), self.dimensions)
+        if any(v is not None and not isinstance(v, _SCALARS) for v in values):
+            return pa.string()
+        try:
+            return pa.array(values).type
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise BedrockArgsError(
+                f"Column `{name}` mixes values of different types: {e}"
+            ) from e
+
+    def _merge(self, name: str, old, new):
+        """The type holding the values of both types, integers and floats are widened to float"""
+        pa = self.pa
+        if old is None or pa.types.is_null(old) or old == new:
+            return new
+        if pa.types.is_null(new):
+            return old
+        if (pa.types.is_integer(old) or pa.types.is_floating(old)) and (
+            pa.types.is_integer(new) or pa.types.is_floating(new)
+        ):
+            return pa.float64()
+        raise BedrockArgsError(
+            f"Column `{name}` has values of type {old} and {new}, declare its type with `types` or `schema`"
+        )
+
+    def _column(self, field, values: List[Any]):
+        pa = self.pa
+        if field.name == self.vector_field:
+            values = [v.tolist() if hasattr(v, "tolist") else v for v in values]
+        elif pa.types.is_string(field.type):
+            values = [
+                (
+                    v
+                    if v is None or isinstance(v, str)
+                    else json.dumps(v, ensure_ascii=False, default=_default)
+                )
+                for v in values
+            ]
+        try:
+            return pa.array(values, type=field.type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            raise BedrockArgsError(
+                f"Column `{field.name}` has values that are not {field.type}: {e}"
+            ) from e
+
+    def _write(self, rows: List[Dict[str, Any]]) -> None:
+        pa = self.pa
+        if self.schema is not None:
+            self._batches.append(self._conform(rows))
+        else:
+            # the types are inferred until the first row group is written, the batches are cast to them then
+            names = list(self._inferred)
+            for row in rows:
+                names.extend(
+                    k for k in row if k not in self._inferred and k not in names
+                )
+            fields = []
+            for name in names:
+                values = [row.get(name) for row in rows]
+                type = self._type(name, values)
+                self._inferred[name] = self._merge(name, self._inferred.get(name), type)
+                fields.append((pa.field(name, type), values))
+            self._batches.append(
+                pa.record_batch([self._column(f, v) for f, v in fields], names=names)
+            )
+        self._bytes += self._batches[-1].nbytes
+        if self._bytes >= self.row_group_bytes:
+            self._write_group()
+
+    def _conform(self, rows: List[Dict[str, Any]]):
+        """Converts rows to a record batch with the schema of the file"""
+        names = set(self.schema.names)
+        for row in rows:
+            unknown = [k for k in row if k not in names]
+            if len(unknown) > 0:
+                raise BedrockArgsError(
+                    f"Fields {', '.join(unknown)} are not in the schema of the sink, declare them with `columns`"
+                )
+        columns = []
+        for field in self.schema:
+            values = [row.get(field.name) for row in rows]
+            if self._infer:
+                type = self._merge(
+                    field.name, field.type, self._type(field.name, values)
+                )
+                if type != field.type:
+                    raise BedrockArgsError(
+                        f"Column `{field.name}` has values of type {type} after the first row group was written "
+                        f"with type {field.type}, declare its type with `types` or `schema`"
+                    )
+            columns.append(self._column(field, values))
+        return self.pa.record_batch(columns, schema=self.schema)
+
+    def _fix_schema(self) -> None:
+        pa = self.pa
+        self.schema = pa.schema(
+            [pa.field(name, t or pa.null()) for name, t in self._inferred.items()]
+        )
+        batches = []
+        for batch in self._batches:
+            columns = []
+            for field in self.schema:
+                i = batch.schema.get_field_index(field.name)
+                if i < 0:
+                    columns.append(pa.nulls(batch.num_rows, field.type))
+                else:
+                    columns.append(batch.column(i).cast(field.type))
+            batches.append(pa.record_batch(columns, schema=self.schema))
+        self._batches = batches
+
+    def _write_group(self) -> None:
+        if len(self._batches) == 0:
+            return
+        if self.schema is None:
+            self._fix_schema()
+        table = self.pa.Table.from_batches(self._batches, schema=self.schema)
+        self._batches, self._bytes = [], 0
+        self._write_table(table)
+        self.row_groups += 1
+
+    @abstractmethod
+    def _write_table(self, table) -> None: ...
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        self.flush()
+        self._write_group()
+        self._closed = True
+        self._close()
+
+
+class ParquetSink(_ArrowSink):
+    """Writes a Parquet file, one row group of about `row_group_bytes` at a time."""
+
+    def __init__(
+        self,
+        path: str,
+        vector_field: str = "embedding",
+        dimensions: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+        schema: Any = None,
+        batch_rows: int = 1024,
+        row_group_bytes: int = ROW_GROUP_BYTES,
+        compression: str = "zstd",
+        types: Optional[Mapping[str, Any]] = None,
+    ):
+        """Creates the sink.
+
+        Args:
+            path (str): the output, overwritten
+            vector_field (str, optional): the field stored as `fixed_size_list<float32>`. Defaults to "embedding".
+            dimensions (Optional[int], optional): the size of the vectors. Defaults to the size of the first vector.
+            columns (Optional[Sequence[str]], optional): the columns, when some may be missing from the first rows.
+                Defaults to the fields of the rows of the first row group.
+            schema (pyarrow.Schema, optional): the schema of the file. Defaults to the schema inferred from the
+                rows of the first row group.
+            batch_rows (int, optional): number of rows converted to Arrow at a time. Defaults to 1024.
+            row_group_bytes (int, optional): uncompressed size of the row groups. Defaults to `ROW_GROUP_BYTES`.
+            compression (str, optional): the Parquet compression codec. Defaults to "zstd".
+            types (Optional[Mapping[str, Any]], optional): the types of some columns, as `pyarrow.DataType`s or
+                names such as "string" or "int64", the others are inferred. Defaults to None.
+        """
+        super().__init__(
+            path,
+            vector_field,
+            dimensions,
+            columns,
+            schema,
+            batch_rows,
+            row_group_bytes,
+            types,
+        )
+        self.compression = compression
+        self._writer = None
+
+    def _write_table(self, table) -> None:
+        if self._writer is None:
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(
+                self.path, table.schema, compression=self.compression
+            )
+        self._writer.write_table(table, row_group_size=table.num_rows)
+
+    def _close(self) -> None:
+        if self._writer is None and self.schema is not None:
+            self._write_table(self.schema.empty_table())
+        if self._writer is not None:
+            self._writer.close()
+
+
+class ArrowSink(_ArrowSink):
+    """Writes an Arrow IPC file, one record batch of about `row_group_bytes` at a time.
+
+    Arrow files can be memory mapped, so vectors are read without copies. Record batches are not compressed by
+    default for the same reason.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        vector_field: str = "embedding",
+        dimensions: Optional[int] = None,
+        columns: Optional[Sequence[str]] = None,
+        schema: Any = None,
+        batch_rows: int = 1024,
+        row_group_bytes: int = ROW_GROUP_BYTES,
+        compression: Optional[str] = None,
+        types: Optional[Mapping[str, Any]] = None,
+    ):
+        """Creates the sink.
+
+        Args:
+            path (str): the output, overwritten
+            vector_field (str, optional): the field stored as `fixed_size_list<float32>`. Defaults to "embedding".
+            dimensions (Optional[int], optional): the size of the vectors. Defaults to the size of the first vector.
+            columns (Optional[Sequence[str]], optional): the columns, when some may be missing from the first rows.
+                Defaults to the fields of the rows of the first row group.
+            schema (pyarrow.Schema, optional): the schema of the file. Defaults to the schema inferred from the
+                rows of the first row group.
+            batch_rows (int, optional): number of rows converted to Arrow at a time. Defaults to 1024.
+            row_group_bytes (int, optional): uncompressed size of the record batches. Defaults to `ROW_GROUP_BYTES`.
+            compression (Optional[str], optional): "zstd" or "lz4" to compress the record batches. Defaults to None.
+            types (Optional[Mapping[str, Any]], optional): the types of some columns, as `pyarrow.DataType`s or
+                names such as "string" or "int64", the others are inferred. Defaults to None.
+        """
+        super().__init__(
+            path,
+            vector_field,
+            dimensions,
+            columns,
+            schema,
+            batch_rows,
+            row_group_bytes,
+            types,
+        )
+        self.compression = compression
+        self._writer = None
+
+    def _write_table(self, table) -> None:
+        if self._writer is None:
+            options = self.pa.ipc.IpcWriteOptions(compression=self.compression)
+            self._writer = self.pa.ipc.new_file(
+                self.path, table.schema, options=options
+            )
+        self._writer.write_table(table, max_chunksize=table.num_rows)
+
+    def _close(self) -> None:
+        if self._writer is None and self.schema is not None:
+            self._write_table(self.schema.empty_table())
+        if self._writer is not None:
+            self._writer.close()
+
+
+def open_sink(path: str, format: Optional[str] = None, **kwargs) -> ResultSink:
+    """Creates the sink for a path, with the format of its extension, see `SINK_FORMATS`.
+
+    Args:
+        path (str): the output
+        format (Optional[str], optional): "jsonl", "parquet" or "arrow". Defaults to the format of the extension.
+        **kwargs: the arguments of the sink
+
+    Returns:
+        ResultSink: the sink
+    """
+    if format is None:
+        format = SINK_FORMATS.get(os.path.splitext(path)[1].lower())
+    if format == "jsonl":
+        return JsonlSink(path, **kwargs)
+    if format == "parquet":
+        return ParquetSink(path, **kwargs)
+    if format == "arrow":
+        return ArrowSink(path, **kwargs)
+    raise BedrockArgsError(
+        f"Unknown sink format for {path}, use one of {', '.join(sorted(set(SINK_FORMATS.values())))}"
+    )
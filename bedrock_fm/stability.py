@@ -1,15 +1,16 @@
-from typing import Any, Dict, List, Tuple, Optional, overload
+from typing import Any, Dict, List, Tuple, Optional, overload, TYPE_CHECKING
 
 from bedrock_fm.bedrock import Model
 from .bedrock_image import BedrockImageModel
 from .exceptions import BedrockExtraArgsError
-import json
 from attrs import define, asdict
 from enum import Enum
 from io import BytesIO
-from PIL import Image
 from base64 import b64decode
 
+if TYPE_CHECKING:
+    from PIL import Image
+
 resolutions = [
     (1024, 1024),
     (1152, 896),
@@ -86,7 +87,7 @@ class SDXL(BedrockImageModel):
         if "cfg_scale" in kwargs:
             body["cfg_scale"] = kwargs["cfg_scale"]
 
-        return json.dumps(body)
+        return self.codec.dumps(body)
 
     def generate(
         self,
@@ -101,7 +102,7 @@ class SDXL(BedrockImageModel):
         style_preset: SDStylePresets = None,
         clip_guidance_preset: str = "NONE",
         cfg_scale: int = 7,
-    ) -> List[Image.Image]:
+    ) -> List["Image.Image"]:
         if style_preset:
             return super()._generate(
                 prompts,
@@ -128,8 +129,10 @@ class SDXL(BedrockImageModel):
                 clip_guidance_preset=clip_guidance_preset,
             )
 
-    def get_images(self, resp: Dict[str, Any]) -> List[Image.Image]:
-        body_json = json.loads(resp["body"].read())
+    def get_images(self, resp: Dict[str, Any]) -> List["Image.Image"]:
+        from PIL import Image
+
+        body_json = self.codec.loads(resp["body"].read())
 
         imgs = [
             Image.open(BytesIO(b64decode(v["base64"]))) for v in body_json["artifacts"]
@@ -0,0 +1,796 @@
+"""Offline stub of the `bedrock-runtime` service, for tests and benchmarks.
+
+`StubBedrockClient` is a drop-in client for the models: it answers `invoke_model` and
+`invoke_model_with_response_stream` with response bodies and event streams in the format of each model
+family, without network calls. `StubServer` serves the same responses over HTTP with the Bedrock wire format,
+so that boto3 clients and `HttpTransport` can be pointed to it with `endpoint_url`.
+
+Latency, generation speed, throttling and errors are configurable, and the random choices are seeded, so that
+throughput and tail latencies can be measured reproducibly.
+
+```py
+from bedrock_fm import Claude3, Model
+from bedrock_fm.stub import StubBedrockClient
+
+client = StubBedrockClient(latency=0.2, tokens_per_second=50, throttle_rate=0.01)
+fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client)
+fm.generate("Hello")
+```
+
+The server can also be started from the command line:
+
+    python -m bedrock_fm.stub --port 8080 --latency 0.2 --tokens-per-second 50
+"""
+
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from base64 import b64encode
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from urllib.parse import unquote
+import json
+import random
+import struct
+import threading
+import time
+import zlib
+from attrs import define, field
+from .catalog import get_capabilities
+from .eventstream import _raise_exception, encode_chunk, encode_exception
+from .transport import CONTENT_TYPE_APPLICATION_JSON, Transport, _raise_for_status
+
+WORDS = (
+    "the quick brown fox jumps over the lazy dog while a stub model answers every request with the same "
+    "predictable words so that benchmarks do not depend on a live service"
+).split()
+"""The generated text is made of these words, one for each token"""
+
+ERROR_STATUS = {
+    "ValidationException": 400,
+    "AccessDeniedException": 403,
+    "ResourceNotFoundException": 404,
+    "ModelTimeoutException": 408,
+    "ModelErrorException": 424,
+    "ThrottlingException": 429,
+    "ModelNotReadyException": 429,
+    "InternalServerException": 500,
+    "ServiceUnavailableException": 503,
+}
+"""HTTP status of the `bedrock-runtime` errors"""
+
+_PROFILE_PREFIXES = ("us.", "eu.", "apac.")
+_MAX_TOKENS_KEYS = (
+    "max_tokens",
+    "max_tokens_to_sample",
+    "max_gen_len",
+    "maxTokens",
+    "maxTokenCount",
+)
+
+
+class StubError(Exception):
+    """An error injected by the stub, with the `bedrock-runtime` error code"""
+
+    def __init__(self, code: str, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+    @property
+    def status(self) -> int:
+        return ERROR_STATUS.get(self.code, 500)
+
+
+def _base_model_id(model_id: str) -> str:
+    if model_id.startswith(_PROFILE_PREFIXES):
+        return model_id.split(".", 1)[1]
+    return model_id
+
+
+def _max_tokens(request: Dict[str, Any]) -> Optional[int]:
+    for config in (request, request.get("textGenerationConfig") or {}):
+        for k in _MAX_TOKENS_KEYS:
+            if config.get(k) is not None:
+                return int(config[k])
+    return None
+
+
+def _tokens(count: int) -> List[str]:
+    return [(" " if i else "") + WORDS[i % len(WORDS)] for i in range(count)]
+
+
+def _vector(seed: str, size: int) -> List[float]:
+    rng = random.Random(zlib.crc32(seed.encode("utf-8")))
+    return [round(rng.uniform(-1, 1), 6) for _ in range(size)]
+
+
+@lru_cache(maxsize=16)
+def _png(width: int, height: int) -> str:
+    """A grey PNG image, base64 encoded"""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    rows = (b"\x00" + b"\x80" * 3 * width) * height
+    png = (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+    return b64encode(png).decode("ascii")
+
+
+def _metrics(input_tokens: int, output_tokens: int, latency: float) -> Dict[str, Any]:
+    return {
+        "amazon-bedrock-invocationMetrics": {
+            "inputTokenCount": input_tokens,
+            "outputTokenCount": output_tokens,
+            "invocationLatency": int(latency * 1000),
+            "firstByteLatency": int(latency * 1000),
+        }
+    }
+
+
+def _text_response(
+    model_id: str, request: Dict[str, Any], tokens: List[str], input_tokens: int
+) -> Dict[str, Any]:
+    text = "".join(tokens)
+    n = len(tokens)
+    if model_id.startswith("anthropic."):
+        if "messages" in request:
+            return {
+                "id": "msg_stub",
+                "type": "message",
+                "role": "assistant",
+                "content": [{"type": "text", "text": text}],
+                "stop_reason": "end_turn",
+                "usage": {"input_tokens": input_tokens, "output_tokens": n},
+            }
+        return {"completion": text, "stop_reason": "stop_sequence"}
+    if model_id.startswith("amazon.titan-text") or model_id.startswith(
+        "amazon.titan-tg1"
+    ):
+        return {
+            "inputTextTokenCount": input_tokens,
+            "results": [
+                {"tokenCount": n, "outputText": text, "completionReason": "FINISH"}
+            ],
+        }
+    if model_id.startswith("cohere.command-r"):
+        return {
+            "response_id": "stub",
+            "text": text,
+            "generation_id": "stub",
+            "finish_reason": "COMPLETE",
+        }
+    if model_id.startswith("cohere.command"):
+        count = request.get("num_generations") or 1
+        return {
+            "id": "stub",
+            "prompt": request.get("prompt", ""),
+            "generations": [
+                {"id": str(i), "text": text, "finish_reason": "COMPLETE"}
+                for i in range(count)
+            ],
+        }
+    if model_id.startswith("meta."):
+        return {
+            # the models start the answer on a new line
+            "generation": "\n\n" + text,
+            "prompt_token_count": input_tokens,
+            "generation_token_count": n,
+            "stop_reason": "stop",
+        }
+    if model_id.startswith("mistral.mistral-large"):
+        return {
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "stop_reason": "stop",
+                }
+            ]
+        }
+    if model_id.startswith("mistral."):
+        return {"outputs": [{"text": text, "stop_reason": "stop"}]}
+    if model_id.startswith("ai21.jamba"):
+        count = request.get("n") or 1
+        return {
+            "id": "stub",
+            "choices": [
+                {
+                    "index": i,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": "stop",
+                }
+                for i in range(count)
+            ],
+            "usage": {
+                "prompt_tokens": input_tokens,
+                "completion_tokens": n,
+                "total_tokens": input_tokens + n,
+            },
+        }
+    if model_id.startswith("ai21."):
+        count = request.get("numResults") or 1
+        return {
+            "id": "stub",
+            "prompt": {"text": request.get("prompt", "")},
+            "completions": [
+                {
+                    "data": {"text": text, "tokens": []},
+                    "finishReason": {"reason": "endoftext"},
+                }
+                for _ in range(count)
+            ],
+        }
+    raise StubError("ValidationException", f"The stub does not support {model_id}")
+
+
+def _stream_events(
+    model_id: str, request: Dict[str, Any], tokens: List[str]
+) -> Iterator[Tuple[bool, Dict[str, Any]]]:
+    # the events are paired with whether they carry a generated token
+    if model_id.startswith("anthropic."):
+        if "messages" in request:
+            yield False, {
+                "type": "message_start",
+                "message": {"id": "msg_stub", "type": "message", "role": "assistant"},
+            }
+            yield False, {
+                "type": "content_block_start",
+                "index": 0,
+                "content_block": {"type": "text", "text": ""},
+            }
+            for t in tokens:
+                yield True, {
+                    "type": "content_block_delta",
+                    "index": 0,
+                    "delta": {"type": "text_delta", "text": t},
+                }
+            yield False, {"type": "content_block_stop", "index": 0}
+            yield False, {"type": "message_delta", "delta": {"stop_reason": "end_turn"}}
+            yield False, {"type": "message_stop"}
+        else:
+            for t in tokens:
+                yield True, {"completion": t, "stop_reason": None}
+            yield False, {"completion": "", "stop_reason": "stop_sequence"}
+    elif model_id.startswith("amazon.titan-text") or model_id.startswith(
+        "amazon.titan-tg1"
+    ):
+        for i, t in enumerate(tokens):
+            yield True, {
+                "outputText": t,
+                "index": 0,
+                "totalOutputTextTokenCount": i + 1,
+                "completionReason": None,
+            }
+        yield False, {
+            "outputText": "",
+            "index": 0,
+            "totalOutputTextTokenCount": len(tokens),
+            "completionReason": "FINISH",
+        }
+    elif model_id.startswith("cohere.command-r"):
+        yield False, {
+            "is_finished": False,
+            "event_type": "stream-start",
+            "generation_id": "stub",
+        }
+        for t in tokens:
+            yield True, {
+                "is_finished": False,
+                "event_type": "text-generation",
+                "text": t,
+            }
+        yield False, {
+            "is_finished": True,
+            "event_type": "stream-end",
+            "finish_reason": "COMPLETE",
+        }
+    elif model_id.startswith("cohere.command"):
+        for t in tokens:
+            yield True, {"text": t, "is_finished": False}
+        yield False, {"is_finished": True, "finish_reason": "COMPLETE"}
+    elif model_id.startswith("meta."):
+        for t in tokens:
+            yield True, {"generation": t, "stop_reason": None}
+        yield False, {"generation": "", "stop_reason": "stop"}
+    elif model_id.startswith("mistral.mistral-large"):
+        for t in tokens:
+            yield True, {
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": t},
+                        "stop_reason": None,
+                    }
+                ]
+            }
+        yield False, {
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": ""},
+                    "stop_reason": "stop",
+                }
+            ]
+        }
+    elif model_id.startswith("mistral."):
+        for t in tokens:
+            yield True, {"outputs": [{"text": t, "stop_reason": None}]}
+        yield False, {"outputs": [{"text": "", "stop_reason": "stop"}]}
+    elif model_id.startswith("ai21.jamba"):
+        for t in tokens:
+            yield True, {
+                "id": "stub",
+                "choices": [
+                    {"index": 0, "delta": {"content": t}, "finish_reason": None}
+                ],
+            }
+        yield False, {
+            "id": "stub",
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+        }
+    else:
+        raise StubError(
+            "ValidationException", f"The stub does not support streaming for {model_id}"
+        )
+
+
+def _embedding_response(model_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
+    if model_id.startswith("cohere.embed"):
+        texts = request.get("texts", [])
+        types = request.get("embedding_types")
+        vectors = [_vector(t, 1024) for t in texts]
+        if not types:
+            return {
+                "id": "stub",
+                "texts": texts,
+                "embeddings": vectors,
+                "response_type": "embeddings_floats",
+            }
+        embeddings: Dict[str, Any] = {}
+        for kind in types:
+            if kind == "float":
+                embeddings[kind] = vectors
+            elif kind in ("int8", "uint8"):
+                offset = 128 if kind == "uint8" else 0
+                embeddings[kind] = [[int(x * 127) + offset for x in v] for v in vectors]
+            else:
+                offset = 128 if kind == "ubinary" else 0
+                embeddings[kind] = [
+                    [int(x * 127) + offset for x in v[::8]] for v in vectors
+                ]
+        return {
+            "id": "stub",
+            "texts": texts,
+            "embeddings": embeddings,
+            "response_type": "embeddings_by_type",
+        }
+    if model_id.startswith("amazon.titan-embed-image"):
+        size = (request.get("embeddingConfig") or {}).get("outputEmbeddingLength", 1024)
+        text = request.get("inputText") or request.get("inputImage", "")[:64]
+        return {
+            "embedding": _vector(text, size),
+            "inputTextTokenCount": len(text.split()),
+        }
+    text = request.get("inputText", "")
+    size = request.get("dimensions") or (
+        1024 if model_id.startswith("amazon.titan-embed-text-v2") else 1536
+    )
+    vector = _vector(text, size)
+    out: Dict[str, Any] = {"inputTextTokenCount": len(text.split())}
+    types = request.get("embeddingTypes") or ["float"]
+    if "float" in types:
+        out["embedding"] = vector
+    if "binary" in types:
+        out["embeddingsByType"] = {"binary": [1.0 if x > 0 else 0.0 for x in vector]}
+    return out
+
+
+def _rerank_response(request: Dict[str, Any]) -> Dict[str, Any]:
+    query = request.get("query", "")
+    documents = request.get("documents", [])
+    scores = [
+        (i, round(_vector(query + json.dumps(d, sort_keys=True), 1)[0] / 2 + 0.5, 6))
+        for i, d in enumerate(documents)
+    ]
+    scores.sort(key=lambda s: -s[1])
+    top_n = request.get("top_n") or len(documents)
+    return {
+        "id": "stub",
+        "results": [{"index": i, "relevance_score": s} for i, s in scores[:top_n]],
+    }
+
+
+def _image_response(model_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
+    if model_id.startswith("stability.stable-diffusion"):
+        image = _png(request.get("width", 512), request.get("height", 512))
+        return {
+            "result": "success",
+            "artifacts": [
+                {
+                    "seed": request.get("seed", 0),
+                    "base64": image,
+                    "finishReason": "SUCCESS",
+                }
+                for _ in range(request.get("samples") or 1)
+            ],
+        }
+    if model_id.startswith("stability."):
+        return {
+            "images": [_png(512, 512)],
+            "seeds": [request.get("seed", 0)],
+            "finish_reasons": [None],
+        }
+    config = request.get("imageGenerationConfig") or {}
+    image = _png(config.get("width", 512), config.get("height", 512))
+    return {"images": [image] * (config.get("numberOfImages") or 1), "error": None}
+
+
+@define
+class StubBedrockClient(Transport):
+    """Drop-in `bedrock-runtime` client answering with stub responses in the format of each model family.
+
+    Text models generate `output_tokens` tokens, or fewer if the request limits them, after `latency` seconds
+    and at `tokens_per_second`. Errors are raised as the boto3 client does, as `botocore.exceptions.ClientError`
+    and, for errors in the middle of a stream, `botocore.exceptions.EventStreamError`.
+    """
+
+    latency: float = field(default=0.0)
+    """Seconds before the response, or the first event of a stream"""
+    jitter: float = field(default=0.0)
+    """Maximum random seconds added to the latency, to model tail latencies"""
+    tokens_per_second: Optional[float] = field(default=None)
+    """Generation speed of the text models. Unlimited if None"""
+    output_tokens: int = field(default=16)
+    """Number of tokens generated by the text models, unless the request sets a lower maximum"""
+    throttle_rate: float = field(default=0.0)
+    """Fraction of the requests failing with `ThrottlingException`"""
+    error_rate: float = field(default=0.0)
+    """Fraction of the requests failing with `error_code`"""
+    error_code: str = field(default="ModelErrorException")
+    """The error injected with `error_rate`"""
+    stream_error_rate: float = field(default=0.0)
+    """Fraction of the streams failing with `modelStreamErrorException` after half of the tokens"""
+    seed: Optional[int] = field(default=None)
+    """Seed of the random choices, for reproducible runs"""
+    sleep: Callable[[float], None] = field(default=time.sleep)
+    """Function used to wait, replace it to run without delays"""
+    calls: int = field(default=0, init=False)
+    """Number of requests received"""
+    _rng: random.Random = field(init=False)
+    _lock: threading.Lock = field(factory=threading.Lock, init=False)
+
+    def __attrs_post_init__(self):
+        self._rng = random.Random(self.seed)
+        from .clients import track
+
+        track(self)
+
+    def __reduce__(self):
+        from .clients import reduce_init
+
+        return reduce_init(self)
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+
+    def _draw(self) -> Tuple[float, float, float]:
+        with self._lock:
+            self.calls += 1
+            return self._rng.random(), self._rng.random(), self._rng.random()
+
+    def _delay(self, jitter: float) -> float:
+        return self.latency + self.jitter * jitter
+
+    def _generation_time(self, tokens: int) -> float:
+        return tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def respond(
+        self, model_id: str, body: str | bytes, stream: bool
+    ) -> Tuple[float, Any]:
+        """Computes the response to a request, without waiting.
+
+        Args:
+            model_id (str): the modelId, or an inference profile id
+            body (str | bytes): the request body
+            stream (bool): whether the request is for `invoke_model_with_response_stream`
+
+        Raises:
+            StubError: the error to return instead of the response
+
+        Returns:
+            Tuple[float, Any]: the seconds before the response, and the response body, or for streams a list of
+            `(seconds, event)` pairs where `event` is a dictionary or a `StubError` ending the stream
+        """
+        draw, error, jitter = self._draw()
+        if draw < self.throttle_rate:
+            raise StubError(
+                "ThrottlingException",
+                "Too many requests, please wait before trying again.",
+            )
+        if draw < self.throttle_rate + self.error_rate:
+            raise StubError(self.error_code, f"Injected {self.error_code}")
+        model_id = _base_model_id(model_id)
+        caps = get_capabilities(model_id)
+        if stream and caps is not None and not caps.streaming:
+            raise StubError(
+                "ValidationException", f"{model_id} does not support response streaming"
+            )
+        try:
+            request = json.loads(body)
+        except ValueError:
+            raise StubError(
+                "ValidationException",
+                "Malformed input request, please reformat your input and try again.",
+            )
+        delay = self._delay(jitter)
+        if model_id.startswith(("amazon.titan-embed", "cohere.embed")):
+            return delay, _embedding_response(model_id, request)
+        if model_id.startswith("cohere.rerank"):
+            return delay, _rerank_response(request)
+        if model_id.startswith(("amazon.titan-image", "stability.")):
+            return delay, _image_response(model_id, request)
+
+        count = self.output_tokens
+        max_tokens = _max_tokens(request)
+        if max_tokens is not None:
+            count = min(count, max_tokens)
+        tokens = _tokens(count)
+        input_tokens = len(str(body).split())
+        if not stream:
+            delay += self._generation_time(count)
+            return delay, _text_response(model_id, request, tokens, input_tokens)
+
+        interval = self._generation_time(1)
+        events: List[Tuple[float, Any]] = []
+        for token, e in _stream_events(model_id, request, tokens):
+            events.append((delay if not events else interval if token else 0.0, e))
+        if error < self.stream_error_rate:
+            events = events[: max(1, len(events) // 2)]
+            events.append(
+                (0.0, StubError("modelStreamErrorException", "Injected stream error"))
+            )
+        else:
+            events[-1][1].update(
+                _metrics(input_tokens, count, delay + interval * count)
+            )
+        return 0.0, events
+
+    def invoke_model(
+        self,
+        *,
+        modelId: str,
+        body: str | bytes,
+        contentType: str = CONTENT_TYPE_APPLICATION_JSON,
+        accept: str = "*/*",
+        **kwargs,
+    ) -> Dict[str, Any]:
+        try:
+            delay, out = self.respond(modelId, body, False)
+        except StubError as e:
+            self.sleep(self.latency)
+            _raise_for_status(
+                e.status,
+                {"x-amzn-ErrorType": e.code},
+                json.dumps({"message": e.message}).encode(),
+                "InvokeModel",
+            )
+        self.sleep(delay)
+        return {
+            "body": BytesIO(json.dumps(out).encode("utf-8")),
+            "contentType": CONTENT_TYPE_APPLICATION_JSON,
+        }
+
+    def invoke_model_with_response_stream(
+        self,
+        *,
+        modelId: str,
+        body: str | bytes,
+        contentType: str = CONTENT_TYPE_APPLICATION_JSON,
+        accept: str = "*/*",
+        **kwargs,
+    ) -> Dict[str, Any]:
+        try:
+            _, events = self.respond(modelId, body, True)
+        except StubError as e:
+            self.sleep(self.latency)
+            _raise_for_status(
+                e.status,
+                {"x-amzn-ErrorType": e.code},
+                json.dumps({"message": e.message}).encode(),
+                "InvokeModelWithResponseStream",
+            )
+        return {
+            "body": self._events(events),
+            "contentType": "application/vnd.amazon.eventstream",
+        }
+
+    def _events(self, events: List[Tuple[float, Any]]) -> Iterator[Dict[str, Any]]:
+        for delay, e in events:
+            self.sleep(delay)
+            if isinstance(e, StubError):
+                payload = json.dumps({"message": e.message}).encode("utf-8")
+                _raise_exception({":exception-type": e.code}, memoryview(payload))
+            yield {"chunk": {"bytes": json.dumps(e).encode("utf-8")}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_HTTPServer"
+
+    def log_message(self, format: str, *args: Any):
+        pass
+
+    def _error(self, e: StubError):
+        payload = json.dumps({"message": e.message}).encode("utf-8")
+        self.send_response(e.status)
+        self.send_header("Content-Type", CONTENT_TYPE_APPLICATION_JSON)
+        self.send_header(
+            "x-amzn-ErrorType",
+            f"{e.code}:http://internal.amazon.com/coral/com.amazon.bedrock/",
+        )
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        # the connection warm-up pings the endpoint root
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self):
+        client = self.server.client
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        parts = self.path.split("/")
+        if (
+            len(parts) != 4
+            or parts[1] != "model"
+            or parts[3] not in ("invoke", "invoke-with-response-stream")
+        ):
+            self._error(
+                StubError("ResourceNotFoundException", f"Unknown operation {self.path}")
+            )
+            return
+        model_id = unquote(parts[2])
+        stream = parts[3] == "invoke-with-response-stream"
+        try:
+            delay, out = client.respond(model_id, body, stream)
+        except StubError as e:
+            client.sleep(client.latency)
+            self._error(e)
+            return
+        if not stream:
+            client.sleep(delay)
+            payload = json.dumps(out).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", CONTENT_TYPE_APPLICATION_JSON)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for delay, e in out:
+            client.sleep(delay)
+            if isinstance(e, StubError):
+                message = encode_exception(e.code, e.message)
+            else:
+                message = encode_chunk(json.dumps(e).encode("utf-8"))
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(message), message))
+            self.wfile.flush()
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class _HTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    client: StubBedrockClient
+
+
+@define
+class StubServer:
+    """Local HTTP server speaking the `bedrock-runtime` wire format, answering with the responses of a
+    `StubBedrockClient`. Use it as a context manager, and point the clients to `endpoint_url`.
+
+    ```py
+    with StubServer(StubBedrockClient(latency=0.1)) as server:
+        client = boto3.client("bedrock-runtime", endpoint_url=server.endpoint_url)
+    ```
+    """
+
+    client: StubBedrockClient = field(factory=StubBedrockClient)
+    """The stub computing the responses and the injected errors"""
+    host: str = field(default="127.0.0.1")
+    """The address to listen on"""
+    port: int = field(default=0)
+    """The port to listen on. With 0 a free port is picked"""
+    _server: Optional[_HTTPServer] = field(default=None, init=False)
+    _thread: Optional[threading.Thread] = field(default=None, init=False)
+
+    @property
+    def endpoint_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> "StubServer":
+        """Starts serving in a background thread.
+
+        Returns:
+            StubServer: this server
+        """
+        self._server = _HTTPServer((self.host, self.port), _Handler)
+        self._server.client = self.client
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="bedrock_fm-stub", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._thread.join()
+            self._server = None
+            self._thread = None
+
+    def __enter__(self) -> "StubServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Local stub of the Bedrock runtime API"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--output-tokens", type=int, default=16)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-code", default="ModelErrorException")
+    parser.add_argument("--stream-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    client = StubBedrockClient(
+        latency=args.latency,
+        jitter=args.jitter,
+        tokens_per_second=args.tokens_per_second,
+        output_tokens=args.output_tokens,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        error_code=args.error_code,
+        stream_error_rate=args.stream_error_rate,
+        seed=args.seed,
+    )
+    server = StubServer(client, host=args.host, port=args.port).start()
+    print(f"Serving the Bedrock runtime stub on {server.endpoint_url}")
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
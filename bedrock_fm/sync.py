@@ -0,0 +1,336 @@
+"""Incremental corpus synchronization.
+
+`CorpusSync` splits documents with content-defined chunking, so that editing a document only changes the chunks
+around the edit, and keeps a manifest of the chunk hashes of each document. On each run only new chunks are
+embedded, chunks that disappeared are deleted from the `VectorStore`, and chunks that moved between documents
+reuse the vector already computed.
+
+The manifest only holds hashes. The vectors are appended to a JSON Lines file next to it, named by the manifest
+with the offset of each vector, and read back only when a chunk moves. The file is rewritten without the vectors
+of deleted chunks once they make up most of it.
+
+```py
+from bedrock_fm import CorpusSync, Embed, Model, InMemoryVectorStore, iter_text_files
+
+sync = CorpusSync(model=Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3), store=store, manifest_path="manifest.json")
+report = sync.run(iter_text_files("./kb", "*.md"))
+print(report.skipped_ratio)
+```
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import os
+import random
+import re
+import uuid
+import zlib
+from attrs import define, field
+from .bedrock import BedrockEmbeddingsModel
+from .pipeline import Chunk, EmbeddingPipeline
+from .vector_store import VectorStore
+
+MANIFEST_VERSION = 2
+
+_TOKENS = re.compile(r"\S+\s*|\s+")
+_rnd = random.Random(0x6265647266)
+_GEAR = [_rnd.getrandbits(64) for _ in range(256)]
+_MASK64 = (1 << 64) - 1
+
+
+def chunk_hash(text: str) -> str:
+    """The content hash used to identify a chunk.
+
+    Args:
+        text (str): the chunk text
+
+    Returns:
+        str: the hash as a hex string
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def content_defined_chunks(
+    text: str, min_chars: int, avg_chars: int, max_chars: int
+) -> Iterator[str]:
+    """Splits a text on content-defined boundaries.
+
+    A gear rolling hash is computed over the words of the text and a chunk ends after a word when the hash
+    matches a mask sized for `avg_chars`. Because boundaries only depend on the surrounding words, an edit only
+    moves the boundaries of the chunks close to it.
+
+    Args:
+        text (str): the text to split
+        min_chars (int): the minimum chunk size
+        avg_chars (int): the target average chunk size
+        max_chars (int): the maximum chunk size, a boundary is forced when reached
+
+    Yields:
+        str: the chunks
+    """
+    # one bit less than the average number of words per chunk, assuming ~6 chars per word
+    bits = max((avg_chars - min_chars) // 6, 1).bit_length() - 1
+    mask = ((1 << bits) - 1) << (64 - bits) if bits > 0 else 0
+    h = 0
+    start = 0
+    size = 0
+    for m in _TOKENS.finditer(text):
+        token = m.group()
+        if size + len(token) > max_chars and size > 0:
+            yield text[start : m.start()]
+            start, size, h = m.start(), 0, 0
+        while len(token) > max_chars:
+            yield token[:max_chars]
+            token = token[max_chars:]
+            start += max_chars
+        size += len(token)
+        h = ((h << 1) + _GEAR[zlib.crc32(token.encode("utf-8")) & 0xFF]) & _MASK64
+        if size >= min_chars and (h & mask) == 0:
+            yield text[start : m.end()]
+            start, size, h = m.end(), 0, 0
+    if start < len(text):
+        yield text[start:]
+
+
+@define(kw_only=True)
+class SyncReport:
+    """Statistics of a `CorpusSync` run"""
+
+    documents: int = field(default=0)
+    """Number of documents processed"""
+    documents_deleted: int = field(default=0)
+    """Number of documents removed from the corpus"""
+    chunks: int = field(default=0)
+    """Number of chunks in the processed documents"""
+    chunks_embedded: int = field(default=0)
+    """Number of chunks sent to the model"""
+    chunks_reused: int = field(default=0)
+    """Number of chunks whose vector was already known"""
+    chunks_deleted: int = field(default=0)
+    """Number of chunks removed from the store"""
+    chars_embedded: int = field(default=0)
+    """Number of characters sent to the model"""
+    chars_skipped: int = field(default=0)
+    """Number of characters that did not need to be embedded"""
+
+    @property
+    def skipped_ratio(self) -> float:
+        """Fraction of the corpus characters that did not need to be embedded"""
+        total = self.chars_embedded + self.chars_skipped
+        return self.chars_skipped / total if total > 0 else 1.0
+
+
+@define(kw_only=True)
+class CorpusSync:
+    """Keeps a `VectorStore` in sync with a corpus, embedding only new or changed chunks.
+
+    Each chunk is stored with id `<document_id>#<chunk_hash>`.
+    """
+
+    model: BedrockEmbeddingsModel
+    """The embeddings model"""
+    store: VectorStore
+    """The destination store"""
+    manifest_path: Optional[str] = field(default=None)
+    """Where the manifest is persisted between runs. If not set the manifest is only kept in memory"""
+    avg_chars: Optional[int] = field(default=None)
+    """Target average chunk size. Defaults to half of the model input limit"""
+    chars_per_token: float = field(default=3.0)
+    """Conservative characters per token ratio used to convert the model token limit into a chunk size"""
+    max_workers: int = field(default=4)
+    """Number of concurrent invocations"""
+    documents: Dict[str, List[str]] = field(factory=dict)
+    """The chunk hashes of each document"""
+    vectors: Dict[str, Any] = field(factory=dict)
+    """The vectors of the chunk hashes computed since the manifest was saved, or of all the chunk hashes without
+    `manifest_path`"""
+    _offsets: Dict[str, int] = field(factory=dict, init=False)
+    """The offset of the vector of each saved chunk hash in the vectors file"""
+    _vectors_file: Optional[str] = field(default=None, init=False)
+    """The name of the vectors file, in the directory of the manifest"""
+    _lines: int = field(default=0, init=False)
+    """Number of vectors in the vectors file, including the ones of deleted chunks"""
+
+    def __attrs_post_init__(self):
+        if self.manifest_path is not None and os.path.exists(self.manifest_path):
+            self.load()
+
+    def _sizes(self) -> Tuple[int, int, int]:
+        max_chars = int(self.model.max_input_tokens() * self.chars_per_token)
+        avg_chars = min(self.avg_chars or max_chars // 2, max_chars)
+        return avg_chars // 4, avg_chars, max_chars
+
+    def load(self):
+        """Loads the manifest from `manifest_path`. A manifest built with another model is discarded."""
+        with open(self.manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("model_id") != self.model._model_id:
+            return
+        if manifest.get("version") == 1:
+            # the vectors were stored in the manifest, they move to the vectors file when it is saved
+            self.documents = manifest["documents"]
+            self.vectors = manifest["vectors"]
+        elif manifest.get("version") == MANIFEST_VERSION:
+            self.documents = manifest["documents"]
+            self._vectors_file = manifest["vectors_file"]
+            self._offsets = manifest["vectors"]
+            self._lines = manifest["vectors_lines"]
+
+    def _path(self, name: str) -> str:
+        return os.path.join(os.path.dirname(self.manifest_path), name)
+
+    def _read_vectors(self, hashes: List[str]) -> Iterator[Any]:
+        """The vectors of chunk hashes, from memory or from the vectors file"""
+        f = None
+        try:
+            for h in hashes:
+                vector = self.vectors.get(h)
+                if vector is None:
+                    if f is None:
+                        f = open(self._path(self._vectors_file), "rb")
+                    f.seek(self._offsets[h])
+                    vector = json.loads(f.readline())["vector"]
+                yield vector
+        finally:
+            if f is not None:
+                f.close()
+
+    def save(self):
+        """Appends the new vectors to the vectors file and atomically writes the manifest to `manifest_path`.
+
+        When most of the vectors file holds vectors of deleted chunks, the live vectors are copied to a new file
+        instead, and the old file is removed once the manifest points to the new one.
+        """
+        if self.manifest_path is None:
+            return
+        old = self._vectors_file
+        new = [h for h in self.vectors if h not in self._offsets]
+        live = list(self._offsets) + new
+        compact = old is None or self._lines + len(new) > 2 * len(live)
+        if compact:
+            name = (
+                f"{os.path.basename(self.manifest_path)}.{uuid.uuid4().hex[:8]}.vectors"
+            )
+            hashes, offsets, lines = live, {}, 0
+        else:
+            name, hashes = old, new
+            offsets, lines = dict(self._offsets), self._lines
+        with open(self._path(name), "wb" if compact else "ab") as out:
+            out.seek(0, os.SEEK_END)
+            for h, vector in zip(hashes, self._read_vectors(hashes)):
+                offsets[h] = out.tell()
+                vector = vector.tolist() if hasattr(vector, "tolist") else vector
+                out.write(
+                    (json.dumps({"hash": h, "vector": vector}) + "\n").encode("utf-8")
+                )
+                lines += 1
+        manifest = {
+            "version": MANIFEST_VERSION,
+            "model_id": self.model._model_id,
+            "documents": self.documents,
+            "vectors_file": name,
+            "vectors": offsets,
+            "vectors_lines": lines,
+        }
+        tmp = f"{self.manifest_path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.manifest_path)
+        self._vectors_file, self._offsets, self._lines = name, offsets, lines
+        self.vectors = {}
+        if old is not None and old != name:
+            try:
+                os.remove(self._path(old))
+            except OSError:
+                pass
+
+    def run(
+        self,
+        documents: Iterable[Tuple[str, str | Iterable[str]]],
+        *,
+        delete_missing: bool = True,
+    ) -> SyncReport:
+        """Synchronizes the store with the documents and saves the manifest.
+
+        Args:
+            documents (Iterable[Tuple[str, str | Iterable[str]]]): the `(document_id, content)` pairs
+            delete_missing (bool, optional): remove the documents that are in the manifest but not in `documents`.
+                Defaults to True.
+
+        Returns:
+            SyncReport: the statistics of the run
+        """
+        report = SyncReport()
+        seen = set()
+        waiting: Dict[str, List[Tuple[str, str]]] = {}
+        pipeline = EmbeddingPipeline(model=self.model, max_workers=self.max_workers)
+
+        def to_embed() -> Iterator[Chunk]:
+            min_chars, avg_chars, max_chars = self._sizes()
+            for document_id, content in documents:
+                seen.add(document_id)
+                report.documents += 1
+                if not isinstance(content, str):
+                    content = "".join(content)
+                new_chunks = {}
+                for text in content_defined_chunks(
+                    content, min_chars, avg_chars, max_chars
+                ):
+                    if text.strip():
+                        new_chunks.setdefault(chunk_hash(text), text)
+                old = set(self.documents.get(document_id, []))
+                stale = [h for h in old if h not in new_chunks]
+                if len(stale) > 0:
+                    self.store.delete([f"{document_id}#{h}" for h in stale])
+                    report.chunks_deleted += len(stale)
+                self.documents[document_id] = list(new_chunks.keys())
+                report.chunks += len(new_chunks)
+                reused = []
+                for i, (h, text) in enumerate(new_chunks.items()):
+                    if h in old:
+                        report.chunks_reused += 1
+                        report.chars_skipped += len(text)
+                    elif h in self.vectors or h in self._offsets:
+                        reused.append((h, text))
+                        report.chunks_reused += 1
+                        report.chars_skipped += len(text)
+                    elif h in waiting:
+                        waiting[h].append((document_id, text))
+                        report.chunks_reused += 1
+                        report.chars_skipped += len(text)
+                    else:
+                        waiting[h] = [(document_id, text)]
+                        report.chunks_embedded += 1
+                        report.chars_embedded += len(text)
+                        yield Chunk(f"{document_id}#{h}", document_id, i, text)
+                if len(reused) > 0:
+                    self._upsert(document_id, reused)
+
+        for batch, vectors in pipeline.embed_chunks(to_embed()):
+            for chunk, vector in zip(batch, vectors):
+                h = chunk.id.rsplit("#", 1)[1]
+                self.vectors[h] = vector
+                for document_id, text in waiting.pop(h):
+                    self._upsert(document_id, [(h, text)])
+
+        if delete_missing:
+            for document_id in [d for d in self.documents if d not in seen]:
+                hashes = self.documents.pop(document_id)
+                self.store.delete([f"{document_id}#{h}" for h in hashes])
+                report.chunks_deleted += len(hashes)
+                report.documents_deleted += 1
+        live = {h for hashes in self.documents.values() for h in hashes}
+        for h in [h for h in self.vectors if h not in live]:
+            del self.vectors[h]
+        for h in [h for h in self._offsets if h not in live]:
+            del self._offsets[h]
+        self.save()
+        return report
+
+    def _upsert(self, document_id: str, chunks: List[Tuple[str, str]]):
+        self.store.upsert(
+            [f"{document_id}#{h}" for h, _ in chunks],
+            list(self._read_vectors([h for h, _ in chunks])),
+            [{"document_id": document_id, "text": text} for _, text in chunks],
+        )
@@ -1,24 +1,218 @@
-from typing import List
-import json
-from .bedrock import BedrockEmbeddingsModel, EmbeddingType
+from typing import Any, Dict, Iterable, List, Optional, TYPE_CHECKING
+import os
+from io import BytesIO
+from base64 import b64encode
+from attrs import define, field
+from .bedrock import BedrockEmbeddingsModel, EmbeddingType, EmbeddingDataType
 from .exceptions import BedrockArgsError
 
+if TYPE_CHECKING:
+    from PIL import Image
 
+TITAN_V2_DIMENSIONS = [256, 512, 1024]
+
+
+@define(kw_only=True)
 class TitanEmbeddings(BedrockEmbeddingsModel):
-    """Amazon Titan Embedding base class."""
+    """Amazon Titan Embedding base class.
+
+    Titan Text Embeddings V2 (`amazon.titan-embed-text-v2:0`) also supports the following options:
+
+        TitanEmbeddings.from_id(
+            Model.AMAZON_TITAN_EMBED_TEXT_V2_0,
+            dimensions=256,
+            normalize=True,
+            embedding_type=EmbeddingDataType.BINARY,
+        )
+
+    With `EmbeddingDataType.BINARY` the vectors are returned as a `numpy.uint8` array with 8 dimensions packed per byte.
+    """
+
+    dimensions: Optional[int] = field(default=None)
+    """The number of dimensions of the output vector (256, 512 or 1024). V2 only."""
+
+    normalize: Optional[bool] = field(default=None)
+    """Whether to normalize the output vector. V2 only."""
+
+    embedding_type: EmbeddingDataType = field(default=EmbeddingDataType.FLOAT)
+    """The output format, `FLOAT` or `BINARY`. V2 only."""
 
     @classmethod
     def family(cls) -> str:
         return "amazon.titan-embed"
 
+    @classmethod
+    def _validate_model_id(cls, model_id: str) -> bool:
+        return model_id.startswith(cls.family()) and "embed-image" not in model_id
+
+    def max_input_tokens(self) -> int:
+        return self._catalog_limit("context_window", 8192)
+
+    def _is_v2(self) -> bool:
+        return self._model_id is not None and "-v2" in self._model_id
+
     def get_body(self, data: List[str], type: EmbeddingType) -> str:
         if len(data) != 1:
             raise BedrockArgsError(
                 f"Titan embeddings do not support batch inference. Provide a single element array as input. {data}"
             )
-        return json.dumps({"inputText": data[0]})
+        body = {"inputText": data[0]}
+        options = {}
+        if self.dimensions is not None:
+            if self.dimensions not in TITAN_V2_DIMENSIONS:
+                raise BedrockArgsError(
+                    f"dimensions must be one of {TITAN_V2_DIMENSIONS}, got {self.dimensions}"
+                )
+            options["dimensions"] = self.dimensions
+        if self.normalize is not None:
+            options["normalize"] = self.normalize
+        if self.embedding_type != EmbeddingDataType.FLOAT:
+            if self.embedding_type != EmbeddingDataType.BINARY:
+                raise BedrockArgsError(
+                    f"Titan embeddings only support FLOAT and BINARY types, got {self.embedding_type}"
+                )
+            options["embeddingTypes"] = [self.embedding_type.value]
+        if len(options) > 0 and not self._is_v2():
+            raise BedrockArgsError(
+                f"Options [{','.join(options.keys())}] are only supported by Titan Text Embeddings V2"
+            )
+        body.update(options)
+        return self.codec.dumps(body)
 
     def parse_response(self, response: bytes) -> List[List[float]]:
-        response_body = json.loads(response.get("body").read())
+        response_body = self.codec.loads(response.get("body").read())
+        if self.embedding_type == EmbeddingDataType.BINARY:
+            import numpy as np
+
+            bits = np.asarray(
+                response_body["embeddingsByType"]["binary"], dtype=np.uint8
+            )
+            return np.packbits(bits)[np.newaxis, :]
         embedding = response_body.get("embedding")
         return [embedding]
+
+
+TITAN_MULTIMODAL_LENGTHS = [256, 384, 1024]
+
+
+def encode_image(
+    image: "Image.Image | bytes | os.PathLike", max_size: int, format: str = "png"
+) -> str:
+    """Encodes an image as base64, resizing it to fit in a `max_size` x `max_size` box.
+
+    PNG and JPEG bytes or files that already fit are passed through without being decoded and re-encoded.
+
+    Args:
+        image (Image.Image | bytes | os.PathLike): a PIL image, the encoded image bytes or a path to an image file
+        max_size (int): the maximum width and height
+        format (str, optional): the format used when the image needs to be re-encoded. Defaults to "png".
+
+    Returns:
+        str: the base64 encoded image
+    """
+    from PIL import Image
+
+    if isinstance(image, (str, os.PathLike)):
+        with open(image, "rb") as f:
+            image = f.read()
+    if isinstance(image, (bytes, bytearray)):
+        raw = bytes(image)
+        image = Image.open(BytesIO(raw))
+        if image.format in ("PNG", "JPEG") and max(image.size) <= max_size:
+            return str(b64encode(raw), "ascii")
+    if max(image.size) > max_size:
+        image = image.copy()
+        image.thumbnail((max_size, max_size))
+    if format.lower() in ("jpeg", "jpg") and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format=format)
+    return str(b64encode(buffer.getvalue()), "ascii")
+
+
+@define(kw_only=True)
+class TitanMultimodalEmbeddings(BedrockEmbeddingsModel):
+    """Amazon Titan Multimodal Embeddings, embeds texts, images and image + text pairs in the same vector space.
+
+    Inputs can be a text (`str`), an image (a PIL image, the encoded image `bytes` or a `pathlib.Path`) or an
+    `(image, text)` tuple. Images are resized and encoded by `prepare`, which `EmbeddingPipeline` runs in a worker
+    pool ahead of the invocations:
+
+        fm = TitanMultimodalEmbeddings.from_id(Model.AMAZON_TITAN_EMBED_IMAGE_V1, output_embedding_length=384)
+        pipeline = EmbeddingPipeline(model=fm, max_workers=8, preprocess_workers=4)
+        pipeline.run_items_to_store(((p.name, p) for p in Path("catalog").glob("*.jpg")), store)
+    """
+
+    output_embedding_length: Optional[int] = field(default=None)
+    """The size of the output vectors (256, 384 or 1024). Defaults to the model default, 1024"""
+
+    max_image_size: int = field(default=2048)
+    """Images larger than this are resized to fit in a `max_image_size` x `max_image_size` box"""
+
+    image_format: str = field(default="png")
+    """The format used when an image needs to be re-encoded, `png` or `jpeg`"""
+
+    @classmethod
+    def family(cls) -> str:
+        return "amazon.titan-embed-image"
+
+    def max_input_tokens(self) -> int:
+        return self._catalog_limit("context_window", 128)
+
+    def prepare(self, item: Any) -> Dict[str, str]:
+        if isinstance(item, dict):
+            return item
+        text = None
+        image = None
+        if isinstance(item, tuple):
+            image, text = item
+        elif isinstance(item, str):
+            text = item
+        else:
+            image = item
+        body = {}
+        if text is not None:
+            body["inputText"] = text
+        if image is not None:
+            body["inputImage"] = encode_image(
+                image, self.max_image_size, self.image_format
+            )
+        return body
+
+    def get_body(self, data: List[Any], type: EmbeddingType) -> str:
+        if len(data) != 1:
+            raise BedrockArgsError(
+                "Titan multimodal embeddings do not support batch inference. Provide a single element array as input."
+            )
+        body = dict(self.prepare(data[0]))
+        if self.output_embedding_length is not None:
+            if self.output_embedding_length not in TITAN_MULTIMODAL_LENGTHS:
+                raise BedrockArgsError(
+                    f"output_embedding_length must be one of {TITAN_MULTIMODAL_LENGTHS}, got {self.output_embedding_length}"
+                )
+            body["embeddingConfig"] = {
+                "outputEmbeddingLength": self.output_embedding_length
+            }
+        return self.codec.dumps(body)
+
+    def parse_response(self, response: bytes) -> List[List[float]]:
+        response_body = self.codec.loads(response.get("body").read())
+        return [response_body.get("embedding")]
+
+    def generate_for_images(
+        self, images: Iterable[Any], *, max_workers: int = 4
+    ) -> List[List[float]]:
+        """Generate the embeddings for a list of images or `(image, text)` pairs, encoding the images in a worker
+        pool and invoking the model concurrently.
+
+        Args:
+            images (Iterable[Any]): the images or `(image, text)` pairs
+            max_workers (int, optional): the number of concurrent invocations. Defaults to 4.
+
+        Returns:
+            List[List[float]]: the embedding vectors, one for each input
+        """
+        from .pipeline import EmbeddingPipeline
+
+        pipeline = EmbeddingPipeline(model=self, max_workers=max_workers)
+        return [v for _, v in pipeline.run_items(enumerate(images))]
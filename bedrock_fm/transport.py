@@ -0,0 +1,573 @@
+"""Pluggable transports for the Bedrock runtime API.
+
+Models invoke Bedrock through the object passed as `client=`, which by default is a `boto3` `bedrock-runtime`
+client. Any object exposing `invoke_model` and `invoke_model_with_response_stream` with the same keyword arguments
+and response shape can be used instead. `Transport` defines that interface, with async variants.
+
+`HttpTransport` signs requests with SigV4 directly, caching the derived signing keys, and sends them over HTTP/2,
+multiplexing all the in-flight requests over a few connections. It requires `httpx` with HTTP/2 support
+(`pip install bedrock_fm[http2]`).
+
+```py
+from bedrock_fm import Claude3, Model
+from bedrock_fm.transport import HttpTransport
+
+transport = HttpTransport(session=boto3.Session(region_name="us-east-1"))
+fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=transport)
+```
+"""
+
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+    TYPE_CHECKING,
+)
+from abc import abstractmethod
+from datetime import datetime, timezone
+from functools import lru_cache
+from io import BytesIO
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import hmac
+import json
+from attrs import define, field, Factory
+from .eventstream import (
+    EventStreamDecoder,
+    decode_chunks,
+    iter_events,
+    register_decoder,
+)
+
+if TYPE_CHECKING:
+    import boto3
+
+CONTENT_TYPE_APPLICATION_JSON = "application/json"
+SERVICE_NAME = "bedrock"
+
+
+def default_session() -> "boto3.Session":
+    """Creates a default `boto3.Session`. `boto3` is imported on the first call, keeping it out of the
+    import of `bedrock_fm`.
+
+    Returns:
+        boto3.Session: a new session
+    """
+    import boto3
+
+    return boto3.Session()
+
+
+class Transport:
+    """Interface of the objects that models use to invoke Bedrock.
+
+    The sync methods mirror the `boto3` `bedrock-runtime` client: `invoke_model` returns a dictionary whose `body`
+    has a `read()` method and `invoke_model_with_response_stream` returns a dictionary whose `body` is an iterable
+    of `{"chunk": {"bytes": ...}}` events.
+    """
+
+    @abstractmethod
+    def invoke_model(
+        self,
+        *,
+        modelId: str,
+        body: str | bytes,
+        contentType: str = CONTENT_TYPE_APPLICATION_JSON,
+        accept: str = "*/*",
+        **kwargs,
+    ) -> Dict[str, Any]: ...
+
+    @abstractmethod
+    def invoke_model_with_response_stream(
+        self,
+        *,
+        modelId: str,
+        body: str | bytes,
+        contentType: str = CONTENT_TYPE_APPLICATION_JSON,
+        accept: str = "*/*",
+        **kwargs,
+    ) -> Dict[str, Any]: ...
+
+    async def ainvoke_model(self, **kwargs) -> Dict[str, Any]:
+        """Async variant of `invoke_model`. By default runs `invoke_model` in a thread."""
+        import asyncio
+
+        return await asyncio.to_thread(self.invoke_model, **kwargs)
+
+    async def ainvoke_model_with_response_stream(self, **kwargs) -> Dict[str, Any]:
+        """Async variant of `invoke_model_with_response_stream`, the `body` is an async iterator.
+        By default runs the sync method in a thread."""
+        import asyncio
+
+        resp = await asyncio.to_thread(self.invoke_model_with_response_stream, **kwargs)
+        resp["body"] = _aiter_in_thread(resp["body"])
+        return resp
+
+    def credentials(self) -> Any:
+        """The credentials used to sign the requests, if any. Used by `warmup` to resolve and refresh them."""
+        return None
+
+    def open_connections(self, count: int):
+        """Opens up to `count` connections to the endpoint and keeps them in the pool. Used by `warmup`.
+
+        Args:
+            count (int): the number of connections
+        """
+        pass
+
+
+async def _aiter_in_thread(events: Iterable) -> AsyncIterator:
+    import asyncio
+
+    it = iter(events)
+    done = object()
+    while True:
+        e = await asyncio.to_thread(next, it, done)
+        if e is done:
+            return
+        yield e
+
+
+@define
+class Boto3Transport(Transport):
+    """`Transport` backed by a `boto3` `bedrock-runtime` client."""
+
+    session: "boto3.Session" = field(factory=default_session)
+    """A `boto3.Session` object to use to create an instance of the Bedrock client"""
+
+    client: Any = field(
+        default=Factory(
+            lambda self: self.session.client("bedrock-runtime"),
+            takes_self=True,
+        )
+    )
+    """The boto3 client"""
+
+    def invoke_model(self, **kwargs) -> Dict[str, Any]:
+        return self.client.invoke_model(**kwargs)
+
+    def invoke_model_with_response_stream(self, **kwargs) -> Dict[str, Any]:
+        register_decoder(self.client)
+        return self.client.invoke_model_with_response_stream(**kwargs)
+
+    def credentials(self) -> Any:
+        return client_credentials(self.client)
+
+    def open_connections(self, count: int):
+        open_connections(self.client, count)
+
+
+def client_credentials(client: Any) -> Any:
+    """The credentials used by a `Transport` or a boto3 client.
+
+    Args:
+        client (Any): the client
+
+    Returns:
+        Any: the botocore credentials, or None if unknown
+    """
+    if isinstance(client, Transport):
+        return client.credentials()
+    signer = getattr(client, "_request_signer", None)
+    return getattr(signer, "_credentials", None)
+
+
+def open_connections(client: Any, count: int):
+    """Opens up to `count` connections from a `Transport` or a boto3 client to its endpoint, sending
+    concurrent unsigned `GET /` requests. The connections are then kept in the client pool.
+
+    Args:
+        client (Any): the client
+        count (int): the number of connections
+    """
+    if isinstance(client, Transport):
+        client.open_connections(count)
+        return
+    endpoint = getattr(client, "_endpoint", None)
+    if endpoint is None:
+        return
+    from botocore.awsrequest import AWSRequest
+
+    def ping(_):
+        request = AWSRequest(method="GET", url=endpoint.host).prepare()
+        endpoint.http_session.send(request).content
+
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        list(pool.map(ping, range(count)))
+
+
+@lru_cache(maxsize=32)
+def _signing_key(secret_key: str, date: str, region: str, service: str) -> bytes:
+    k = hmac.digest(f"AWS4{secret_key}".encode("utf-8"), date.encode("utf-8"), "sha256")
+    k = hmac.digest(k, region.encode("utf-8"), "sha256")
+    k = hmac.digest(k, service.encode("utf-8"), "sha256")
+    return hmac.digest(k, b"aws4_request", "sha256")
+
+
+@define
+class SigV4Signer:
+    """Minimal AWS Signature Version 4 signer for requests without query strings.
+
+    The derived signing keys only change once a day and are cached.
+    """
+
+    region: str
+    service: str = field(default=SERVICE_NAME)
+
+    def sign(
+        self,
+        method: str,
+        host: str,
+        path: str,
+        headers: Dict[str, str],
+        body: bytes,
+        credentials: Any,
+        now: Optional[datetime] = None,
+    ) -> Dict[str, str]:
+        """Computes the signed headers for a request.
+
+        Args:
+            method (str): the HTTP method
+            host (str): the host name
+            path (str): the URL encoded path
+            headers (Dict[str, str]): the headers to sign
+            body (bytes): the request payload
+            credentials (Any): frozen credentials with `access_key`, `secret_key` and `token`
+            now (datetime, optional): the signing time. Defaults to the current UTC time.
+
+        Returns:
+            Dict[str, str]: the headers to send, including `Authorization`
+        """
+        now = now or datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+        signed = {k.lower(): " ".join(str(v).split()) for k, v in headers.items()}
+        signed["host"] = host
+        signed["x-amz-date"] = amz_date
+        if credentials.token:
+            signed["x-amz-security-token"] = credentials.token
+        names = sorted(signed.keys())
+        signed_headers = ";".join(names)
+        canonical_request = "\n".join(
+            [
+                method,
+                quote(path, safe="/~"),
+                "",
+                "".join(f"{k}:{signed[k]}\n" for k in names),
+                signed_headers,
+                hashlib.sha256(body).hexdigest(),
+            ]
+        )
+        scope = f"{date}/{self.region}/{self.service}/aws4_request"
+        string_to_sign = "\n".join(
+            [
+                "AWS4-HMAC-SHA256",
+                amz_date,
+                scope,
+                hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+            ]
+        )
+        key = _signing_key(credentials.secret_key, date, self.region, self.service)
+        signature = hmac.new(
+            key, string_to_sign.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+        out = dict(headers)
+        out["X-Amz-Date"] = amz_date
+        if credentials.token:
+            out["X-Amz-Security-Token"] = credentials.token
+        out["Authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={credentials.access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        return out
+
+
+def iter_event_stream(raw: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    """Decodes an `application/vnd.amazon.eventstream` byte stream into `{"chunk": {"bytes": ...}}` events.
+
+    Args:
+        raw (Iterable[bytes]): the response body as an iterable of byte blocks
+
+    Raises:
+        ClientError: when the stream contains an exception message
+
+    Yields:
+        Dict[str, Any]: the decoded events, in the same shape as the boto3 `EventStream`
+    """
+    return iter_events(raw)
+
+
+class _StreamingBody:
+    """Streamed response body, iterable as the boto3 `EventStream`.
+
+    `iter_chunk_bytes` lets the models skip building the intermediate events.
+    """
+
+    def __init__(self, response: Any):
+        self._response = response
+
+    def iter_chunk_bytes(self) -> Iterator[bytes]:
+        try:
+            yield from decode_chunks(self._response.iter_bytes())
+        finally:
+            self._response.close()
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for data in self.iter_chunk_bytes():
+            yield {"chunk": {"bytes": data}}
+
+    def close(self):
+        self._response.close()
+
+
+def _raise_for_status(status: int, headers: Any, content: bytes, operation: str):
+    if status < 300:
+        return
+    code = headers.get("x-amzn-ErrorType", "").split(":")[0] or str(status)
+    try:
+        message = json.loads(content).get("message", "")
+    except ValueError:
+        message = content.decode("utf-8", errors="replace")
+    from botocore.exceptions import ClientError
+
+    raise ClientError(
+        {
+            "Error": {"Code": code, "Message": message},
+            "ResponseMetadata": {"HTTPStatusCode": status},
+        },
+        operation,
+    )
+
+
+@define
+class HttpTransport(Transport):
+    """`Transport` that signs requests with SigV4 and sends them over HTTP/2 with `httpx`.
+
+    All the concurrent requests of a transport share the same connections, so a single instance should be
+    shared by all the models and threads of a process.
+    """
+
+    session: "boto3.Session" = field(factory=default_session)
+    """The `boto3.Session` providing region and credentials"""
+
+    region: Optional[str] = field(default=None)
+    """The AWS region. Defaults to the session region"""
+
+    endpoint_url: Optional[str] = field(default=None)
+    """The endpoint. Defaults to `https://bedrock-runtime.<region>.amazonaws.com`"""
+
+    http2: bool = field(default=True)
+    """Use HTTP/2. If false, HTTP/1.1 with a connection pool is used"""
+
+    max_connections: int = field(default=10)
+    """Maximum number of open connections. With HTTP/2 each connection multiplexes many requests"""
+
+    timeout: float = field(default=60.0)
+    """Read timeout in seconds"""
+
+    _http: Any = field(default=None)
+    """The `httpx.Client`, created on first use"""
+
+    _ahttp: Any = field(default=None)
+    """The `httpx.AsyncClient`, created on first use"""
+
+    _signer: SigV4Signer = field(default=None)
+
+    def __attrs_post_init__(self):
+        if self.region is None:
+            self.region = self.session.region_name
+        if self.endpoint_url is None:
+            self.endpoint_url = f"https://bedrock-runtime.{self.region}.amazonaws.com"
+        self.endpoint_url = self.endpoint_url.rstrip("/")
+        if self._signer is None:
+            self._signer = SigV4Signer(region=self.region)
+        from .clients import track
+
+        track(self)
+
+    def __reduce__(self):
+        from .clients import reduce_model
+
+        return reduce_model(self, drop=("_http", "_ahttp"))
+
+    def _after_fork(self):
+        # the connections of the parent must not be used by the child
+        from .clients import reset_model
+
+        reset_model(self, drop=("_http", "_ahttp"))
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        import httpx
+
+        return {
+            "http2": self.http2,
+            "timeout": httpx.Timeout(self.timeout, connect=10.0),
+            "limits": httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+            ),
+        }
+
+    @property
+    def http(self):
+        if self._http is None:
+            import httpx
+
+            self._http = httpx.Client(**self._client_kwargs())
+        return self._http
+
+    @property
+    def ahttp(self):
+        if self._ahttp is None:
+            import httpx
+
+            self._ahttp = httpx.AsyncClient(**self._client_kwargs())
+        return self._ahttp
+
+    def _request(
+        self,
+        model_id: str,
+        action: str,
+        body: str | bytes,
+        content_type: str,
+        accept: str,
+    ) -> Tuple[str, Dict[str, str], bytes]:
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        path = f"/model/{quote(model_id, safe='')}/{action}"
+        host = self.endpoint_url.split("://", 1)[1]
+        headers = self._signer.sign(
+            "POST",
+            host,
+            path,
+            {"Content-Type": content_type, "Accept": accept},
+            body,
+            self.session.get_credentials().get_frozen_credentials(),
+        )
+        return self.endpoint_url + path, headers, body
+
+    def invoke_model(
+        self,
+        *,
+        modelId: str,
+        body: str | bytes,
+        contentType: str = CONTENT_TYPE_APPLICATION_JSON,
+        accept: str = "*/*",
+        **kwargs,
+    ) -> Dict[str, Any]:
+        url, headers, body = self._request(modelId, "invoke", body, contentType, accept)
+        resp = self.http.post(url, content=body, headers=headers)
+        _raise_for_status(resp.status_code, resp.headers, resp.content, "InvokeModel")
+        return {
+            "body": BytesIO(resp.content),
+            "contentType": resp.headers.get("content-type"),
+        }
+
+    def invoke_model_with_response_stream(
+        self,
+        *,
+        modelId: str,
+        body: str | bytes,
+        contentType: str = CONTENT_TYPE_APPLICATION_JSON,
+        accept: str = "*/*",
+        **kwargs,
+    ) -> Dict[str, Any]:
+        url, headers, body = self._request(
+            modelId, "invoke-with-response-stream", body, contentType, accept
+        )
+        request = self.http.build_request("POST", url, content=body, headers=headers)
+        resp = self.http.send(request, stream=True)
+        if resp.status_code >= 300:
+            resp.read()
+            resp.close()
+            _raise_for_status(
+                resp.status_code,
+                resp.headers,
+                resp.content,
+                "InvokeModelWithResponseStream",
+            )
+
+        return {
+            "body": _StreamingBody(resp),
+            "contentType": resp.headers.get("content-type"),
+        }
+
+    async def ainvoke_model(
+        self,
+        *,
+        modelId: str,
+        body: str | bytes,
+        contentType: str = CONTENT_TYPE_APPLICATION_JSON,
+        accept: str = "*/*",
+        **kwargs,
+    ) -> Dict[str, Any]:
+        url, headers, body = self._request(modelId, "invoke", body, contentType, accept)
+        resp = await self.ahttp.post(url, content=body, headers=headers)
+        _raise_for_status(resp.status_code, resp.headers, resp.content, "InvokeModel")
+        return {
+            "body": BytesIO(resp.content),
+            "contentType": resp.headers.get("content-type"),
+        }
+
+    async def ainvoke_model_with_response_stream(
+        self,
+        *,
+        modelId: str,
+        body: str | bytes,
+        contentType: str = CONTENT_TYPE_APPLICATION_JSON,
+        accept: str = "*/*",
+        **kwargs,
+    ) -> Dict[str, Any]:
+        url, headers, body = self._request(
+            modelId, "invoke-with-response-stream", body, contentType, accept
+        )
+        request = self.ahttp.build_request("POST", url, content=body, headers=headers)
+        resp = await self.ahttp.send(request, stream=True)
+        if resp.status_code >= 300:
+            await resp.aread()
+            await resp.aclose()
+            _raise_for_status(
+                resp.status_code,
+                resp.headers,
+                resp.content,
+                "InvokeModelWithResponseStream",
+            )
+
+        async def events():
+            decoder = EventStreamDecoder()
+            try:
+                async for data in resp.aiter_bytes():
+                    for chunk in decoder.chunks(data):
+                        yield {"chunk": {"bytes": chunk}}
+            finally:
+                await resp.aclose()
+
+        return {"body": events(), "contentType": resp.headers.get("content-type")}
+
+    def credentials(self) -> Any:
+        return self.session.get_credentials()
+
+    def open_connections(self, count: int):
+        # with HTTP/2 a single connection is opened and multiplexed
+        count = 1 if self.http2 else min(count, self.max_connections)
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            list(
+                pool.map(lambda _: self.http.get(self.endpoint_url + "/"), range(count))
+            )
+
+    def close(self):
+        """Closes the sync connections."""
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
+    async def aclose(self):
+        """Closes the async connections."""
+        if self._ahttp is not None:
+            await self._ahttp.aclose()
+            self._ahttp = None
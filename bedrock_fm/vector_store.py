@@ -0,0 +1,70 @@
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from abc import abstractmethod
+from threading import Lock
+
+
+class VectorStore:
+    """Abstract destination for embedding vectors.
+
+    To plug in a vector database, inherit from this class and implement `upsert` and `delete`.
+    """
+
+    @abstractmethod
+    def upsert(
+        self,
+        ids: Sequence[str],
+        vectors: Sequence[Any],
+        metadata: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> None:
+        """Insert or replace the vectors for the given ids.
+
+        Args:
+            ids (Sequence[str]): the chunk ids
+            vectors (Sequence[Any]): the embedding vectors, one for each id
+            metadata (Sequence[Dict[str, Any]], optional): additional metadata, one for each id
+        """
+        ...
+
+    @abstractmethod
+    def delete(self, ids: Iterable[str]) -> None:
+        """Remove the vectors for the given ids. Unknown ids are ignored.
+
+        Args:
+            ids (Iterable[str]): the chunk ids
+        """
+        ...
+
+
+class InMemoryVectorStore(VectorStore):
+    """A dictionary backed `VectorStore`, useful for tests and small corpora."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self.vectors: Dict[str, Any] = {}
+        self.metadata: Dict[str, Dict[str, Any]] = {}
+
+    def upsert(
+        self,
+        ids: Sequence[str],
+        vectors: Sequence[Any],
+        metadata: Optional[Sequence[Dict[str, Any]]] = None,
+    ) -> None:
+        with self._lock:
+            for i, (id, v) in enumerate(zip(ids, vectors)):
+                self.vectors[id] = v
+                self.metadata[id] = metadata[i] if metadata is not None else {}
+
+    def delete(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for id in ids:
+                self.vectors.pop(id, None)
+                self.metadata.pop(id, None)
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.vectors
+
+    def ids(self) -> List[str]:
+        return list(self.vectors.keys())
@@ -0,0 +1,196 @@
+"""Warm-up of the Bedrock clients.
+
+The first invocation of a new client resolves the credentials, the endpoint address and opens a TLS connection,
+adding hundreds of milliseconds to the first request after a deploy or a cold start. `Warmer` does this work
+ahead of time. Optionally, a background thread then resolves the credentials periodically, so that temporary
+credentials entering the botocore refresh window are refreshed there rather than in a request thread.
+
+```py
+from bedrock_fm import Claude3, Model
+
+fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, prewarm=True)
+# or
+fm.warmup(connections=8)
+```
+"""
+
+from typing import Any, Callable, Dict, Optional
+import logging
+import os
+import threading
+import weakref
+from attrs import define, field
+from .transport import client_credentials, open_connections
+
+logger = logging.getLogger(__name__)
+
+_warmers: Dict[int, "Warmer"] = {}
+"""Running warmers by client id, an entry is removed when its client is garbage collected"""
+_lock = threading.Lock()
+
+
+def _after_fork():
+    # the refresh threads do not survive a fork, the child warms its own clients again
+    global _lock
+    _lock = threading.Lock()
+    _warmers.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def _refresh_credentials(credentials: Any):
+    # botocore refreshes the credentials inside `get_frozen_credentials()` once they enter its advisory window
+    credentials.get_frozen_credentials()
+
+
+def _forget(key: int, warmer: "Warmer"):
+    with _lock:
+        if _warmers.get(key) is warmer:
+            del _warmers[key]
+    warmer._stop.set()
+
+
+def _reference(client: Any) -> Callable[[], Any]:
+    try:
+        return weakref.ref(client)
+    except TypeError:
+        return lambda: client
+
+
+@define(kw_only=True)
+class Warmer:
+    """Prefetches the credentials and opens the connections of a client, optionally keeping them fresh in
+    background. The warmer references the client weakly: the background thread stops when the client is
+    garbage collected."""
+
+    _client: Callable[[], Any] = field(converter=_reference, alias="client")
+    """A boto3 `bedrock-runtime` client or a `Transport`"""
+    connections: int = field(default=4)
+    """Number of connections to open"""
+    interval: float = field(default=60.0)
+    """Seconds between background refreshes"""
+    keepalive: bool = field(default=False)
+    """Reopen the connections at each background refresh, so that idle connections closed by the server are
+    replaced"""
+    _stop: threading.Event = field(factory=threading.Event)
+    _thread: Optional[threading.Thread] = field(default=None)
+
+    @property
+    def client(self) -> Any:
+        """The client, or None if it was garbage collected"""
+        return self._client()
+
+    def warm(self):
+        """Resolves the credentials and opens the connections."""
+        client = self.client
+        if client is None:
+            return
+        credentials = client_credentials(client)
+        if credentials is not None:
+            _refresh_credentials(credentials)
+        open_connections(client, self.connections)
+
+    def start(self) -> "Warmer":
+        """Warms the client and starts the background refresh thread.
+
+        Returns:
+            Warmer: this warmer
+        """
+        self.warm()
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="bedrock_fm-warmer", daemon=True
+            )
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the background refresh thread."""
+        client = self.client
+        with _lock:
+            if client is not None and _warmers.get(id(client)) is self:
+                del _warmers[id(client)]
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            client = self.client
+            if client is None:
+                return
+            try:
+                credentials = client_credentials(client)
+                if credentials is not None:
+                    _refresh_credentials(credentials)
+                if self.keepalive:
+                    open_connections(client, self.connections)
+            except Exception:
+                logger.warning("Background warm-up failed", exc_info=True)
+            del client
+
+
+def warmup(client: Any, connections: int = 4, background: bool = False) -> Warmer:
+    """Warms a client. With `background`, one refresh thread is started for each client, later calls
+    for the same client return the running `Warmer` after opening the connections again.
+
+    Args:
+        client (Any): a boto3 `bedrock-runtime` client or a `Transport`
+        connections (int, optional): number of connections to open. Defaults to 4.
+        background (bool, optional): keep the credentials fresh in a background thread until `stop()` is
+            called or the client is garbage collected. Defaults to False.
+
+    Returns:
+        Warmer: the warmer
+    """
+    if not background:
+        warmer = Warmer(client=client, connections=connections)
+        warmer.warm()
+        return warmer
+    with _lock:
+        warmer = _warmers.get(id(client))
+        new = warmer is None or warmer.client is not client
+        if new:
+            warmer = Warmer(client=client, connections=connections)
+            _warmers[id(client)] = warmer
+            try:
+                weakref.finalize(client, _forget, id(client), warmer)
+            except TypeError:
+                pass
+    if new:
+        return warmer.start()
+    warmer.connections = max(warmer.connections, connections)
+    warmer.warm()
+    return warmer
+
+
+class Warmable:
+    """Base of the model classes adding `warmup()`, and warming the model up when it is created with
+    `prewarm=True`. The subclasses define the `client` and `prewarm` attributes."""
+
+    __slots__ = ()
+
+    def _prewarm(self):
+        if self.prewarm:
+            try:
+                self.warmup()
+            except Exception:
+                logger.warning("Model warm-up failed", exc_info=True)
+
+    def warmup(self, connections: int = 4, background: bool = False) -> Warmer:
+        """Resolves the credentials and opens connections to the Bedrock endpoint ahead of the first request.
+
+        With `background`, a thread shared by all the models using the same client keeps resolving the
+        credentials, so that botocore refreshes them there rather than in a request thread.
+
+        Args:
+            connections (int, optional): number of connections to open. Defaults to 4.
+            background (bool, optional): keep the credentials fresh in background. Defaults to False.
+
+        Returns:
+            Warmer: the client warmer, call `stop()` to stop the background thread
+        """
+        return warmup(self.client, connections=connections, background=background)
@@ -0,0 +1,56 @@
+"""Measures the throughput of a single `Claude3` instance shared by a pool of threads, against a stub client
+with a fixed latency, and compares it with creating a model for each request.
+
+    python benchmarks/bench_concurrency.py --threads 1 8 64 --requests 2000 --latency 0.02
+
+No network calls are made. With a shared instance the throughput should scale with the number of threads until
+the Python overhead of each request, reported as CPU time per request, saturates one core.
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bedrock_fm import Claude3, Human, Model
+from bedrock_fm.stub import StubBedrockClient
+
+
+def run(threads: int, requests: int, call):
+    with ThreadPoolExecutor(threads) as ex:
+        t = time.perf_counter()
+        c = time.process_time()
+        list(ex.map(call, range(requests)))
+        return time.perf_counter() - t, time.process_time() - c
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    client = StubBedrockClient(latency=args.latency)
+    model_id = Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0
+    shared = Claude3.from_id(model_id, client=client, client_ops=client)
+    conversation = [Human("What is the capital of France?")]
+
+    def shared_call(i):
+        return shared.chat(conversation, temperature=0.1 + (i % 5) / 10)
+
+    def new_model_call(i):
+        fm = Claude3.from_id(model_id, client=client, client_ops=client)
+        return fm.chat(conversation, temperature=0.1 + (i % 5) / 10)
+
+    for name, call in [("shared instance", shared_call), ("model per request", new_model_call)]:
+        for threads in args.threads:
+            requests = min(args.requests, threads * 200)
+            elapsed, cpu = run(threads, requests, call)
+            print(
+                f"{name:>18} threads={threads:<3} {requests / elapsed:9.0f} req/s"
+                f"  {cpu / requests * 1e6:7.1f} us CPU/request"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Compares the tokens decoded per CPU second of the botocore `EventStream` iteration and of the
+`bedrock_fm.eventstream` decoder.
+
+    python benchmarks/bench_eventstream.py --tokens 100000 --block-size 4096
+
+The first two paths decode a synthetic Claude 3 response stream held in memory. The `boto3` paths stream
+responses with boto3 clients from a `bedrock_fm.stub` server running in a subprocess, so that only the CPU time
+of the client is measured. One client is left as is and iterates the botocore `EventStream`. The other one is
+passed to `register_decoder`, as the models do, and returns a `RawEventStream`. All the paths decode the chunk JSON
+and extract the text with `Claude3.get_text`, as `generate(stream=True)` does. No calls are made to AWS.
+"""
+
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import boto3
+from botocore.eventstream import EventStream
+from botocore.parsers import EventStreamJSONParser
+
+from bedrock_fm import Claude3, Model
+from bedrock_fm.eventstream import decode_chunks, encode_chunk, iter_chunk_bytes, register_decoder
+
+
+class RawStream:
+    def __init__(self, data: bytes, block_size: int):
+        self.data = data
+        self.block_size = block_size
+
+    def stream(self):
+        for i in range(0, len(self.data), self.block_size):
+            yield self.data[i : i + self.block_size]
+
+    def close(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=100_000)
+    parser.add_argument("--block-size", type=int, default=4096)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--http-tokens", type=int, default=5_000, help="output tokens of each stub response")
+    parser.add_argument("--http-requests", type=int, default=10)
+    args = parser.parse_args()
+
+    data = b"".join(
+        encode_chunk(
+            json.dumps(
+                {
+                    "type": "content_block_delta",
+                    "index": 0,
+                    "delta": {"type": "text_delta", "text": f" token{i}"},
+                }
+            ).encode()
+        )
+        for i in range(args.tokens)
+    )
+    session = boto3.Session(aws_access_key_id="a", aws_secret_access_key="b", region_name="us-east-1")
+    op = session.client("bedrock-runtime").meta.service_model.operation_model(
+        "InvokeModelWithResponseStream"
+    )
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, session=session)
+
+    def stream():
+        return EventStream(
+            RawStream(data, args.block_size),
+            op.output_shape.members["body"],
+            EventStreamJSONParser(),
+            op.name,
+        )
+
+    def botocore_path():
+        for e in stream():
+            fm.get_text(json.loads(e["chunk"]["bytes"]))
+
+    def fast_path():
+        for c in decode_chunks(RawStream(data, args.block_size).stream()):
+            fm.get_text(json.loads(c))
+
+    report("botocore", botocore_path, args.tokens, args.repeat)
+    report("eventstream", fast_path, args.tokens, args.repeat)
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-u", "-m", "bedrock_fm.stub", "--port", str(port), "--output-tokens", str(args.http_tokens)],
+        stdout=subprocess.PIPE,
+    )
+    try:
+        server.stdout.readline()
+        endpoint_url = f"http://127.0.0.1:{port}"
+        plain = session.client("bedrock-runtime", endpoint_url=endpoint_url)
+        fast = session.client("bedrock-runtime", endpoint_url=endpoint_url)
+        register_decoder(fast)
+
+        body = json.dumps(
+            {"messages": [{"role": "user", "content": "Hello"}], "max_tokens": args.http_tokens}
+        )
+
+        def http_path(client):
+            def run():
+                for _ in range(args.http_requests):
+                    resp = client.invoke_model_with_response_stream(modelId=fm.invocation_model_id(), body=body)
+                    for c in iter_chunk_bytes(resp["body"]):
+                        fm.get_text(json.loads(c))
+
+            return run
+
+        tokens = args.http_tokens * args.http_requests
+        report("boto3", http_path(plain), tokens, args.repeat)
+        report("boto3+decoder", http_path(fast), tokens, args.repeat)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(name, fn, tokens, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        cpu = time.process_time()
+        fn()
+        best = min(best, time.process_time() - cpu)
+    print(f"{name:14} tokens_per_cpu_s={tokens / best:,.0f} us_per_token={1e6 * best / tokens:.2f}")
+
+
+if __name__ == "__main__":
+    main()
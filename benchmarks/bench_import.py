@@ -0,0 +1,74 @@
+"""Measures the import time of `bedrock_fm` with `python -X importtime`, in a fresh interpreter for each scenario.
+
+    python benchmarks/bench_import.py --repeat 5 --max-ms 50
+
+For each scenario the median total import time and the modules with the largest cumulative time are printed.
+With `--max-ms` the script exits with an error when `import bedrock_fm` takes longer, so that it can run in CI to
+catch import time regressions.
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+SCENARIOS = {
+    "import bedrock_fm": "import bedrock_fm",
+    "text model class": "from bedrock_fm import Claude3, Human",
+    "text model instance": "from bedrock_fm import Claude3, Model\n"
+    "Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=object(), client_ops=object())",
+    "image model class": "from bedrock_fm import TitanImageGeneration",
+}
+
+
+def importtime(code: str):
+    """Runs `code` in a new interpreter and returns the cumulative import time in microseconds of each
+    top level import"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not name.startswith("  "):
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def startup():
+    """Modules imported by the interpreter itself, excluded from the totals"""
+    return set(importtime("pass"))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    excluded = startup()
+    failed = False
+    for scenario, code in SCENARIOS.items():
+        runs = [
+            {k: v for k, v in importtime(code).items() if k not in excluded}
+            for _ in range(args.repeat)
+        ]
+        total = statistics.median(sum(r.values()) for r in runs) / 1000
+        print(f"{scenario}: {total:.1f} ms")
+        last = runs[-1]
+        for name in sorted(last, key=last.get, reverse=True)[: args.top]:
+            print(f"    {name}: {last[name] / 1000:.1f} ms")
+        if scenario == "import bedrock_fm" and args.max_ms is not None:
+            failed = total > args.max_ms
+    if failed:
+        sys.exit(f"import bedrock_fm takes more than {args.max_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
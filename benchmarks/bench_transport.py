@@ -0,0 +1,82 @@
+"""Compares the per-call client CPU time and the throughput at increasing concurrency of the boto3 client and
+`HttpTransport`.
+
+    python benchmarks/bench_transport.py --model-id amazon.titan-text-lite-v1 --calls 200 --concurrency 1 16 64
+    python benchmarks/bench_transport.py --endpoint-url http://127.0.0.1:8080 --no-http2
+
+Without Bedrock access, run it against the stub server, started with `python -m bedrock_fm.stub --port 8080`.
+
+The CPU time includes body encoding, signing, HTTP handling and response parsing, measured with
+`time.process_time` over the whole process, so the network latency does not count.
+"""
+
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+from bedrock_fm.transport import HttpTransport
+
+
+def run(client, model_id: str, body: str, calls: int, concurrency: int):
+    def call(_):
+        t = time.perf_counter()
+        resp = client.invoke_model(modelId=model_id, body=body)
+        resp["body"].read()
+        return time.perf_counter() - t
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, range(min(concurrency, calls))))  # warm up connections
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        latencies = sorted(pool.map(call, range(calls)))
+        wall = time.perf_counter() - wall
+        cpu = time.process_time() - cpu
+    return {
+        "cpu_ms_per_call": 1000 * cpu / calls,
+        "throughput_rps": calls / wall,
+        "p50_ms": 1000 * latencies[len(latencies) // 2],
+        "p99_ms": 1000 * latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model-id", default="amazon.titan-text-lite-v1")
+    parser.add_argument("--region", default=None)
+    parser.add_argument("--endpoint-url", default=None)
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--no-http2", action="store_true")
+    args = parser.parse_args()
+
+    session = boto3.Session(region_name=args.region)
+    body = json.dumps(
+        {"inputText": "Hello", "textGenerationConfig": {"maxTokenCount": 16}}
+    )
+    for concurrency in args.concurrency:
+        clients = {
+            "boto3": session.client(
+                "bedrock-runtime",
+                endpoint_url=args.endpoint_url,
+                config=Config(max_pool_connections=10),
+            ),
+            "http2" if not args.no_http2 else "http1": HttpTransport(
+                session=session,
+                endpoint_url=args.endpoint_url,
+                http2=not args.no_http2,
+            ),
+        }
+        for name, client in clients.items():
+            r = run(client, args.model_id, body, args.calls, concurrency)
+            print(
+                f"{name:6} concurrency={concurrency:4} "
+                + " ".join(f"{k}={v:.2f}" for k, v in r.items())
+            )
+
+
+if __name__ == "__main__":
+    main()
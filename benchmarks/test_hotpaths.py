@@ -0,0 +1,163 @@
+"""Microbenchmarks of the CPU spent by the library on each request, with `pytest-benchmark`.
+
+    pytest benchmarks/test_hotpaths.py --benchmark-storage=benchmarks/results --benchmark-autosave
+    pytest benchmarks/test_hotpaths.py --benchmark-storage=benchmarks/results \\
+        --benchmark-compare --benchmark-compare-fail=median:15%
+
+The first command saves the results under `benchmarks/results`, the second compares a run with the latest saved
+one and fails if the median time of any benchmark is more than 15% slower. Responses and event streams come from
+`bedrock_fm.stub`, so no network calls are made. The suite is skipped when `pytest-benchmark` is not installed.
+"""
+
+from io import BytesIO
+import json
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from bedrock_fm import (  # noqa: E402
+    SDXL,
+    Assistant,
+    Claude,
+    Claude3,
+    Command,
+    CommandR,
+    Embed,
+    Human,
+    Jamba,
+    Jurassic,
+    Llama2Chat,
+    Llama3Instruct,
+    Mistral,
+    MistralLarge,
+    Model,
+    Titan,
+    TitanEmbeddings,
+    TitanImageGeneration,
+)
+from bedrock_fm.bedrock import EmbeddingDataType  # noqa: E402
+from bedrock_fm.stub import StubBedrockClient  # noqa: E402
+
+STUB = StubBedrockClient(output_tokens=500, sleep=lambda s: None)
+
+GENERATE = [
+    (Titan, Model.AMAZON_TITAN_TEXT_EXPRESS_V1),
+    (Claude, Model.ANTHROPIC_CLAUDE_V2_1),
+    (Command, Model.COHERE_COMMAND_TEXT_V14),
+    (Jurassic, Model.AI21_J2_MID_V1),
+    (Mistral, Model.MISTRAL_MISTRAL_7B_INSTRUCT_V0_2),
+]
+
+CHAT = [
+    (Claude, Model.ANTHROPIC_CLAUDE_V2_1),
+    (Claude3, Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0),
+    (CommandR, Model.COHERE_COMMAND_R_V1_0),
+    (Jamba, Model.AI21_JAMBA_1_5_MINI_V1_0),
+    (Llama2Chat, Model.META_LLAMA2_13B_CHAT_V1),
+    (Llama3Instruct, Model.META_LLAMA3_8B_INSTRUCT_V1_0),
+    (Mistral, Model.MISTRAL_MISTRAL_7B_INSTRUCT_V0_2),
+    (MistralLarge, Model.MISTRAL_MISTRAL_LARGE_2407_V1_0),
+]
+
+TURNS = [1, 10, 100, 500]
+
+STREAMING = [(cls, model_id) for cls, model_id in CHAT if cls is not Claude]
+
+
+def _ids(params):
+    return [cls.__name__ for cls, _ in params]
+
+
+def conversation(turns: int):
+    return [
+        Human(f"Question {i} about the weather in Paris?") if i % 2 == 0 else Assistant(f"Answer {i}: it is sunny.")
+        for i in range(turns if turns % 2 else turns + 1)
+    ]
+
+
+def body(fm, prompt):
+    return fm.get_body(prompt, 0.9, 0.5, 500, ["STOP"], {}, False)
+
+
+@pytest.mark.parametrize("cls,model_id", GENERATE, ids=_ids(GENERATE))
+def test_get_body(benchmark, cls, model_id):
+    fm = cls.from_id(model_id, client=STUB)
+    benchmark.group = "get_body"
+    benchmark(body, fm, "What is the capital of France? " * 20)
+
+
+@pytest.mark.parametrize("turns", TURNS)
+@pytest.mark.parametrize("cls,model_id", CHAT, ids=_ids(CHAT))
+def test_get_chat_prompt_and_body(benchmark, cls, model_id, turns):
+    fm = cls.from_id(model_id, client=STUB)
+    messages = conversation(turns)
+    benchmark.group = f"chat {turns} turns"
+    benchmark(lambda: body(fm, fm.get_chat_prompt(messages)))
+
+
+@pytest.mark.parametrize("cls,model_id", STREAMING, ids=_ids(STREAMING))
+def test_get_text_stream(benchmark, cls, model_id):
+    fm = cls.from_id(model_id, client=STUB)
+    request = body(fm, fm.get_chat_prompt([Human("Hello")]))
+    events = list(STUB.invoke_model_with_response_stream(modelId=model_id.value, body=request)["body"])
+    benchmark.group = "stream decoding"
+    benchmark.extra_info["chunks"] = len(events)
+    benchmark(lambda: list(fm._get_text_stream(events)))
+
+
+@pytest.mark.parametrize("cls,model_id", CHAT, ids=_ids(CHAT))
+def test_process_response_body(benchmark, cls, model_id):
+    fm = cls.from_id(model_id, client=STUB)
+    request = body(fm, fm.get_chat_prompt([Human("Hello")]))
+    raw = STUB.invoke_model(modelId=model_id.value, body=request)["body"].read()
+    benchmark.group = "process_response_body"
+    benchmark(lambda: fm.process_response_body(fm.codec.loads(raw)))
+
+
+@pytest.mark.parametrize("size", [512, 1024])
+@pytest.mark.parametrize(
+    "cls,model_id",
+    [(TitanImageGeneration, Model.AMAZON_TITAN_IMAGE_GENERATOR_V1), (SDXL, Model.STABILITY_STABLE_DIFFUSION_XL_V1)],
+    ids=["TitanImageGeneration", "SDXL"],
+)
+def test_get_images(benchmark, cls, model_id, size):
+    pytest.importorskip("PIL")
+    fm = cls.from_id(model_id, client=STUB)
+    request = json.dumps({"width": size, "height": size, "imageGenerationConfig": {"width": size, "height": size}})
+    raw = STUB.invoke_model(modelId=model_id.value, body=request)["body"].read()
+
+    def decode():
+        # the images are decoded lazily, load them to include the decoding
+        return [img.load() for img in fm.get_images({"body": BytesIO(raw)})]
+
+    benchmark.group = f"get_images {size}"
+    benchmark(decode)
+
+
+@pytest.mark.parametrize("size", [256, 1024])
+def test_claude3_image_encoding(benchmark, size):
+    Image = pytest.importorskip("PIL.Image")
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=STUB)
+    messages = [Human("What is in this image?", images=[Image.new("RGB", (size, size), (128, 64, 32))])]
+    benchmark.group = "claude3 image encoding"
+    benchmark(lambda: body(fm, fm.get_chat_prompt(messages)))
+
+
+@pytest.mark.parametrize("batch", [1, 16, 96])
+@pytest.mark.parametrize("embedding_type", [EmbeddingDataType.FLOAT, EmbeddingDataType.INT8])
+def test_cohere_parse_response(benchmark, batch, embedding_type):
+    if embedding_type != EmbeddingDataType.FLOAT:
+        pytest.importorskip("numpy")
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=STUB, embedding_type=embedding_type)
+    texts = [f"passage {i} about the weather in Paris" for i in range(batch)]
+    raw = STUB.invoke_model(modelId=fm._model_id, body=fm.get_body(texts, None))["body"].read()
+    benchmark.group = f"embeddings parse_response {batch}"
+    benchmark(lambda: fm.parse_response({"body": BytesIO(raw)}))
+
+
+def test_titan_parse_response(benchmark):
+    fm = TitanEmbeddings.from_id(Model.AMAZON_TITAN_EMBED_TEXT_V2_0, client=STUB)
+    raw = STUB.invoke_model(modelId=fm._model_id, body=fm.get_body(["passage"], None))["body"].read()
+    benchmark.group = "embeddings parse_response 1"
+    benchmark(lambda: fm.parse_response({"body": BytesIO(raw)}))
@@ -0,0 +1,247 @@
+from bedrock_fm import BatchRunner, Claude3, Embed, Model, Titan
+from bedrock_fm.batch import (
+    Checkpoint,
+    export_output,
+    iter_records,
+    main,
+    merge_shards,
+    parse_shard,
+    shard_of,
+    shard_path,
+    usage,
+)
+from bedrock_fm.exceptions import BedrockArgsError
+from bedrock_fm.stub import StubBedrockClient
+import json
+import os
+import pytest
+
+
+def write_input(path, n):
+    with open(path, "w") as f:
+        for i in range(n):
+            if i % 3 == 0:
+                record = {"id": f"r{i}", "messages": [{"role": "user", "content": f"Hello {i}"}]}
+            else:
+                record = {"id": f"r{i}", "prompt": f"Hello {i}", "max_token_count": 4}
+            f.write(json.dumps(record) + "\n")
+        f.write("\n")
+        f.write(json.dumps({"prompt": "no id"}) + "\n")
+
+
+def read_output(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def runner(tmp_path, client, **kwargs):
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client)
+    return BatchRunner(model=fm, output_path=str(tmp_path / "out.jsonl"), sleep=lambda s: None, **kwargs)
+
+
+def test_run(tmp_path):
+    write_input(tmp_path / "in.jsonl", 20)
+    client = StubBedrockClient(output_tokens=8)
+    report = runner(tmp_path, client, max_workers=4, flush_every=3).run_file(str(tmp_path / "in.jsonl"))
+    assert report.records == report.completed == client.calls == 21
+    assert report.errors == 0 and report.output_tokens > 0
+    rows = read_output(tmp_path / "out.jsonl")
+    assert sorted(r["id"] for r in rows) == sorted([f"r{i}" for i in range(20)] + ["22"])
+    r1 = next(r for r in rows if r["id"] == "r1")
+    assert r1["usage"]["output_tokens"] == 4 and r1["attempts"] == 1
+    assert r1["output"] == ["the quick brown fox"]
+
+
+def test_resume(tmp_path):
+    write_input(tmp_path / "in.jsonl", 30)
+    records = iter_records(str(tmp_path / "in.jsonl"))
+    client = StubBedrockClient()
+    partial = [next(records) for _ in range(10)]
+    runner(tmp_path, client, flush_every=4).run(partial)
+    assert client.calls == 10
+
+    # a crash after writing outputs but before checkpointing them, and during a checkpoint write
+    with open(tmp_path / "out.jsonl", "a") as f:
+        f.write('{"id": "r10", "output": ["lost"]}\n{"id": "r1')
+    with open(tmp_path / "out.jsonl.checkpoint", "a") as f:
+        f.write('{"offset": 99999, "ids": ["r1')
+
+    report = runner(tmp_path, client).run_file(str(tmp_path / "in.jsonl"))
+    assert report.skipped == 10 and report.completed == 21
+    assert client.calls == 31
+    ids = [r["id"] for r in read_output(tmp_path / "out.jsonl")]
+    assert len(ids) == len(set(ids)) == 31
+    checkpoint = Checkpoint(str(tmp_path / "out.jsonl.checkpoint"))
+    checkpoint.load()
+    assert checkpoint.done == set(ids)
+
+    report = runner(tmp_path, client).run_file(str(tmp_path / "in.jsonl"))
+    assert report.skipped == 31 and report.completed == 0 and client.calls == 31
+
+
+def test_retries_and_errors(tmp_path):
+    write_input(tmp_path / "in.jsonl", 20)
+    client = StubBedrockClient(throttle_rate=0.5, seed=1)
+    report = runner(tmp_path, client, max_retries=20).run_file(str(tmp_path / "in.jsonl"))
+    assert report.errors == 0 and report.retries > 0
+    assert client.calls == 21 + report.retries
+
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=StubBedrockClient(error_rate=1.0))
+    out = str(tmp_path / "errors.jsonl")
+    report = BatchRunner(model=fm, output_path=out).run([("a", {"prompt": "Hi"}), ("b", {"text": "no prompt"})])
+    assert report.errors == 2
+    errors = {r["id"]: r["error"]["code"] for r in read_output(out)}
+    assert errors == {"a": "ModelErrorException", "b": "BedrockArgsError"}
+
+
+def test_retry_errors_and_output_checks(tmp_path):
+    write_input(tmp_path / "in.jsonl", 20)
+    report = runner(tmp_path, StubBedrockClient(error_rate=0.5, seed=3)).run_file(str(tmp_path / "in.jsonl"))
+    assert 0 < report.errors < 21
+    checkpoint = Checkpoint(str(tmp_path / "out.jsonl.checkpoint"))
+    checkpoint.load()
+    assert len(checkpoint.failed) == report.errors
+
+    client = StubBedrockClient()
+    report = runner(tmp_path, client).run_file(str(tmp_path / "in.jsonl"))
+    assert report.completed == 0 and client.calls == 0
+    report = runner(tmp_path, client, retry_errors=True).run_file(str(tmp_path / "in.jsonl"))
+    assert report.completed == client.calls == len(checkpoint.failed) and report.errors == 0
+    checkpoint = Checkpoint(str(tmp_path / "out.jsonl.checkpoint"))
+    checkpoint.load()
+    assert checkpoint.failed == set()
+    merged = merge_shards(str(tmp_path / "in.jsonl"), [str(tmp_path / "out.jsonl")], str(tmp_path / "merged.jsonl"))
+    assert merged.written == 21 and merged.errors == 0
+    assert export_output(str(tmp_path / "out.jsonl"), str(tmp_path / "export.jsonl")) == 21
+
+    # a hand edited output, and an output without its checkpoint, are not overwritten
+    rows = read_output(tmp_path / "out.jsonl")
+    with open(tmp_path / "out.jsonl", "w") as f:
+        f.writelines(json.dumps(r) + "\n" for r in rows[1:])
+    with pytest.raises(BedrockArgsError, match="shorter"):
+        runner(tmp_path, client).run_file(str(tmp_path / "in.jsonl"))
+    (tmp_path / "out.jsonl.checkpoint").unlink()
+    with pytest.raises(BedrockArgsError, match="without the checkpoint"):
+        runner(tmp_path, client).run_file(str(tmp_path / "in.jsonl"))
+    assert len(read_output(tmp_path / "out.jsonl")) == len(rows) - 1
+
+
+def test_template_and_rate(tmp_path):
+    delays = []
+    client = StubBedrockClient()
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=client)
+    out = str(tmp_path / "out.jsonl")
+    batch = BatchRunner(
+        model=fm,
+        output_path=out,
+        template="Classify: {text}",
+        generate_args={"max_token_count": 3},
+        rate=10,
+        max_workers=1,
+        sleep=delays.append,
+    )
+    assert batch.render({"text": "great"}) == ("generate", "Classify: great")
+    report = batch.run((str(i), {"text": f"review {i}"}) for i in range(5))
+    assert report.output_tokens == 15
+    # the fake sleep does not advance the clock, the invocations are scheduled 0.1s apart
+    assert len(delays) == 4 and 0.3 < delays[-1] <= 0.4
+
+
+def test_usage():
+    assert usage({"usage": {"input_tokens": 3, "output_tokens": 5}}) == {"input_tokens": 3, "output_tokens": 5}
+    assert usage({"prompt_token_count": 3, "generation_token_count": 5}) == {"input_tokens": 3, "output_tokens": 5}
+    assert usage({"inputTextTokenCount": 3, "results": [{"tokenCount": 5}]}) == {"input_tokens": 3, "output_tokens": 5}
+    assert usage({"outputs": []}) == {"input_tokens": None, "output_tokens": None}
+
+
+def test_cli(tmp_path, capsys):
+    write_input(tmp_path / "in.jsonl", 5)
+    args = [
+        "--model-id",
+        Model.META_LLAMA3_8B_INSTRUCT_V1_0.value,
+        "--input",
+        str(tmp_path / "in.jsonl"),
+        "--output",
+        str(tmp_path / "out.jsonl"),
+        "--stub",
+    ]
+    main(args)
+    assert json.loads(capsys.readouterr().out)["completed"] == 6
+    main(args)
+    assert json.loads(capsys.readouterr().out)["skipped"] == 6
+    with pytest.raises(SystemExit):
+        main(args[:2])
+
+
+def test_shards(tmp_path):
+    assert shard_of("record-1", 8) == shard_of("record-1", 8)
+    assert parse_shard("3/8") == (3, 8)
+    for value in ("8/8", "x/2", "1"):
+        with pytest.raises(BedrockArgsError):
+            parse_shard(value)
+    assert shard_path("out/vectors.jsonl", 2, 8) == "out/vectors-00002-of-00008.jsonl"
+
+    write_input(tmp_path / "in.jsonl", 60)
+    records = list(iter_records(str(tmp_path / "in.jsonl")))
+    client = StubBedrockClient()
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client)
+    out = str(tmp_path / "out.jsonl")
+    counts = []
+    for i in range(3):
+        batch = BatchRunner(model=fm, output_path=shard_path(out, i, 3), shard=(i, 3))
+        # the worker of shard 0 stops half way through the input
+        counts.append(batch.run(records[:30] if i == 0 else records).records)
+    assert client.calls == sum(counts) and all(c > 5 for c in counts)
+
+    merged = merge_shards(str(tmp_path / "in.jsonl"), [shard_path(out, i, 3) for i in range(3)], out)
+    ids = [r["id"] for r in read_output(out)]
+    expected = [r for r, _ in iter_records(str(tmp_path / "in.jsonl"))]
+    assert ids == [r for r in expected if r not in merged.missing]
+    assert merged.records == 61 and merged.written + len(merged.missing) == 61
+    assert 0 < len(merged.missing) < 30
+    assert list(merged.missing_by_shard) == [0]
+
+
+def test_embeddings(tmp_path):
+    client = StubBedrockClient()
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=client)
+    out = str(tmp_path / "vectors.jsonl")
+    records = [(str(i), {"text": f"passage {i}"}) for i in range(25)] + [("bad", {"title": "no text"})]
+    report = BatchRunner(model=fm, output_path=out, batch_size=10).run(records)
+    assert report.completed == 26 and report.errors == 1
+    assert client.calls == 3
+    rows = {r["id"]: r for r in read_output(out)}
+    assert len(rows["3"]["embedding"]) == 1024
+    assert rows["bad"]["error"]["code"] == "BedrockArgsError"
+
+
+def test_cli_shards(tmp_path, capsys):
+    write_input(tmp_path / "in.jsonl", 20)
+    out = str(tmp_path / "out.jsonl")
+    base = ["--input", str(tmp_path / "in.jsonl"), "--output", out]
+    for i in range(2):
+        main(base + ["--model-id", Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0.value, "--stub", "--shard", f"{i}/2"])
+    capsys.readouterr()
+    main(base + ["--merge", "2"])
+    assert json.loads(capsys.readouterr().out) == {
+        "records": 21,
+        "written": 21,
+        "errors": 0,
+        "missing": 0,
+        "missing_by_shard": {},
+    }
+    assert len(read_output(out)) == 21
+    with pytest.raises(SystemExit):
+        main(base)
+
+    # the checkpoint of each shard is derived from --checkpoint like the outputs
+    out = str(tmp_path / "custom.jsonl")
+    checkpoint = str(tmp_path / "state" / "run.checkpoint")
+    os.makedirs(os.path.dirname(checkpoint))
+    base = ["--input", str(tmp_path / "in.jsonl"), "--output", out, "--checkpoint", checkpoint]
+    for i in range(2):
+        main(base + ["--model-id", Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0.value, "--stub", "--shard", f"{i}/2"])
+    assert os.path.exists(shard_path(checkpoint, 1, 2)) and not os.path.exists(checkpoint)
+    capsys.readouterr()
+    main(base + ["--merge", "2"])
+    assert json.loads(capsys.readouterr().out)["written"] == 21
@@ -0,0 +1,197 @@
+from bedrock_fm import (
+    BatchInference,
+    BedrockBatchJobs,
+    Claude3,
+    Human,
+    LocalBatchJobs,
+    LocalStorage,
+    Model,
+    Titan,
+)
+from bedrock_fm.batch_inference import BatchJobs
+from bedrock_fm.exceptions import BedrockArgsError, BedrockBatchJobError
+from bedrock_fm.stub import StubBedrockClient
+from botocore.stub import Stubber
+import boto3
+import json
+import pytest
+
+
+def make_batch(tmp_path, client=None, jobs=None, **kwargs):
+    storage = LocalStorage(str(tmp_path))
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=StubBedrockClient())
+    jobs = jobs or LocalBatchJobs(storage, client or StubBedrockClient(output_tokens=3))
+    return BatchInference(model=fm, storage=storage, jobs=jobs, sleep=lambda s: None, **kwargs)
+
+
+def items(n):
+    return [f"Prompt {i}" if i % 2 else [Human(f"Conversation {i}")] for i in range(n)]
+
+
+def test_run_local(tmp_path):
+    batch = make_batch(tmp_path, max_records_per_job=10, generate_args={"max_token_count": 50})
+    jobs = batch.prepare(items(25), run_id="run")
+    assert [(j.first, j.count) for j in jobs] == [(0, 10), (10, 10), (20, 5)]
+    with open(jobs[1].input_uri) as f:
+        record = json.loads(f.readline())
+    assert record["recordId"] == "00000000010"
+    assert record["modelInput"]["max_tokens"] == 50
+    assert "Conversation 10" in json.dumps(record["modelInput"]["messages"])
+
+    results = list(batch.run(items(25)))
+    assert [r.index for r in results] == list(range(25))
+    assert all(r.error is None and r.output == ["the quick brown"] for r in results)
+    assert results[0].response["usage"]["output_tokens"] == 3
+
+
+def test_shard_by_size(tmp_path):
+    batch = make_batch(tmp_path, max_bytes_per_job=1000)
+    jobs = batch.prepare(items(30), run_id="run")
+    assert len(jobs) > 2 and sum(j.count for j in jobs) == 30
+    for job in jobs:
+        assert 0 < len(open(job.input_uri, "rb").read()) <= 1000
+    with pytest.raises(BedrockArgsError):
+        make_batch(tmp_path, max_bytes_per_job=10).prepare(["Hello"])
+
+
+def test_minimum_records_per_job(tmp_path):
+    batch = make_batch(tmp_path, max_records_per_job=10, min_records_per_job=4)
+    jobs = batch.prepare(items(21), run_id="run")
+    assert [(j.first, j.count) for j in jobs] == [(0, 10), (10, 7), (17, 4)]
+    with open(jobs[2].input_uri) as f:
+        assert [json.loads(line)["recordId"] for line in f] == [f"{i:011d}" for i in range(17, 21)]
+    assert [r.index for r in batch.run(items(21))] == list(range(21))
+
+    batch = make_batch(tmp_path, max_records_per_job=10, min_records_per_job=6)
+    assert [(j.first, j.count) for j in batch.prepare(items(13), run_id="even")] == [(0, 7), (7, 6)]
+    batch = make_batch(tmp_path, max_records_per_job=10, min_records_per_job=8)
+    with pytest.raises(BedrockArgsError, match="at least 8 records"):
+        batch.prepare(items(13), run_id="small")
+    with pytest.raises(BedrockArgsError, match="at least 100 records"):
+        BatchInference(
+            model=batch.model, storage=batch.storage, jobs=BedrockBatchJobs("role", client=object())
+        ).prepare(items(5), run_id="bedrock")
+
+
+def test_record_errors(tmp_path):
+    batch = make_batch(tmp_path, client=StubBedrockClient(error_rate=0.3, seed=2))
+    results = list(batch.run(f"Prompt {i}" for i in range(40)))
+    errors = [r for r in results if r.error is not None]
+    assert 0 < len(errors) < 40
+    assert errors[0].error["errorCode"] == 424
+    assert all(r.output for r in results if r.error is None)
+
+
+class FakeJobs(BatchJobs):
+    def __init__(self, local, statuses):
+        self.local = local
+        self.statuses = statuses
+        self.submitted = []
+        self.stopped = []
+        self.polls = {}
+        self.names = {}
+
+    def submit(self, name, model_id, input_uri, output_uri):
+        self.submitted.append(name)
+        job_id = self.local.submit(name, model_id, input_uri, output_uri)
+        self.names[job_id] = name
+        return job_id
+
+    def status(self, job_id):
+        n = self.polls[job_id] = self.polls.get(job_id, 0) + 1
+        statuses = self.statuses(self.names[job_id])
+        return statuses[min(n, len(statuses)) - 1], "message"
+
+    def stop(self, job_id):
+        self.stopped.append(job_id)
+
+
+def test_polling_and_failures(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    local = LocalBatchJobs(storage, StubBedrockClient())
+    fake = FakeJobs(local, lambda name: ["Submitted", "InProgress", "Completed"])
+    sleeps = []
+    batch = make_batch(tmp_path, jobs=fake, max_records_per_job=5, max_concurrent_jobs=2)
+    batch.sleep = sleeps.append
+    stream = batch.run(f"Prompt {i}" for i in range(15))
+    assert next(stream).index == 0
+    assert len(fake.submitted) == 2 and len(sleeps) == 2
+    assert [r.index for r in stream] == list(range(1, 15))
+    assert len(fake.submitted) == 3
+
+    fake = FakeJobs(local, lambda name: ["InProgress", "Failed"] if name.endswith("-1") else ["InProgress"])
+    batch = make_batch(tmp_path, jobs=fake, max_records_per_job=5)
+    with pytest.raises(BedrockBatchJobError, match="failed: message, stopped the other jobs: ") as e:
+        list(batch.run(f"Prompt {i}" for i in range(15)))
+    assert len(fake.stopped) == 2 and all(job_id in str(e.value) for job_id in fake.stopped)
+
+    fake = FakeJobs(local, lambda name: ["InProgress"])
+    batch = make_batch(tmp_path, jobs=fake, timeout=0)
+    with pytest.raises(BedrockBatchJobError, match="Timeout") as e:
+        list(batch.run(["Prompt"]))
+    assert len(fake.stopped) == 1 and fake.stopped[0] in str(e.value)
+
+    # abandoning the results stops the running jobs
+    fake = FakeJobs(local, lambda name: ["Completed"] if name.endswith("-0") else ["InProgress"])
+    batch = make_batch(tmp_path, jobs=fake, max_records_per_job=5, max_concurrent_jobs=2)
+    stream = batch.run(f"Prompt {i}" for i in range(15))
+    assert next(stream).index == 0
+    stream.close()
+    assert len(fake.submitted) == 2 and len(fake.stopped) == 1
+
+
+def test_missing_records(tmp_path):
+    batch = make_batch(tmp_path)
+    (job,) = batch.prepare(["a", "b", "c"], run_id="run")
+    batch.submit(job)
+    (out,) = batch.storage.list(job.output_uri)
+    with open(out) as f:
+        lines = f.readlines()
+    with open(out, "w") as f:
+        f.writelines(lines[:1] + lines[2:])
+    results = list(batch.results(job))
+    assert [r.error["errorCode"] if r.error else None for r in results] == [None, "MissingRecord", None]
+
+
+def test_bedrock_jobs():
+    client = boto3.client("bedrock", region_name="us-east-1")
+    jobs = BedrockBatchJobs("arn:aws:iam::123456789012:role/Batch", client=client, tags={"team": "ml"})
+    arn = "arn:aws:bedrock:us-east-1:123456789012:model-invocation-job/abc123"
+    with Stubber(client) as stubber:
+        stubber.add_response(
+            "create_model_invocation_job",
+            {"jobArn": arn},
+            {
+                "jobName": "job-1",
+                "roleArn": "arn:aws:iam::123456789012:role/Batch",
+                "modelId": "amazon.titan-text-express-v1",
+                "inputDataConfig": {"s3InputDataConfig": {"s3Uri": "s3://b/in.jsonl", "s3InputFormat": "JSONL"}},
+                "outputDataConfig": {"s3OutputDataConfig": {"s3Uri": "s3://b/out/"}},
+                "tags": [{"key": "team", "value": "ml"}],
+            },
+        )
+        stubber.add_response(
+            "get_model_invocation_job",
+            {
+                "jobArn": arn,
+                "modelId": "amazon.titan-text-express-v1",
+                "roleArn": "arn:aws:iam::123456789012:role/Batch",
+                "status": "InProgress",
+                "submitTime": "2024-01-01T00:00:00Z",
+                "inputDataConfig": {"s3InputDataConfig": {"s3Uri": "s3://b/in.jsonl"}},
+                "outputDataConfig": {"s3OutputDataConfig": {"s3Uri": "s3://b/out/"}},
+            },
+            {"jobIdentifier": arn},
+        )
+        assert jobs.submit("job-1", "amazon.titan-text-express-v1", "s3://b/in.jsonl", "s3://b/out/") == arn
+        assert jobs.status(arn) == ("InProgress", None)
+
+
+def test_model_input_matches_generate(tmp_path):
+    client = StubBedrockClient()
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=client, max_token_count=77)
+    batch = BatchInference(model=fm, storage=LocalStorage(str(tmp_path)), jobs=LocalBatchJobs(None, client))
+    details = fm.generate("Hello", details=True)
+    assert batch.model_input("Hello") == json.loads(details.body)
+    with pytest.raises(BedrockArgsError):
+        batch.model_input([Human("Hello")])
@@ -0,0 +1,81 @@
+from bedrock_fm import Claude3, Embed, Model, Titan
+from bedrock_fm.bench import LoadResult, Sample, find_knee, main, make_call, run_load, sweep
+from bedrock_fm.stub import StubBedrockClient
+import json
+import pytest
+
+
+def test_fixed_concurrency():
+    client = StubBedrockClient(latency=0.01, tokens_per_second=2000, output_tokens=10)
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client)
+    result = run_load(make_call(fm, stream=True), model_id=fm._model_id, concurrency=4, requests=40)
+    assert client.calls == 40
+    report = result.report()
+    assert report["requests"] == 40 and report["throttle_rate"] == 0
+    assert 10 <= report["ttft_p50_ms"] < report["p50_ms"] <= report["p99_ms"]
+    assert all(s.output_tokens == 10 for s in result.samples)
+    assert report["output_tokens_per_s"] > 0 and report["cpu_ms_per_request"] > 0
+
+
+def test_fixed_rate_and_throttling():
+    client = StubBedrockClient(latency=0.01, throttle_rate=0.5, seed=3)
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=client)
+    result = run_load(make_call(fm), rate=100, requests=40)
+    assert result.requests == 40
+    assert 0.2 < result.throttle_rate < 0.8
+    assert result.error_rate == 0
+    assert result.elapsed >= 0.39
+    assert result.ttft(50) is None
+
+
+def test_embeddings_call():
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=StubBedrockClient())
+    result = run_load(make_call(fm, batch=8), concurrency=2, requests=4)
+    assert len(result.ok) == 4
+
+
+def test_find_knee():
+    def result(concurrency, throughput):
+        r = LoadResult(model_id="m", concurrency=concurrency, elapsed=1.0)
+        r.samples = [Sample(latency=0.1)] * throughput
+        return r
+
+    results = [result(1, 10), result(2, 20), result(4, 38), result(8, 40), result(16, 39)]
+    assert find_knee(results).concurrency == 4
+    assert find_knee([result(1, 0)]) is None
+    with pytest.raises(ValueError):
+        run_load(lambda: Sample(latency=0), concurrency=1, rate=1, requests=1)
+
+
+def test_sweep():
+    client = StubBedrockClient(latency=0.005)
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=client)
+    results = sweep(make_call(fm), [1, 4], requests_per_level=8)
+    assert [r.concurrency for r in results] == [1, 4]
+    assert client.calls == 16
+
+
+def test_cli(capsys):
+    main(
+        [
+            "--model-id",
+            Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0.value,
+            "--stub",
+            "--stub-latency",
+            "0.001",
+            "--stub-tokens-per-second",
+            "0",
+            "--sweep",
+            "1",
+            "2",
+            "--requests",
+            "4",
+            "--instance-profile",
+            "us",
+            "--json",
+        ]
+    )
+    lines = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [line.get("concurrency") for line in lines if "p50_ms" in line] == [1, 2, 1, 2]
+    knees = [line for line in lines if "knee_concurrency" in line]
+    assert [k["instance_profile"] for k in knees] == [None, "us"]
@@ -0,0 +1,112 @@
+from bedrock_fm import (
+    CassetteClient,
+    CassetteMode,
+    Claude3,
+    Human,
+    Model,
+    TitanEmbeddings,
+    TitanImageGeneration,
+)
+from bedrock_fm.cassette import body_hash
+from bedrock_fm.exceptions import BedrockCassetteMissError
+from bedrock_fm.stub import StubBedrockClient
+from botocore.exceptions import ClientError, EventStreamError
+import pytest
+
+
+def record(path, **kwargs):
+    stub = StubBedrockClient(output_tokens=6, sleep=lambda s: None, **kwargs)
+    return CassetteClient(path, mode=CassetteMode.RECORD, client=stub)
+
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path / "cassette.jsonl.gz")
+    client = record(path)
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client)
+    emb = TitanEmbeddings.from_id(Model.AMAZON_TITAN_EMBED_TEXT_V2_0, client=client)
+    text = fm.generate("Hello")
+    stream = list(fm.chat([Human("Hello")], stream=True))
+    vector = emb.generate_for_documents(["Hello"])
+    assert client.client.calls == 3
+
+    replay = CassetteClient(path)
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=replay)
+    emb = TitanEmbeddings.from_id(Model.AMAZON_TITAN_EMBED_TEXT_V2_0, client=replay)
+    assert fm.generate("Hello") == text
+    assert list(fm.chat([Human("Hello")], stream=True)) == stream
+    assert emb.generate_for_documents(["Hello"]) == vector
+    with pytest.raises(BedrockCassetteMissError):
+        fm.generate("Goodbye")
+    with pytest.raises(BedrockCassetteMissError):
+        fm.generate("Goodbye", stream=True)
+
+
+def test_images(tmp_path):
+    pytest.importorskip("PIL")
+    path = str(tmp_path / "images.jsonl")
+    fm = TitanImageGeneration.from_id(Model.AMAZON_TITAN_IMAGE_GENERATOR_V1, client=record(path))
+    fm.generate("a cat", width=320, height=320)
+    fm = TitanImageGeneration.from_id(Model.AMAZON_TITAN_IMAGE_GENERATOR_V1, client=CassetteClient(path))
+    assert fm.generate("a cat", width=320, height=320)[0].size == (320, 320)
+
+
+def test_body_hash_normalized():
+    assert body_hash('{"a": 1, "b": [1, 2]}') == body_hash(b'{"b":[1,2],"a":1}')
+    assert body_hash('{"a": 1}') != body_hash('{"a": 2}')
+    assert body_hash(b"\xff\x00") == body_hash(b"\xff\x00")
+
+
+def test_errors_replayed(tmp_path):
+    path = str(tmp_path / "errors.jsonl")
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=record(path, throttle_rate=1.0))
+    with pytest.raises(ClientError):
+        fm.generate("Hello")
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=record(path, stream_error_rate=1.0))
+    with pytest.raises(EventStreamError):
+        list(fm.generate("Hello", stream=True))
+
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=CassetteClient(path))
+    with pytest.raises(ClientError) as e:
+        fm.generate("Hello")
+    assert e.value.response["Error"]["Code"] == "ThrottlingException"
+    assert e.value.response["ResponseMetadata"]["HTTPStatusCode"] == 429
+    chunks = []
+    with pytest.raises(EventStreamError):
+        for c in fm.generate("Hello", stream=True):
+            chunks.append(c)
+    assert chunks
+
+
+def test_realtime_replay(tmp_path):
+    path = str(tmp_path / "timing.jsonl")
+    stub = StubBedrockClient(latency=0.02, tokens_per_second=200, output_tokens=3)
+    client = CassetteClient(path, mode=CassetteMode.RECORD, client=stub)
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client)
+    list(fm.generate("Hello", stream=True))
+    entry = CassetteClient.load(path)[0]
+    assert entry["op"] == "stream" and entry["model"] == Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0.value
+    assert entry["chunks"][0][0] >= 0.015
+    assert entry["chunks"][2][0] >= 0.004
+
+    delays = []
+    replay = CassetteClient(path, realtime=True, sleep=delays.append)
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=replay)
+    list(fm.generate("Hello", stream=True))
+    assert delays == [entry["latency"]] + [c[0] for c in entry["chunks"]]
+    delays.clear()
+    replay.realtime = False
+    list(fm.generate("Hello", stream=True))
+    assert delays == []
+
+
+def test_record_closed_stream(tmp_path):
+    path = str(tmp_path / "closed.jsonl")
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=record(path))
+    stream = fm.generate("Hello", stream=True)
+    first = next(stream)
+    stream.close()
+    entry = CassetteClient.load(path)[0]
+    assert entry["truncated"] and len(entry["chunks"]) < 8
+
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=CassetteClient(path))
+    assert next(fm.generate("Hello", stream=True)) == first
@@ -0,0 +1,100 @@
+from bedrock_fm import Embed, Human, InstanceProfile, Jurassic, Llama3Instruct, Model, Titan, get_capabilities
+from bedrock_fm.catalog import _PROFILE_PREFIXES, catalog_version, clear_cache, list_foundation_models
+from io import BytesIO
+
+
+class FakeClient:
+    def __init__(self, region="us-east-1"):
+        self.model_ids = []
+        self.meta = type("Meta", (), {"region_name": region})()
+
+    def invoke_model(self, modelId, **kwargs):
+        self.model_ids.append(modelId)
+        return {"body": BytesIO(b'{"generation": "\\n\\nhi"}')}
+
+
+class FakeOpsClient:
+    def __init__(self):
+        self.calls = 0
+
+    def list_foundation_models(self):
+        self.calls += 1
+        return {
+            "modelSummaries": [
+                {"modelId": "amazon.titan-text-express-v1"},
+                {"modelId": "amazon.titan-embed-text-v1"},
+            ]
+        }
+
+
+def test_catalog_covers_enum():
+    from bedrock_fm.model_catalog import CATALOG
+
+    assert catalog_version()
+    # tools/gen_model_enum.py writes one enum member per catalog entry, models are added there and not by hand
+    assert {m.value for m in Model} == set(CATALOG)
+    for m in Model:
+        assert get_capabilities(m).model_id == m.value
+    caps = get_capabilities("us.anthropic.claude-3-haiku-20240307-v1:0")
+    assert caps.model_id == Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0.value
+    assert caps.streaming
+    assert caps.max_output_tokens == 4096
+    assert get_capabilities("acme.unknown-v1") is None
+
+
+def test_catalog_limits_are_advisory(caplog):
+    client = FakeClient()
+    fm = Jurassic.from_id(Model.AI21_J2_MID_V1, client=client, client_ops=client)
+    with caplog.at_level("WARNING", logger="bedrock_fm.bedrock"):
+        fm.prepare_body("A", stream=True)
+        fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_LITE_V1, client=client, client_ops=client)
+        assert '"maxTokenCount": 5000' in fm.prepare_body("A", max_token_count=5000)
+    assert "streaming" in caplog.records[0].getMessage()
+    assert "5000" in caplog.records[1].getMessage()
+    assert client.model_ids == []
+
+
+def test_inference_profile_routing():
+    client = FakeClient("eu-west-1")
+    fm = Llama3Instruct.from_id(Model.META_LLAMA3_2_1B_INSTRUCT_V1_0, client=client, client_ops=client)
+    assert fm.chat([Human("A")]) == ["hi"]
+    fm = Llama3Instruct.from_id(
+        Model.META_LLAMA3_2_1B_INSTRUCT_V1_0, client=client, client_ops=client, auto_profile=True
+    )
+    assert fm.chat([Human("A")]) == ["hi"]
+    fm = Llama3Instruct.from_id(Model.META_LLAMA3_8B_INSTRUCT_V1_0, client=client, client_ops=client, auto_profile=True)
+    assert fm.chat([Human("A")]) == ["hi"]
+    assert client.model_ids == [
+        Model.META_LLAMA3_2_1B_INSTRUCT_V1_0.value,
+        "eu." + Model.META_LLAMA3_2_1B_INSTRUCT_V1_0.value,
+        Model.META_LLAMA3_8B_INSTRUCT_V1_0.value,
+    ]
+    client = FakeClient("ap-northeast-1")
+    fm = Llama3Instruct.from_id(
+        Model.META_LLAMA3_2_1B_INSTRUCT_V1_0, client=client, client_ops=client, auto_profile=True
+    )
+    assert fm.invocation_model_id() == "apac." + Model.META_LLAMA3_2_1B_INSTRUCT_V1_0.value
+
+
+def test_profiles_match_catalog():
+    assert tuple(p.value for p in InstanceProfile) == _PROFILE_PREFIXES
+
+
+def test_list_model_ids_cached():
+    clear_cache()
+    ops = FakeOpsClient()
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=ops, client_ops=ops)
+    other = Titan.from_id(Model.AMAZON_TITAN_TEXT_LITE_V1, client=ops, client_ops=ops)
+    assert fm.list_model_ids() == ["amazon.titan-text-express-v1", "amazon.titan-embed-text-v1"]
+    assert other.list_model_ids() == fm.list_model_ids()
+    assert ops.calls == 1
+    list_foundation_models(ops, ttl=0)
+    assert ops.calls == 2
+    clear_cache()
+
+
+def test_embedding_limits():
+    client = FakeClient()
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=client, client_ops=client)
+    assert fm.max_batch_size() == 96
+    assert fm.max_input_tokens() == 512
@@ -0,0 +1,84 @@
+from bedrock_fm import (
+    Claude,
+    Claude3,
+    Command,
+    Jamba,
+    Jurassic,
+    Llama3Instruct,
+    Mistral,
+    MistralLarge,
+    Titan,
+    Model,
+    Human,
+    System,
+    OrjsonCodec,
+)
+from bedrock_fm.ai21 import Penalty
+from bedrock_fm.codec import SLOT, BodyTemplate, JsonCodec, body_template
+import json
+import pytest
+
+orjson = pytest.importorskip("orjson")
+
+params = dict(top_p=1, max_token_count=500, stop_sequences=["Hello"], stream=False)
+
+
+@body_template
+def _body(extra_args, temperature):
+    return {**extra_args, "prompt": SLOT, "temperature": temperature}
+
+
+def test_template_matches_json_dumps():
+    t = BodyTemplate(JsonCodec(), {"a": SLOT, "b": {"c": 1, "d": SLOT}, "e": [1.5]})
+    assert t.render("x", ["y"]) == json.dumps({"a": "x", "b": {"c": 1, "d": ["y"]}, "e": [1.5]})
+
+
+def test_template_cache_is_typed():
+    codec = JsonCodec()
+    assert _body(codec, {}, 1).render("p") == '{"prompt": "p", "temperature": 1}'
+    assert _body(codec, {}, 1.0).render("p") == '{"prompt": "p", "temperature": 1.0}'
+    assert _body(codec, {}, True).render("p") == '{"prompt": "p", "temperature": true}'
+    assert _body(codec, {"k": 1}, 1) is not _body(codec, {"k": 1.0}, 1)
+    assert _body(codec, {"k": [1]}, 1).render("p") == '{"k": [1], "prompt": "p", "temperature": 1}'
+
+
+@pytest.mark.parametrize(
+    "cls,model_id,prompt,extra_args",
+    [
+        (Titan, Model.AMAZON_TITAN_TEXT_EXPRESS_V1, "A", {}),
+        (Claude, Model.ANTHROPIC_CLAUDE_INSTANT_V1, "A", {"top_k": 200}),
+        (Claude3, Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, "A", {"top_k": 200}),
+        (Command, Model.COHERE_COMMAND_TEXT_V14, "A", {"k": 10}),
+        (Jurassic, Model.AI21_J2_ULTRA_V1, "A", {"countPenalty": Penalty(1).to_dict()}),
+        (Jamba, Model.AI21_JAMBA_1_5_MINI_V1_0, "A", {}),
+        (Mistral, Model.MISTRAL_MISTRAL_7B_INSTRUCT_V0_2, "A", {"top_k": 5}),
+    ],
+)
+def test_orjson_codec(cls, model_id, prompt, extra_args):
+    fm = cls.from_id(model_id)
+    fast = cls.from_id(model_id, codec=OrjsonCodec())
+    for temperature in [0.5, 1, 0.5]:
+        b = fm.get_body(prompt, temperature=temperature, extra_args=extra_args, **params)
+        assert isinstance(b, str)
+        o = fast.get_body(prompt, temperature=temperature, extra_args=extra_args, **params)
+        assert isinstance(o, bytes)
+        assert o == orjson.dumps(json.loads(b))
+
+
+def test_chat_bodies():
+    conversation = [System("You are an assistant"), Human("Hi")]
+    for cls, model_id in [
+        (Claude3, Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0),
+        (Llama3Instruct, Model.META_LLAMA3_8B_INSTRUCT_V1_0),
+        (Mistral, Model.MISTRAL_MISTRAL_7B_INSTRUCT_V0_2),
+        (MistralLarge, Model.MISTRAL_MISTRAL_LARGE_2402_V1_0),
+    ]:
+        fm = cls.from_id(model_id)
+        b = fm.get_body(fm.get_chat_prompt(conversation), temperature=0.5, extra_args={}, **params)
+        assert json.loads(b)["temperature"] == 0.5
+
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0)
+    prompt = fm.get_chat_prompt(conversation)
+    b = json.loads(fm.get_body(prompt, temperature=0.5, extra_args={"top_k": 1}, **params))
+    assert list(b.keys())[:3] == ["top_k", "system", "messages"]
+    assert b["system"] == "You are an assistant"
@@ -1,4 +1,6 @@
-from bedrock_fm import Embed, Model, EmbeddingType
+from bedrock_fm import Embed, Model, EmbeddingType, EmbeddingDataType
+from io import BytesIO
+import numpy as np
 import json
 
 emv1 = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3)
@@ -13,4 +15,25 @@ def test_doc_embeddings():
 
 def test_query_embeddings():
     b = emv1.generate_for_query("Hello, how are you")
-    assert len(b) == 1024
\ No newline at end of file
+    assert len(b) == 1024
+
+emv1_int8 = Embed.from_id(
+    Model.COHERE_EMBED_ENGLISH_V3, embedding_type=EmbeddingDataType.INT8
+)
+
+
+def test_embeddings_int8_body():
+    b = emv1_int8.get_body(["Hello"], type=EmbeddingType.QUERY)
+    assert json.loads(b) == {
+        "texts": ["Hello"],
+        "input_type": "search_query",
+        "embedding_types": ["int8"],
+    }
+
+
+def test_embeddings_int8_parse():
+    body = {"embeddings": {"int8": [[1, -2, 3], [-128, 0, 127]]}}
+    v = emv1_int8.parse_response({"body": BytesIO(json.dumps(body).encode())})
+    assert v.dtype == np.int8
+    assert v.shape == (2, 3)
+    assert v[1, 0] == -128
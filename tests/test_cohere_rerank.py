@@ -0,0 +1,82 @@
+from bedrock_fm import Model, Rerank, from_model_id
+from bedrock_fm.codec import JsonCodec
+from bedrock_fm.exceptions import BedrockArgsError
+from io import BytesIO
+from threading import Lock
+import json
+import pytest
+
+
+class FakeRerankClient:
+    def __init__(self):
+        self.calls = []
+        self._lock = Lock()
+
+    def invoke_model(self, modelId, body, **kwargs):
+        body = json.loads(body)
+        with self._lock:
+            self.calls.append(body)
+        scores = [(i, int(d.split()[-1]) / 1000) for i, d in enumerate(body["documents"])]
+        scores.sort(key=lambda s: -s[1])
+        out = {
+            "results": [
+                {"index": i, "relevance_score": s} for i, s in scores[: body["top_n"]]
+            ]
+        }
+        return {"body": BytesIO(json.dumps(out).encode())}
+
+
+def test_from_model_id():
+    assert type(from_model_id(Model.COHERE_RERANK_V3_5_0)) is Rerank
+
+
+def test_body():
+    fm = Rerank.from_id(Model.COHERE_RERANK_V3_5_0)
+    assert json.loads(fm.get_body("q", ["a", "b"], 1)) == {
+        "query": "q",
+        "documents": ["a", "b"],
+        "top_n": 1,
+        "api_version": 2,
+    }
+
+
+def test_rerank_batches():
+    client = FakeRerankClient()
+    fm = Rerank.from_id(Model.COHERE_RERANK_V3_5_0, batch_size=100, client=client)
+    docs = [f"doc {(i * 37) % 1000}" for i in range(1000)]
+    best = fm.rerank("query", docs, top_n=3)
+    assert len(client.calls) == 10
+    assert all(c["top_n"] == 3 for c in client.calls)
+    assert [r.document for r in best] == ["doc 999", "doc 998", "doc 997"]
+    assert docs[best[0].index] == "doc 999"
+
+
+def test_rerank_single_call():
+    client = FakeRerankClient()
+    fm = Rerank.from_id(Model.COHERE_RERANK_V3_5_0, client=client)
+    best = fm.rerank("query", ["doc 1", "doc 5", "doc 3"])
+    assert len(client.calls) == 1
+    assert [r.index for r in best] == [1, 2, 0]
+
+
+def test_rerank_top_n():
+    fm = Rerank.from_id(Model.COHERE_RERANK_V3_5_0, client=FakeRerankClient())
+    for top_n in (0, -1):
+        with pytest.raises(BedrockArgsError):
+            fm.rerank("query", ["doc 1"], top_n=top_n)
+    with pytest.raises(BedrockArgsError):
+        Rerank.from_id(Model.COHERE_EMBED_ENGLISH_V3)
+
+
+def test_codec():
+    class CountingCodec(JsonCodec):
+        calls = 0
+
+        def loads(self, data):
+            self.calls += 1
+            return super().loads(data)
+
+    codec = CountingCodec()
+    fm = Rerank.from_id(Model.COHERE_RERANK_V3_5_0, client=FakeRerankClient(), codec=codec)
+    assert [r.index for r in fm.rerank("query", ["doc 1", "doc 2"])] == [1, 0]
+    assert codec.calls == 1
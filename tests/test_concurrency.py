@@ -0,0 +1,99 @@
+from bedrock_fm import Claude3, Embed, Human, Llama3Instruct, Model
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import time
+
+THREADS = 64
+ITERATIONS = 20
+
+
+class EchoClient:
+    """Stub client answering with the request body, so that each caller can check it got its own response"""
+
+    def __init__(self):
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def _count(self):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0)
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self._count()
+        request = json.loads(body)
+        if modelId.startswith("anthropic"):
+            response = {"type": "message", "content": [{"text": body}]}
+        elif modelId.startswith("meta"):
+            response = {"generation": "\n\n" + body}
+        else:
+            response = {"embeddings": [[len(t), i] for i, t in enumerate(request["texts"])], "texts": request["texts"]}
+        return {"body": _Body(json.dumps(response).encode())}
+
+    def invoke_model_with_response_stream(self, modelId, body, **kwargs):
+        self._count()
+        events = [
+            {"type": "content_block_delta", "delta": {"text": body[i : i + 7]}}
+            for i in range(0, len(body), 7)
+        ]
+        return {"body": [{"chunk": {"bytes": json.dumps(e).encode()}} for e in events]}
+
+
+class _Body:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+def test_human_images_not_shared():
+    a = Human("a")
+    a.images.append(object())
+    assert Human("b").images == []
+
+
+def test_shared_instances_under_load():
+    client = EchoClient()
+    claude = Claude3.from_id(
+        Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client, client_ops=client, stop_sequences=["X"]
+    )
+    llama = Llama3Instruct.from_id(Model.META_LLAMA3_8B_INSTRUCT_V1_0, client=client, client_ops=client)
+    embed = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=client, client_ops=client)
+    before = (claude.temperature, claude.stop_sequences, dict(claude.extra_args))
+    barrier = threading.Barrier(THREADS)
+
+    def worker(n):
+        barrier.wait()
+        for i in range(ITERATIONS):
+            prompt = f"thread {n} call {i}"
+            temperature = round(0.1 + (n % 9) / 10, 1)
+            out = claude.generate(
+                prompt,
+                temperature=temperature,
+                stop_sequences=[f"stop{n}"],
+                extra_args={"top_k": n + 1},
+            )[0]
+            body = json.loads(out)
+            assert body["messages"] == [{"role": "user", "content": prompt}]
+            assert body["temperature"] == temperature
+            assert body["stop_sequences"] == [f"stop{n}"]
+            assert body["top_k"] == n + 1
+
+            body = json.loads("".join(claude.chat([Human(prompt)], stream=True)))
+            assert body["messages"] == [{"role": "user", "content": prompt}]
+            assert "top_k" not in body
+
+            body = json.loads(llama.chat([Human(prompt)], max_token_count=n + 10)[0])
+            assert prompt in body["prompt"]
+            assert body["max_gen_len"] == n + 10
+
+            texts = [prompt] * (n % 3 + 1)
+            assert embed.generate_for_documents(texts) == [[len(prompt), j] for j in range(len(texts))]
+        return n
+
+    with ThreadPoolExecutor(THREADS) as ex:
+        assert sorted(ex.map(worker, range(THREADS))) == list(range(THREADS))
+    assert client.calls == THREADS * ITERATIONS * 4
+    assert (claude.temperature, claude.stop_sequences, claude.extra_args) == before
@@ -1,4 +1,9 @@
-from bedrock_fm import TitanEmbeddings, EmbeddingType
+from bedrock_fm import TitanEmbeddings, EmbeddingType, EmbeddingDataType, Model
+from bedrock_fm.exceptions import BedrockArgsError
+from io import BytesIO
+import numpy as np
+import json
+import pytest
 
 emv1 = TitanEmbeddings.from_id("amazon.titan-embed-text-v1")
 
@@ -8,4 +13,42 @@ def test_embeddings_body():
 
 def test_embeddings():
     b = emv1.generate(["Hello, how are you"])
-    assert len(b[0]) == 1536
\ No newline at end of file
+    assert len(b[0]) == 1536
+
+emv2 = TitanEmbeddings.from_id(
+    Model.AMAZON_TITAN_EMBED_TEXT_V2_0,
+    dimensions=256,
+    normalize=True,
+    embedding_type=EmbeddingDataType.BINARY,
+)
+
+
+def test_embeddings_v2_body():
+    b = emv2.get_body(["Hello"], type=EmbeddingType.DOCUMENT)
+    assert json.loads(b) == {
+        "inputText": "Hello",
+        "dimensions": 256,
+        "normalize": True,
+        "embeddingTypes": ["binary"],
+    }
+
+
+def test_embeddings_v1_options_unsupported():
+    fm = TitanEmbeddings.from_id("amazon.titan-embed-text-v1", dimensions=256)
+    with pytest.raises(BedrockArgsError):
+        fm.get_body(["Hello"], type=EmbeddingType.DOCUMENT)
+
+
+def test_embeddings_v2_invalid_dimensions():
+    fm = TitanEmbeddings.from_id(Model.AMAZON_TITAN_EMBED_TEXT_V2_0, dimensions=100)
+    with pytest.raises(BedrockArgsError):
+        fm.get_body(["Hello"], type=EmbeddingType.DOCUMENT)
+
+
+def test_embeddings_v2_parse_binary():
+    bits = [1, 0, 0, 0, 0, 0, 0, 1] * 32
+    resp = {"body": BytesIO(json.dumps({"embeddingsByType": {"binary": bits}}).encode())}
+    v = emv2.parse_response(resp)
+    assert v.dtype == np.uint8
+    assert v.shape == (1, 32)
+    assert v[0, 0] == 0b10000001
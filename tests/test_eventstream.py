@@ -0,0 +1,130 @@
+from bedrock_fm import Claude3, Model
+from bedrock_fm.eventstream import (
+    EventStreamDecodeError,
+    EventStreamDecoder,
+    RawEventStream,
+    decode_chunks,
+    encode_chunk,
+    encode_exception,
+    iter_chunk_bytes,
+    register_decoder,
+)
+from bedrock_fm.stub import StubBedrockClient, StubServer
+from botocore.eventstream import EventStream, EventStreamBuffer
+from botocore.exceptions import ClientError, EventStreamError
+from botocore.parsers import EventStreamJSONParser
+import boto3
+import json
+import pytest
+import struct
+
+deltas = [
+    {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": f"tok{i} "}}
+    for i in range(50)
+]
+raw = b"".join(encode_chunk(json.dumps(d).encode()) for d in deltas)
+
+
+def blocks(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+class RawStream:
+    def __init__(self, data, size=1024):
+        self.data = data
+        self.size = size
+
+    def stream(self):
+        return iter(blocks(self.data, self.size))
+
+    def close(self):
+        pass
+
+
+def botocore_stream(data):
+    op = boto3.client("bedrock-runtime", region_name="us-east-1").meta.service_model.operation_model(
+        "InvokeModelWithResponseStream"
+    )
+    return EventStream(
+        RawStream(data), op.output_shape.members["body"], EventStreamJSONParser(), op.name
+    )
+
+
+def test_encoded_messages_decode_with_botocore():
+    buffer = EventStreamBuffer()
+    buffer.add_data(raw)
+    messages = list(buffer)
+    assert len(messages) == len(deltas)
+    assert messages[0].headers[":event-type"] == "chunk"
+
+
+@pytest.mark.parametrize("size", [1, 7, 100, len(raw)])
+def test_decode_split_blocks(size):
+    assert [json.loads(c) for c in decode_chunks(blocks(raw, size))] == deltas
+
+
+def test_decoder_headers_and_payload():
+    headers, payload = next(EventStreamDecoder().feed(encode_chunk(b"{}")))
+    assert headers[":message-type"] == "event"
+    assert json.loads(bytes(payload)) == {"bytes": "e30="}
+
+
+def test_crc_mismatch():
+    data = bytearray(encode_chunk(b"{}"))
+    data[-1] ^= 0xFF
+    with pytest.raises(EventStreamDecodeError):
+        list(decode_chunks([bytes(data)]))
+    assert list(decode_chunks([bytes(data)], verify_crc=False)) == [b"{}"]
+
+
+def test_exception_message():
+    data = encode_chunk(b"{}") + encode_exception("throttlingException", "slow down")
+    out = decode_chunks([data])
+    assert next(out) == b"{}"
+    with pytest.raises(ClientError) as e:
+        next(out)
+    assert e.value.response["Error"]["Code"] == "throttlingException"
+    assert e.value.response["Error"]["Message"] == "slow down"
+    assert isinstance(e.value, EventStreamError) and type(e.value).__name__ == "ThrottlingException"
+
+
+def test_invalid_message_length():
+    for data in [bytes(16), struct.pack(">II", 10, 0) + bytes(8), struct.pack(">II", 20, 8) + bytes(12)]:
+        with pytest.raises(EventStreamDecodeError, match="length"):
+            list(decode_chunks([data], verify_crc=False))
+
+
+def test_botocore_event_stream():
+    expected = [e["chunk"]["bytes"] for e in botocore_stream(raw)]
+    assert list(iter_chunk_bytes(botocore_stream(raw))) == expected
+
+
+def test_iterable_of_events():
+    events = [{"chunk": {"bytes": json.dumps(d).encode()}} for d in deltas]
+    assert [json.loads(c) for c in iter_chunk_bytes(events)] == deltas
+
+
+def test_model_stream():
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0)
+    tokens = list(fm._get_text_stream(botocore_stream(raw)))
+    assert "".join(tokens) == "".join(d["delta"]["text"] for d in deltas)
+
+
+def test_boto3_client_decoder():
+    session = boto3.Session(aws_access_key_id="a", aws_secret_access_key="b", region_name="us-east-1")
+    with StubServer(StubBedrockClient(output_tokens=5)) as server:
+        client = session.client("bedrock-runtime", endpoint_url=server.endpoint_url)
+        kwargs = {"modelId": Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0.value, "body": "{}"}
+        expected = [e["chunk"]["bytes"] for e in client.invoke_model_with_response_stream(**kwargs)["body"]]
+
+        fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client)
+        assert "".join(fm.generate("Hello", stream=True)) == "the quick brown fox jumps"
+        body = client.invoke_model_with_response_stream(**kwargs)["body"]
+        assert isinstance(body, RawEventStream)
+        assert [e["chunk"]["bytes"] for e in body] == expected
+        register_decoder(client)
+        assert [e["chunk"]["bytes"] for e in client.invoke_model_with_response_stream(**kwargs)["body"]] == expected
+
+        server.client.stream_error_rate = 1.0
+        with pytest.raises(client.exceptions.ModelStreamErrorException):
+            list(client.invoke_model_with_response_stream(**kwargs)["body"])
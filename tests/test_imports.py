@@ -0,0 +1,40 @@
+import bedrock_fm
+import subprocess
+import sys
+
+
+def loaded_modules(code):
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            code + "\nimport sys\nprint(' '.join(m.split('.')[0] for m in sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return set(result.stdout.split())
+
+
+def test_import_is_light():
+    modules = loaded_modules("import bedrock_fm")
+    assert "boto3" not in modules
+    assert "botocore" not in modules
+    assert "PIL" not in modules
+    assert "attrs" not in modules
+
+
+def test_text_models_do_not_import_pil():
+    modules = loaded_modules(
+        "from bedrock_fm import Claude3, Human, Model\n"
+        "Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=object(), client_ops=object())"
+    )
+    assert "PIL" not in modules
+
+
+def test_lazy_attributes():
+    for name in bedrock_fm.__all__:
+        assert getattr(bedrock_fm, name) is not None
+        assert name in dir(bedrock_fm)
+    assert bedrock_fm.Claude3 is bedrock_fm.anthropic.Claude3
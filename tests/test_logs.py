@@ -0,0 +1,82 @@
+from bedrock_fm import Titan, Model
+from bedrock_fm.logs import PayloadLogger, PayloadSummary, payload_logger, start_payload_writer
+from base64 import b64encode
+from io import BytesIO
+import json
+import logging
+import threading
+
+
+class Capture(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+        self.threads = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+        self.threads.append(threading.current_thread())
+
+
+class FakeClient:
+    def invoke_model(self, **kwargs):
+        return {"body": BytesIO(b'{"results": [{"outputText": "hi"}]}')}
+
+
+def capture(name):
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    handler = Capture()
+    logger.addHandler(handler)
+    return logger, handler
+
+
+def test_summary():
+    png = b64encode(b"\x89PNG\r\n\x1a\n" + b"\x00" * 3000).decode()
+    body = json.dumps({"inputText": "a", "images": [png, png]})
+    s = str(PayloadSummary(body, 20))
+    assert f"size={len(body)} " in s
+    assert "images=2" in s
+    assert s.endswith('payload={"inputText": "a", "...')
+
+
+def test_disabled_and_sampling():
+    logger, handler = capture("test.payload.sampling")
+    logger.setLevel(logging.INFO)
+    PayloadLogger(logger=logger).log("request", "m", "{}")
+    assert handler.messages == []
+    logger.setLevel(logging.DEBUG)
+    PayloadLogger(logger=logger, sample_rate=0.0).log("request", "m", "{}")
+    assert handler.messages == []
+    PayloadLogger(logger=logger).log("request", "m", "{}")
+    assert handler.messages[0].startswith("request m size=2 ")
+
+
+def test_async_writer():
+    logger = logging.getLogger("test.payload.async")
+    logger.setLevel(logging.DEBUG)
+    handler = Capture()
+    listener = start_payload_writer(handler, logger=logger)
+    PayloadLogger(logger=logger).log("request", "m", "{}")
+    assert logger.propagate is False
+    listener.stop()
+    assert handler.messages[0].startswith("request m size=2 ")
+    assert handler.threads[0] is not threading.current_thread()
+    assert logger.handlers == [] and logger.propagate is True
+    PayloadLogger(logger=logger).log("request", "m", "{}")
+    assert listener.queue.qsize() == 0 and len(handler.messages) == 1
+    listener.stop()
+
+
+def test_model_logs_request_and_response():
+    _, handler = capture(payload_logger.logger.name)
+    try:
+        fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=FakeClient())
+        assert fm.generate("test") == ["hi"]
+        assert handler.messages[0].startswith("request amazon.titan-text-express-v1 ")
+        assert handler.messages[1].startswith("response amazon.titan-text-express-v1 ")
+    finally:
+        payload_logger.logger.removeHandler(handler)
+        payload_logger.logger.setLevel(logging.NOTSET)
+        payload_logger.logger.propagate = True
@@ -0,0 +1,101 @@
+from bedrock_fm import Claude3, Model, PromptPacker, Titan
+from bedrock_fm.exceptions import BedrockArgsError
+from bedrock_fm.stub import StubBedrockClient
+from io import BytesIO
+import json
+import re
+import pytest
+
+ITEM = re.compile(r'<item id="(\d+)">\n(.*?)\n</item>', re.S)
+
+
+class PackingClient:
+    """Answers the packs with the items upper cased, skipping the item "skip" when it is packed with others."""
+
+    def __init__(self, format="json"):
+        self.format = format
+        self.prompts = []
+
+    def invoke_model(self, modelId, body, **kwargs):
+        prompt = json.loads(body)["messages"][0]["content"]
+        self.prompts.append(prompt)
+        items = [text for _, text in ITEM.findall(prompt)]
+        answers = [text.upper() for text in items if text != "skip" or len(items) == 1]
+        if len(items) == 0:
+            text = prompt.rsplit("\n", 1)[-1].upper()
+        elif self.format == "json":
+            text = "Here are the answers:\n" + json.dumps(answers)
+        else:
+            text = "\n".join(f"{i}. {a}" for i, a in enumerate(answers, 1))
+        out = {"type": "message", "content": [{"type": "text", "text": text}], "usage": {"input_tokens": 1, "output_tokens": 1}}
+        return {"body": BytesIO(json.dumps(out).encode())}
+
+
+def packer(client, **kwargs):
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client)
+    return PromptPacker(model=fm, instruction="Upper case the text.", **kwargs)
+
+
+@pytest.mark.parametrize("format", ["json", "numbered"])
+def test_packed(format):
+    client = PackingClient(format)
+    p = packer(client, format=format, max_items=10)
+    items = [f"item {i}" for i in range(25)]
+    assert p.generate(items) == [f"ITEM {i}" for i in range(25)]
+    assert len(client.prompts) == 3
+    assert p.report.invocations == 3 and p.report.items_per_invocation == 25 / 3
+    assert client.prompts[0].startswith("Upper case the text.\n\nThe input contains 10 items")
+
+
+def test_fallback():
+    client = PackingClient()
+    p = packer(client, max_items=4)
+    items = ["a", "b", "skip", "c", "d", "e"]
+    assert p.generate(items) == ["A", "B", "SKIP", "C", "D", "E"]
+    # a pack of 4 that fell back to 4 single calls, and a pack of 2
+    assert len(client.prompts) == 1 + 4 + 1
+    assert p.report.fallbacks == 1 and p.report.invocations == 6
+    assert client.prompts[1].startswith("Upper case the text.\n\nThe input contains 1 items")
+
+
+def test_pack_size_adapts():
+    p = packer(PackingClient(), max_items=100, output_tokens_per_item=10, context_window=2000)
+    short = [len(pack) for pack in p.packs(["short"] * 300)]
+    long = [len(pack) for pack in p.packs(["long " * 200] * 30)]
+    assert sum(short) == 300 and sum(long) == 30
+    assert max(long) < max(short)
+    assert all(len(pack) == 1 for pack in p.packs(["huge " * 5000] * 3))
+
+    # the output limit of the model bounds the pack size too
+    p = packer(PackingClient(), max_items=100, output_tokens_per_item=100, max_output_tokens=1000)
+    assert max(len(pack) for pack in p.packs(["x"] * 100)) == 1000 // 108
+
+
+def test_parse():
+    p = packer(PackingClient(), format="numbered")
+    assert p.parse("1. a\n2. b\ncontinued", 2) == ["a", "b\ncontinued"]
+    assert p.parse("1. a\n1. b", 2) is None
+    assert p.parse("1. a", 2) is None
+    assert p.parse("Sure!\n1. a", 1) is None
+    p = packer(PackingClient())
+    assert p.parse('[{"label": "x"}, {"label": "y"}]', 2) == [{"label": "x"}, {"label": "y"}]
+    assert p.parse("[1, 2", 2) is None
+    assert p.parse("[1]", 2) is None
+    with pytest.raises(BedrockArgsError):
+        packer(PackingClient(), format="xml")
+
+
+def test_generate_models():
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=StubBedrockClient(output_tokens=3))
+    p = PromptPacker(model=fm, instruction="Classify.", max_items=5)
+    # the stub does not answer in the requested format: every pack falls back, and single answers stay text
+    assert p.generate(["a", "b", "c"]) == ["the quick brown"] * 3
+    assert p.report.fallbacks == 1
+
+
+def test_single_json():
+    client = PackingClient()
+    p = packer(client, max_items=1)
+    assert p.generate(["a", "b"]) == ["A", "B"]
+    assert p.report.packs == 0 and p.report.fallbacks == 0
+    assert all('<item id="1">' in prompt for prompt in client.prompts)
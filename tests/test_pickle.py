@@ -0,0 +1,111 @@
+from bedrock_fm import Claude3, Embed, Human, Model, Rerank, SDXL
+from bedrock_fm.clients import ClientSettings
+from bedrock_fm.transport import HttpTransport
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+import boto3
+import multiprocessing
+import os
+import pickle
+import pytest
+
+
+class StubClient:
+    def invoke_model(self, **kwargs):
+        return {"body": BytesIO(b'{"type": "message", "content": [{"text": "hello"}]}')}
+
+
+def test_pickle_keeps_configuration():
+    session = boto3.Session(region_name="eu-west-1")
+    fm = Claude3.from_id(
+        Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0,
+        session=session,
+        temperature=0.2,
+        stop_sequences=["X"],
+    )
+    copy = pickle.loads(pickle.dumps(fm))
+    assert copy._model_id == fm._model_id
+    assert (copy.temperature, copy.stop_sequences) == (0.2, ["X"])
+    assert copy.session is not session
+    assert copy.session.region_name == "eu-west-1"
+    assert copy._client is None
+    assert copy.client.meta.region_name == "eu-west-1"
+
+
+def test_pickle_recreates_boto3_clients():
+    session = boto3.Session(region_name="us-east-1")
+    client = session.client("bedrock-runtime", region_name="us-west-2", endpoint_url="http://localhost:8000")
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, session=session, client=client)
+    assert fm.client is client
+    copy = pickle.loads(pickle.dumps(fm))
+    assert copy._client == ClientSettings("us-west-2", "http://localhost:8000")
+    assert copy.client.meta.region_name == "us-west-2"
+    assert copy.client.meta.endpoint_url == "http://localhost:8000"
+    assert copy.client is copy.client
+
+    for model in [
+        Rerank.from_id(Model.COHERE_RERANK_V3_5_0, session=session),
+        SDXL.from_id(Model.STABILITY_STABLE_DIFFUSION_XL_V1, session=session),
+    ]:
+        copy = pickle.loads(pickle.dumps(model))
+        assert copy._model_id == model._model_id
+        assert copy.client.meta.service_model.service_name == "bedrock-runtime"
+
+
+def test_pickle_keeps_stub_clients():
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=StubClient())
+    copy = pickle.loads(pickle.dumps(fm))
+    assert isinstance(copy.client, StubClient)
+    assert copy.chat([Human("Hi")]) == ["hello"]
+
+
+def test_pickle_http_transport():
+    pytest.importorskip("httpx")
+    transport = HttpTransport(session=boto3.Session(region_name="us-east-1"))
+    transport.http
+    copy = pickle.loads(pickle.dumps(transport))
+    assert copy._http is None
+    assert copy.endpoint_url == transport.endpoint_url
+    assert copy.session.region_name == "us-east-1"
+    transport.close()
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork is not available")
+def test_fork_drops_clients():
+    session = boto3.Session(region_name="us-east-1", aws_access_key_id="AKIDEXAMPLE", aws_secret_access_key="secret")
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, session=session)
+    other = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, session=session)
+    stub = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=StubClient())
+    client = fm.client
+    other.client
+    read, write = multiprocessing.Pipe(duplex=False)
+    pid = os.fork()
+    if pid == 0:
+        try:
+            write.send(
+                (
+                    type(fm._client) is ClientSettings,
+                    fm.session is session and other.session is session,
+                    fm.session.get_credentials().access_key,
+                    fm.client is not client,
+                    fm.client.meta.region_name,
+                    isinstance(stub.client, StubClient),
+                )
+            )
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+    assert read.recv() == (True, True, "AKIDEXAMPLE", True, "us-east-1", True)
+    assert fm.client is client
+
+
+def _chat(fm, prompt):
+    return fm.chat([Human(prompt)])[0]
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="fork is not available")
+def test_process_pool():
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=StubClient())
+    context = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(2, mp_context=context) as pool:
+        assert list(pool.map(_chat, [fm] * 4, ["a", "b", "c", "d"])) == ["hello"] * 4
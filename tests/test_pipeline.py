@@ -0,0 +1,102 @@
+from bedrock_fm import (
+    Embed,
+    EmbeddingPipeline,
+    InMemoryVectorStore,
+    Model,
+    TitanEmbeddings,
+    iter_text_files,
+    split_text,
+)
+from bedrock_fm.exceptions import BedrockArgsError
+from io import BytesIO
+from threading import Lock
+import json
+import time
+import pytest
+
+
+class FakeEmbeddingsClient:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.active = 0
+        self.max_active = 0
+        self._lock = Lock()
+
+    def invoke_model(self, modelId, body, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        body = json.loads(body)
+        if "texts" in body:
+            out = {"embeddings": [[len(t)] for t in body["texts"]]}
+        else:
+            out = {"embedding": [len(body["inputText"])]}
+        with self._lock:
+            self.active -= 1
+        return {"body": BytesIO(json.dumps(out).encode())}
+
+
+def test_split_text_limits():
+    text = ("word " * 50 + "\n\n") * 20
+    chunks = list(split_text(text, 100))
+    assert all(len(c) <= 100 for c in chunks)
+    assert "".join(chunks).replace(" ", "").replace("\n", "") == text.replace(
+        " ", ""
+    ).replace("\n", "")
+
+
+def test_split_text_blocks():
+    blocks = ["abc def ", "ghi jkl ", "mno"]
+    assert list(split_text(blocks, 8)) == ["abc def", "ghi jkl", "mno"]
+    assert list(split_text("abc", 1)) == ["a", "b", "c"]
+    with pytest.raises(BedrockArgsError):
+        list(split_text("abc", 0))
+    with pytest.raises(BedrockArgsError):
+        list(split_text("abc", 8, overlap=4))
+
+
+def test_pipeline_batches_and_order():
+    client = FakeEmbeddingsClient()
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=client)
+    pipeline = EmbeddingPipeline(model=fm, chunk_tokens=10, batch_size=4)
+    docs = [(f"d{i}", "x" * 25) for i in range(3)]
+    out = list(pipeline.run(docs))
+    assert [id for id, _ in out] == ["d0#0", "d1#0", "d2#0"]
+    assert client.calls == 1
+    assert out[0][1] == [25]
+
+
+def test_pipeline_backpressure():
+    client = FakeEmbeddingsClient(delay=0.01)
+    fm = TitanEmbeddings.from_id("amazon.titan-embed-text-v1", client=client)
+    pipeline = EmbeddingPipeline(model=fm, max_workers=2, max_in_flight=3)
+    pulled = []
+
+    def docs():
+        for i in range(50):
+            pulled.append(i)
+            yield f"d{i}", f"document {i}"
+
+    it = pipeline.run(docs())
+    next(it)
+    assert len(pulled) <= 4
+    assert len(list(it)) == 49
+    assert client.max_active <= 2
+
+
+def test_pipeline_to_store(tmp_path):
+    for i in range(3):
+        (tmp_path / f"f{i}.txt").write_text(f"file {i}")
+    (tmp_path / "skip.bin").write_text("no")
+    client = FakeEmbeddingsClient()
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=client)
+    store = InMemoryVectorStore()
+    n = EmbeddingPipeline(model=fm).run_to_store(
+        iter_text_files(str(tmp_path), "*.txt"), store
+    )
+    assert n == 3
+    assert store.ids() == ["f0.txt#0", "f1.txt#0", "f2.txt#0"]
+    assert store.metadata["f1.txt#0"] == {"document_id": "f1.txt", "text": "file 1"}
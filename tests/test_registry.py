@@ -0,0 +1,117 @@
+from bedrock_fm import (
+    Claude3,
+    CommandR,
+    Llama3Instruct,
+    Mixtral,
+    MistralLarge,
+    Model,
+    TitanImageGeneration,
+    from_model_id,
+    get_model,
+    register_family,
+)
+from bedrock_fm import registry
+from bedrock_fm.exceptions import BedrockInvalidModelError
+from bedrock_fm.registry import FAMILIES, _freeze, clear_models, family_class
+from bedrock_fm.stub import StubBedrockClient
+from concurrent.futures import ThreadPoolExecutor
+import bedrock_fm
+import gc
+import pytest
+import weakref
+
+client = object()
+
+
+def test_families():
+    for prefix, name in FAMILIES.items():
+        assert getattr(bedrock_fm, name).family() == prefix
+    assert family_class(Model.META_LLAMA3_8B_INSTRUCT_V1_0) is Llama3Instruct
+    assert family_class(Model.COHERE_COMMAND_R_V1_0) is CommandR
+    assert family_class(Model.MISTRAL_MIXTRAL_8X7B_INSTRUCT_V0_1) is Mixtral
+    assert family_class(Model.MISTRAL_MISTRAL_LARGE_2407_V1_0) is MistralLarge
+    assert family_class(Model.AMAZON_TITAN_IMAGE_GENERATOR_V1) is TitanImageGeneration
+    assert family_class("anthropic.claude-3-7-sonnet-20250219-v1:0") is Claude3
+    with pytest.raises(BedrockInvalidModelError):
+        family_class("acme.unknown-v1")
+
+
+def test_from_model_id():
+    fm = from_model_id(Model.META_LLAMA3_8B_INSTRUCT_V1_0, client=client, client_ops=client)
+    assert type(fm) is Llama3Instruct
+    assert fm._model_id == Model.META_LLAMA3_8B_INSTRUCT_V1_0.value
+
+
+def test_register_family():
+    class AcmeLLM(Claude3):
+        @classmethod
+        def family(cls) -> str:
+            return "acme.llm"
+
+    register_family("acme.llm", AcmeLLM)
+    try:
+        assert type(from_model_id("acme.llm-v1", client=client, client_ops=client)) is AcmeLLM
+    finally:
+        del registry._registered["acme.llm"]
+        registry._prefixes = None
+        registry._classes.clear()
+
+
+def test_entry_point(monkeypatch):
+    class EntryPoint:
+        name = "acme.llm"
+
+        def load(self):
+            return Claude3
+
+    import importlib.metadata
+
+    monkeypatch.setattr(importlib.metadata, "entry_points", lambda group: [EntryPoint()])
+    monkeypatch.setattr(registry, "_prefixes", None)
+    monkeypatch.setattr(registry, "_classes", {})
+    assert family_class("acme.llm-v1") is Claude3
+
+
+def test_get_model():
+    clear_models()
+    fm = get_model(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client, client_ops=client)
+    assert fm is get_model(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0.value, client=client, client_ops=client)
+    other = get_model(
+        Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0,
+        client=client,
+        client_ops=client,
+        extra_args={"top_k": 10},
+    )
+    assert other is not fm
+    assert other.extra_args == {"top_k": 10}
+    assert other is get_model(
+        Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0,
+        client=client,
+        client_ops=client,
+        extra_args={"top_k": 10},
+    )
+    assert get_model(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=object(), client_ops=client) is not fm
+    clear_models()
+
+
+def test_get_model_unhashable_args():
+    client = StubBedrockClient()
+    key = _freeze({"client": client})
+    assert key == _freeze({"client": client}) and key != _freeze({"client": StubBedrockClient()})
+    ref = weakref.ref(client)
+    del client
+    gc.collect()
+    assert ref() is not None
+
+
+def test_get_model_threads():
+    clear_models()
+    with ThreadPoolExecutor(16) as ex:
+        models = list(
+            ex.map(
+                lambda _: get_model(Model.COHERE_COMMAND_R_V1_0, client=client, client_ops=client),
+                range(64),
+            )
+        )
+    assert all(m is models[0] for m in models)
+    clear_models()
@@ -0,0 +1,128 @@
+from bedrock_fm import Claude3, Embed, Model, RequestScheduler, scheduling
+from bedrock_fm.exceptions import BedrockArgsError, BedrockQueueTimeoutError
+from bedrock_fm.stub import StubBedrockClient
+from io import BytesIO
+import boto3
+import gc
+import pickle
+import threading
+import time
+import pytest
+
+
+class GateClient:
+    """Records the order of the invocations and blocks them until `gate` is set"""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.order = []
+        self.lock = threading.Lock()
+
+    def invoke_model(self, modelId, body, **kwargs):
+        self.gate.wait()
+        with self.lock:
+            self.order.append(body)
+        return {"body": BytesIO(b"{}")}
+
+
+def run_queued(scheduler, requests):
+    """Occupies the only slot, queues the requests in order, then lets them all run"""
+    client = scheduler.client
+    threads = [threading.Thread(target=scheduler.invoke_model, kwargs={"modelId": "m", "body": "holder"})]
+    for body, priority, tenant in requests:
+        threads.append(
+            threading.Thread(
+                target=scheduler.invoke,
+                args=(priority, tenant),
+                kwargs={"modelId": "m", "body": body},
+            )
+        )
+    for i, t in enumerate(threads):
+        t.start()
+        while scheduler.queued("m") < i:
+            time.sleep(0.001)
+    client.gate.set()
+    for t in threads:
+        t.join()
+    return client.order[1:]
+
+
+def test_priority_classes():
+    scheduler = RequestScheduler(client=GateClient(), slots={"m": 1})
+    order = run_queued(
+        scheduler,
+        [("bulk1", "bulk", None), ("bulk2", "bulk", None), ("std", None, None), ("chat", "interactive", None)],
+    )
+    assert order == ["chat", "std", "bulk1", "bulk2"]
+    report = scheduler.report()
+    assert report["bulk"]["requests"] == 2 and report["bulk"]["queued"] == 0
+    assert report["bulk"]["wait_max_ms"] >= report["interactive"]["wait_max_ms"] > 0
+    with pytest.raises(BedrockArgsError):
+        scheduler.bind("urgent")
+
+
+def test_weighted_fair_queuing():
+    scheduler = RequestScheduler(client=GateClient(), slots={"m": 1}, tenant_weights={"a": 2})
+    requests = [(f"a{i}", "bulk", "a") for i in range(6)] + [(f"b{i}", "bulk", "b") for i in range(3)]
+    order = run_queued(scheduler, requests)
+    assert "".join(body[0] for body in order) == "aabaabaab"
+
+
+def test_promotion():
+    now = [0.0]
+    scheduler = RequestScheduler(client=GateClient(), slots={"m": 1}, promote_after=10, clock=lambda: now[0])
+    scheduler.acquire("m")
+    threads = []
+    for priority in ("bulk", "interactive"):
+        kwargs = {"modelId": "m", "body": priority}
+        threads.append(threading.Thread(target=scheduler.invoke, args=(priority, None), kwargs=kwargs))
+        threads[-1].start()
+        while scheduler.queued("m") < len(threads):
+            time.sleep(0.001)
+        now[0] += 5
+    now[0] = 20
+    scheduler.client.gate.set()
+    scheduler.release("m")
+    for t in threads:
+        t.join()
+    assert scheduler.client.order == ["bulk", "interactive"]
+    assert scheduler.stats["bulk"].promoted == 1 and scheduler.stats["bulk"].max_wait == 20
+
+
+def test_models_and_streams():
+    scheduler = RequestScheduler(client=StubBedrockClient(), default_slots=1, max_queue_wait=0.05)
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=scheduler.bind("interactive"))
+    embed = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=scheduler)
+    stream = fm.generate("Hello", stream=True)
+    with pytest.raises(BedrockQueueTimeoutError):
+        fm.generate("Hello")
+    assert "".join(stream).startswith("the quick")
+    assert fm.generate("Hello")[0].startswith("the quick")
+    with scheduling("bulk", tenant="etl"):
+        assert len(embed.generate(["a", "b"])) == 2
+    report = scheduler.report()
+    assert report["interactive"]["requests"] == 2 and report["interactive"]["timeouts"] == 1
+    assert report["bulk"]["requests"] == 1 and report["standard"]["requests"] == 0
+
+
+def test_unread_stream_released():
+    scheduler = RequestScheduler(client=StubBedrockClient(), default_slots=1, max_queue_wait=0.05)
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=scheduler)
+    fm.generate("Hello", stream=True)
+    gc.collect()
+    assert fm.generate("Hello")[0].startswith("the quick")
+
+
+def test_pickle():
+    scheduler = RequestScheduler(client=StubBedrockClient(output_tokens=2), slots={"m": 2}, tenant_weights={"a": 3})
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=scheduler.bind("bulk", tenant="a"))
+    fm.generate("Hello")
+    copy = pickle.loads(pickle.dumps(fm))
+    assert copy.client.priority == "bulk" and copy.client.scheduler.tenant_weights == {"a": 3}
+    assert copy.client.scheduler.report()["bulk"]["requests"] == 0
+    assert copy.generate("Hello") == ["the quick"]
+    assert copy.client.scheduler.client.output_tokens == 2
+
+    scheduler = RequestScheduler(client=boto3.client("bedrock-runtime", region_name="eu-west-1"))
+    copy = pickle.loads(pickle.dumps(scheduler))
+    assert copy._client().meta.region_name == "eu-west-1"
@@ -0,0 +1,21 @@
+from bedrock_fm.similarity import hamming_distance, hamming_similarity, int8_dot
+import numpy as np
+
+
+def test_hamming_distance():
+    q = np.array([0b11110000, 0b00000000], dtype=np.uint8)
+    v = np.array([[0b11110000, 0b00000000], [0b00001111, 0b11111111]], dtype=np.uint8)
+    assert hamming_distance(q, v).tolist() == [0, 16]
+
+
+def test_hamming_signed_binary():
+    q = np.array([-1, 0], dtype=np.int8)
+    v = np.array([[-1, 0], [0, 0]], dtype=np.int8)
+    assert hamming_distance(q, v).tolist() == [0, 8]
+    assert hamming_similarity(q, v).tolist() == [1.0, 0.5]
+
+
+def test_int8_dot_no_overflow():
+    q = np.full(1024, 127, dtype=np.int8)
+    v = np.full((2, 1024), -128, dtype=np.int8)
+    assert int8_dot(q, v).tolist() == [-127 * 128 * 1024] * 2
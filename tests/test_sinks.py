@@ -0,0 +1,129 @@
+from bedrock_fm import (
+    BatchRunner,
+    Embed,
+    EmbeddingPipeline,
+    JsonlSink,
+    Model,
+    Titan,
+    open_sink,
+)
+from bedrock_fm.sinks import ResultSink
+from bedrock_fm.batch import export_output
+from bedrock_fm.exceptions import BedrockArgsError
+from bedrock_fm.stub import StubBedrockClient
+import gzip
+import json
+import numpy as np
+import pytest
+
+
+def test_jsonl_sink_batches(tmp_path):
+    path = str(tmp_path / "out.jsonl")
+    sink = JsonlSink(path, batch_rows=3)
+    for i in range(4):
+        sink.write({"id": str(i), "embedding": np.arange(i, dtype=np.float32)})
+    with open(path) as f:
+        assert len(f.readlines()) == 3
+    sink.close()
+    sink.close()
+    with open(path) as f:
+        rows = [json.loads(line) for line in f]
+    assert [r["embedding"] for r in rows] == [[], [0.0], [0.0, 1.0], [0.0, 1.0, 2.0]]
+    with pytest.raises(BedrockArgsError):
+        sink.write({"id": "4"})
+    with pytest.raises(TypeError):
+        ResultSink(10)
+
+
+def test_jsonl_sink_gzip_and_completions(tmp_path):
+    path = str(tmp_path / "out.jsonl.gz")
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=StubBedrockClient(output_tokens=3))
+    with open_sink(path) as sink:
+        for i in range(5):
+            sink.write_completion(str(i), fm.generate(f"Prompt {i}", details=True), prompt_id=i)
+    with gzip.open(path, "rt") as f:
+        rows = [json.loads(line) for line in f]
+    assert len(rows) == 5
+    assert rows[2]["output"] == "the quick brown" and rows[2]["prompt_id"] == 2
+    assert rows[2]["output_tokens"] == 3 and rows[2]["latency"] >= 0
+    with pytest.raises(BedrockArgsError):
+        open_sink(str(tmp_path / "out.csv"))
+
+
+def test_parquet_sink_row_groups(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    pa = pytest.importorskip("pyarrow")
+    path = str(tmp_path / "vectors.parquet")
+    vectors = np.random.default_rng(0).random((1000, 16), dtype=np.float32)
+    columns = ["id", "embedding", "error"]
+    with open_sink(path, batch_rows=100, row_group_bytes=20_000, columns=columns, types={"error": "string"}) as sink:
+        sink.write_embeddings([str(i) for i in range(500)], vectors[:500], [{"usage": {"n": i}} for i in range(500)])
+        for i in range(500, 1000):
+            sink.write({"id": str(i), "embedding": vectors[i].tolist(), "usage": None})
+        sink.write({"id": "failed", "error": {"code": "ModelErrorException"}})
+    file = pq.ParquetFile(path)
+    assert file.schema_arrow.field("embedding").type == pa.list_(pa.float32(), 16)
+    assert file.metadata.num_rows == 1001
+    assert 1 < file.metadata.num_row_groups <= 5
+    table = file.read()
+    flat = table.column("embedding").combine_chunks().flatten().to_numpy()
+    assert np.array_equal(flat.reshape(-1, 16), vectors)
+    assert json.loads(table.column("usage")[3].as_py()) == {"n": 3}
+    assert json.loads(table.column("error")[1000].as_py())["code"] == "ModelErrorException"
+
+    with pytest.raises(BedrockArgsError, match="not in the schema"):
+        with open_sink(str(tmp_path / "other.parquet"), batch_rows=1, row_group_bytes=1) as sink:
+            sink.write({"id": "1", "embedding": [0.0]})
+            sink.write({"id": "2", "embedding": [0.0], "extra": 1})
+
+
+def test_parquet_sink_types(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    pa = pytest.importorskip("pyarrow")
+    path = str(tmp_path / "types.parquet")
+    with open_sink(path, batch_rows=2) as sink:
+        sink.write_rows([{"id": "0", "tokens": 2, "latency": None}, {"id": "1", "tokens": 3, "latency": None}])
+        sink.write_rows([{"id": "2", "tokens": 2.5, "latency": 0.5}, {"id": "3", "tokens": 4, "latency": 1}])
+    table = pq.read_table(path)
+    assert table.schema.field("tokens").type == pa.float64() and table.column("tokens").to_pylist()[2] == 2.5
+    assert table.column("latency").to_pylist() == [None, None, 0.5, 1.0]
+
+    with pytest.raises(BedrockArgsError, match="`tokens` has values of type int64 and string"):
+        with open_sink(str(tmp_path / "conflict.parquet"), batch_rows=1) as sink:
+            sink.write({"id": "0", "tokens": 1})
+            sink.write({"id": "1", "tokens": "many"})
+
+    with pytest.raises(BedrockArgsError, match="after the first row group"):
+        with open_sink(str(tmp_path / "late.parquet"), batch_rows=1, row_group_bytes=1) as sink:
+            sink.write({"id": "0", "tokens": 1, "error": None})
+            sink.write({"id": "1", "tokens": 1.5, "error": None})
+    with pytest.raises(BedrockArgsError, match="after the first row group"):
+        with open_sink(str(tmp_path / "null.arrow"), batch_rows=1, row_group_bytes=1) as sink:
+            sink.write({"id": "0", "error": None})
+            sink.write({"id": "1", "error": {"code": "ThrottlingException"}})
+
+
+def test_pipeline_to_arrow(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=StubBedrockClient())
+    path = str(tmp_path / "vectors.arrow")
+    documents = [(f"doc{i}", "lorem ipsum " * 50) for i in range(10)]
+    with open_sink(path) as sink:
+        count = EmbeddingPipeline(model=fm, chunk_tokens=100).run_to_sink(documents, sink)
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+    assert table.num_rows == count > 10
+    assert table.schema.field("embedding").type == pa.list_(pa.float32(), 1024)
+    assert table.column("document_id")[0].as_py() == "doc0" and table.column("index")[1].as_py() == 1
+
+
+def test_export_output(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=StubBedrockClient())
+    out = str(tmp_path / "vectors.jsonl")
+    records = [("bad", {"title": "no text"})] + [(str(i), {"text": f"passage {i}"}) for i in range(25)]
+    BatchRunner(model=fm, output_path=out, batch_size=10, flush_every=10).run(records)
+    assert export_output(out, str(tmp_path / "vectors.parquet")) == 26
+    table = pq.read_table(str(tmp_path / "vectors.parquet"))
+    assert table.column_names[:2] == ["id", "embedding"]
+    assert table.column("embedding").null_count == 1
@@ -0,0 +1,141 @@
+from bedrock_fm import (
+    SDXL,
+    Claude,
+    Claude3,
+    Command,
+    CommandR,
+    Embed,
+    Human,
+    Jamba,
+    Jurassic,
+    Llama2Chat,
+    Llama3Instruct,
+    Mistral,
+    MistralLarge,
+    Model,
+    Rerank,
+    Titan,
+    TitanEmbeddings,
+    TitanImageGeneration,
+)
+from bedrock_fm.stub import WORDS, StubBedrockClient, StubServer
+from bedrock_fm.transport import HttpTransport
+from botocore.exceptions import ClientError, EventStreamError
+import boto3
+import pytest
+
+TEXT = " ".join(WORDS[:4])
+
+GENERATE = [
+    (Claude3, Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0),
+    (Claude, Model.ANTHROPIC_CLAUDE_V2_1),
+    (Titan, Model.AMAZON_TITAN_TEXT_EXPRESS_V1),
+    (Command, Model.COHERE_COMMAND_TEXT_V14),
+    (Jurassic, Model.AI21_J2_MID_V1),
+    (Jamba, Model.AI21_JAMBA_1_5_MINI_V1_0),
+    (Mistral, Model.MISTRAL_MISTRAL_7B_INSTRUCT_V0_2),
+]
+
+CHAT = [
+    (Claude3, Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0),
+    (CommandR, Model.COHERE_COMMAND_R_V1_0),
+    (Llama2Chat, Model.META_LLAMA2_13B_CHAT_V1),
+    (Llama3Instruct, Model.META_LLAMA3_8B_INSTRUCT_V1_0),
+    (MistralLarge, Model.MISTRAL_MISTRAL_LARGE_2407_V1_0),
+    (Jamba, Model.AI21_JAMBA_1_5_MINI_V1_0),
+]
+
+
+def stub(**kwargs):
+    return StubBedrockClient(output_tokens=4, sleep=lambda s: None, **kwargs)
+
+
+@pytest.mark.parametrize("cls,model_id", GENERATE)
+def test_generate(cls, model_id):
+    fm = cls.from_id(model_id, client=stub())
+    assert fm.generate("Hello") == [TEXT]
+    if model_id != Model.AI21_J2_MID_V1:
+        assert "".join(fm.generate("Hello", stream=True)) == TEXT
+
+
+@pytest.mark.parametrize("cls,model_id", CHAT)
+def test_chat(cls, model_id):
+    fm = cls.from_id(model_id, client=stub())
+    assert fm.chat([Human("Hello")]) == [TEXT]
+    assert "".join(fm.chat([Human("Hello")], stream=True)) == TEXT
+
+
+def test_max_tokens():
+    fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=stub())
+    assert fm.generate("Hello", max_token_count=2) == [" ".join(WORDS[:2])]
+
+
+def test_embeddings_rerank_images():
+    client = stub()
+    assert len(Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=client).generate_for_documents(["a", "b"])) == 2
+    fm = TitanEmbeddings.from_id(Model.AMAZON_TITAN_EMBED_TEXT_V2_0, client=client, dimensions=256)
+    assert len(fm.generate_for_documents(["a"])[0]) == 256
+    results = Rerank.from_id(Model.COHERE_RERANK_V3_5_0, client=client).rerank("q", ["a", "b", "c"], top_n=2)
+    assert len(results) == 2 and results[0].relevance_score >= results[1].relevance_score
+    pytest.importorskip("PIL")
+    fm = TitanImageGeneration.from_id(Model.AMAZON_TITAN_IMAGE_GENERATOR_V1, client=client)
+    assert [i.size for i in fm.generate("a cat", number_of_images=2, width=256, height=256)] == [(256, 256)] * 2
+    assert SDXL.from_id(Model.STABILITY_STABLE_DIFFUSION_XL_V1, client=client).generate("a cat")[0].size == (512, 512)
+
+
+def test_latency_and_speed():
+    delays = []
+    client = StubBedrockClient(latency=0.5, tokens_per_second=10, output_tokens=4, sleep=delays.append)
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=client)
+    fm.generate("Hello")
+    assert delays == [pytest.approx(0.9)]
+    delays.clear()
+    list(fm.generate("Hello", stream=True))
+    assert delays == [0.5, 0.1, 0.1, 0.1, 0.0]
+
+
+def test_error_injection():
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=stub(throttle_rate=1.0))
+    with pytest.raises(ClientError) as e:
+        fm.generate("Hello")
+    assert e.value.response["Error"]["Code"] == "ThrottlingException"
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=stub(stream_error_rate=1.0))
+    with pytest.raises(EventStreamError):
+        list(fm.generate("Hello", stream=True))
+    fm = Jurassic.from_id(Model.AI21_J2_MID_V1, client=stub())
+    with pytest.raises(ClientError):
+        fm.client.invoke_model_with_response_stream(modelId=fm._model_id, body="{}")
+
+
+def test_seeded_errors_are_reproducible():
+    def failures(seed):
+        client = stub(error_rate=0.3, seed=seed)
+        out = []
+        for _ in range(50):
+            try:
+                client.invoke_model(modelId=Model.AMAZON_TITAN_TEXT_EXPRESS_V1.value, body="{}")
+                out.append(False)
+            except ClientError:
+                out.append(True)
+        return out
+
+    assert failures(1) == failures(1)
+    assert 5 < sum(failures(1)) < 25
+
+
+def test_server():
+    pytest.importorskip("httpx")
+    session = boto3.Session(aws_access_key_id="a", aws_secret_access_key="b", region_name="us-east-1")
+    with StubServer(stub()) as server:
+        boto3_client = session.client("bedrock-runtime", endpoint_url=server.endpoint_url)
+        transport = HttpTransport(session=session, endpoint_url=server.endpoint_url, http2=False)
+        for client in [boto3_client, transport]:
+            fm = Claude3.from_id(Model.ANTHROPIC_CLAUDE_3_HAIKU_20240307_V1_0, client=client)
+            assert fm.generate("Hello") == [TEXT]
+            assert "".join(fm.generate("Hello", stream=True)) == TEXT
+        server.client.error_rate = 1.0
+        with pytest.raises(ClientError) as e:
+            transport.invoke_model(modelId=Model.AMAZON_TITAN_TEXT_EXPRESS_V1.value, body="{}")
+        assert e.value.response["Error"]["Code"] == "ModelErrorException"
+        assert e.value.response["ResponseMetadata"]["HTTPStatusCode"] == 424
+        transport.close()
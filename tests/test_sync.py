@@ -0,0 +1,99 @@
+from bedrock_fm import CorpusSync, Embed, InMemoryVectorStore, Model
+from bedrock_fm.sync import content_defined_chunks
+from io import BytesIO
+import json
+import random
+
+
+class FakeEmbeddingsClient:
+    def __init__(self):
+        self.texts = 0
+
+    def invoke_model(self, modelId, body, **kwargs):
+        texts = json.loads(body)["texts"]
+        self.texts += len(texts)
+        out = {"embeddings": [[len(t)] for t in texts]}
+        return {"body": BytesIO(json.dumps(out).encode())}
+
+
+def make_text(seed, n=3000):
+    rnd = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+    return " ".join(rnd.choice(words) + str(rnd.randint(0, 99)) for _ in range(n))
+
+
+def test_cdc_local_edit():
+    text = make_text(1)
+    a = list(content_defined_chunks(text, 200, 800, 1500))
+    assert "".join(a) == text
+    assert all(len(c) <= 1500 for c in a)
+    i = len(text) // 2
+    edited = text[:i] + " inserted words here " + text[i:]
+    b = list(content_defined_chunks(edited, 200, 800, 1500))
+    assert len(set(a) - set(b)) <= 3
+
+
+def test_sync_incremental(tmp_path):
+    client = FakeEmbeddingsClient()
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=client)
+    store = InMemoryVectorStore()
+    manifest = str(tmp_path / "manifest.json")
+    docs = {"a": make_text(1), "b": make_text(2)}
+
+    r = CorpusSync(model=fm, store=store, manifest_path=manifest).run(docs.items())
+    assert r.chunks_embedded == r.chunks == len(store)
+    assert r.skipped_ratio == 0.0
+    first = client.texts
+
+    docs["a"] = docs["a"][:5000] + " an edit " + docs["a"][5000:]
+    r = CorpusSync(model=fm, store=store, manifest_path=manifest).run(docs.items())
+    assert 0 < r.chunks_embedded <= 3
+    assert r.chunks_deleted == r.chunks_embedded
+    assert r.skipped_ratio > 0.8
+    assert client.texts - first == r.chunks_embedded
+
+    r = CorpusSync(model=fm, store=store, manifest_path=manifest).run(
+        [("b", docs["b"])]
+    )
+    assert r.chunks_embedded == 0
+    assert r.documents_deleted == 1
+    assert all(id.startswith("b#") for id in store.ids())
+
+
+def test_sync_moved_chunks_reuse_vectors():
+    client = FakeEmbeddingsClient()
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=client)
+    store = InMemoryVectorStore()
+    sync = CorpusSync(model=fm, store=store)
+    text = make_text(3)
+    sync.run([("a", text)])
+    n = client.texts
+    r = sync.run([("a", text), ("copy", text)])
+    assert client.texts == n
+    assert r.chunks_embedded == 0
+    assert len(store) == 2 * n
+
+
+def test_sync_manifest_keeps_hashes(tmp_path):
+    client = FakeEmbeddingsClient()
+    fm = Embed.from_id(Model.COHERE_EMBED_ENGLISH_V3, client=client)
+    store = InMemoryVectorStore()
+    manifest = str(tmp_path / "manifest.json")
+    texts = {"a": make_text(4), "b": make_text(5)}
+    CorpusSync(model=fm, store=store, manifest_path=manifest).run(texts.items())
+    with open(manifest) as f:
+        saved = json.load(f)
+    assert all(isinstance(offset, int) for offset in saved["vectors"].values())
+    n = client.texts
+
+    sync = CorpusSync(model=fm, store=store, manifest_path=manifest)
+    r = sync.run([("a", texts["a"]), ("b", texts["b"]), ("copy", texts["a"])])
+    assert client.texts == n and r.chunks_embedded == 0
+    h = sync.documents["copy"][0]
+    assert list(store.vectors[f"copy#{h}"]) == list(store.vectors[f"a#{h}"])
+    assert sync.vectors == {}
+
+    sync = CorpusSync(model=fm, store=store, manifest_path=manifest)
+    sync.run([("c", make_text(6))])
+    files = [p.name for p in tmp_path.iterdir() if p.name.endswith(".vectors")]
+    assert files == [sync._vectors_file] and sync._lines == len(sync._offsets)
@@ -0,0 +1,70 @@
+from bedrock_fm import (
+    EmbeddingPipeline,
+    InMemoryVectorStore,
+    Model,
+    TitanMultimodalEmbeddings,
+    from_model_id,
+)
+from bedrock_fm.exceptions import BedrockArgsError
+from base64 import b64decode
+from io import BytesIO
+from pathlib import Path
+from PIL import Image
+import json
+import pytest
+
+fm = TitanMultimodalEmbeddings.from_id(
+    Model.AMAZON_TITAN_EMBED_IMAGE_V1, output_embedding_length=384, max_image_size=64
+)
+
+
+class FakeEmbeddingsClient:
+    def invoke_model(self, modelId, body, **kwargs):
+        body = json.loads(body)
+        out = {"embedding": [len(body.get("inputImage", "")), len(body.get("inputText", ""))]}
+        return {"body": BytesIO(json.dumps(out).encode())}
+
+
+def test_from_model_id():
+    assert type(from_model_id(Model.AMAZON_TITAN_EMBED_IMAGE_V1)) is TitanMultimodalEmbeddings
+
+
+def test_body_text_and_image():
+    img = Image.new("RGB", (256, 128), "red")
+    b = json.loads(fm.get_body([(img, "a red box")], None))
+    assert b["inputText"] == "a red box"
+    assert b["embeddingConfig"] == {"outputEmbeddingLength": 384}
+    resized = Image.open(BytesIO(b64decode(b["inputImage"])))
+    assert resized.size == (64, 32)
+
+
+def test_body_bytes_passthrough():
+    buffer = BytesIO()
+    Image.new("RGB", (32, 32), "blue").save(buffer, format="png")
+    b = json.loads(fm.get_body([buffer.getvalue()], None))
+    assert b64decode(b["inputImage"]) == buffer.getvalue()
+    assert "inputText" not in b
+
+
+def test_invalid_length():
+    m = TitanMultimodalEmbeddings.from_id(
+        Model.AMAZON_TITAN_EMBED_IMAGE_V1, output_embedding_length=100
+    )
+    with pytest.raises(BedrockArgsError):
+        m.get_body(["text"], None)
+
+
+def test_pipeline_images(tmp_path):
+    for i in range(5):
+        Image.new("RGB", (16 + i, 16), "green").save(tmp_path / f"{i}.png")
+    m = TitanMultimodalEmbeddings.from_id(
+        Model.AMAZON_TITAN_EMBED_IMAGE_V1, client=FakeEmbeddingsClient()
+    )
+    store = InMemoryVectorStore()
+    paths = sorted(Path(tmp_path).glob("*.png"))
+    n = EmbeddingPipeline(model=m, max_workers=2).run_items_to_store(
+        ((p.name, p) for p in paths), store
+    )
+    assert n == 5
+    assert store.ids() == [p.name for p in paths]
+    assert len(m.generate_for_images(paths + [(paths[0], "caption")])) == 6
@@ -0,0 +1,120 @@
+from bedrock_fm import Titan
+from bedrock_fm.transport import HttpTransport, SigV4Signer
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.credentials import Credentials
+from botocore.exceptions import ClientError
+from datetime import datetime, timezone
+import boto3
+import json
+import pytest
+import struct
+import zlib
+
+httpx = pytest.importorskip("httpx")
+
+creds = Credentials("AKIDEXAMPLE", "wJalrXUtnFEMI/K7MDENG+bPxRfiCYEXAMPLEKEY", "tok")
+session = boto3.Session(
+    aws_access_key_id=creds.access_key,
+    aws_secret_access_key=creds.secret_key,
+    aws_session_token=creds.token,
+    region_name="us-east-1",
+)
+
+
+def frame(headers, payload):
+    h = b""
+    for k, v in headers.items():
+        h += bytes([len(k)]) + k.encode() + b"\x07" + struct.pack(">H", len(v)) + v.encode()
+    total = 16 + len(h) + len(payload)
+    prelude = struct.pack(">II", total, len(h))
+    prelude += struct.pack(">I", zlib.crc32(prelude))
+    msg = prelude + h + payload
+    return msg + struct.pack(">I", zlib.crc32(msg))
+
+
+def chunk(data):
+    payload = json.dumps({"bytes": __import__("base64").b64encode(json.dumps(data).encode()).decode()})
+    return frame(
+        {":message-type": "event", ":event-type": "chunk", ":content-type": "application/json"},
+        payload.encode(),
+    )
+
+
+def test_signature_matches_botocore():
+    now = datetime(2024, 5, 1, 12, 30, 0, tzinfo=timezone.utc)
+    path = "/model/anthropic.claude-3-haiku-20240307-v1%3A0/invoke"
+    body = b'{"a": 1}'
+    headers = {"Content-Type": "application/json", "Accept": "*/*"}
+    ours = SigV4Signer(region="us-east-1").sign(
+        "POST", "bedrock-runtime.us-east-1.amazonaws.com", path, headers, body, creds, now
+    )
+
+    request = AWSRequest(
+        method="POST",
+        url="https://bedrock-runtime.us-east-1.amazonaws.com" + path,
+        data=body,
+        headers=dict(headers),
+    )
+    request.context["timestamp"] = now.strftime("%Y%m%dT%H%M%SZ")
+    auth = SigV4Auth(creds, "bedrock", "us-east-1")
+    request.headers["X-Amz-Date"] = request.context["timestamp"]
+    request.headers["X-Amz-Security-Token"] = creds.token
+    signature = auth.signature(
+        auth.string_to_sign(request, auth.canonical_request(request)), request
+    )
+    auth._inject_signature_to_request(request, signature)
+    assert ours["Authorization"] == request.headers["Authorization"]
+
+
+def test_invoke_model():
+    seen = {}
+
+    def handler(request):
+        seen["url"] = str(request.url)
+        seen["auth"] = request.headers["authorization"]
+        out = {"results": [{"outputText": "hello"}]}
+        return httpx.Response(200, json=out)
+
+    t = HttpTransport(session=session, http=httpx.Client(transport=httpx.MockTransport(handler)))
+    fm = Titan.from_id("amazon.titan-text-express-v1", client=t)
+    assert fm.generate("hi") == ["hello"]
+    assert seen["url"] == "https://bedrock-runtime.us-east-1.amazonaws.com/model/amazon.titan-text-express-v1/invoke"
+    assert seen["auth"].startswith("AWS4-HMAC-SHA256 Credential=AKIDEXAMPLE/")
+
+
+def test_invoke_model_error():
+    def handler(request):
+        return httpx.Response(
+            429,
+            headers={"x-amzn-ErrorType": "ThrottlingException:http://internal"},
+            json={"message": "slow down"},
+        )
+
+    t = HttpTransport(session=session, http=httpx.Client(transport=httpx.MockTransport(handler)))
+    with pytest.raises(ClientError) as e:
+        t.invoke_model(modelId="amazon.titan-text-express-v1", body="{}")
+    assert e.value.response["Error"]["Code"] == "ThrottlingException"
+
+
+def test_invoke_model_stream():
+    def handler(request):
+        content = b"".join(chunk({"outputText": t}) for t in ["a", "b", "c"])
+        return httpx.Response(200, content=content)
+
+    t = HttpTransport(session=session, http=httpx.Client(transport=httpx.MockTransport(handler)))
+    fm = Titan.from_id("amazon.titan-text-express-v1", client=t)
+    assert list(fm.generate("hi", stream=True)) == ["a", "b", "c"]
+
+
+def test_async_invoke_model():
+    import asyncio
+
+    def handler(request):
+        return httpx.Response(200, json={"ok": True})
+
+    t = HttpTransport(
+        session=session, ahttp=httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+    resp = asyncio.run(t.ainvoke_model(modelId="m", body="{}"))
+    assert json.loads(resp["body"].read()) == {"ok": True}
@@ -0,0 +1,110 @@
+from bedrock_fm import Titan, Model, Transport
+from bedrock_fm.stability import SDXL
+from bedrock_fm.warmup import Warmer, _refresh_credentials, _warmers, warmup
+from botocore.credentials import RefreshableCredentials
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import boto3
+import gc
+import threading
+import time
+
+peers = set()
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        peers.add(self.client_address)
+        time.sleep(0.2)
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def refreshable(expires_in):
+    calls = []
+
+    def refresh():
+        calls.append(1)
+        expiry = datetime.now(timezone.utc) + timedelta(hours=1)
+        return {"access_key": "a", "secret_key": "b", "token": "c", "expiry_time": expiry.isoformat()}
+
+    expiry = datetime.now(timezone.utc) + timedelta(seconds=expires_in)
+    creds = RefreshableCredentials("a", "b", "c", expiry, refresh, "test")
+    return creds, calls
+
+
+def test_open_connections():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        session = boto3.Session(aws_access_key_id="a", aws_secret_access_key="b", region_name="us-east-1")
+        client = session.client("bedrock-runtime", endpoint_url=f"http://127.0.0.1:{server.server_port}")
+        warmup(client, connections=3)
+        assert len(peers) == 3
+        Warmer(client=client, connections=3).warm()
+        assert len(peers) == 3
+    finally:
+        server.shutdown()
+
+
+def test_refresh_credentials():
+    creds, calls = refreshable(20 * 60)
+    _refresh_credentials(creds)
+    assert calls == []
+    creds, calls = refreshable(10 * 60)
+    _refresh_credentials(creds)
+    assert calls == [1]
+    _refresh_credentials(creds)
+    assert calls == [1]
+
+
+class CountingTransport(Transport):
+    def __init__(self):
+        self.opened = []
+        self.creds, self.refreshes = refreshable(3600)
+
+    def invoke_model(self, **kwargs):
+        raise NotImplementedError()
+
+    def invoke_model_with_response_stream(self, **kwargs):
+        raise NotImplementedError()
+
+    def credentials(self):
+        return self.creds
+
+    def open_connections(self, count):
+        self.opened.append(count)
+
+
+def test_prewarm():
+    transport = CountingTransport()
+    Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=transport)
+    assert transport.opened == []
+    fm = Titan.from_id(Model.AMAZON_TITAN_TEXT_EXPRESS_V1, client=transport, prewarm=True)
+    assert transport.opened == [4]
+    assert fm.warmup(connections=8)._thread is None
+    assert transport.opened == [4, 8]
+    SDXL.from_id(Model.STABILITY_STABLE_DIFFUSION_XL_V1, client=transport, prewarm=True)
+    assert transport.opened == [4, 8, 4]
+    warmer = fm.warmup(background=True)
+    assert warmer is fm.warmup(background=True)
+    warmer.stop()
+    assert fm.warmup(background=True) is not warmer
+    fm.warmup(background=True).stop()
+
+
+def test_background_warmer_does_not_keep_client():
+    transport = CountingTransport()
+    warmer = warmup(transport, background=True)
+    assert _warmers[id(transport)] is warmer
+    del transport
+    gc.collect()
+    assert warmer.client is None and warmer not in _warmers.values()
+    warmer._thread.join(timeout=5)
+    assert not warmer._thread.is_alive()
@@ -1,45 +1,205 @@
 #!/bin/usr/env python3
-import boto3
-
-sess = boto3.Session(region_name="us-east-1")
-br = sess.client("bedrock")
-
-models_us_east = br.list_foundation_models()
-sess = boto3.Session(region_name="us-west-2")
-br = sess.client("bedrock")
-models_us_west = br.list_foundation_models()
-
-models = set(
-    [
-        m["modelId"]
-        for m in models_us_east["modelSummaries"]
-        if len(
-            set(m["inferenceTypesSupported"]).intersection(
-                ["ON_DEMAND", "INFERENCE_PROFILE"]
-            )
-        )
-        > 0
-    ]
-)
-models = models.union(
-    [
-        m["modelId"]
-        for m in models_us_west["modelSummaries"]
-        if len(
-            set(m["inferenceTypesSupported"]).intersection(
-                ["ON_DEMAND", "INFERENCE_PROFILE"]
-            )
-        )
-        > 0
-    ]
-)
-
-
-print("# This file is autogenerated")
-print("from enum import Enum\n")
-print("class Model(Enum):")
-
-for id in sorted(models):
-    print(
-        f'    {id.upper().replace(".", "_").replace("-", "_").replace(":", "_")}="{id}"'
+"""Generates `bedrock_fm/model.py`, the `Model` enum, and `bedrock_fm/model_catalog.py`, the capability catalog.
+
+    python tools/gen_model_enum.py             # lists the models in us-east-1 and us-west-2
+    python tools/gen_model_enum.py --offline   # regenerates from the current catalog, after editing LIMITS
+
+Streaming support, modalities and inference types come from `list_foundation_models`. Context windows, output
+token limits, embedding batch sizes, image sizes and extra args are not returned by the API and are maintained in
+`LIMITS` below, by model id prefix.
+"""
+import argparse
+import importlib.util
+import pprint
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent / "bedrock_fm"
+REGIONS = ["us-east-1", "us-west-2"]
+
+LIMITS = {
+    "ai21.j2": dict(
+        context_window=8191,
+        max_output_tokens=8191,
+        extra_args=("countPenalty", "presencePenalty", "frequencyPenalty"),
+    ),
+    "ai21.jamba": dict(
+        context_window=256000,
+        max_output_tokens=4096,
+        extra_args=("response_format", "n", "documents"),
+    ),
+    "amazon.titan-text": dict(context_window=8192, max_output_tokens=8192),
+    "amazon.titan-text-lite": dict(context_window=4096, max_output_tokens=4096),
+    "amazon.titan-text-premier": dict(context_window=32000, max_output_tokens=3072),
+    "amazon.titan-tg1": dict(context_window=8192, max_output_tokens=8192),
+    "amazon.titan-embed": dict(context_window=8192, max_batch_size=1),
+    "amazon.titan-embed-image": dict(
+        context_window=128, max_batch_size=1, max_image_side=2048
+    ),
+    "amazon.titan-image": dict(
+        max_image_side=1408,
+        max_image_pixels=4194304,
+        extra_args=("numberOfImages", "height", "width", "cfgScale", "steps"),
+    ),
+    "anthropic.claude": dict(
+        context_window=100000, max_output_tokens=4096, extra_args=("top_k",)
+    ),
+    "anthropic.claude-v2:1": dict(
+        context_window=200000, max_output_tokens=4096, extra_args=("top_k",)
+    ),
+    "anthropic.claude-3": dict(
+        context_window=200000, max_output_tokens=4096, extra_args=("top_k",)
+    ),
+    "anthropic.claude-3-5-sonnet-20241022": dict(
+        context_window=200000, max_output_tokens=8192, extra_args=("top_k",)
+    ),
+    "cohere.command": dict(
+        context_window=4096,
+        max_output_tokens=4096,
+        extra_args=("return_likelihoods", "num_generations", "k"),
+    ),
+    "cohere.command-r": dict(
+        context_window=128000,
+        max_output_tokens=4096,
+        extra_args=(
+            "k",
+            "documents",
+            "search_queries_only",
+            "preamble",
+            "prompt_truncation",
+            "frequency_penalty",
+            "presence_penalty",
+            "seed",
+            "return_prompt",
+            "tools",
+            "tool_results",
+            "stop_sequences",
+            "raw_prompting",
+        ),
+    ),
+    "cohere.embed": dict(context_window=512, max_batch_size=96),
+    "cohere.rerank": dict(context_window=4096, max_batch_size=1000),
+    "meta.llama2": dict(context_window=4096, max_output_tokens=2048),
+    "meta.llama3": dict(context_window=8192, max_output_tokens=2048),
+    "meta.llama3-1": dict(context_window=128000, max_output_tokens=2048),
+    "meta.llama3-2": dict(context_window=128000, max_output_tokens=2048),
+    "mistral.mistral": dict(
+        context_window=32000, max_output_tokens=8192, extra_args=("top_k",)
+    ),
+    "mistral.mixtral": dict(
+        context_window=32000, max_output_tokens=4096, extra_args=("top_k",)
+    ),
+    "mistral.mistral-large-2407": dict(
+        context_window=128000, max_output_tokens=8192, extra_args=("top_k",)
+    ),
+    "stability.": dict(max_image_side=1536, max_image_pixels=1048576),
+}
+
+LIVE_FIELDS = [
+    "provider",
+    "input_modalities",
+    "output_modalities",
+    "streaming",
+    "on_demand",
+    "inference_profile",
+]
+
+
+def from_summary(summary):
+    types = summary["inferenceTypesSupported"]
+    return dict(
+        provider=summary["providerName"],
+        input_modalities=tuple(summary["inputModalities"]),
+        output_modalities=tuple(summary["outputModalities"]),
+        streaming=bool(summary.get("responseStreamingSupported", False)),
+        on_demand="ON_DEMAND" in types,
+        inference_profile="INFERENCE_PROFILE" in types,
     )
+
+
+def merge(a, b):
+    """Merges the entries of the same model listed in two regions"""
+    merged = dict(a)
+    for k in ["streaming", "on_demand", "inference_profile"]:
+        merged[k] = a[k] or b[k]
+    return merged
+
+
+def limits(model_id):
+    matches = [p for p in LIMITS if model_id.startswith(p)]
+    if not matches:
+        return {}
+    return LIMITS[max(matches, key=len)]
+
+
+def live_models():
+    import boto3
+
+    models = {}
+    for region in REGIONS:
+        br = boto3.Session(region_name=region).client("bedrock")
+        for m in br.list_foundation_models()["modelSummaries"]:
+            entry = from_summary(m)
+            if not (entry["on_demand"] or entry["inference_profile"]):
+                continue
+            if m["modelId"] in models:
+                entry = merge(models[m["modelId"]], entry)
+            models[m["modelId"]] = entry
+    return models
+
+
+def catalog_models():
+    spec = importlib.util.spec_from_file_location(
+        "model_catalog", ROOT / "model_catalog.py"
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return {
+        k: {f: v[f] for f in LIVE_FIELDS} for k, v in module.CATALOG.items()
+    }
+
+
+def formatted(source):
+    """Formats the generated source with black when it is installed, as the CI checks `bedrock_fm` with it"""
+    try:
+        import black
+    except ImportError:
+        return source
+    return black.format_str(source, mode=black.Mode())
+
+
+def write(models):
+    catalog = {}
+    for model_id in sorted(models):
+        entry = dict(models[model_id])
+        entry.update(limits(model_id))
+        catalog[model_id] = entry
+
+    source = "# This file is autogenerated\nfrom enum import Enum\n\nclass Model(Enum):\n"
+    for id in catalog:
+        source += f'    {id.upper().replace(".", "_").replace("-", "_").replace(":", "_")}="{id}"\n'
+    with open(ROOT / "model.py", "w") as f:
+        f.write(formatted(source))
+
+    source = (
+        "# This file is autogenerated by tools/gen_model_enum.py\n"
+        f'CATALOG_VERSION = "{date.today().isoformat()}"\n\n'
+        f"CATALOG = {pprint.pformat(catalog, sort_dicts=False, width=100)}\n"
+    )
+    with open(ROOT / "model_catalog.py", "w") as f:
+        f.write(formatted(source))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="regenerate from the current catalog without calling Bedrock",
+    )
+    args = parser.parse_args()
+    write(catalog_models() if args.offline else live_models())
+
+
+if __name__ == "__main__":
+    main()